@@ -3,4 +3,15 @@ EXCHANGE_CONFIG = {
         'apiKey': 'YOUR_API_KEY',
         'secret': 'YOUR_SECRET_KEY',
     }
-}
\ No newline at end of file
+}
+
+# Polling mode (for hosts without WebSockets). Symbols are exchange ids; an empty
+# list polls every symbol listed on both spot and USDT-M perps. Spot tickers go out
+# in chunks of 20 (the largest symbol list Binance still weighs at 2) and funding
+# rates in one bulk request, at most `max_concurrency` requests in flight.
+POLLER_CONFIG = {
+    'symbols': [],
+    'interval': 1.0,
+    'chunk_size': 20,
+    'max_concurrency': 4,
+}
@@ -1,24 +1,86 @@
 import psycopg2
+import psycopg2.pool
+from psycopg2.extras import execute_values
 import os
+import pandas as pd
 from dotenv import load_dotenv
 
 load_dotenv()
 
+PRICES_COLUMNS = ('timestamp', 'exchange', 'symbol', 'spot', 'perp', 'funding_rate')
+
 class TimescaleDB:
-    def __init__(self):
-        self.conn = psycopg2.connect(
+    def __init__(self, minconn=1, maxconn=4):
+        # One pool per process: the poller and the engine borrow connections
+        # instead of opening (and committing on) their own
+        self.pool = psycopg2.pool.ThreadedConnectionPool(
+            minconn, maxconn,
             dbname=os.getenv('DB_NAME'),
             user=os.getenv('DB_USER'),
             password=os.getenv('DB_PASS'),
             host=os.getenv('DB_HOST'),
             port=os.getenv('DB_PORT')
         )
-        
+
+    def ensure_schema(self):
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    CREATE TABLE IF NOT EXISTS prices (
+                        timestamp    TIMESTAMPTZ      NOT NULL,
+                        exchange     TEXT             NOT NULL,
+                        symbol       TEXT,
+                        spot         DOUBLE PRECISION,
+                        perp         DOUBLE PRECISION,
+                        funding_rate DOUBLE PRECISION
+                    );
+                    ALTER TABLE prices ADD COLUMN IF NOT EXISTS symbol TEXT;
+                    SELECT create_hypertable('prices', 'timestamp', if_not_exists => TRUE, migrate_data => TRUE);
+                """)
+            conn.commit()
+        finally:
+            self.pool.putconn(conn)
+
     def write(self, table: str, data: dict):
-        with self.conn.cursor() as cur:
-            cur.execute(f"""
-                INSERT INTO {table} (timestamp, exchange, spot, perp, funding_rate)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (data['timestamp'], data['exchange'], data['spot'], 
-                  data['perp'], data['funding_rate']))
-        self.conn.commit()
\ No newline at end of file
+        self.write_many(table, [data])
+
+    def write_many(self, table: str, rows: list):
+        """
+        Insert all rows in one statement and one commit.
+        """
+        if not rows:
+            return
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    f"INSERT INTO {table} ({', '.join(PRICES_COLUMNS)}) VALUES %s",
+                    [tuple(row.get(c) for c in PRICES_COLUMNS) for row in rows],
+                    page_size=1000,
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self.pool.putconn(conn)
+
+    def query(self, sql: str, params=None) -> pd.DataFrame:
+        """
+        Run a read query and return its rows as a DataFrame (empty if none).
+        """
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cur:
+                cur.execute(sql, params)
+                columns = [c[0] for c in cur.description]
+                rows = cur.fetchall()
+            conn.rollback()  # end the read transaction; the connection goes back to the pool
+            return pd.DataFrame(rows, columns=columns)
+        finally:
+            self.pool.putconn(conn)
+
+    def close(self):
+        self.pool.closeall()
@@ -3,7 +3,7 @@ import ccxt.async_support as ccxt
 import pandas as pd
 from database import TimescaleDB
 from risk_engine import RiskEngine
-from config import EXCHANGE_CONFIG
+from config import EXCHANGE_CONFIG, POLLER_CONFIG
 
 # -----------------------------------------
 # 1. DATA COLLECTOR
@@ -11,35 +11,98 @@ from config import EXCHANGE_CONFIG
 class DataHandler:
     def __init__(self):
         self.db = TimescaleDB()
-    
+        self.symbols = POLLER_CONFIG['symbols']
+        self.interval = POLLER_CONFIG['interval']
+        self.chunk_size = POLLER_CONFIG['chunk_size']
+        self.max_concurrency = POLLER_CONFIG['max_concurrency']
+
+    def universe(self, exchange):
+        """
+        {exchange id: (spot symbol, perp symbol)} for the configured symbols, or
+        for every id that has both a spot and a linear perpetual market.
+        """
+        spot = {m['id']: m['symbol'] for m in exchange.markets.values()
+                if m.get('spot') and m.get('active') is not False}
+        perp = {m['id']: m['symbol'] for m in exchange.markets.values()
+                if m.get('swap') and m.get('linear') and m.get('active') is not False}
+        ids = self.symbols or sorted(spot.keys() & perp.keys())
+        return {i: (spot[i], perp[i]) for i in ids if i in spot and i in perp}
+
+    async def poll(self, exchange, universe, semaphore):
+        """
+        One snapshot of the universe: funding rates in one request, spot tickers
+        in chunks, all concurrently (bounded by `semaphore`). Returns the rows.
+        """
+        async def limited(fetch, symbols):
+            async with semaphore:
+                return await fetch(symbols)
+
+        spot_symbols = [spot for spot, _ in universe.values()]
+        chunks = [spot_symbols[i:i + self.chunk_size] for i in range(0, len(spot_symbols), self.chunk_size)]
+        results = await asyncio.gather(
+            limited(exchange.fetch_funding_rates, [perp for _, perp in universe.values()]),
+            *[limited(exchange.fetch_tickers, chunk) for chunk in chunks],
+            return_exceptions=True,
+        )
+        funding = results[0]
+        if isinstance(funding, Exception):
+            raise funding
+        tickers = {}
+        for result in results[1:]:
+            if isinstance(result, Exception):
+                print(f"Ticker request failed: {result}")
+            else:
+                tickers.update(result)
+
+        timestamp = pd.Timestamp.now(tz='UTC')
+        rows = []
+        for symbol, (spot_symbol, perp_symbol) in universe.items():
+            ticker, perp_data = tickers.get(spot_symbol), funding.get(perp_symbol)
+            if not ticker or not perp_data or ticker.get('last') is None:
+                continue
+            rows.append({
+                'timestamp': timestamp,
+                'exchange': 'binance',
+                'symbol': symbol,
+                'spot': ticker['last'],
+                'perp': perp_data['markPrice'],
+                'funding_rate': perp_data['fundingRate']
+            })
+        return rows
+
     async def update_live_data(self):
-        while True:
-            try:
-                # Connect to Binance
-                exchange = ccxt.binance({
-                    'apiKey': EXCHANGE_CONFIG['binance']['apiKey'],
-                    'secret': EXCHANGE_CONFIG['binance']['secret'],
-                    'enableRateLimit': True,
-                })
-                
-                # Fetch Bitcoin prices
-                spot_price = (await exchange.fetch_ticker('BTC/USDT'))['last']
-                perp_data = await exchange.fetch_funding_rate('BTC/USDT:USDT')
-                
-                # Save to database
-                self.db.write('prices', {
-                    'timestamp': pd.Timestamp.now(),
-                    'exchange': 'binance',
-                    'spot': spot_price,
-                    'perp': perp_data['markPrice'],
-                    'funding_rate': perp_data['fundingRate']
-                })
-                
-                await exchange.close()
-                await asyncio.sleep(60)  # Wait 1 minute
-            
-            except Exception as e:
-                print(f"Error: {e}")
+        # One client for the lifetime of the poller (its connection pool and
+        # rate limiter persist across polls)
+        exchange = ccxt.binance({
+            'apiKey': EXCHANGE_CONFIG['binance']['apiKey'],
+            'secret': EXCHANGE_CONFIG['binance']['secret'],
+            'enableRateLimit': True,
+        })
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        loop = asyncio.get_running_loop()
+        universe = None
+        write = None  # previous batch insert, overlapping the next poll
+        try:
+            while True:
+                started = loop.time()
+                try:
+                    if universe is None:
+                        await loop.run_in_executor(None, self.db.ensure_schema)
+                        await exchange.load_markets()
+                        universe = self.universe(exchange)
+                        print(f"Polling {len(universe)} symbols every {self.interval}s")
+                    rows = await self.poll(exchange, universe, semaphore)
+                    if write is not None:
+                        try:
+                            await write
+                        except Exception as e:
+                            print(f"Error saving prices: {e}")
+                    write = loop.run_in_executor(None, self.db.write_many, 'prices', rows)
+                except Exception as e:
+                    print(f"Error: {e}")
+                await asyncio.sleep(max(0.0, self.interval - (loop.time() - started)))
+        finally:
+            await exchange.close()
 
 # -----------------------------------------
 # 2. ARBITRAGE DETECTOR
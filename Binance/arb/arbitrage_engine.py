@@ -1,25 +1,202 @@
 # arb/arbitrage_engine.py
 
 import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Set
+
+from data.market_state import PriceMatrix
+from data.tick_bus import TickSubscriber
 from data.websocket_client import PriceTick
-from arb.risk_manager import RiskManager
+from arb.risk_manager import MAX_CANDIDATES, RiskManager
 from exec.order_executor import OrderExecutor
 
 
+# Per-symbol opportunity states
+IDLE = 'idle'           # flat, looking for an entry
+ENTERING = 'entering'   # hedge orders in flight
+OPEN = 'open'           # hedged, waiting for the basis to converge
+EXITING = 'exiting'     # closing orders in flight
+
+
+@dataclass
+class SymbolState:
+    state: str = IDLE
+    direction: int = 0          # +1: long spot / short perp, -1: short spot / long perp
+    qty: float = 0.0            # hedged size in asset units
+    entry_basis: float = 0.0
+    cooldown_until_ns: int = 0  # no new action on this symbol before this time
+
+
 class ArbitrageEngine:
-    def __init__(self, risk_manager: RiskManager, order_executor: OrderExecutor):
+    """
+    Stateful strategy loop: each symbol moves idle → entering → open → exiting → idle.
+
+    Entry needs a positive size from RiskManager; exit happens once the basis
+    has converged to `exit_basis`, well inside the entry threshold, so the
+    position does not flap around a single level. While orders are in flight
+    further ticks for that symbol are no-ops, each action is followed by a
+    cooldown, and at most `max_inflight` order tasks run at once.
+
+    Executors return an object with a `hedged_qty` attribute from both
+    `place_hedge` and `close_hedge`.
+    """
+
+    def __init__(
+        self,
+        risk_manager: RiskManager,
+        order_executor: OrderExecutor,
+        exit_basis: float = 0.0005,
+        cooldown_s: float = 5.0,
+        max_inflight: int = 8,
+    ):
         self.risk = risk_manager
         self.executor = order_executor
+        self.exit_basis = exit_basis
+        self.cooldown_ns = int(cooldown_s * 1e9)
+        self.max_inflight = max_inflight
+        self.states: Dict[str, SymbolState] = {}
+        # Strong references to in-flight order tasks (the loop only keeps weak ones)
+        self.tasks: Set[asyncio.Task] = set()
+        # Latest tick time seen; drives cooldowns in both live trading and replay
+        self.clock_ns: int = 0
 
-    async def run(self, price_queue: asyncio.Queue):
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    def on_tick(self, tick: PriceTick, size_asset: Optional[float] = None):
         """
-        Continuously consume PriceTick objects from price_queue.
-        For each tick, calculate position size; if non‐zero, trigger a hedge.
+        Advance the symbol's state machine by one tick. An entry size computed
+        elsewhere (size_universe) can be passed in; it is then only fitted to
+        the order books instead of being sized again.
         """
-        while True:
-            tick: PriceTick = await price_queue.get()
+        now = tick.event_time_ns or tick.recv_time_ns
+        if now > self.clock_ns:
+            self.clock_ns = now
+
+        st = self.states.get(tick.symbol)
+        if st is None:
+            st = self.states[tick.symbol] = SymbolState()
+        state = st.state
+        if state == ENTERING or state == EXITING or now < st.cooldown_until_ns:
+            return
+
+        if state == OPEN:
+            basis = (tick.perp_price - tick.spot_price) / tick.spot_price
+            if st.direction * basis <= self.exit_basis and len(self.tasks) < self.max_inflight:
+                st.state = EXITING
+                self._spawn(self._exit(st, tick))
+            return
 
+        if len(self.tasks) >= self.max_inflight:
+            return
+        if size_asset is None:
             size_asset = self.risk.calculate_position_size(tick)
-            if size_asset > 0:
-                # Launch the hedge asynchronously so that we don't block reading more ticks
-                asyncio.create_task(self.executor.place_hedge(tick, size_asset))
+        else:
+            size_asset = self.risk.fit_to_depth(tick, size_asset)
+        if size_asset > 0:
+            st.state = ENTERING
+            st.direction = 1 if tick.perp_price > tick.spot_price else -1
+            st.entry_basis = (tick.perp_price - tick.spot_price) / tick.spot_price
+            # Launch the hedge asynchronously so that we don't block reading more ticks
+            self._spawn(self._enter(st, tick, size_asset))
+
+    async def _enter(self, st: SymbolState, tick: PriceTick, size_asset: float):
+        qty = 0.0
+        try:
+            report = await self.executor.place_hedge(tick, size_asset)
+            qty = getattr(report, 'hedged_qty', 0.0) if report is not None else 0.0
+        except Exception as e:
+            logging.error(f"Entry for {tick.symbol} failed: {e}")
+        finally:
+            st.qty = qty
+            st.state = OPEN if qty > 0 else IDLE
+            st.cooldown_until_ns = self.clock_ns + self.cooldown_ns
+
+    async def _exit(self, st: SymbolState, tick: PriceTick):
+        closed = 0.0
+        try:
+            report = await self.executor.close_hedge(tick, st.direction, st.qty)
+            closed = getattr(report, 'hedged_qty', 0.0) if report is not None else 0.0
+        except Exception as e:
+            logging.error(f"Exit for {tick.symbol} failed: {e}")
+        finally:
+            st.qty = max(0.0, st.qty - closed)
+            st.state = OPEN if st.qty > 0 else IDLE
+            st.cooldown_until_ns = self.clock_ns + self.cooldown_ns
+
+    def restore_position(self, symbol: str, direction: int, qty: float, entry_basis: float = 0.0):
+        """
+        Resume an open hedge after a restart (e.g. from the fill ledger).
+        """
+        self.states[symbol] = SymbolState(state=OPEN, direction=direction, qty=qty, entry_basis=entry_basis)
+
+    async def shutdown(self):
+        """
+        Cancel all in-flight order tasks and wait for them to finish.
+        """
+        for task in list(self.tasks):
+            task.cancel()
+        if self.tasks:
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def run(self, ticks: TickSubscriber):
+        """
+        Continuously consume the latest PriceTick per symbol from the tick bus.
+        Intermediate ticks are conflated away, so sizing always uses current prices.
+        """
+        while True:
+            for tick in await ticks.get_latest():
+                self.on_tick(tick)
+
+    async def run_universe(self, ticks: TickSubscriber, market: PriceMatrix,
+                           max_candidates: Optional[int] = MAX_CANDIDATES):
+        """
+        Multi-symbol mode: on every market-data update, size the whole universe in
+        one vectorized pass over a PriceMatrix snapshot and feed the ranked
+        candidates (with their sizes), plus every symbol with an open position,
+        to the state machine. Ticks are only built for those symbols. The tick
+        bus is only used as a conflated wake-up signal.
+        """
+        # Open positions whose symbol is not in the matrix (e.g. restored from the
+        # ledger after SYMBOLS changed); warned about once, then left alone
+        untracked: Set[str] = set()
+        while True:
+            await ticks.get_latest()
+            snap = market.snapshot()
+            now_ns = time.time_ns()
+
+            def tick_for(slot: int, funding_rate: float) -> PriceTick:
+                return PriceTick(
+                    snap.symbols[slot],
+                    float(snap.spot[slot]),
+                    float(snap.perp[slot]),
+                    funding_rate,
+                    int(max(snap.spot_time[slot], snap.perp_time[slot])) * 1_000_000,
+                    now_ns,
+                )
+
+            # Exits first, so open positions are never starved by new candidates
+            for symbol, st in self.states.items():
+                if st.state == OPEN:
+                    slot = market.slots.get(symbol)
+                    if slot is None:
+                        if symbol not in untracked:
+                            untracked.add(symbol)
+                            logging.warning(
+                                f"Open {symbol} hedge is not in the streamed universe; "
+                                f"it will not be exited automatically."
+                            )
+                        continue
+                    self.on_tick(tick_for(slot, float(snap.funding[slot])))
+
+            sized = self.risk.size_universe_arrays(snap.spot, snap.perp, max_candidates=max_candidates)
+            for slot, size_asset in zip(sized.slots.tolist(), sized.size.tolist()):
+                if len(self.tasks) >= self.max_inflight:
+                    break
+                st = self.states.get(snap.symbols[slot])
+                if st is None or st.state == IDLE:
+                    self.on_tick(tick_for(slot, float(snap.funding[slot])), size_asset)
@@ -0,0 +1,126 @@
+# arb/position_book.py
+
+import itertools
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, List, Optional
+
+
+@dataclass
+class Lot:
+    lot_id: int
+    symbol: str
+    collateral: float     # USD locked for this lot
+    qty: float = 0.0      # hedged size in asset units
+    direction: int = 0    # +1: long spot / short perp, -1: short spot / long perp
+    opened_ns: int = 0
+
+
+@dataclass
+class SymbolExposure:
+    collateral: float = 0.0
+    qty: float = 0.0        # signed by direction
+    lots: int = 0
+
+
+class PositionBook:
+    """
+    Open lots per symbol (several per symbol allowed) with running totals, so
+    total locked collateral and per-symbol exposure are O(1) reads. Totals are
+    adjusted on every open / fill / close instead of being re-summed.
+    """
+
+    def __init__(self):
+        self.lots: Dict[int, Lot] = {}
+        self.by_symbol: Dict[str, Dict[int, Lot]] = {}
+        self.exposure: Dict[str, SymbolExposure] = {}
+        self.locked_collateral: float = 0.0
+        self._ids = itertools.count(1)
+
+    def __len__(self) -> int:
+        return len(self.lots)
+
+    def open_lot(self, symbol: str, collateral: float, qty: float = 0.0, direction: int = 0,
+                 opened_ns: int = 0, lot_id: Optional[int] = None) -> int:
+        lot_id = lot_id if lot_id is not None else next(self._ids)
+        lot = Lot(lot_id, symbol, collateral, qty, direction, opened_ns)
+        self.lots[lot_id] = lot
+        self.by_symbol.setdefault(symbol, {})[lot_id] = lot
+
+        exp = self.exposure.get(symbol)
+        if exp is None:
+            exp = self.exposure[symbol] = SymbolExposure()
+        exp.collateral += collateral
+        exp.qty += direction * qty
+        exp.lots += 1
+        self.locked_collateral += collateral
+        return lot_id
+
+    def fill_lot(self, lot_id: int, qty_delta: float, collateral_delta: float = 0.0):
+        """
+        Adjust a lot after a (partial) fill or top-up.
+        """
+        lot = self.lots[lot_id]
+        exp = self.exposure[lot.symbol]
+        lot.qty += qty_delta
+        lot.collateral += collateral_delta
+        exp.qty += lot.direction * qty_delta
+        exp.collateral += collateral_delta
+        self.locked_collateral += collateral_delta
+
+    def close_lot(self, lot_id: int) -> Optional[Lot]:
+        lot = self.lots.pop(lot_id, None)
+        if lot is None:
+            return None
+        symbol_lots = self.by_symbol[lot.symbol]
+        del symbol_lots[lot_id]
+
+        exp = self.exposure[lot.symbol]
+        if symbol_lots:
+            exp.collateral -= lot.collateral
+            exp.qty -= lot.direction * lot.qty
+            exp.lots -= 1
+        else:
+            # Last lot: drop the entry rather than leave float residue behind
+            del self.by_symbol[lot.symbol]
+            del self.exposure[lot.symbol]
+
+        if self.lots:
+            self.locked_collateral -= lot.collateral
+        else:
+            self.locked_collateral = 0.0
+        return lot
+
+    def close_symbol(self, symbol: str) -> List[Lot]:
+        return [self.close_lot(lot_id) for lot_id in list(self.by_symbol.get(symbol, ()))]
+
+    def symbol_lots(self, symbol: str) -> List[Lot]:
+        return list(self.by_symbol.get(symbol, {}).values())
+
+
+class OutcomeWindow:
+    """
+    Rolling window of trade outcomes (1 = win, 0 = loss) with a running win count.
+    """
+
+    def __init__(self, maxlen: int = 500):
+        self.outcomes: Deque[int] = deque(maxlen=maxlen)
+        self.wins: int = 0
+
+    def __len__(self) -> int:
+        return len(self.outcomes)
+
+    def __bool__(self) -> bool:
+        return bool(self.outcomes)
+
+    def __iter__(self):
+        return iter(self.outcomes)
+
+    def append(self, outcome: int):
+        if len(self.outcomes) == self.outcomes.maxlen:
+            self.wins -= self.outcomes[0]
+        self.outcomes.append(outcome)
+        self.wins += outcome
+
+    def win_rate(self) -> float:
+        return self.wins / len(self.outcomes)
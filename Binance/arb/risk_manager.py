@@ -1,52 +1,136 @@
 # arb/risk_manager.py
 
+import time
+
 import ccxt.async_support as ccxt
-from collections import deque
-from typing import Dict
+import numpy as np
+from typing import Dict, List, NamedTuple, Optional
+from config import SYMBOL
 from data.websocket_client import PriceTick
+from arb.position_book import OutcomeWindow, PositionBook
+from exec.rate_limiter import METADATA, PassthroughScheduler
+from metrics.latency import histogram
+
+
+# Slippage cushion added on top of the taker fee (1 bp)
+SLIPPAGE_CUSHION = 0.0001
+# Rounds of re-pricing a size against the order books before giving up on it
+DEPTH_SIZING_ITERATIONS = 4
+# Candidates size_universe turns into Opportunity objects (best edge first)
+MAX_CANDIDATES = 32
+
+_SIZING = histogram('sizing')
+
+
+class Opportunity(NamedTuple):
+    """
+    One sized candidate from RiskManager.size_universe, ready to hand to the executor.
+    """
+    symbol: str
+    slot: int
+    spot_price: float
+    perp_price: float
+    funding_rate: float
+    basis: float
+    edge: float
+    kelly: float
+    size_asset: float
+
+
+class SizedUniverse(NamedTuple):
+    """
+    Ranked positive-size candidates from RiskManager.size_universe_arrays, as
+    parallel arrays (best edge first); `slots` index the input arrays.
+    """
+    slots: np.ndarray
+    basis: np.ndarray
+    edge: np.ndarray
+    kelly: np.ndarray
+    size: np.ndarray
 
 
 class RiskManager:
-    def __init__(self, initial_equity: float = 100_000.0, max_alloc: float = 0.1):
+    def __init__(
+        self,
+        initial_equity: float = 100_000.0,
+        max_alloc: float = 0.1,
+        slippage_cushion: float = SLIPPAGE_CUSHION,
+        prior_win_prob: float = 0.6,
+    ):
         self.equity: float = initial_equity
-        self.open_positions: Dict[str, Dict] = {}  # Track collateral & entry for each symbol
-        self.historical_outcomes = deque(maxlen=500)  # 1 for win, 0 for loss
+        self.positions = PositionBook()  # Lots, collateral & exposure per symbol, with running totals
+        self.historical_outcomes = OutcomeWindow(maxlen=500)  # 1 for win, 0 for loss
         self.maker_fee: float = 0.0
         self.taker_fee: float = 0.0
         self.max_alloc: float = max_alloc
+        self.slippage_cushion: float = slippage_cushion
+        self.prior_win_prob: float = prior_win_prob  # used until we have any outcomes
+        # Optional data.order_book.DepthBooks; when its books are synced, sizing
+        # uses the VWAP cost of both legs instead of the flat slippage cushion
+        self.books = None
+        # Optional data.funding.FundingSchedule; when set, the expected funding carry
+        # over one interval is added to the edge (positive when the hedge receives it)
+        self.funding = None
+        # Optional db.history.RollingBasis; rolling basis mean / volatility per symbol
+        # from the continuous aggregates (see basis_zscore)
+        self.history = None
 
-    async def fetch_fees(self, exchange: ccxt.binance):
+    async def fetch_fees(self, exchange: ccxt.binance, scheduler=None, symbol: str = SYMBOL):
         """
-        Fetch maker/taker fees for SYMBOL from Binance REST.
+        Fetch maker/taker fees for `symbol` (exchange id, SYMBOL by default) from Binance REST.
         If Binance does not return a per‐symbol breakdown, default to 0.001 (0.1%).
+        If the request fails, keep fees already known (e.g. from a snapshot).
         """
+        scheduler = scheduler or PassthroughScheduler()
         try:
-            fees_resp = await exchange.fetch_trading_fees()
+            fees_resp = await scheduler.call(exchange.fetch_trading_fees, venue='spot', weight=1, priority=METADATA)
             # fetch_trading_fees() returns a dict: { 'BTC/USDT': {'maker': 0.0002, 'taker': 0.0004}, ... }
-            key = exchange.market_id(SYMBOL) if hasattr(exchange, 'market_id') else SYMBOL
+            key = next(
+                (m['symbol'] for m in (exchange.markets or {}).values() if m['id'] == symbol and m.get('spot')),
+                symbol,
+            )
             symbol_fees = fees_resp.get(key, {})
             self.maker_fee = float(symbol_fees.get('maker', 0.001))
             self.taker_fee = float(symbol_fees.get('taker', 0.001))
         except Exception:
             # Fallback defaults
-            self.maker_fee = 0.001
-            self.taker_fee = 0.001
+            if not self.taker_fee:
+                self.maker_fee = 0.001
+                self.taker_fee = 0.001
+
+    def basis_zscore(self, symbol: str, basis: float) -> Optional[float]:
+        """
+        Distance of `basis` from its rolling mean in rolling standard deviations;
+        None without history for the symbol.
+        """
+        if self.history is None:
+            return None
+        return self.history.zscore(symbol, basis)
 
     def estimate_win_prob(self) -> float:
         """
         Estimate empirical win probability from historical outcomes.
-        If not enough data, default to 0.6.
+        If not enough data, default to prior_win_prob (0.6).
         """
         if not self.historical_outcomes:
-            return 0.6
-        return sum(self.historical_outcomes) / len(self.historical_outcomes)
+            return self.prior_win_prob
+        return self.historical_outcomes.win_rate()
 
     def available_equity(self) -> float:
         """
         Subtract all locked collateral for open positions from total equity.
         """
-        locked = sum(pos.get('locked_collateral', 0.0) for pos in self.open_positions.values())
-        return self.equity - locked
+        return self.equity - self.positions.locked_collateral
+
+    @property
+    def open_positions(self) -> Dict[str, Dict]:
+        """
+        Per-symbol summary of the position book (locked collateral, signed qty, lot count).
+        """
+        return {
+            symbol: {'locked_collateral': exp.collateral, 'qty': exp.qty, 'lots': exp.lots}
+            for symbol, exp in self.positions.exposure.items()
+        }
 
     def calculate_position_size(self, tick: PriceTick) -> float:
         """
@@ -54,30 +138,29 @@ class RiskManager:
         then convert to asset units (spot side size).
         Returns size in units of the asset (e.g. BTC).
         """
+        t0 = time.perf_counter_ns()
+
         # 1. Compute basis in decimal (e.g., 0.007 for 0.7%)
         basis_pct = (tick.perp_price - tick.spot_price) / tick.spot_price
 
         # 2. Fee + slippage cushion (taker fee + 1 bps)
-        fee_slippage = self.taker_fee + 0.0001
+        fee_slippage = self.taker_fee + self.slippage_cushion
 
-        # 3. Effective edge
-        edge = abs(basis_pct) - fee_slippage
+        # 3. Effective edge (plus expected funding carry for the hedge direction)
+        carry = 0.0
+        if self.funding is not None:
+            carry = self.funding.expected_carry(tick.symbol, 1 if basis_pct > 0 else -1)
+        edge = abs(basis_pct) + carry - fee_slippage
 
         # 4. Empirical win probability
         win_prob = self.estimate_win_prob()
 
         if edge <= 0 or win_prob < 0.51:
+            _SIZING.record(time.perf_counter_ns() - t0)
             return 0.0
 
-        # 5. Kelly fraction: (p * b - q) / b
-        b = edge  # assuming if we win, we make `edge` fraction (e.g., 0.005)
-        q = 1 - win_prob
-        kelly = (win_prob * b - q) / b
-        # Use half‐Kelly for safety
-        kelly *= 0.5
-
-        # 6. Constrain by max_alloc
-        kelly = max(0.0, min(kelly, self.max_alloc))
+        # 5-6. Half-Kelly fraction, constrained by max_alloc
+        kelly = self._half_kelly(edge, win_prob)
 
         # 7. Determine USD to allocate
         usd_alloc = self.available_equity() * kelly
@@ -85,28 +168,161 @@ class RiskManager:
         # 8. Convert to asset units
         size_asset = usd_alloc / tick.spot_price
 
+        # 9. With live books, replace the flat cushion by the cost of walking both books
+        if self.books is not None and size_asset > 0:
+            size_asset = self._fit_to_depth(tick, basis_pct, carry, size_asset, win_prob)
+
+        _SIZING.record(time.perf_counter_ns() - t0)
         return max(0.0, size_asset)
 
-    def lock_collateral(self, symbol: str, locked_usd: float):
+    def fit_to_depth(self, tick: PriceTick, size_asset: float) -> float:
         """
-        Register locked collateral for an open position.
+        Step 9 of calculate_position_size for a size computed elsewhere (e.g. by
+        size_universe): shrink it to what both order books support. Unchanged
+        without books.
         """
-        self.open_positions[symbol] = {
-            'locked_collateral': locked_usd
-        }
+        if self.books is None or size_asset <= 0:
+            return size_asset
+        basis_pct = (tick.perp_price - tick.spot_price) / tick.spot_price
+        carry = 0.0
+        if self.funding is not None:
+            carry = self.funding.expected_carry(tick.symbol, 1 if basis_pct > 0 else -1)
+        return max(0.0, self._fit_to_depth(tick, basis_pct, carry, size_asset, self.estimate_win_prob()))
+
+    def _half_kelly(self, edge: float, win_prob: float) -> float:
+        """
+        Half of the Kelly fraction (p * b - q) / b for a win of `edge`, clamped to [0, max_alloc].
+        """
+        if edge <= 0:
+            return 0.0
+        kelly = 0.5 * (win_prob * edge - (1 - win_prob)) / edge
+        return max(0.0, min(kelly, self.max_alloc))
 
-    def record_trade_outcome(self, symbol: str, pnl_usd: float):
+    def _fit_to_depth(self, tick: PriceTick, basis_pct: float, carry: float, size_asset: float,
+                      win_prob: float) -> float:
+        """
+        Shrink `size_asset` until the edge left after the VWAP slippage of both
+        legs at that size still supports it. Never grows the size; keeps it as is
+        when either book is not synced.
+        """
+        direction = 1 if basis_pct > 0 else -1
+        equity = self.available_equity()
+        for _ in range(DEPTH_SIZING_ITERATIONS):
+            cost = self.books.hedge_cost(tick.symbol, direction, size_asset)
+            if cost is None:
+                return size_asset
+            slippage, fillable = cost
+            edge = abs(basis_pct) + carry - self.taker_fee - slippage
+            if edge <= 0:
+                # Too deep into the book: back off and re-price
+                size_asset = 0.5 * min(size_asset, fillable)
+                continue
+            fitted = min(size_asset, fillable, equity * self._half_kelly(edge, win_prob) / tick.spot_price)
+            if fitted >= size_asset:
+                return size_asset
+            size_asset = fitted
+            if size_asset <= 0:
+                return 0.0
+        # Out of rounds: only keep the size if it now pays for its own slippage
+        cost = self.books.hedge_cost(tick.symbol, direction, size_asset)
+        if cost is None or abs(basis_pct) + carry - self.taker_fee - cost[0] > 0:
+            return size_asset
+        return 0.0
+
+    def size_universe_arrays(
+        self,
+        spot: np.ndarray,
+        perp: np.ndarray,
+        max_candidates: Optional[int] = MAX_CANDIDATES,
+    ) -> SizedUniverse:
+        """
+        Vectorized calculate_position_size over a whole universe in one NumPy pass.
+        Computes basis, fee-adjusted edge, half-Kelly fraction clamped to max_alloc
+        and asset-unit size for every slot, and returns the `max_candidates` best
+        positive-size slots by edge (all of them for None). Slots with a NaN price
+        are skipped. With a FundingSchedule attached (slots aligned with the
+        arrays), the expected carry per funding interval is added to the edge.
+        Depth fitting is left to the caller (fit_to_depth), for the few
+        candidates that are actually entered.
+        """
+        t0 = time.perf_counter_ns()
+        win_prob = self.estimate_win_prob()
+        if win_prob < 0.51:
+            _SIZING.record(time.perf_counter_ns() - t0)
+            empty = np.empty(0, dtype=np.float64)
+            return SizedUniverse(np.empty(0, dtype=np.intp), empty, empty, empty, empty)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            basis = (perp - spot) / spot
+            edge = np.abs(basis) - (self.taker_fee + self.slippage_cushion)
+            if self.funding is not None:
+                edge += np.sign(basis) * self.funding.carry
+            kelly = 0.5 * (win_prob * edge - (1 - win_prob)) / edge
+            np.clip(kelly, 0.0, self.max_alloc, out=kelly)
+            size = (self.available_equity() * kelly) / spot
+
+        candidates = np.flatnonzero((edge > 0) & (size > 0))
+        if max_candidates is not None and len(candidates) > max_candidates:
+            # Partial selection: only the top-k are sorted
+            top = np.argpartition(-edge[candidates], max_candidates - 1)[:max_candidates]
+            candidates = candidates[top]
+        ranked = candidates[np.argsort(-edge[candidates], kind='stable')]
+
+        _SIZING.record(time.perf_counter_ns() - t0)
+        return SizedUniverse(ranked, basis[ranked], edge[ranked], kelly[ranked], size[ranked])
+
+    def size_universe(
+        self,
+        spot: np.ndarray,
+        perp: np.ndarray,
+        funding: np.ndarray,
+        symbols: List[str],
+        max_candidates: Optional[int] = MAX_CANDIDATES,
+    ) -> List[Opportunity]:
+        """
+        size_universe_arrays with the top candidates as Opportunity objects.
+        """
+        sized = self.size_universe_arrays(spot, perp, max_candidates)
+        return [
+            Opportunity(symbols[i], i, float(spot[i]), float(perp[i]), float(funding[i]), basis, edge, kelly, size)
+            for i, basis, edge, kelly, size in zip(
+                sized.slots.tolist(), sized.basis.tolist(), sized.edge.tolist(),
+                sized.kelly.tolist(), sized.size.tolist(),
+            )
+        ]
+
+    def lock_collateral(self, symbol: str, locked_usd: float, qty: float = 0.0, direction: int = 0,
+                        opened_ns: int = 0) -> int:
+        """
+        Register locked collateral for a newly opened lot; a symbol can hold several lots.
+        Returns the lot id to pass to `record_fill` / `record_trade_outcome`.
+        """
+        return self.positions.open_lot(symbol, locked_usd, qty, direction, opened_ns)
+
+    def record_fill(self, lot_id: int, qty_delta: float, collateral_delta: float = 0.0):
+        """
+        Adjust an open lot after a later (partial) fill, top-up or partial unwind.
+        """
+        self.positions.fill_lot(lot_id, qty_delta, collateral_delta)
+
+    def record_pnl(self, pnl_usd: float):
+        """
+        PnL that is not a trade outcome (e.g. the cost of an entry whose legs were
+        unwound, or realized PnL restored from the fill ledger): equity only.
+        """
+        self.equity += pnl_usd
+
+    def record_trade_outcome(self, symbol: str, pnl_usd: float, lot_id: Optional[int] = None):
         """
         Called whenever a completed arbitrage trade yields PnL.
-        Updates equity, historical outcomes (1 = win, 0 = loss), and releases collateral.
+        Updates equity, historical outcomes (1 = win, 0 = loss), and releases collateral:
+        only `lot_id` if given, otherwise every lot of the symbol.
         """
-        if pnl_usd > 0:
-            self.historical_outcomes.append(1)
-        else:
-            self.historical_outcomes.append(0)
+        self.historical_outcomes.append(1 if pnl_usd > 0 else 0)
 
         self.equity += pnl_usd
 
-        # Remove collateral lock if position is closed
-        if symbol in self.open_positions:
-            del self.open_positions[symbol]
+        if lot_id is not None:
+            self.positions.close_lot(lot_id)
+        else:
+            self.positions.close_symbol(symbol)
@@ -0,0 +1,179 @@
+# backtest/replay.py
+#
+# Faster-than-real-time replay of recorded ticks through the real ArbitrageEngine
+# and RiskManager, with a SimulatedOrderExecutor in place of the exchange.
+#
+#   cd Binance && python -m backtest.replay --spool /var/spool/ticks --symbol BTCUSDT
+#   cd Binance && python -m backtest.replay --spool /var/spool/ticks \
+#       --sweep max_alloc=0.05,0.1,0.2 --sweep slippage_cushion=0.0001,0.0005 --processes 8
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, replace
+from typing import AsyncIterator, Dict, List
+
+import numpy as np
+
+from arb.arbitrage_engine import ArbitrageEngine
+from arb.risk_manager import RiskManager
+from backtest.sim_executor import SimulatedOrderExecutor
+from backtest.sources import open_source
+from data.websocket_client import PriceTick
+
+
+@dataclass
+class BacktestParams:
+    initial_equity: float = 100_000.0
+    max_alloc: float = 0.1
+    slippage_cushion: float = 0.0001   # RiskManager fee cushion on top of the taker fee
+    prior_win_prob: float = 0.6
+    taker_fee: float = 0.0004
+    sim_slippage_bps: float = 1.0
+    sim_latency_ms: float = 50.0
+    sim_fill_ratio: float = 1.0
+    exit_basis: float = 0.0005
+    cooldown_s: float = 5.0
+
+
+async def run_backtest(chunks: AsyncIterator[np.ndarray], params: BacktestParams) -> dict:
+    """
+    Replay every chunk of spool records through the strategy and return a summary.
+    """
+    risk = RiskManager(
+        initial_equity=params.initial_equity,
+        max_alloc=params.max_alloc,
+        slippage_cushion=params.slippage_cushion,
+        prior_win_prob=params.prior_win_prob,
+    )
+    risk.maker_fee = risk.taker_fee = params.taker_fee
+    executor = SimulatedOrderExecutor(
+        risk,
+        fee_rate=params.taker_fee,
+        slippage_bps=params.sim_slippage_bps,
+        latency_ms=params.sim_latency_ms,
+        fill_ratio=params.sim_fill_ratio,
+    )
+    engine = ArbitrageEngine(risk, executor, exit_basis=params.exit_basis, cooldown_s=params.cooldown_s)
+
+    symbols: Dict[bytes, str] = {}
+    n_ticks = 0
+    first_ns = last_ns = 0
+    t0 = time.perf_counter()
+
+    async for chunk in chunks:
+        if not len(chunk):
+            continue
+        if not first_ns:
+            first_ns = int(chunk['event_ns'][0])
+        for ns, raw_symbol, spot, perp, funding in zip(
+            chunk['event_ns'].tolist(), chunk['symbol'].tolist(),
+            chunk['spot'].tolist(), chunk['perp'].tolist(), chunk['funding'].tolist(),
+        ):
+            symbol = symbols.get(raw_symbol)
+            if symbol is None:
+                symbol = symbols[raw_symbol] = raw_symbol.decode()
+            tick = PriceTick(symbol, spot, perp, funding, ns, ns)
+            executor.on_tick(tick)
+            engine.on_tick(tick)
+            if engine.tasks:
+                await asyncio.sleep(0)  # let in-flight order tasks submit / observe fills at this tick's time
+        n_ticks += len(chunk)
+        last_ns = int(chunk['event_ns'][-1])
+
+    wall_s = time.perf_counter() - t0
+    sim_s = (last_ns - first_ns) / 1e9
+    return {
+        'params': asdict(params),
+        'ticks': n_ticks,
+        'hedges_opened': executor.hedges_opened,
+        'hedges_closed': executor.hedges_closed,
+        'fees_paid': executor.fees_paid,
+        'funding_received': executor.funding_received,
+        'realized_pnl': executor.realized_pnl,
+        'unrealized_pnl': executor.unrealized_pnl(),
+        'final_equity': risk.equity,
+        'max_drawdown': executor.max_drawdown,
+        'win_prob': risk.estimate_win_prob(),
+        'wall_s': wall_s,
+        'sim_span_s': sim_s,
+        'ticks_per_s': n_ticks / wall_s if wall_s else 0.0,
+        'speedup_vs_realtime': sim_s / wall_s if wall_s else 0.0,
+    }
+
+
+def _run_one(job) -> dict:
+    source_spec, params = job
+    return asyncio.run(run_backtest(open_source(source_spec), params))
+
+
+def run_sweep(source_spec: dict, base: BacktestParams, grid: Dict[str, List[float]], processes: int = None) -> List[dict]:
+    """
+    Run one backtest per point of the parameter grid across a process pool.
+    Each worker opens its own copy of the source from the picklable spec.
+    """
+    names = list(grid)
+    jobs = [
+        (source_spec, replace(base, **dict(zip(names, values))))
+        for values in itertools.product(*(grid[n] for n in names))
+    ]
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        return list(pool.map(_run_one, jobs))
+
+
+def _parse_sweep(items: List[str]) -> Dict[str, List[float]]:
+    grid = {}
+    for item in items:
+        name, values = item.split('=', 1)
+        if name not in BacktestParams.__dataclass_fields__:
+            raise SystemExit(f"Unknown parameter {name!r}")
+        grid[name] = [float(v) for v in values.split(',')]
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded ticks through the arbitrage strategy.")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--spool', help="spool directory written by db.spool.SpoolWriter")
+    source.add_argument('--npy', help=".npy file of spool records")
+    source.add_argument('--dsn', help="Timescale DSN to stream the prices table from")
+    source.add_argument('--archive', help="columnar archive root written by db.archive")
+    parser.add_argument('--symbol', help="symbol filter (required with --dsn)")
+    parser.add_argument('--start', help="ISO start time (with --dsn or --archive)")
+    parser.add_argument('--end', help="ISO end time (with --dsn or --archive)")
+    parser.add_argument('--sweep', action='append', default=[], metavar='PARAM=V1,V2,...')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.spool:
+        spec = {'kind': 'spool', 'directory': args.spool, 'symbol': args.symbol}
+    elif args.npy:
+        spec = {'kind': 'npy', 'path': args.npy}
+    elif args.archive:
+        from datetime import datetime, timezone
+        to_ns = lambda value: int(datetime.fromisoformat(value).replace(tzinfo=timezone.utc).timestamp() * 1e9)
+        spec = {
+            'kind': 'archive', 'root': args.archive, 'symbol': args.symbol,
+            'start_ns': to_ns(args.start) if args.start else 0,
+            'end_ns': to_ns(args.end) if args.end else None,
+        }
+    else:
+        from datetime import datetime
+        spec = {
+            'kind': 'prices', 'dsn': args.dsn, 'symbol': args.symbol,
+            'start': datetime.fromisoformat(args.start), 'end': datetime.fromisoformat(args.end),
+        }
+
+    grid = _parse_sweep(args.sweep)
+    if grid:
+        results = run_sweep(spec, BacktestParams(), grid, args.processes)
+    else:
+        results = [_run_one((spec, BacktestParams()))]
+    print(json.dumps(results, indent=2, default=str))
+
+
+if __name__ == '__main__':
+    main()
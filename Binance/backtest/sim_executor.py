@@ -0,0 +1,194 @@
+# backtest/sim_executor.py
+
+import asyncio
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from arb.risk_manager import RiskManager
+from data.websocket_client import PriceTick
+
+
+FUNDING_INTERVAL_NS = 8 * 3600 * 1_000_000_000  # Binance funds at 00:00, 08:00 and 16:00 UTC
+
+
+@dataclass
+class SimOrder:
+    symbol: str
+    direction: int      # +1: long spot / short perp, -1: short spot / long perp
+    size_asset: float
+    fill_after_ns: int  # send time + simulated latency
+    closing: bool = False
+    done: Optional[asyncio.Future] = None
+
+
+@dataclass
+class SimReport:
+    """
+    What place_hedge / close_hedge return, mirroring HedgeReport.hedged_qty.
+    """
+    symbol: str
+    hedged_qty: float
+    pnl: float = 0.0
+
+
+@dataclass
+class SimHedge:
+    symbol: str
+    direction: int
+    size_asset: float
+    spot_entry: float
+    perp_entry: float
+    opened_ns: int
+    fees: float = 0.0
+    funding: float = 0.0
+    lot_id: Optional[int] = None    # RiskManager position-book lot
+
+
+class SimulatedOrderExecutor:
+    """
+    Drop-in replacement for OrderExecutor in backtests.
+
+    Time is driven by the replay (`on_tick`), never by the wall clock. A hedge
+    placed at time t fills on the first tick of its symbol at or after
+    t + latency, at that tick's prices moved against us by `slippage_bps`, for
+    `fill_ratio` of the requested size, paying `fee_rate` on each leg; the
+    place_hedge / close_hedge coroutine completes at that simulated fill.
+    Open hedges accrue funding at every 8-hour boundary; on close the realized
+    PnL is reported to RiskManager.record_trade_outcome, as the live
+    user-data stream would.
+    """
+
+    def __init__(
+        self,
+        risk_manager: RiskManager,
+        fee_rate: float = 0.0004,
+        slippage_bps: float = 1.0,
+        latency_ms: float = 50.0,
+        fill_ratio: float = 1.0,
+        margin_rate: float = 0.01,
+    ):
+        self.risk = risk_manager
+        self.fee_rate = fee_rate
+        self.slippage = slippage_bps / 10_000
+        self.latency_ns = int(latency_ms * 1_000_000)
+        self.fill_ratio = fill_ratio
+        self.margin_rate = margin_rate
+
+        self.now_ns: int = 0
+        self.pending: Dict[str, List[SimOrder]] = {}
+        self.open_hedges: Dict[str, List[SimHedge]] = {}
+        self.last_tick: Dict[str, PriceTick] = {}
+
+        self.hedges_opened: int = 0
+        self.hedges_closed: int = 0
+        self.fees_paid: float = 0.0
+        self.funding_received: float = 0.0
+        self.realized_pnl: float = 0.0
+        self.peak_equity: float = risk_manager.equity
+        self.max_drawdown: float = 0.0
+
+    async def place_hedge(self, tick: PriceTick, size_asset: float) -> SimReport:
+        direction = 1 if tick.perp_price > tick.spot_price else -1
+        return await self._submit(SimOrder(tick.symbol, direction, size_asset, self.now_ns + self.latency_ns))
+
+    async def close_hedge(self, tick: PriceTick, direction: int, qty: float) -> SimReport:
+        return await self._submit(
+            SimOrder(tick.symbol, direction, qty, self.now_ns + self.latency_ns, closing=True)
+        )
+
+    async def _submit(self, order: SimOrder) -> SimReport:
+        order.done = asyncio.get_running_loop().create_future()
+        self.pending.setdefault(order.symbol, []).append(order)
+        return await order.done
+
+    def on_tick(self, tick: PriceTick):
+        """
+        Advance the simulated clock to this tick and process due fills and funding.
+        """
+        ns = tick.event_time_ns
+        if self.now_ns and ns // FUNDING_INTERVAL_NS != self.now_ns // FUNDING_INTERVAL_NS:
+            self._accrue_funding()
+        self.now_ns = ns
+        self.last_tick[tick.symbol] = tick
+
+        orders = self.pending.get(tick.symbol)
+        if orders:
+            still_pending = []
+            for order in orders:
+                if order.fill_after_ns > ns:
+                    still_pending.append(order)
+                    continue
+                report = self._close_all(tick) if order.closing else self._fill(order, tick)
+                if not order.done.done():
+                    order.done.set_result(report)
+            self.pending[tick.symbol] = still_pending
+
+    def _fill(self, order: SimOrder, tick: PriceTick) -> SimReport:
+        size = order.size_asset * self.fill_ratio
+        if size <= 0:
+            return SimReport(order.symbol, 0.0)
+        # Long spot pays up, short perp sells down (and vice versa)
+        spot_px = tick.spot_price * (1 + order.direction * self.slippage)
+        perp_px = tick.perp_price * (1 - order.direction * self.slippage)
+        fees = self.fee_rate * size * (spot_px + perp_px)
+
+        hedge = SimHedge(order.symbol, order.direction, size, spot_px, perp_px, self.now_ns, fees=fees)
+        hedge.lot_id = self.risk.lock_collateral(
+            order.symbol, size * tick.spot_price * self.margin_rate, size, order.direction, self.now_ns
+        )
+        self.open_hedges.setdefault(order.symbol, []).append(hedge)
+        self.hedges_opened += 1
+        self.fees_paid += fees
+        return SimReport(order.symbol, size)
+
+    def _close_all(self, tick: PriceTick) -> SimReport:
+        closed = total_pnl = 0.0
+        for hedge in self.open_hedges.pop(tick.symbol, []):
+            d = hedge.direction
+            spot_px = tick.spot_price * (1 - d * self.slippage)
+            perp_px = tick.perp_price * (1 + d * self.slippage)
+            exit_fees = self.fee_rate * hedge.size_asset * (spot_px + perp_px)
+            self.fees_paid += exit_fees
+
+            pnl = (
+                d * (spot_px - hedge.spot_entry) * hedge.size_asset
+                + d * (hedge.perp_entry - perp_px) * hedge.size_asset
+                + hedge.funding
+                - hedge.fees
+                - exit_fees
+            )
+            self.realized_pnl += pnl
+            self.hedges_closed += 1
+            closed += hedge.size_asset
+            total_pnl += pnl
+            self.risk.record_trade_outcome(hedge.symbol, pnl, hedge.lot_id)
+
+        self.peak_equity = max(self.peak_equity, self.risk.equity)
+        self.max_drawdown = max(self.max_drawdown, self.peak_equity - self.risk.equity)
+        return SimReport(tick.symbol, closed, total_pnl)
+
+    def _accrue_funding(self):
+        # Shorts receive positive funding, longs pay it
+        for symbol, hedges in self.open_hedges.items():
+            tick = self.last_tick[symbol]
+            for hedge in hedges:
+                payment = hedge.direction * tick.funding_rate * tick.perp_price * hedge.size_asset
+                hedge.funding += payment
+                self.funding_received += payment
+
+    def unrealized_pnl(self) -> float:
+        """
+        Mark-to-market PnL of still-open hedges at their last seen prices, before exit costs.
+        """
+        total = 0.0
+        for symbol, hedges in self.open_hedges.items():
+            tick = self.last_tick[symbol]
+            for h in hedges:
+                d = h.direction
+                total += (
+                    d * (tick.spot_price - h.spot_entry) * h.size_asset
+                    + d * (h.perp_entry - tick.perp_price) * h.size_asset
+                    + h.funding
+                    - h.fees
+                )
+        return total
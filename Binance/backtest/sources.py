@@ -0,0 +1,123 @@
+# backtest/sources.py
+
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+import asyncpg
+import numpy as np
+
+from db.spool import RECORD_DTYPE, list_segments, load_segment, segment_path
+
+
+# Every source yields chunks as NumPy arrays of spool records (db.spool.RECORD_DTYPE),
+# ordered by event time, so the replay loop does not care where ticks came from.
+
+
+async def spool_chunks(
+    directory: str,
+    symbol: Optional[str] = None,
+    start_ns: int = 0,
+    end_ns: Optional[int] = None,
+    chunk_records: int = 100_000,
+) -> AsyncIterator[np.ndarray]:
+    """
+    Stream recorded ticks from spool segment files (see db.spool), read-only.
+    """
+    wanted = symbol.encode() if symbol else None
+    for index in list_segments(directory):
+        records = load_segment(segment_path(directory, index))
+        for i in range(0, len(records), chunk_records):
+            chunk = records[i:i + chunk_records]
+            mask = chunk['event_ns'] >= start_ns
+            if end_ns is not None:
+                mask &= chunk['event_ns'] < end_ns
+            if wanted is not None:
+                mask &= chunk['symbol'] == wanted
+            if mask.any():
+                yield chunk[mask]
+
+
+async def npy_chunks(path: str, chunk_records: int = 100_000) -> AsyncIterator[np.ndarray]:
+    """
+    Stream ticks from a .npy file of RECORD_DTYPE records (memory-mapped).
+    """
+    records = np.load(path, mmap_mode='r')
+    for i in range(0, len(records), chunk_records):
+        yield records[i:i + chunk_records]
+
+
+async def prices_table_chunks(
+    dsn: str,
+    symbol: str,
+    start: datetime,
+    end: datetime,
+    exchange: str = 'binance',
+    chunk_rows: int = 50_000,
+) -> AsyncIterator[np.ndarray]:
+    """
+    Stream rows of the `prices` hypertable for one symbol with a server-side cursor,
+    `chunk_rows` at a time, so a month of ticks never sits in memory at once.
+    """
+    conn = await asyncpg.connect(dsn=dsn)
+    try:
+        async with conn.transaction():
+            cursor = await conn.cursor(
+                """
+                SELECT (extract(epoch FROM timestamp) * 1e9)::bigint, spot, perp, funding_rate
+                FROM prices
+                WHERE exchange = $1 AND symbol = $2 AND timestamp >= $3 AND timestamp < $4
+                ORDER BY timestamp
+                """,
+                exchange, symbol, start, end,
+            )
+            while True:
+                rows = await cursor.fetch(chunk_rows)
+                if not rows:
+                    break
+                chunk = np.zeros(len(rows), dtype=RECORD_DTYPE)
+                chunk['event_ns'] = [r[0] for r in rows]
+                chunk['spot'] = [r[1] for r in rows]
+                chunk['perp'] = [r[2] for r in rows]
+                chunk['funding'] = [r[3] for r in rows]
+                chunk['symbol'] = symbol.encode()
+                chunk['venue'] = exchange.encode()
+                yield chunk
+    finally:
+        await conn.close()
+
+
+async def archive_chunks(
+    root: str,
+    symbol: Optional[str] = None,
+    start_ns: int = 0,
+    end_ns: Optional[int] = None,
+) -> AsyncIterator[np.ndarray]:
+    """
+    Stream ticks from a columnar archive (see db.archive), one day per chunk,
+    merged across symbols in event-time order.
+    """
+    from db.archive import ArchiveReader
+    for chunk in ArchiveReader(root).records([symbol] if symbol else None, start_ns, end_ns):
+        yield chunk
+
+
+def open_source(spec: dict) -> AsyncIterator[np.ndarray]:
+    """
+    Build a chunk iterator from a picklable spec, so sweep workers can each open
+    their own source:
+        {'kind': 'spool', 'directory': ..., 'symbol': ...}
+        {'kind': 'npy', 'path': ...}
+        {'kind': 'prices', 'dsn': ..., 'symbol': ..., 'start': datetime, 'end': datetime}
+        {'kind': 'archive', 'root': ..., 'symbol': ..., 'start_ns': ..., 'end_ns': ...}
+    """
+    spec = dict(spec)
+    kind = spec.pop('kind')
+    if kind == 'spool':
+        return spool_chunks(**spec)
+    if kind == 'npy':
+        return npy_chunks(**spec)
+    if kind == 'prices':
+        return prices_table_chunks(**spec)
+    if kind == 'archive':
+        return archive_chunks(**spec)
+    raise ValueError(f"Unknown backtest source kind {kind!r}")
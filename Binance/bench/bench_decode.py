@@ -0,0 +1,111 @@
+# bench/bench_decode.py
+#
+# Micro-benchmark for the tick decode path: legacy json.loads + dict lookups +
+# datetime + dataclass versus the schema-specific decoders + slotted PriceTick.
+#
+#   cd Binance && python -m bench.bench_decode [n_messages]
+
+import gc
+import json
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+import pytz
+
+from data.decoders import MARK_PRICE, TICKER, decode_mark_price, decode_ticker, stream_kind, stream_name
+from data.websocket_client import PriceTick
+
+
+TICKER_MSG = (
+    '{"stream":"btcusdt@ticker","data":{"e":"24hrTicker","E":1717000000123,"s":"BTCUSDT",'
+    '"p":"-120.50000000","P":"-0.178","w":"67650.12345678","x":"67771.00000000","c":"67650.50000000",'
+    '"Q":"0.00150000","b":"67650.49000000","B":"3.21000000","a":"67650.50000000","A":"0.51000000",'
+    '"o":"67771.00000000","h":"68200.00000000","l":"67001.00000000","v":"18234.12345000",'
+    '"q":"1233456789.12345678","O":1716913600123,"C":1717000000123,"F":3601234567,"L":3602234567,"n":1000001}}'
+)
+MARK_MSG = (
+    '{"stream":"btcusdt@markPrice","data":{"e":"markPriceUpdate","E":1717000000456,"s":"BTCUSDT",'
+    '"p":"67680.10000000","i":"67660.31234567","P":"67670.42000000","r":"0.00010000","T":1717027200000}}'
+)
+
+
+@dataclass
+class LegacyPriceTick:
+    symbol: str
+    timestamp: datetime
+    spot_price: float
+    perp_price: float
+    funding_rate: float
+
+
+def legacy_path(messages):
+    spot = perp = None
+    out = None
+    for msg in messages:
+        msg_json = json.loads(msg)
+        stream = msg_json.get('stream', '')
+        data = msg_json.get('data', {})
+        if stream.endswith('@ticker'):
+            spot = float(data.get('c', 0.0))
+        elif stream.endswith('@markPrice'):
+            perp = float(data.get('p', 0.0))
+        if spot is not None and perp is not None:
+            out = LegacyPriceTick('BTCUSDT', datetime.utcnow().replace(tzinfo=pytz.utc), spot, perp, 0.0001)
+    return out
+
+
+def fast_path(messages):
+    spot = perp = None
+    out = None
+    time_ns = time.time_ns
+    for msg in messages:
+        recv_ns = time_ns()
+        kind = stream_kind(stream_name(msg))
+        if kind == TICKER:
+            _, event_ms, spot = decode_ticker(msg)
+        elif kind == MARK_PRICE:
+            _, event_ms, perp, _, _ = decode_mark_price(msg)
+        else:
+            continue
+        if spot is not None and perp is not None:
+            out = PriceTick('BTCUSDT', spot, perp, 0.0001, event_ms * 1_000_000, recv_ns)
+    return out
+
+
+def object_bytes(obj) -> int:
+    size = sys.getsizeof(obj)
+    if hasattr(obj, '__dict__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def measure(fn, messages):
+    fn(messages[:1000])  # warm-up
+    gc.collect()
+    t0 = time.perf_counter_ns()
+    fn(messages)
+    elapsed = time.perf_counter_ns() - t0
+
+    return {
+        'ns_per_msg': elapsed / len(messages),
+        'msgs_per_s': len(messages) / (elapsed / 1e9),
+        'tick_bytes': object_bytes(fn(messages[:2])),
+    }
+
+
+def run(n: int = 200_000) -> dict:
+    messages = [TICKER_MSG if i % 2 else MARK_MSG for i in range(n)]
+    return {'legacy': measure(legacy_path, messages), 'fast': measure(fast_path, messages)}
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    results = run(n)
+    for name, r in results.items():
+        print(
+            f"{name:>6}: {r['ns_per_msg']:8.0f} ns/msg  {r['msgs_per_s']:>10,.0f} msg/s  "
+            f"tick={r['tick_bytes']} B"
+        )
+    print(f"speed-up: {results['legacy']['ns_per_msg'] / results['fast']['ns_per_msg']:.2f}x")
@@ -0,0 +1,590 @@
+# bench/hot_path.py
+#
+# Throughput / latency benchmark suite for the tick-to-order hot path, driven by
+# synthetic Binance combined-stream messages (sim.market) at increasing rates.
+#
+#   cd Binance && python -m bench.hot_path --out bench/results.json
+#   cd Binance && python -m bench.hot_path --rates 10000,50000,0 --dsn postgres://localhost/arb
+#   cd Binance && python -m bench.hot_path --compare bench/results.json   # fail on regressions
+#
+# Stages:
+#   decode       listen_price_ticks decode path: stream kind + fast decoders + PriceTick + publish
+#   bus          TickBus hand-off, publish → get_batch, paced at each rate (0 = unpaced)
+#   engine       ArbitrageEngine.run fed through the bus at each rate, instant-fill executor
+#   sizing       RiskManager.calculate_position_size and size_universe
+#   order        OrderGateway per-order build (lot rounding + signing), then order round trips
+#                through the gateway (REST, WebSocket API) and through ccxt against an
+#                in-process exchange simulator
+#   write_batch  TimescaleDB.write_batch into a scratch schema of a local Postgres (needs --dsn)
+#
+# Every stage reports msgs/s, latency percentiles (ns) and RSS growth (bytes).
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import resource
+import socket
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from arb.arbitrage_engine import ArbitrageEngine
+from arb.risk_manager import RiskManager
+from data.decoders import MARK_PRICE, TICKER, decode_mark_price, decode_ticker, stream_kind, stream_name
+from data.tick_bus import TickBus
+from data.websocket_client import PriceTick
+from exec.order_gateway import MarketFilters, OrderGateway
+from metrics.latency import Histogram
+from sim.market import SimMarket
+
+DEFAULT_RATES = [1_000, 10_000, 50_000, 0]   # 0 = as fast as possible
+DEFAULT_SYMBOLS = 20
+DEFAULT_DURATION_S = 2.0                      # cap per paced rate: at most rate * duration ticks
+# Relative change in a throughput / latency figure that --compare flags as a regression
+REGRESSION_THRESHOLD = 0.10
+
+
+def rss_bytes() -> int:
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def summarize(hist: Histogram, count: int, elapsed_s: float, rss_before: int) -> dict:
+    q = hist.quantiles((0.5, 0.99, 0.999))
+    return {
+        'count': count,
+        'msgs_per_s': count / elapsed_s if elapsed_s > 0 else 0.0,
+        'p50_ns': q[0.5],
+        'p99_ns': q[0.99],
+        'p999_ns': q[0.999],
+        'rss_growth_bytes': rss_bytes() - rss_before,
+    }
+
+
+def synthetic_messages(n: int, n_symbols: int, seed: int = 7) -> List[str]:
+    """
+    Alternating @ticker / @markPrice messages over `n_symbols` random-walk symbols.
+    """
+    market = SimMarket([f"SYM{i}USDT" for i in range(n_symbols)], basis_vol=0.002, seed=seed)
+    order = market.order
+    now_ms = int(time.time() * 1000)
+    out = []
+    for i in range(n):
+        s = order[(i // 2) % len(order)]
+        if i & 1:
+            out.append(market.mark_price_msg(s, now_ms + i))
+        else:
+            market.step(s)
+            out.append(market.ticker_msg(s, now_ms + i))
+    return out
+
+
+def synthetic_ticks(messages: List[str]) -> List[PriceTick]:
+    spot: Dict[str, float] = {}
+    ticks = []
+    for msg in messages:
+        kind = stream_kind(stream_name(msg))
+        if kind == TICKER:
+            symbol, event_ms, price = decode_ticker(msg)
+            spot[symbol] = price
+        else:
+            symbol, event_ms, perp, funding, _ = decode_mark_price(msg)
+            if symbol in spot:
+                ticks.append(PriceTick(symbol, spot[symbol], perp, funding, event_ms * 1_000_000, 0))
+    return ticks
+
+
+# ---------------------------------------------------------------------- decode
+
+def bench_decode(messages: List[str]) -> dict:
+    """
+    The per-message work of listen_price_ticks: classify, decode, build and publish a tick.
+    Throughput comes from an untimed pass, percentiles from a pass timing every message.
+    """
+    bus = TickBus(8192)
+    publish = bus.publish
+    hist = Histogram('decode')
+
+    def one_pass(timed: bool):
+        spot = perp = None
+        perf = time.perf_counter_ns
+        record = hist.record
+        for msg in messages:
+            t0 = perf()
+            kind = stream_kind(stream_name(msg))
+            if kind == TICKER:
+                symbol, event_ms, spot = decode_ticker(msg)
+            elif kind == MARK_PRICE:
+                symbol, event_ms, perp, funding, _ = decode_mark_price(msg)
+            else:
+                continue
+            if spot is not None and perp is not None:
+                publish(PriceTick(symbol, spot, perp, 0.0001, event_ms * 1_000_000, t0))
+            if timed:
+                record(perf() - t0)
+
+    one_pass(False)  # warm-up
+    gc.collect()
+    rss0 = rss_bytes()
+    t0 = time.perf_counter()
+    one_pass(False)
+    elapsed = time.perf_counter() - t0
+    one_pass(True)
+    return summarize(hist, len(messages), elapsed, rss0)
+
+
+# ---------------------------------------------------------------------- paced driver
+
+async def drive(ticks: List[PriceTick], rate: float, publish: Callable[[PriceTick], None], chunk: int = 64) -> float:
+    """
+    Publish `ticks` at `rate` per second (0 = unpaced), stamping recv time at publish
+    and yielding to consumers between chunks. Returns elapsed seconds.
+    """
+    t_start = time.perf_counter()
+    time_ns = time.time_ns
+    sent = 0
+    n = len(ticks)
+    while sent < n:
+        if rate:
+            due = min(n, int((time.perf_counter() - t_start) * rate) + 1)
+            if due <= sent:
+                await asyncio.sleep(min(0.001, (sent + 1 - due) / rate))
+                continue
+        else:
+            due = min(n, sent + chunk)
+        for tick in ticks[sent:due]:
+            tick.recv_time_ns = time_ns()
+            publish(tick)
+        sent = due
+        await asyncio.sleep(0)
+    return time.perf_counter() - t_start
+
+
+# ---------------------------------------------------------------------- bus hand-off
+
+async def _bench_bus_at(ticks: List[PriceTick], rate: float) -> dict:
+    bus = TickBus(8192)
+    sub = bus.subscribe('bench')
+    hist = Histogram('bus')
+    received = 0
+
+    async def consume():
+        nonlocal received
+        record = hist.record
+        # Ticks the producer lapped count as consumed (and are reported as overruns)
+        while received + sub.overruns < len(ticks):
+            batch = await sub.get_batch(max_items=1000, timeout=1.0)
+            if not batch:
+                return
+            now = time.time_ns()
+            for tick in batch:
+                record(now - tick.recv_time_ns)
+            received += len(batch)
+
+    gc.collect()
+    rss0 = rss_bytes()
+    consumer = asyncio.create_task(consume())
+    elapsed = await drive(ticks, rate, bus.publish)
+    await consumer
+    result = summarize(hist, hist.count(), elapsed, rss0)
+    result['overruns'] = sub.overruns
+    return result
+
+
+def _paced(ticks: List[PriceTick], rate: float, duration_s: float) -> List[PriceTick]:
+    return ticks[:max(1, int(rate * duration_s))] if rate else ticks
+
+
+def bench_bus(ticks: List[PriceTick], rates: List[float], duration_s: float) -> dict:
+    return {_rate_key(rate): asyncio.run(_bench_bus_at(_paced(ticks, rate, duration_s), rate)) for rate in rates}
+
+
+# ---------------------------------------------------------------------- engine
+
+class InstantFillExecutor:
+    """
+    Executor stand-in that fills every hedge immediately, so the benchmark
+    measures the engine and its state machine rather than an exchange.
+    """
+
+    class Report:
+        __slots__ = ('hedged_qty',)
+
+        def __init__(self, qty: float):
+            self.hedged_qty = qty
+
+    def __init__(self):
+        self.hedges = 0
+
+    async def place_hedge(self, tick: PriceTick, size_asset: float):
+        self.hedges += 1
+        return self.Report(size_asset)
+
+    async def close_hedge(self, tick: PriceTick, direction: int, qty: float):
+        return self.Report(qty)
+
+
+async def _bench_engine_at(ticks: List[PriceTick], rate: float) -> dict:
+    risk = RiskManager(prior_win_prob=0.9999)
+    risk.taker_fee = 0.0004
+    executor = InstantFillExecutor()
+    engine = ArbitrageEngine(risk, executor, exit_basis=0.0005, cooldown_s=0.0, max_inflight=64)
+    bus = TickBus(8192)
+    sub = bus.subscribe('engine')
+    hist = Histogram('engine')
+    processed = 0
+
+    on_tick = engine.on_tick
+
+    def timed_on_tick(tick: PriceTick):
+        nonlocal processed
+        on_tick(tick)
+        hist.record(time.time_ns() - tick.recv_time_ns)
+        processed += 1
+
+    engine.on_tick = timed_on_tick  # engine.run() dispatches through the instance attribute
+
+    gc.collect()
+    rss0 = rss_bytes()
+    runner = asyncio.create_task(engine.run(sub))
+    elapsed = await drive(ticks, rate, bus.publish)
+    await asyncio.sleep(0.01)
+    runner.cancel()
+    await engine.shutdown()
+    result = summarize(hist, processed, elapsed, rss0)
+    result['published'] = len(ticks)
+    result['conflated'] = sub.conflated
+    result['hedges'] = executor.hedges
+    return result
+
+
+def bench_engine(ticks: List[PriceTick], rates: List[float], duration_s: float) -> dict:
+    return {_rate_key(rate): asyncio.run(_bench_engine_at(_paced(ticks, rate, duration_s), rate)) for rate in rates}
+
+
+# ---------------------------------------------------------------------- sizing
+
+def bench_sizing(ticks: List[PriceTick], universe_sizes=(10, 100, 1000)) -> dict:
+    risk = RiskManager(prior_win_prob=0.9999)
+    risk.taker_fee = 0.0004
+    size = risk.calculate_position_size
+    hist = Histogram('sizing')
+    perf = time.perf_counter_ns
+
+    for tick in ticks[:1000]:
+        size(tick)
+    gc.collect()
+    rss0 = rss_bytes()
+    t0 = time.perf_counter()
+    for tick in ticks:
+        size(tick)
+    elapsed = time.perf_counter() - t0
+    for tick in ticks:
+        t = perf()
+        size(tick)
+        hist.record(perf() - t)
+    results = {'calculate_position_size': summarize(hist, len(ticks), elapsed, rss0)}
+
+    rng = np.random.default_rng(7)
+    for n in universe_sizes:
+        spot = rng.uniform(1.0, 50_000.0, n)
+        perp = spot * (1 + rng.normal(0.0, 0.003, n))
+        funding = rng.normal(0.0001, 0.0001, n)
+        symbols = [f"SYM{i}USDT" for i in range(n)]
+        hist = Histogram(f'size_universe_{n}')
+        rounds = max(100, 100_000 // n)
+        gc.collect()
+        rss0 = rss_bytes()
+        t0 = time.perf_counter()
+        for _ in range(rounds):
+            t = perf()
+            risk.size_universe(spot, perp, funding, symbols)
+            hist.record(perf() - t)
+        elapsed = time.perf_counter() - t0
+        # msgs/s counts symbols sized per second
+        results[f'size_universe_{n}'] = summarize(hist, rounds * n, elapsed, rss0)
+    return results
+
+
+# ---------------------------------------------------------------------- order
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _bench_order_build(gateway: OrderGateway, ticks: List[PriceTick]) -> dict:
+    filters = gateway.filters
+    hist = Histogram('order_build')
+    perf = time.perf_counter_ns
+
+    def one(tick: PriceTick):
+        qty = filters.hedge_qty(tick.symbol, 0.0123456, tick.spot_price)
+        gateway.signed_body('spot', tick.symbol, 'BUY', filters.format_qty(tick.symbol, qty, 'spot'), False, 'arb1s0')
+        gateway.signed_body('perp', tick.symbol, 'SELL', filters.format_qty(tick.symbol, qty, 'perp'), False, 'arb1p0')
+
+    for tick in ticks[:1000]:
+        one(tick)
+    gc.collect()
+    rss0 = rss_bytes()
+    t0 = time.perf_counter()
+    for tick in ticks:
+        one(tick)
+    elapsed = time.perf_counter() - t0
+    for tick in ticks:
+        t = perf()
+        one(tick)
+        hist.record(perf() - t)
+    # msgs/s counts hedges (two signed orders each)
+    return summarize(hist, len(ticks), elapsed, rss0)
+
+
+async def _round_trips(name: str, send: Callable, n: int) -> dict:
+    hist = Histogram(name)
+    perf = time.perf_counter_ns
+    for _ in range(20):
+        await send()
+    gc.collect()
+    rss0 = rss_bytes()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        t = perf()
+        await send()
+        hist.record(perf() - t)
+    return summarize(hist, n, time.perf_counter() - t0, rss0)
+
+
+async def _bench_order(ticks: List[PriceTick], n_orders: int) -> dict:
+    import ccxt.async_support as ccxt
+    from sim.exchange_sim import ExchangeSimulator, SimConfig, configure_ccxt
+
+    symbols = sorted({t.symbol for t in ticks})
+    config = SimConfig(port=_free_port(), symbols=symbols, msg_rate=0.0, rest_latency_ms=0.0, seed=7)
+    sim = ExchangeSimulator(config)
+    await sim.start()
+    base = f"http://127.0.0.1:{config.port}"
+    ws_base = f"ws://127.0.0.1:{config.port}"
+    exchange = ccxt.binance({'apiKey': 'bench', 'secret': 'bench', 'enableRateLimit': False})
+    configure_ccxt(exchange, base)
+    results = {}
+    try:
+        await exchange.load_markets()
+        filters = MarketFilters(exchange.markets)
+        symbol = symbols[0]
+        rest = OrderGateway('bench', 'bench', base, base, filters)
+        ws = OrderGateway('bench', 'bench', base, base, filters,
+                          spot_ws_url=f"{ws_base}/ws-api/v3", perp_ws_url=f"{ws_base}/ws-fapi/v1")
+        await rest.start(symbols)
+        await ws.start(symbols)
+        while not all(channel.ready for channel in ws._ws.values()):
+            await asyncio.sleep(0.01)
+        results['build_sign'] = _bench_order_build(rest, ticks)
+        for venue in ('spot', 'perp'):
+            results[f'gateway_rest_{venue}'] = await _round_trips(
+                'gateway_rest', lambda: rest.place_market_order(symbol, 'BUY', 0.01, venue), n_orders)
+            results[f'gateway_ws_{venue}'] = await _round_trips(
+                'gateway_ws', lambda: ws.place_market_order(symbol, 'BUY', 0.01, venue), n_orders)
+        market = next(m['symbol'] for m in exchange.markets.values() if m['id'] == symbol and m['spot'])
+        results['ccxt_spot'] = await _round_trips(
+            'ccxt_spot', lambda: exchange.create_order(market, 'market', 'buy', 0.01), n_orders)
+        perp_params = {'symbol': symbol, 'side': 'BUY', 'type': 'MARKET', 'quantity': '0.010',
+                       'newOrderRespType': 'RESULT'}
+        results['ccxt_perp'] = await _round_trips(
+            'ccxt_perp', lambda: exchange.fapiPrivatePostOrder(perp_params), n_orders)
+        await rest.close()
+        await ws.close()
+    finally:
+        await exchange.close()
+        await sim.close()
+    return results
+
+
+def bench_order(ticks: List[PriceTick], n_orders: int = 500) -> dict:
+    return asyncio.run(_bench_order(ticks, n_orders))
+
+
+# ---------------------------------------------------------------------- write_batch
+
+BENCH_SCHEMA = 'arb_bench'
+
+
+async def _bench_write_batch(dsn: str, ticks: List[PriceTick], batch_sizes=(1000, 5000)) -> dict:
+    import asyncpg
+    from db.db_async import TimescaleDB
+
+    admin = await asyncpg.connect(dsn)
+    try:
+        await admin.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        await admin.execute(f"CREATE SCHEMA {BENCH_SCHEMA}")
+        await admin.execute(
+            f"CREATE TABLE {BENCH_SCHEMA}.prices ("
+            "timestamp TIMESTAMPTZ NOT NULL, exchange TEXT NOT NULL, symbol TEXT NOT NULL, "
+            "spot DOUBLE PRECISION NOT NULL, perp DOUBLE PRECISION NOT NULL, "
+            "funding_rate DOUBLE PRECISION NOT NULL)"
+        )
+        # Unknown DSN query parameters become server settings in asyncpg,
+        # so the real write path lands in the scratch schema, not in `prices`
+        sep = '&' if '?' in dsn else '?'
+        db = TimescaleDB(dsn=f"{dsn}{sep}search_path={BENCH_SCHEMA}")
+        await db.connect()
+
+        now_ns = time.time_ns()
+        for t in ticks:
+            t.recv_time_ns = t.recv_time_ns or now_ns
+        results = {}
+        for batch_size in batch_sizes:
+            batches = [ticks[i:i + batch_size] for i in range(0, len(ticks), batch_size)]
+            hist = Histogram(f'write_batch_{batch_size}')
+            await db.write_batch(batches[0])  # warm-up
+            gc.collect()
+            rss0 = rss_bytes()
+            t0 = time.perf_counter()
+            for batch in batches:
+                t = time.perf_counter_ns()
+                await db.write_batch(batch)
+                hist.record(time.perf_counter_ns() - t)
+            elapsed = time.perf_counter() - t0
+            # latency is per batch; msgs/s counts rows
+            results[f'batch_{batch_size}'] = summarize(hist, sum(len(b) for b in batches), elapsed, rss0)
+        await db.pool.close()
+        return results
+    finally:
+        await admin.execute(f"DROP SCHEMA IF EXISTS {BENCH_SCHEMA} CASCADE")
+        await admin.close()
+
+
+def bench_write_batch(dsn: Optional[str], ticks: List[PriceTick]) -> dict:
+    if not dsn:
+        return {'skipped': 'no --dsn / DATABASE_URL given'}
+    try:
+        return asyncio.run(_bench_write_batch(dsn, ticks))
+    except Exception as e:
+        return {'skipped': f'database unavailable: {e}'}
+
+
+# ---------------------------------------------------------------------- results
+
+def _rate_key(rate: float) -> str:
+    return f"rate_{int(rate)}" if rate else 'rate_max'
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def _flatten(results: dict, prefix: str = '') -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, path))
+        elif isinstance(value, (int, float)):
+            flat[path] = value
+    return flat
+
+
+def compare(baseline: dict, current: dict, threshold: float = REGRESSION_THRESHOLD) -> List[str]:
+    """
+    Throughput drops and p50/p99 latency rises beyond `threshold` versus a previous run.
+    """
+    old, new = _flatten(baseline['stages']), _flatten(current['stages'])
+    regressions = []
+    for path, before in old.items():
+        after = new.get(path)
+        if after is None or not before:
+            continue
+        change = (after - before) / before
+        if path.endswith('msgs_per_s') and change < -threshold:
+            regressions.append(f"{path}: {before:,.0f} -> {after:,.0f} ({change:+.0%})")
+        elif (path.endswith('p50_ns') or path.endswith('p99_ns')) and change > threshold:
+            regressions.append(f"{path}: {before:,.0f} -> {after:,.0f} ({change:+.0%})")
+    return regressions
+
+
+def run(n_messages: int, n_symbols: int, rates: List[float], dsn: Optional[str],
+        duration_s: float = DEFAULT_DURATION_S) -> dict:
+    messages = synthetic_messages(n_messages, n_symbols)
+    ticks = synthetic_ticks(messages)
+    stages = {
+        'decode': bench_decode(messages),
+        'bus': bench_bus(ticks, rates, duration_s),
+        'engine': bench_engine(ticks, rates, duration_s),
+        'sizing': bench_sizing(ticks),
+        'order': bench_order(ticks),
+        'write_batch': bench_write_batch(dsn, ticks),
+    }
+    return {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'config': {'messages': n_messages, 'symbols': n_symbols, 'rates': rates, 'duration_s': duration_s},
+        'stages': stages,
+    }
+
+
+def _print(results: dict):
+    for stage, body in results['stages'].items():
+        if 'skipped' in body:
+            print(f"{stage:<12} skipped: {body['skipped']}")
+            continue
+        rows = body.items() if all(isinstance(v, dict) for v in body.values()) else [('', body)]
+        for name, r in rows:
+            print(
+                f"{stage:<12}{name:<26}{r['msgs_per_s']:>14,.0f}/s  p50={r['p50_ns']:>10,}ns  "
+                f"p99={r['p99_ns']:>11,}ns  p999={r['p999_ns']:>12,}ns  rss+={r['rss_growth_bytes']:>11,}B"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the tick-to-order hot path.")
+    parser.add_argument('--messages', type=int, default=200_000)
+    parser.add_argument('--symbols', type=int, default=DEFAULT_SYMBOLS)
+    parser.add_argument('--rates', default=','.join(str(r) for r in DEFAULT_RATES),
+                        help="comma-separated publish rates (msg/s) for bus and engine; 0 = unpaced")
+    parser.add_argument('--duration', type=float, default=DEFAULT_DURATION_S,
+                        help="seconds per paced rate (bus and engine)")
+    parser.add_argument('--dsn', default=os.getenv('DATABASE_URL'), help="local Postgres for write_batch")
+    parser.add_argument('--out', help="write results JSON here")
+    parser.add_argument('--compare', help="previous results JSON; exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="relative change counted as a regression (default 0.10)")
+    args = parser.parse_args()
+
+    rates = [float(r) for r in args.rates.split(',') if r.strip()]
+    results = run(args.messages, args.symbols, rates, args.dsn, args.duration)
+    _print(results)
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"results written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        print(f"compared with {baseline.get('commit')}: {len(regressions)} regression(s)")
+        for line in regressions:
+            print(f"  {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
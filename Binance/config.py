@@ -14,5 +14,100 @@ DATABASE_URL = os.getenv('DATABASE_URL')
 # Symbol to trade (defaults to BTCUSDT if not set)
 SYMBOL = os.getenv('SYMBOL', 'BTCUSDT')
 
+# Multi-symbol mode: comma-separated universe to scan (e.g. "BTCUSDT,ETHUSDT,SOLUSDT").
+# When empty, only SYMBOL is followed.
+SYMBOLS = [s.strip().upper() for s in os.getenv('SYMBOLS', '').split(',') if s.strip()]
+
 # Maximum allocation fraction of available equity per trade (e.g., 0.1 → 10%)
 MAX_ALLOC = float(os.getenv('MAX_ALLOC', '0.1'))
+
+# Strategy state machine: close a hedge once |basis| has converged to EXIT_BASIS,
+# wait COOLDOWN_S after every entry/exit, and cap concurrent order tasks
+EXIT_BASIS = float(os.getenv('EXIT_BASIS', '0.0005'))
+COOLDOWN_S = float(os.getenv('COOLDOWN_S', '5.0'))
+MAX_INFLIGHT_ORDERS = int(os.getenv('MAX_INFLIGHT_ORDERS', '8'))
+
+# Multi-process mode (needs SYMBOLS): this many feed-worker processes stream and ingest
+# shards of the universe into a shared-memory price matrix read by the strategy process.
+# 0 runs everything in one process.
+FEED_WORKERS = int(os.getenv('FEED_WORKERS', '0'))
+
+# Tick ingestion into TimescaleDB (COPY batches)
+# Flush when a batch reaches INGEST_MAX_BATCH rows or its oldest row is INGEST_MAX_AGE_S old
+INGEST_MAX_BATCH = int(os.getenv('INGEST_MAX_BATCH', '5000'))
+INGEST_MAX_AGE_S = float(os.getenv('INGEST_MAX_AGE_S', '1.0'))
+# Rows buffered while a flush is in flight before INGEST_DROP_POLICY applies
+# ('drop_oldest', 'drop_newest' or 'block')
+INGEST_MAX_PENDING = int(os.getenv('INGEST_MAX_PENDING', '100000'))
+INGEST_DROP_POLICY = os.getenv('INGEST_DROP_POLICY', 'drop_oldest')
+
+# Write-ahead tick spool. When set, ticks go to memory-mapped segments in this
+# directory first and a replayer drains them into TimescaleDB from a checkpoint.
+SPOOL_DIR = os.getenv('SPOOL_DIR', '')
+
+# Local exchange simulator (python -m sim.exchange_sim), e.g. "http://127.0.0.1:8765".
+# When set, all REST and WebSocket traffic goes there instead of Binance.
+EXCHANGE_SIM_URL = os.getenv('EXCHANGE_SIM_URL', '').rstrip('/')
+_SIM_WS_URL = 'ws' + EXCHANGE_SIM_URL[len('http'):] if EXCHANGE_SIM_URL else ''
+
+# WebSocket endpoints: spot combined streams, USDT-M combined streams, USDT-M user data
+SPOT_WS_BASE = f"{_SIM_WS_URL}/stream" if EXCHANGE_SIM_URL else 'wss://stream.binance.com:9443/stream'
+FUTURES_WS_BASE = f"{_SIM_WS_URL}/fstream" if EXCHANGE_SIM_URL else 'wss://fstream.binance.com/stream'
+USER_DATA_WS_BASE = f"{_SIM_WS_URL}/ws" if EXCHANGE_SIM_URL else 'wss://fstream.binance.com/ws'
+
+# Order entry: 'ccxt' (default) through ccxt's create_order / fapiPrivatePostOrder;
+# opt in to 'rest' to send hedge legs through exec.order_gateway over pooled keep-alive
+# connections with pre-signed request templates, or 'ws' through the WebSocket API
+# (REST while it is down).
+ORDER_GATEWAY = os.getenv('ORDER_GATEWAY', 'ccxt').lower()
+SPOT_REST_BASE = EXCHANGE_SIM_URL or 'https://api.binance.com'
+FUTURES_REST_BASE = EXCHANGE_SIM_URL or 'https://fapi.binance.com'
+SPOT_WS_API_URL = f"{_SIM_WS_URL}/ws-api/v3" if EXCHANGE_SIM_URL else 'wss://ws-api.binance.com:443/ws-api/v3'
+FUTURES_WS_API_URL = f"{_SIM_WS_URL}/ws-fapi/v1" if EXCHANGE_SIM_URL else 'wss://ws-fapi.binance.com/ws-fapi/v1'
+
+# Append-only fill ledger (hedges, fills, fees, funding), e.g. 'fill_ledger.jsonl';
+# replayed and compacted at start-up to restore open hedges and realized PnL.
+# Empty (default) keeps it in memory only.
+FILL_LEDGER_PATH = os.getenv('FILL_LEDGER_PATH', '')
+
+# Warm-restart snapshot (markets, fees, funding schedule, equity, win-rate window),
+# rewritten every SNAPSHOT_INTERVAL_S and on shutdown. At boot it replaces the REST
+# start-up calls, which are then re-checked in the background. Markets, fees and
+# funding older than SNAPSHOT_MAX_AGE_S are fetched again. Set a path (e.g.
+# 'warm_start.json') to enable it; empty (default) disables it.
+SNAPSHOT_PATH = os.getenv('SNAPSHOT_PATH', '')
+SNAPSHOT_INTERVAL_S = float(os.getenv('SNAPSHOT_INTERVAL_S', '10'))
+SNAPSHOT_MAX_AGE_S = float(os.getenv('SNAPSHOT_MAX_AGE_S', str(24 * 3600)))
+
+# Local metrics endpoint (latency percentiles, queue depths, loop lag) on
+# http://127.0.0.1:METRICS_PORT/metrics, e.g. 9108; 0 (default) disables it
+METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))
+
+# Local L2 order books from the depth diff streams; when enabled, position sizing
+# uses the VWAP cost of walking both legs' books instead of a flat slippage cushion
+DEPTH_BOOKS = os.getenv('DEPTH_BOOKS', '').lower() in ('1', 'true', 'yes')
+
+# Rolling basis mean / volatility per symbol over HISTORY_WINDOW_S (e.g. 3600), read
+# from the HISTORY_RESOLUTION ('1s', '1m' or '1h') continuous aggregate of the prices
+# table (db.history); needs the database, set up once with `python -m db.history setup`.
+# 0 (default) disables it.
+HISTORY_WINDOW_S = float(os.getenv('HISTORY_WINDOW_S', '0'))
+HISTORY_RESOLUTION = os.getenv('HISTORY_RESOLUTION', '1m')
+
+# Columnar tick archive (db.archive): when set, every tick from the stream is also
+# written to Arrow partitions (day / symbol) under this directory. Empty disables it.
+ARCHIVE_DIR = os.getenv('ARCHIVE_DIR', '')
+
+# Cross-venue basis scanner (venues/): comma-separated venue adapters ('binance',
+# 'bybit', 'okx') streamed concurrently into one price table for SYMBOLS (or SYMBOL),
+# scanned for spot-on-one-venue / perp-on-another spreads. Trading stays on the
+# Binance feed either way. Empty disables it.
+VENUES = [v.strip().lower() for v in os.getenv('VENUES', '').split(',') if v.strip()]
+# Local venues.recorded stand-in (python -m venues.recorded serve), e.g. "http://127.0.0.1:8790".
+# When set, every venue adapter connects there instead of to the exchanges.
+VENUE_STANDIN_URL = os.getenv('VENUE_STANDIN_URL', '').rstrip('/')
+# Minimum seconds between scans, quotes older than SCAN_MAX_AGE_MS are ignored, and
+# spreads are only reported with an edge (after both taker fees) above SCAN_MIN_EDGE
+SCAN_INTERVAL_S = float(os.getenv('SCAN_INTERVAL_S', '1.0'))
+SCAN_MAX_AGE_MS = int(os.getenv('SCAN_MAX_AGE_MS', '5000'))
+SCAN_MIN_EDGE = float(os.getenv('SCAN_MIN_EDGE', '0.0'))
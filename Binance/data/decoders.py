@@ -0,0 +1,111 @@
+# data/decoders.py
+
+# Schema-specific decoders for the Binance combined-stream payloads we consume.
+# Instead of json.loads on the whole envelope (a ~25-entry dict per @ticker
+# message), each decoder slices the few fields it needs out of the raw text.
+# Binance keys are single letters and unique within a payload, so a find on
+# '"c":"' is unambiguous. Unexpected shapes fall back to json.loads.
+
+import json
+from typing import Optional, Tuple
+
+
+STREAM_PREFIX = '{"stream":"'
+_STREAM_START = len(STREAM_PREFIX)
+
+# Stream kinds returned by stream_kind()
+TICKER = 1
+MARK_PRICE = 2
+OTHER = 0
+
+# (symbol, event_time_ms, last_price)
+TickerFields = Tuple[str, int, float]
+# (symbol, event_time_ms, mark_price, funding_rate, next_funding_time_ms)
+MarkPriceFields = Tuple[str, int, float, float, int]
+
+
+def stream_name(msg: str) -> str:
+    """
+    Return the `stream` of a combined-stream envelope without parsing the payload.
+    """
+    if msg.startswith(STREAM_PREFIX):
+        return msg[_STREAM_START:msg.find('"', _STREAM_START)]
+    return json.loads(msg).get('stream', '')
+
+
+def stream_kind(stream: str) -> int:
+    if stream.endswith('@ticker'):
+        return TICKER
+    if stream.endswith('@markPrice') or stream.endswith('@markPrice@1s'):
+        return MARK_PRICE
+    return OTHER
+
+
+def _str_field(msg: str, key: str) -> str:
+    # key is e.g. '"c":"'; value runs to the next double quote
+    i = msg.find(key)
+    if i < 0:
+        raise ValueError(key)
+    i += len(key)
+    return msg[i:msg.find('"', i)]
+
+
+def _int_field(msg: str, key: str) -> int:
+    # key is e.g. '"E":'; value is an unquoted integer ending at ',' or '}'
+    i = msg.find(key)
+    if i < 0:
+        raise ValueError(key)
+    i += len(key)
+    j = msg.find(',', i)
+    k = msg.find('}', i)
+    if j < 0 or (0 <= k < j):
+        j = k
+    return int(msg[i:j])
+
+
+def decode_ticker(msg: str) -> TickerFields:
+    """
+    Decode a spot `<symbol>@ticker` combined-stream message.
+    """
+    try:
+        return _str_field(msg, '"s":"'), _int_field(msg, '"E":'), float(_str_field(msg, '"c":"'))
+    except ValueError:
+        data = json.loads(msg).get('data', {})
+        return data.get('s', ''), int(data.get('E', 0)), float(data.get('c', 0.0))
+
+
+def decode_mark_price(msg: str) -> MarkPriceFields:
+    """
+    Decode a perp `<symbol>@markPrice` combined-stream message.
+    `r` (funding rate) is empty for delivery contracts; it decodes as 0.0.
+    """
+    try:
+        rate = _str_field(msg, '"r":"')
+        return (
+            _str_field(msg, '"s":"'),
+            _int_field(msg, '"E":'),
+            float(_str_field(msg, '"p":"')),
+            float(rate) if rate else 0.0,
+            _int_field(msg, '"T":'),
+        )
+    except ValueError:
+        data = json.loads(msg).get('data', {})
+        return (
+            data.get('s', ''),
+            int(data.get('E', 0)),
+            float(data.get('p', 0.0)),
+            float(data.get('r') or 0.0),
+            int(data.get('T', 0)),
+        )
+
+
+def decode(msg: str) -> Tuple[int, Optional[tuple]]:
+    """
+    Dispatch on the stream name; returns (kind, fields) with fields None for OTHER.
+    """
+    kind = stream_kind(stream_name(msg))
+    if kind == TICKER:
+        return kind, decode_ticker(msg)
+    if kind == MARK_PRICE:
+        return kind, decode_mark_price(msg)
+    return kind, None
@@ -0,0 +1,189 @@
+# data/feed_workers.py
+#
+# Multi-process deployment: N feed-worker processes each stream a shard of the
+# universe (decode + DB ingestion) into a SharedPriceMatrix; the strategy
+# process reads the matrix and runs ArbitrageEngine / RiskManager / OrderExecutor.
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from typing import List, Optional
+
+from config import (
+    DATABASE_URL, INGEST_MAX_BATCH, INGEST_MAX_AGE_S, INGEST_MAX_PENDING, INGEST_DROP_POLICY, SPOOL_DIR,
+)
+from data.funding import FundingSchedule
+from data.shared_market import SharedPriceMatrix
+from data.tick_bus import TickBus
+from data.websocket_client import BinanceWebSocketClient
+
+
+# Workers write their heartbeat this often ...
+HEARTBEAT_INTERVAL_S = 1.0
+# ... and are killed and restarted when it is older than this
+WORKER_STALL_S = 10.0
+SUPERVISE_INTERVAL_S = 1.0
+# Restart backoff: 1s, doubling up to the cap; reset once a worker stayed up this long
+RESTART_BACKOFF_MAX_S = 30.0
+RESTART_STABLE_S = 60.0
+
+
+def shard_symbols(symbols: List[str], n_workers: int) -> List[List[str]]:
+    """
+    Round-robin split, so each worker gets a similar mix of busy and quiet symbols.
+    """
+    return [symbols[i::n_workers] for i in range(n_workers) if symbols[i::n_workers]]
+
+
+def run_feed_worker(index: int, symbols: List[str], shard: List[str], shm_name: str, n_workers: int):
+    """
+    Process entry point of one feed worker.
+    """
+    logging.basicConfig(
+        level=logging.INFO,
+        format=f"%(asctime)s [%(levelname)s] [feed-{index}] %(message)s",
+        handlers=[logging.StreamHandler()]
+    )
+    try:
+        asyncio.run(_feed_worker(index, symbols, shard, shm_name, n_workers))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _feed_worker(index: int, symbols: List[str], shard: List[str], shm_name: str, n_workers: int):
+    market = SharedPriceMatrix(symbols, n_workers, name=shm_name)
+    funding = FundingSchedule(symbols, arrays=market.funding_arrays())
+    client = BinanceWebSocketClient(symbols=shard, market=market, funding=funding)
+    tick_bus = TickBus(capacity=8192)
+    tasks = [client.listen_universe(tick_bus), _heartbeat(market, index)]
+    ingest = await _ingestion(tick_bus, index)
+    if ingest is not None:
+        tasks.append(ingest)
+    logging.info(
+        f"Feed worker streaming {len(shard)} symbols over "
+        f"{len(client.spot_urls)} spot + {len(client.perp_urls)} perp connections."
+    )
+    await asyncio.gather(*tasks)
+
+
+async def _heartbeat(market: SharedPriceMatrix, index: int):
+    while True:
+        market.heartbeat[index] = time.time_ns()
+        await asyncio.sleep(HEARTBEAT_INTERVAL_S)
+
+
+async def _ingestion(tick_bus: TickBus, index: int):
+    """
+    This worker's share of tick ingestion, as in main.py: a spool (one
+    sub-directory per worker) replayed into the DB, or direct COPY batches.
+    """
+    if not DATABASE_URL:
+        return None
+    from db.db_async import TimescaleDB
+    from db.ingest import TickIngestor
+    from db.spool import SpoolReader, SpoolReplayer, SpoolWriter
+
+    db = TimescaleDB(dsn=DATABASE_URL)
+    try:
+        await db.connect()
+    except Exception as e:
+        if not SPOOL_DIR:
+            raise
+        logging.warning(f"TimescaleDB unavailable ({e}); spooling ticks until it is.")
+    ticks = tick_bus.subscribe("db_ingest")
+    if SPOOL_DIR:
+        directory = os.path.join(SPOOL_DIR, f"shard-{index}")
+        writer = SpoolWriter(directory)
+        replayer = SpoolReplayer(SpoolReader(directory), db, max_batch=INGEST_MAX_BATCH)
+        return asyncio.gather(writer.run(ticks), replayer.run())
+    ingestor = TickIngestor(
+        db,
+        max_batch=INGEST_MAX_BATCH,
+        max_age_s=INGEST_MAX_AGE_S,
+        max_pending=INGEST_MAX_PENDING,
+        drop_policy=INGEST_DROP_POLICY,
+    )
+    return ingestor.run(ticks)
+
+
+class FeedSupervisor:
+    """
+    Starts one feed-worker process per shard and keeps them running: a worker
+    that exits or whose heartbeat in the shared matrix goes stale is killed and
+    restarted with exponential backoff. Runs inside the strategy process's loop.
+    """
+
+    def __init__(self, market: SharedPriceMatrix, stall_s: float = WORKER_STALL_S):
+        self.market = market
+        self.shards = shard_symbols(market.symbols, market.n_workers)
+        self.stall_ns = int(stall_s * 1e9)
+        self.ctx = multiprocessing.get_context('spawn')
+        n = len(self.shards)
+        self.procs: List[Optional[multiprocessing.process.BaseProcess]] = [None] * n
+        self.started_ns: List[int] = [0] * n
+        self.backoff_s: List[float] = [1.0] * n
+        self.restart_at_ns: List[int] = [0] * n
+        self.restarts: List[int] = [0] * n
+
+    def start(self):
+        for i in range(len(self.shards)):
+            self._spawn(i)
+
+    def _spawn(self, i: int):
+        # The previous worker may have died halfway through an update
+        torn = self.market.repair(self.shards[i])
+        if torn:
+            logging.warning(f"Feed worker {i} died mid-update; released {', '.join(torn)}.")
+        proc = self.ctx.Process(
+            target=run_feed_worker,
+            args=(i, self.market.symbols, self.shards[i], self.market.name, self.market.n_workers),
+            name=f"feed-{i}",
+            daemon=True,
+        )
+        proc.start()
+        self.procs[i] = proc
+        now = time.time_ns()
+        self.started_ns[i] = now
+        self.market.heartbeat[i] = now  # grace period for start-up
+        self.restart_at_ns[i] = 0
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(SUPERVISE_INTERVAL_S)
+            now = time.time_ns()
+            for i, proc in enumerate(self.procs):
+                if proc is None:
+                    if now >= self.restart_at_ns[i]:
+                        self.restarts[i] += 1
+                        logging.info(f"Restarting feed worker {i} (restart #{self.restarts[i]}).")
+                        self._spawn(i)
+                    continue
+                stalled = now - int(self.market.heartbeat[i]) > self.stall_ns
+                if proc.is_alive() and not stalled:
+                    continue
+                if proc.is_alive():
+                    logging.error(f"Feed worker {i} (pid {proc.pid}) stalled; killing it.")
+                    proc.kill()
+                else:
+                    logging.error(f"Feed worker {i} (pid {proc.pid}) exited with code {proc.exitcode}.")
+                await asyncio.get_running_loop().run_in_executor(None, proc.join, 5)
+                if now - self.started_ns[i] >= RESTART_STABLE_S * 1e9:
+                    self.backoff_s[i] = 1.0
+                self.procs[i] = None
+                self.restart_at_ns[i] = now + int(self.backoff_s[i] * 1e9)
+                self.backoff_s[i] = min(self.backoff_s[i] * 2, RESTART_BACKOFF_MAX_S)
+
+    def alive(self) -> int:
+        return sum(1 for p in self.procs if p is not None and p.is_alive())
+
+    def stop(self):
+        for proc in self.procs:
+            if proc is not None and proc.is_alive():
+                proc.terminate()
+        for proc in self.procs:
+            if proc is not None:
+                proc.join(5)
+                if proc.is_alive():
+                    proc.kill()
@@ -0,0 +1,139 @@
+# data/funding.py
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from exec.rate_limiter import METADATA, PassthroughScheduler
+
+
+# Binance funds every 8 hours unless a symbol's schedule says otherwise
+DEFAULT_FUNDING_INTERVAL_MS = 8 * 3600 * 1000
+# Weight of the latest settled rate in the expected-carry average
+CARRY_EWMA_ALPHA = 0.5
+# /fapi/v1/premiumIndex without a symbol (all symbols at once)
+PREMIUM_INDEX_WEIGHT = 10
+
+
+class FundingSchedule:
+    """
+    Per-symbol funding state fed by the perp `@markPrice` stream: the current
+    predicted rate `r`, the next funding time `T`, the funding interval and an
+    expected carry per interval.
+
+    Rows are NumPy arrays indexed by slot, in the same order as the
+    data.market_state.PriceMatrix built from the same symbols, so sizing can use
+    `carry` across the universe in one pass. Per message only the rate is
+    written; interval and carry are recomputed when `T` rolls over, i.e. once
+    per funding interval. REST is only used by `bootstrap` at cold start.
+
+    `arrays` (rate, next_ms, interval_ms, carry) lets the rows live elsewhere,
+    e.g. in a data.shared_market.SharedPriceMatrix shared across processes.
+    """
+
+    def __init__(self, symbols: List[str], alpha: float = CARRY_EWMA_ALPHA,
+                 arrays: Optional[Dict[str, np.ndarray]] = None):
+        self.symbols: List[str] = [s.upper() for s in symbols]
+        self.slots: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        self.alpha = alpha
+        n = len(self.symbols)
+        if arrays is None:
+            arrays = {
+                'rate': np.zeros(n, dtype=np.float64),
+                'next_ms': np.zeros(n, dtype=np.int64),
+                'interval_ms': np.full(n, DEFAULT_FUNDING_INTERVAL_MS, dtype=np.int64),
+                'carry': np.zeros(n, dtype=np.float64),
+            }
+        self.rate = arrays['rate']                # predicted rate for the next settlement
+        self.next_ms = arrays['next_ms']          # next funding time (epoch ms), 0 = unknown
+        self.interval_ms = arrays['interval_ms']
+        self.carry = arrays['carry']              # expected rate per interval (EWMA of settlements)
+        self.bootstrapped: bool = bool(self.next_ms.any())
+        # Plain-list copy of next_ms for the per-message check (NumPy scalar compares are slow)
+        self._next_ms: List[int] = self.next_ms.tolist()
+
+    def on_mark_price(self, slot: int, rate: float, next_ms: int):
+        """
+        Apply one markPrice update (`r`, `T`). Cheap unless `T` moved.
+        """
+        if next_ms != self._next_ms[slot]:
+            self._roll(slot, rate, next_ms)
+        self.rate[slot] = rate
+
+    def _roll(self, slot: int, rate: float, next_ms: int):
+        prev_ms = self._next_ms[slot]
+        if not next_ms or next_ms < prev_ms:
+            return  # no schedule (delivery contract) or a message from before the last rollover
+        if prev_ms:
+            # The last predicted rate before `T` moved is the one that just settled
+            settled = float(self.rate[slot])
+            self.interval_ms[slot] = next_ms - prev_ms
+            self.carry[slot] = self.alpha * settled + (1 - self.alpha) * self.carry[slot]
+        elif not self.bootstrapped:
+            # First sighting without a cold start: seed from the predicted rate
+            self.carry[slot] = rate
+        self.next_ms[slot] = self._next_ms[slot] = next_ms
+
+    def expected_carry(self, symbol: str, direction: int) -> float:
+        """
+        Expected funding per interval, as a fraction of perp notional, for a hedge
+        in `direction` (+1: short perp, which receives positive funding).
+        """
+        slot = self.slots.get(symbol)
+        if slot is None:
+            return 0.0
+        return direction * float(self.carry[slot])
+
+    def state(self) -> Dict[str, List[float]]:
+        """
+        Per symbol [rate, next_ms, interval_ms, carry], for a warm-restart snapshot.
+        """
+        return {
+            symbol: [float(self.rate[i]), int(self.next_ms[i]), int(self.interval_ms[i]), float(self.carry[i])]
+            for symbol, i in self.slots.items()
+        }
+
+    def load_state(self, rows: Dict[str, List[float]]) -> int:
+        """
+        Seed from `state()` rows; symbols without a row keep their defaults.
+        Returns the number of symbols seeded.
+        """
+        n = 0
+        for symbol, (rate, next_ms, interval_ms, carry) in rows.items():
+            slot = self.slots.get(symbol)
+            if slot is None:
+                continue
+            self.rate[slot] = rate
+            self.next_ms[slot] = self._next_ms[slot] = int(next_ms)
+            self.interval_ms[slot] = int(interval_ms)
+            self.carry[slot] = carry
+            n += 1
+        self.bootstrapped = self.bootstrapped or n > 0
+        return n
+
+    async def bootstrap(self, exchange, scheduler=None, missing_only: bool = False):
+        """
+        Cold start: seed rates, next funding times and carry for every symbol
+        from a single premiumIndex call. Not called again once streaming.
+        With `missing_only`, symbols that already have a schedule (restored from
+        a snapshot, or streaming) are left alone, so their carry average is kept.
+        """
+        scheduler = scheduler or PassthroughScheduler()
+        try:
+            rows = await scheduler.call(
+                exchange.fapiPublicGetPremiumIndex, venue='perp', weight=PREMIUM_INDEX_WEIGHT, priority=METADATA
+            )
+        except Exception as e:
+            print(f"Error fetching initial funding rates: {e}")
+            return
+        if isinstance(rows, dict):
+            rows = [rows]
+        for row in rows:
+            slot = self.slots.get(row.get('symbol'))
+            if slot is None or (missing_only and self._next_ms[slot]):
+                continue
+            rate = float(row.get('lastFundingRate') or 0.0)
+            self.rate[slot] = rate
+            self.carry[slot] = rate
+            self.next_ms[slot] = self._next_ms[slot] = int(row.get('nextFundingTime') or 0)
+        self.bootstrapped = True
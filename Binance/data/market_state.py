@@ -0,0 +1,103 @@
+# data/market_state.py
+
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+
+
+# Row layout of the price matrix: one contiguous float64 row per field
+SPOT, PERP, FUNDING = 0, 1, 2
+N_FIELDS = 3
+# Row layout of the event-time matrix (exchange `E` time, epoch milliseconds)
+SPOT_TIME, PERP_TIME = 0, 1
+
+
+class UniverseSnapshot(NamedTuple):
+    """
+    Read-only views over a PriceMatrix. No data is copied; `seq` is the matrix
+    sequence number when the views were taken (see PriceMatrix.is_consistent).
+    """
+    seq: int
+    symbols: List[str]
+    spot: np.ndarray
+    perp: np.ndarray
+    funding: np.ndarray
+    spot_time: np.ndarray
+    perp_time: np.ndarray
+
+
+class PriceMatrix:
+    """
+    Latest spot, perp and funding values for a fixed universe of symbols, held in
+    contiguous NumPy arrays indexed through a symbol → slot map. Missing values
+    are NaN (prices) or 0 (event times).
+
+    Writers bump `seq` to an odd value before touching the arrays and back to an
+    even value afterwards (seqlock style), so a reader that yields to the event
+    loop between taking a snapshot and using it can tell whether it is still valid.
+    """
+
+    def __init__(self, symbols: List[str]):
+        self.symbols: List[str] = [s.upper() for s in symbols]
+        self.slots: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        n = len(self.symbols)
+
+        self._values = np.full((N_FIELDS, n), np.nan, dtype=np.float64)
+        self._times = np.zeros((2, n), dtype=np.int64)
+        self.seq: int = 0
+
+        # Writable row views, kept as attributes to avoid re-slicing on every update
+        self.spot = self._values[SPOT]
+        self.perp = self._values[PERP]
+        self.funding = self._values[FUNDING]
+        self.spot_time = self._times[SPOT_TIME]
+        self.perp_time = self._times[PERP_TIME]
+
+        self._readonly_values = self._values.view()
+        self._readonly_values.flags.writeable = False
+        self._readonly_times = self._times.view()
+        self._readonly_times.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def slot(self, symbol: str) -> int:
+        return self.slots[symbol]
+
+    def update_spot(self, slot: int, price: float, event_ms: int):
+        self.seq += 1
+        self.spot[slot] = price
+        self.spot_time[slot] = event_ms
+        self.seq += 1
+
+    def update_perp(self, slot: int, price: float, funding_rate: float, event_ms: int):
+        self.seq += 1
+        self.perp[slot] = price
+        self.funding[slot] = funding_rate
+        self.perp_time[slot] = event_ms
+        self.seq += 1
+
+    def snapshot(self) -> UniverseSnapshot:
+        """
+        Zero-copy, read-only view of the whole universe. Within one event-loop step
+        it is always consistent; across an await, check `is_consistent(snap)`.
+        """
+        values, times = self._readonly_values, self._readonly_times
+        return UniverseSnapshot(
+            seq=self.seq,
+            symbols=self.symbols,
+            spot=values[SPOT],
+            perp=values[PERP],
+            funding=values[FUNDING],
+            spot_time=times[SPOT_TIME],
+            perp_time=times[PERP_TIME],
+        )
+
+    def is_consistent(self, snap: UniverseSnapshot) -> bool:
+        return snap.seq == self.seq and not (snap.seq & 1)
+
+    def ready_mask(self) -> np.ndarray:
+        """
+        Boolean mask of slots that have both a spot and a perp price.
+        """
+        return ~(np.isnan(self.spot) | np.isnan(self.perp))
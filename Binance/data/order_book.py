@@ -0,0 +1,360 @@
+# data/order_book.py
+
+import asyncio
+import json
+import logging
+import time
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+import websockets
+
+from config import FUTURES_WS_BASE, SPOT_WS_BASE
+from data.websocket_client import build_stream_urls
+from exec.rate_limiter import METADATA, PassthroughScheduler
+from metrics.latency import histogram
+
+# Levels kept per side; Binance snapshots go 1000 deep, anything further out is dropped
+MAX_LEVELS = 1000
+SNAPSHOT_LIMIT = 1000
+# REST weight of a depth snapshot with limit=1000
+SPOT_SNAPSHOT_WEIGHT = 50
+PERP_SNAPSHOT_WEIGHT = 20
+# Streams per combined connection for the depth feed
+SPOT_DEPTH_STREAMS_PER_CONN = 200
+PERP_DEPTH_STREAMS_PER_CONN = 200
+# Diffs buffered per book while waiting for a snapshot
+MAX_BUFFERED_DIFFS = 1000
+
+_RESYNCS = histogram('book_resync')
+
+
+class BookSide:
+    """
+    One side of an L2 book as two parallel sorted lists (level keys and sizes).
+
+    Keys are the price for bids and the negated price for asks, sorted
+    ascending, so the best level is always the last element: updates near the
+    top of the book shift only a few entries and the VWAP walk runs backwards
+    from the end. Beyond `max_levels` the worst level is dropped.
+    """
+
+    __slots__ = ('is_bid', 'keys', 'qtys', 'max_levels')
+
+    def __init__(self, is_bid: bool, max_levels: int = MAX_LEVELS):
+        self.is_bid = is_bid
+        self.keys: List[float] = []
+        self.qtys: List[float] = []
+        self.max_levels = max_levels
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def clear(self):
+        self.keys.clear()
+        self.qtys.clear()
+
+    def update(self, price: float, qty: float):
+        """
+        Set the size at `price`; a size of 0 removes the level.
+        """
+        key = price if self.is_bid else -price
+        keys = self.keys
+        i = bisect_left(keys, key)
+        if i < len(keys) and keys[i] == key:
+            if qty == 0.0:
+                del keys[i]
+                del self.qtys[i]
+            else:
+                self.qtys[i] = qty
+        elif qty != 0.0:
+            if len(keys) >= self.max_levels:
+                if i == 0:
+                    return  # worse than everything we keep
+                del keys[0]
+                del self.qtys[0]
+                i -= 1
+            keys.insert(i, key)
+            self.qtys.insert(i, qty)
+
+    def load(self, levels: List[List[str]]):
+        self.clear()
+        for price, qty in levels:
+            self.update(float(price), float(qty))
+
+    def best(self) -> Optional[float]:
+        if not self.keys:
+            return None
+        key = self.keys[-1]
+        return key if self.is_bid else -key
+
+    def walk(self, qty: float) -> Tuple[float, float]:
+        """
+        Take `qty` from the top of this side. Returns (vwap, filled); filled < qty
+        when the book is too thin.
+        """
+        keys, qtys = self.keys, self.qtys
+        remaining = qty
+        notional = 0.0
+        i = len(keys) - 1
+        while remaining > 0.0 and i >= 0:
+            take = qtys[i] if qtys[i] < remaining else remaining
+            notional += take * keys[i]
+            remaining -= take
+            i -= 1
+        filled = qty - remaining
+        if filled <= 0.0:
+            return 0.0, 0.0
+        vwap = notional / filled
+        return (vwap if self.is_bid else -vwap), filled
+
+
+class OrderBook:
+    """
+    Local L2 book for one symbol on one venue, kept in sync with Binance's
+    diff-depth stream.
+
+    Diffs are buffered until a REST snapshot is loaded; the first diff that
+    bridges the snapshot's update id (per Binance's rules for the venue) and
+    everything after it are then applied in order. Any later gap in update ids
+    marks the book unsynced, and the caller fetches a new snapshot.
+    """
+
+    def __init__(self, symbol: str, venue: str, max_levels: int = MAX_LEVELS):
+        self.symbol = symbol
+        self.venue = venue  # 'spot' or 'perp'
+        self.bids = BookSide(True, max_levels)
+        self.asks = BookSide(False, max_levels)
+        self.last_update_id: int = 0
+        self.synced: bool = False
+        self.buffer: List[dict] = []
+        self.resyncs: int = 0
+        self.updated_ms: int = 0
+        self.snapshot_loaded: bool = False  # snapshot installed, waiting for a bridging diff
+
+    def mid(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (bid + ask) / 2
+
+    def reset(self):
+        """
+        Forget sync state (e.g. after a reconnect); the next snapshot starts over.
+        """
+        self.synced = False
+        self.snapshot_loaded = False
+        self.buffer = []
+
+    def on_diff(self, data: dict) -> bool:
+        """
+        Feed one depthUpdate payload. Returns False when a new snapshot is needed.
+        """
+        if not self.synced:
+            if len(self.buffer) >= MAX_BUFFERED_DIFFS:
+                self.buffer.pop(0)
+            self.buffer.append(data)
+            return self._drain() is not False if self.snapshot_loaded else True
+
+        if not self._in_sequence(data):
+            if data['u'] <= self.last_update_id:
+                return True  # stale duplicate
+            self.resyncs += 1
+            self.reset()
+            self.buffer.append(data)
+            return False
+        self._apply(data)
+        return True
+
+    def load_snapshot(self, snapshot: dict) -> Optional[bool]:
+        """
+        Install a REST depth snapshot and replay buffered diffs on top of it.
+        Returns True once synced, None while waiting for a diff that bridges the
+        snapshot, and False if the buffered diffs cannot bridge it (fetch again).
+        """
+        self.bids.load(snapshot.get('bids', []))
+        self.asks.load(snapshot.get('asks', []))
+        self.last_update_id = int(snapshot['lastUpdateId'])
+        self.snapshot_loaded = True
+        return self._drain()
+
+    def _bridges(self, data: dict) -> Optional[bool]:
+        """
+        Against a fresh snapshot: None = diff is older (skip), True = first diff
+        to apply, False = diff starts after the snapshot (snapshot too old).
+        """
+        first, last, snap = data['U'], data['u'], self.last_update_id
+        if self.venue == 'perp':
+            if last < snap:
+                return None
+            return first <= snap
+        if last <= snap:
+            return None
+        return first <= snap + 1
+
+    def _in_sequence(self, data: dict) -> bool:
+        if self.venue == 'perp':
+            return data.get('pu') == self.last_update_id
+        return data['U'] == self.last_update_id + 1
+
+    def _drain(self) -> Optional[bool]:
+        pending, self.buffer = self.buffer, []
+        for i, data in enumerate(pending):
+            if not self.synced:
+                bridge = self._bridges(data)
+                if bridge is None:
+                    continue
+                if not bridge:
+                    # Snapshot predates the buffered diffs; keep them for the next one
+                    self.buffer = pending[i:]
+                    self.snapshot_loaded = False
+                    return False
+                self.synced = True
+            elif not self._in_sequence(data):
+                self.resyncs += 1
+                self.reset()
+                self.buffer = pending[i:]
+                return False
+            self._apply(data)
+        return True if self.synced else None
+
+    def _apply(self, data: dict):
+        update_bid, update_ask = self.bids.update, self.asks.update
+        for price, qty in data.get('b', ()):
+            update_bid(float(price), float(qty))
+        for price, qty in data.get('a', ()):
+            update_ask(float(price), float(qty))
+        self.last_update_id = data['u']
+        self.updated_ms = data.get('E', 0)
+
+    def fill_cost(self, side: str, qty: float) -> Optional[Tuple[float, float]]:
+        """
+        Slippage of a market order of `qty` versus mid, as a fraction of notional,
+        and the quantity the book can actually fill. None if the book is not usable.
+        """
+        if not self.synced:
+            return None
+        mid = self.mid()
+        if mid is None:
+            return None
+        if side == 'BUY':
+            vwap, filled = self.asks.walk(qty)
+            cost = (vwap - mid) / mid if filled else 0.0
+        else:
+            vwap, filled = self.bids.walk(qty)
+            cost = (mid - vwap) / mid if filled else 0.0
+        return cost, filled
+
+
+class DepthBooks:
+    """
+    Spot and perp diff-depth books for a set of symbols, plus the feed that keeps
+    them synced (`run`). Snapshots are fetched through the rate-limit scheduler
+    off the stream loop, so a resync never stalls message processing.
+    """
+
+    def __init__(self, symbols: List[str], exchange, scheduler=None, speed: str = '100ms'):
+        self.symbols = [s.upper() for s in symbols]
+        self.exchange = exchange
+        self.scheduler = scheduler or PassthroughScheduler()
+        self.books: Dict[str, Dict[str, OrderBook]] = {
+            venue: {s: OrderBook(s, venue) for s in self.symbols} for venue in ('spot', 'perp')
+        }
+        self._syncing: Dict[Tuple[str, str], asyncio.Task] = {}
+
+        streams = [f"{s.lower()}@depth@{speed}" for s in self.symbols]
+        self.urls = {
+            'spot': build_stream_urls(SPOT_WS_BASE, streams, SPOT_DEPTH_STREAMS_PER_CONN),
+            'perp': build_stream_urls(FUTURES_WS_BASE, streams, PERP_DEPTH_STREAMS_PER_CONN),
+        }
+
+    def book(self, venue: str, symbol: str) -> Optional[OrderBook]:
+        return self.books[venue].get(symbol)
+
+    def hedge_cost(self, symbol: str, direction: int, qty: float) -> Optional[Tuple[float, float]]:
+        """
+        Combined slippage (fraction of notional) of opening a hedge of `qty` in
+        `direction` (+1: buy spot / sell perp) by walking both books, and the
+        largest quantity both books can fill. None unless both books are synced.
+        """
+        spot, perp = self.books['spot'].get(symbol), self.books['perp'].get(symbol)
+        if spot is None or perp is None:
+            return None
+        spot_cost = spot.fill_cost('BUY' if direction > 0 else 'SELL', qty)
+        perp_cost = perp.fill_cost('SELL' if direction > 0 else 'BUY', qty)
+        if spot_cost is None or perp_cost is None:
+            return None
+        return spot_cost[0] + perp_cost[0], min(spot_cost[1], perp_cost[1])
+
+    async def run(self):
+        tasks = [
+            asyncio.create_task(self._listen(venue, url))
+            for venue, urls in self.urls.items() for url in urls
+        ]
+        await asyncio.gather(*tasks)
+
+    async def _listen(self, venue: str, url: str):
+        books = self.books[venue]
+        while True:
+            try:
+                async with websockets.connect(url) as ws:
+                    # New connection: everything on it starts from a fresh snapshot
+                    for symbol in self._symbols_of(url):
+                        books[symbol].reset()
+                        self._resync(books[symbol])
+                    while True:
+                        data = json.loads(await ws.recv()).get('data', {})
+                        book = books.get(data.get('s'))
+                        if book is None:
+                            continue
+                        if not book.on_diff(data):
+                            logging.warning(f"Depth gap on {venue} {book.symbol}; resyncing.")
+                            self._resync(book)
+                        elif not book.synced:
+                            self._resync(book)
+            except Exception as e:
+                print(f"Depth stream error ({url[:80]}...): {e}. Reconnecting in 1s...")
+                await asyncio.sleep(1)
+
+    def _symbols_of(self, url: str) -> List[str]:
+        streams = url.split('streams=', 1)[1].split('/')
+        return [s.split('@', 1)[0].upper() for s in streams]
+
+    def _resync(self, book: OrderBook):
+        key = (book.venue, book.symbol)
+        task = self._syncing.get(key)
+        if task is None or task.done():
+            self._syncing[key] = asyncio.create_task(self._sync(book))
+
+    async def _sync(self, book: OrderBook):
+        """
+        Fetch snapshots until one bridges the buffered diffs.
+        """
+        t0 = time.perf_counter_ns()
+        while not book.synced:
+            # Binance: the snapshot must come after the first buffered diff
+            while not book.buffer:
+                await asyncio.sleep(0.05)
+            try:
+                if book.venue == 'spot':
+                    snapshot = await self.scheduler.call(
+                        self.exchange.publicGetDepth, {'symbol': book.symbol, 'limit': SNAPSHOT_LIMIT},
+                        venue='spot', weight=SPOT_SNAPSHOT_WEIGHT, priority=METADATA,
+                    )
+                else:
+                    snapshot = await self.scheduler.call(
+                        self.exchange.fapiPublicGetDepth, {'symbol': book.symbol, 'limit': SNAPSHOT_LIMIT},
+                        venue='perp', weight=PERP_SNAPSHOT_WEIGHT, priority=METADATA,
+                    )
+            except Exception as e:
+                logging.warning(f"Depth snapshot for {book.venue} {book.symbol} failed: {e}")
+                await asyncio.sleep(1)
+                continue
+            result = book.load_snapshot(snapshot)
+            # None: on_diff completes the bridge when the next diff arrives
+            while result is None:
+                await asyncio.sleep(0.05)
+                result = True if book.synced else (None if book.snapshot_loaded else False)
+            if result is False:
+                await asyncio.sleep(0.1)
+        _RESYNCS.record(time.perf_counter_ns() - t0)
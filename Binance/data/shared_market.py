@@ -0,0 +1,185 @@
+# data/shared_market.py
+
+import asyncio
+import time
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from data.funding import DEFAULT_FUNDING_INTERVAL_MS
+from data.market_state import N_FIELDS, PERP, SPOT, FUNDING, PERP_TIME, SPOT_TIME, PriceMatrix, UniverseSnapshot
+from data.websocket_client import PriceTick
+
+
+# Copies attempted per snapshot before torn slots are masked out (NaN) instead
+SNAPSHOT_RETRIES = 3
+# How often the strategy process checks the matrix for new writes
+NOTIFY_POLL_S = 0.0005
+
+
+class SharedPriceMatrix(PriceMatrix):
+    """
+    PriceMatrix whose arrays live in one multiprocessing.shared_memory block, so
+    feed-worker processes can write prices that a strategy process reads.
+
+    Block layout (n symbols, w workers; every cell 8 bytes):
+        values     float64 (3, n)   spot, perp, funding (PriceMatrix rows)
+        times      int64   (2, n)   spot / perp event time, epoch ms
+        slot_seq   int64   (n,)     per-slot seqlock: odd while that slot is being written
+        funding    float64 (2, n)   FundingSchedule rate, carry
+        schedule   int64   (2, n)   FundingSchedule next_ms, interval_ms
+        heartbeat  int64   (w,)     last heartbeat of each feed worker, epoch ns
+
+    Each slot has exactly one writer (the worker streaming that symbol), so a
+    per-slot sequence replaces the single-writer `seq` of PriceMatrix. Readers
+    take private copies and retry slots whose sequence moved or was odd; this
+    relies on stores becoming visible in program order (true on x86-64).
+
+    The creating process (`name=None`) owns the block and unlinks it on `close`;
+    workers attach by `name`.
+    """
+
+    def __init__(self, symbols: List[str], n_workers: int = 0, name: Optional[str] = None):
+        self.symbols: List[str] = [s.upper() for s in symbols]
+        self.slots: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        n = len(self.symbols)
+        self.n_workers = n_workers
+        self.owner = name is None
+        size = ((N_FIELDS + 2 + 1 + 2 + 2) * n + n_workers) * 8
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=max(size, 8))
+
+        offset = 0
+
+        def take(dtype, shape) -> np.ndarray:
+            nonlocal offset
+            array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            offset += array.nbytes
+            return array
+
+        self._values = take(np.float64, (N_FIELDS, n))
+        self._times = take(np.int64, (2, n))
+        self.slot_seq = take(np.int64, (n,))
+        self._funding_values = take(np.float64, (2, n))
+        self._schedule = take(np.int64, (2, n))
+        self.heartbeat = take(np.int64, (n_workers,))
+        if self.owner:
+            self._values.fill(np.nan)
+            self._times.fill(0)
+            self.slot_seq.fill(0)
+            self._funding_values.fill(0.0)
+            self._schedule[0].fill(0)
+            self._schedule[1].fill(DEFAULT_FUNDING_INTERVAL_MS)
+            self.heartbeat.fill(0)
+
+        self.seq: int = 0
+        self.spot = self._values[SPOT]
+        self.perp = self._values[PERP]
+        self.funding = self._values[FUNDING]
+        self.spot_time = self._times[SPOT_TIME]
+        self.perp_time = self._times[PERP_TIME]
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    def funding_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Rows for data.funding.FundingSchedule(arrays=...).
+        """
+        return {
+            'rate': self._funding_values[0],
+            'carry': self._funding_values[1],
+            'next_ms': self._schedule[0],
+            'interval_ms': self._schedule[1],
+        }
+
+    def update_spot(self, slot: int, price: float, event_ms: int):
+        seq = self.slot_seq
+        seq[slot] += 1
+        self.spot[slot] = price
+        self.spot_time[slot] = event_ms
+        seq[slot] += 1
+
+    def update_perp(self, slot: int, price: float, funding_rate: float, event_ms: int):
+        seq = self.slot_seq
+        seq[slot] += 1
+        self.perp[slot] = price
+        self.funding[slot] = funding_rate
+        self.perp_time[slot] = event_ms
+        seq[slot] += 1
+
+    def repair(self, symbols: List[str]) -> List[str]:
+        """
+        Round the sequence of `symbols`' slots up to even and return those that
+        were odd: a writer killed between the two increments of an update leaves
+        its slot marked as being written forever. Only safe while no process is
+        writing those slots (the supervisor calls it before starting their worker).
+        """
+        slots = np.array([self.slots[s.upper()] for s in symbols], dtype=np.int64)
+        torn = slots[(self.slot_seq[slots] & 1).astype(bool)]
+        self.slot_seq[torn] += 1
+        return [self.symbols[i] for i in torn]
+
+    def version(self) -> int:
+        """
+        Changes whenever any slot is written (sum of the per-slot sequences).
+        """
+        return int(self.slot_seq.sum())
+
+    def snapshot(self) -> UniverseSnapshot:
+        """
+        Consistent private copy of the whole universe. Slots still torn after
+        SNAPSHOT_RETRIES copies read as NaN, so sizing skips them this round.
+        """
+        for _ in range(SNAPSHOT_RETRIES):
+            before = self.slot_seq.copy()
+            values = self._values.copy()
+            times = self._times.copy()
+            torn = (before != self.slot_seq) | (before & 1).astype(bool)
+            if not torn.any():
+                break
+        else:
+            values[:, torn] = np.nan
+        return UniverseSnapshot(
+            seq=int(before.sum()),
+            symbols=self.symbols,
+            spot=values[SPOT],
+            perp=values[PERP],
+            funding=values[FUNDING],
+            spot_time=times[SPOT_TIME],
+            perp_time=times[PERP_TIME],
+        )
+
+    def is_consistent(self, snap: UniverseSnapshot) -> bool:
+        """
+        Snapshots are private copies; this tells whether one is still current.
+        """
+        return snap.seq == self.version()
+
+    async def notify(self, tick_bus, poll_s: float = NOTIFY_POLL_S):
+        """
+        Strategy-process side: publish a wake-up PriceTick on `tick_bus` whenever
+        a feed worker has written to the matrix (for ArbitrageEngine.run_universe,
+        which only uses the bus as a conflated signal and reads prices from here).
+        """
+        last = self.version()
+        while True:
+            await asyncio.sleep(poll_s)
+            version = self.version()
+            if version != last:
+                last = version
+                now_ns = time.time_ns()
+                tick_bus.publish(PriceTick('*', float('nan'), float('nan'), 0.0, now_ns, now_ns))
+
+    def close(self):
+        # Views into the block must be gone before it can be closed
+        for attr in ('_values', '_times', 'slot_seq', '_funding_values', '_schedule', 'heartbeat',
+                     'spot', 'perp', 'funding', 'spot_time', 'perp_time'):
+            self.__dict__.pop(attr, None)
+        try:
+            self.shm.close()
+        except BufferError:
+            pass  # still viewed elsewhere (e.g. a FundingSchedule); the mapping goes at exit
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,130 @@
+# data/tick_bus.py
+
+import asyncio
+import time
+from typing import Dict, List, Optional
+
+from data.websocket_client import PriceTick
+from metrics.latency import histogram
+
+
+class TickSubscriber:
+    """
+    A read cursor into a TickBus.
+
+    Every subscriber advances independently, so one slow consumer never
+    steals ticks from (or delays) another one.
+    """
+
+    def __init__(self, bus: "TickBus", name: str):
+        self.bus = bus
+        self.name = name
+        self.cursor: int = bus.head  # only see ticks published after subscribing
+        self.overruns: int = 0       # ticks overwritten before this subscriber read them
+        self.conflated: int = 0      # ticks skipped in favour of a newer one
+        self._wakeup = asyncio.Event()
+        # Publish → read delay of the oldest tick in each read
+        self._bus_wait = histogram(f'bus_wait.{name}')
+
+    def pending(self) -> int:
+        return self.bus.head - self.cursor
+
+    async def _wait(self, timeout: Optional[float]) -> bool:
+        while self.cursor >= self.bus.head:
+            self._wakeup.clear()
+            if timeout is None:
+                await self._wakeup.wait()
+            else:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    return False
+        return True
+
+    def _skip_overrun(self):
+        """
+        If the producer lapped us, jump to the oldest tick still in the ring
+        and account for what was lost.
+        """
+        oldest = self.bus.head - self.bus.capacity
+        if self.cursor < oldest:
+            self.overruns += oldest - self.cursor
+            self.cursor = oldest
+
+    async def get_batch(self, max_items: int = 100, timeout: Optional[float] = None) -> List[PriceTick]:
+        """
+        Lossless consumption: return up to `max_items` unread ticks in publish order.
+        Waits for at least one tick; returns an empty list if `timeout` expires first.
+        """
+        if not await self._wait(timeout):
+            return []
+        self._skip_overrun()
+
+        buf, mask = self.bus._buf, self.bus._mask
+        self._bus_wait.record(time.time_ns() - self.bus._stamps[self.cursor & mask])
+        end = min(self.bus.head, self.cursor + max_items)
+        batch = [buf[i & mask] for i in range(self.cursor, end)]
+        self.cursor = end
+        return batch
+
+    async def get_latest(self, timeout: Optional[float] = None) -> List[PriceTick]:
+        """
+        Latest-value conflation: wait for new data, then return only the newest
+        unread tick per symbol and move the cursor to the head of the bus.
+        """
+        if not await self._wait(timeout):
+            return []
+        self._skip_overrun()
+
+        buf, mask = self.bus._buf, self.bus._mask
+        self._bus_wait.record(time.time_ns() - self.bus._stamps[self.cursor & mask])
+        head = self.bus.head
+        latest: Dict[str, PriceTick] = {}
+        # Walk backwards from the head so the first tick seen per symbol is the newest
+        for i in range(head - 1, self.cursor - 1, -1):
+            tick = buf[i & mask]
+            if tick.symbol not in latest:
+                latest[tick.symbol] = tick
+        self.conflated += (head - self.cursor) - len(latest)
+        self.cursor = head
+        return list(latest.values())
+
+
+class TickBus:
+    """
+    Single-producer, multi-consumer broadcast of PriceTicks.
+
+    Ticks are stored in a preallocated ring buffer; `publish` is synchronous and
+    never waits on consumers. A subscriber that falls more than `capacity` ticks
+    behind loses the oldest ones (counted in `TickSubscriber.overruns`) instead
+    of applying backpressure to the WebSocket reader.
+    """
+
+    def __init__(self, capacity: int = 8192):
+        # Round up to a power of two so the slot index is a cheap mask
+        size = 1
+        while size < capacity:
+            size <<= 1
+        self.capacity: int = size
+        self._mask: int = size - 1
+        self._buf: List[Optional[PriceTick]] = [None] * size
+        self._stamps: List[int] = [0] * size  # publish time (ns) of each slot
+        self.head: int = 0  # sequence number of the next tick to be published
+        self._subscribers: List[TickSubscriber] = []
+
+    def subscribe(self, name: str) -> TickSubscriber:
+        sub = TickSubscriber(self, name)
+        self._subscribers.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: TickSubscriber):
+        if sub in self._subscribers:
+            self._subscribers.remove(sub)
+
+    def publish(self, tick: PriceTick):
+        idx = self.head & self._mask
+        self._buf[idx] = tick
+        self._stamps[idx] = time.time_ns()
+        self.head += 1
+        for sub in self._subscribers:
+            sub._wakeup.set()
@@ -1,103 +1,251 @@
 # data/websocket_client.py
 
 import asyncio
-import json
-from dataclasses import dataclass
+import time
 from datetime import datetime
+from typing import List, Optional
 import pytz
 import websockets
 
-from config import SYMBOL
+from config import FUTURES_WS_BASE, SPOT_WS_BASE, SYMBOL
+from data.funding import FundingSchedule
+from data.decoders import MARK_PRICE, TICKER, decode_mark_price, decode_ticker, stream_kind, stream_name
+from data.market_state import PriceMatrix
+from exec.rate_limiter import PassthroughScheduler
+from metrics.latency import histogram
 
 
-BINANCE_WS_BASE = 'wss://stream.binance.com:9443/stream'
+BINANCE_WS_BASE = SPOT_WS_BASE
 # Combine two streams: ticker (spot) + markPrice (perp)
 STREAMS = f"{SYMBOL.lower()}@ticker/{SYMBOL.lower()}@markPrice"
 
+# Multi-symbol mode: spot tickers and perp mark prices live on separate clusters
+BINANCE_SPOT_WS_BASE = SPOT_WS_BASE
+BINANCE_FUTURES_WS_BASE = FUTURES_WS_BASE
+# Binance caps the number of streams per combined connection
+SPOT_MAX_STREAMS_PER_CONN = 1024
+FUTURES_MAX_STREAMS_PER_CONN = 200
+# New connections are limited per IP (300 per 5 minutes), so stagger shard start-up
+SHARD_CONNECT_STAGGER_S = 0.25
+
+_EXCHANGE_TO_RECV = histogram('exchange_to_recv')
+_DECODE = histogram('decode')
+
+
+def build_stream_urls(base: str, streams: List[str], max_per_conn: int) -> List[str]:
+    """
+    Split `streams` into combined-stream URLs of at most `max_per_conn` streams each.
+    """
+    return [
+        f"{base}?streams={'/'.join(streams[i:i + max_per_conn])}"
+        for i in range(0, len(streams), max_per_conn)
+    ]
+
 
-@dataclass
 class PriceTick:
-    symbol: str
-    timestamp: datetime
-    spot_price: float
-    perp_price: float
-    funding_rate: float
+    """
+    One spot/perp observation for a symbol.
+
+    Slotted to keep per-message allocation small. Times are integer epoch
+    nanoseconds: `event_time_ns` from the exchange `E` field, `recv_time_ns`
+    from the local clock when the message was read off the socket.
+    """
+
+    __slots__ = ('symbol', 'spot_price', 'perp_price', 'funding_rate', 'event_time_ns', 'recv_time_ns')
+
+    def __init__(
+        self,
+        symbol: str,
+        spot_price: float,
+        perp_price: float,
+        funding_rate: float,
+        event_time_ns: int = 0,
+        recv_time_ns: int = 0,
+    ):
+        self.symbol = symbol
+        self.spot_price = spot_price
+        self.perp_price = perp_price
+        self.funding_rate = funding_rate
+        self.event_time_ns = event_time_ns
+        self.recv_time_ns = recv_time_ns
+
+    @property
+    def timestamp(self) -> datetime:
+        """
+        Exchange event time (receive time if unknown) as an aware UTC datetime.
+        Built on demand, e.g. for DB writes, so the hot path never creates one.
+        """
+        ns = self.event_time_ns or self.recv_time_ns
+        return datetime.fromtimestamp(ns / 1e9, tz=pytz.utc)
+
+    def __repr__(self) -> str:
+        return (
+            f"PriceTick(symbol={self.symbol!r}, spot_price={self.spot_price}, perp_price={self.perp_price}, "
+            f"funding_rate={self.funding_rate}, event_time_ns={self.event_time_ns}, recv_time_ns={self.recv_time_ns})"
+        )
 
 
 class BinanceWebSocketClient:
-    def __init__(self):
+    def __init__(
+        self,
+        symbols: Optional[List[str]] = None,
+        max_streams_per_conn: Optional[int] = None,
+        scheduler=None,
+        market: Optional[PriceMatrix] = None,
+        funding: Optional[FundingSchedule] = None,
+    ):
         # e.g. wss://stream.binance.com:9443/stream?streams=btcusdt@ticker/btcusdt@markPrice
         self.url = f"{BINANCE_WS_BASE}?streams={STREAMS}"
         self.spot_price: float = None
         self.perp_price: float = None
         self.funding_rate: float = None
-        self._last_funding_fetch: datetime = None
+        # Rate-limit scheduler for REST calls (exec.rate_limiter.RequestScheduler)
+        self.scheduler = scheduler or PassthroughScheduler()
+
+        # Multi-symbol mode: per-symbol state lives in a PriceMatrix instead of attributes.
+        # A shard can be given a larger (e.g. shared-memory) matrix and only stream `symbols`.
+        self.market: Optional[PriceMatrix] = None
+        self.spot_urls: List[str] = []
+        self.perp_urls: List[str] = []
+        if symbols:
+            self.market = market if market is not None else PriceMatrix(symbols)
+            lower = [s.lower() for s in symbols]
+            self.spot_urls = build_stream_urls(
+                BINANCE_SPOT_WS_BASE,
+                [f"{s}@ticker" for s in lower],
+                min(max_streams_per_conn or SPOT_MAX_STREAMS_PER_CONN, SPOT_MAX_STREAMS_PER_CONN),
+            )
+            self.perp_urls = build_stream_urls(
+                BINANCE_FUTURES_WS_BASE,
+                [f"{s}@markPrice" for s in lower],
+                min(max_streams_per_conn or FUTURES_MAX_STREAMS_PER_CONN, FUTURES_MAX_STREAMS_PER_CONN),
+            )
+        # Funding rate / schedule per symbol, kept current from the markPrice stream
+        self.funding = funding or FundingSchedule(self.market.symbols if self.market is not None else [SYMBOL])
 
     async def fetch_initial_funding_rate(self, exchange):
         """
-        Fetch the most recent funding rate via REST. 
-        Binance returns a list—take the last element's 'fundingRate'.
+        Cold start: seed the funding schedule (rate, next funding time, carry)
+        via REST. Only needed once; afterwards the markPrice stream keeps it current.
         """
-        try:
-            data = await exchange.fapiPublic_get_fundingRate({'symbol': SYMBOL})
-            if isinstance(data, list) and data:
-                last_entry = data[-1]
-                self.funding_rate = float(last_entry.get('fundingRate', 0.0))
-                self._last_funding_fetch = datetime.utcnow().replace(tzinfo=pytz.utc)
-        except Exception as e:
-            print(f"Error fetching initial funding rate: {e}")
-            self.funding_rate = 0.0
-            self._last_funding_fetch = datetime.utcnow().replace(tzinfo=pytz.utc)
-
-    async def listen_price_ticks(self, price_queue: asyncio.Queue, exchange):
+        await self.funding.bootstrap(exchange, self.scheduler)
+        if self.market is None:
+            self.funding_rate = float(self.funding.rate[0])
+
+    async def listen_price_ticks(self, tick_bus, exchange):
         """
-        Connect to Binance WebSocket streams and push PriceTick objects into price_queue.
-        Automatically refreshes funding rate every 8 hours.
+        Connect to Binance WebSocket streams and publish PriceTick objects on tick_bus.
+        Publishing never blocks, so slow consumers cannot stall the socket reader.
+        Funding rate and schedule come from the markPrice stream (`r`, `T`); REST
+        is only used for the cold start, before connecting.
         On any disconnect/error, waits 1 second and reconnects.
         """
-        # On startup, fetch the current funding rate via REST
-        await self.fetch_initial_funding_rate(exchange)
+        if not self.funding.bootstrapped:
+            await self.fetch_initial_funding_rate(exchange)
+        on_funding = self.funding.on_mark_price
 
         while True:
             try:
                 async with websockets.connect(self.url) as ws:
+                    recv = ws.recv
+                    publish = tick_bus.publish
+                    record_wire, record_decode = _EXCHANGE_TO_RECV.record, _DECODE.record
                     while True:
-                        msg = await ws.recv()
-                        msg_json = json.loads(msg)
-                        stream = msg_json.get('stream', '')
-                        data = msg_json.get('data', {})
+                        msg = await recv()
+                        recv_ns = time.time_ns()
+                        kind = stream_kind(stream_name(msg))
+
+                        # Spot ticker updates ('c' is last price)
+                        if kind == TICKER:
+                            _, event_ms, self.spot_price = decode_ticker(msg)
 
-                        # Spot ticker updates
-                        if stream.endswith('@ticker'):
-                            # 'c' is last price
-                            self.spot_price = float(data.get('c', 0.0))
+                        # Perp mark price updates ('p' is mark price)
+                        elif kind == MARK_PRICE:
+                            _, event_ms, self.perp_price, self.funding_rate, next_funding_ms = decode_mark_price(msg)
+                            on_funding(0, self.funding_rate, next_funding_ms)
 
-                        # Perp mark price updates
-                        elif stream.endswith('@markPrice'):
-                            # 'p' is mark price
-                            self.perp_price = float(data.get('p', 0.0))
+                        else:
+                            continue
+                        record_decode(time.time_ns() - recv_ns)
+                        record_wire(recv_ns - event_ms * 1_000_000)
 
                         # If both prices are available, build and send a tick
                         if self.spot_price is not None and self.perp_price is not None:
-                            now = datetime.utcnow().replace(tzinfo=pytz.utc)
-
-                            # If 8+ hours have passed since last funding fetch, refresh via REST
-                            if (
-                                self._last_funding_fetch is None
-                                or (now - self._last_funding_fetch).total_seconds() >= 8 * 3600
-                            ):
-                                await self.fetch_initial_funding_rate(exchange)
-
-                            tick = PriceTick(
-                                symbol=SYMBOL,
-                                timestamp=now,
-                                spot_price=self.spot_price,
-                                perp_price=self.perp_price,
-                                funding_rate=self.funding_rate
-                            )
-                            await price_queue.put(tick)
+                            publish(PriceTick(
+                                SYMBOL,
+                                self.spot_price,
+                                self.perp_price,
+                                self.funding_rate,
+                                event_ms * 1_000_000,
+                                recv_ns,
+                            ))
 
             except Exception as e:
                 print(f"WebSocket error: {e}. Reconnecting in 1s...")
                 await asyncio.sleep(1)
-              
\ No newline at end of file
+
+    async def listen_universe(self, tick_bus=None):
+        """
+        Multi-symbol mode: run one connection per stream shard and keep
+        `self.market` up to date. If `tick_bus` is given, a PriceTick is also
+        published for every update of a symbol that has both prices.
+        """
+        if self.market is None:
+            raise RuntimeError("listen_universe() requires the client to be built with symbols")
+
+        tasks = []
+        for url in self.spot_urls + self.perp_urls:
+            tasks.append(asyncio.create_task(self._listen_shard(url, tick_bus)))
+            await asyncio.sleep(SHARD_CONNECT_STAGGER_S)
+        await asyncio.gather(*tasks)
+
+    async def _listen_shard(self, url: str, tick_bus):
+        """
+        Consume one combined-stream connection, reconnecting after 1 second on error.
+        """
+        market = self.market
+        slots = market.slots
+        on_funding = self.funding.on_mark_price
+        record_wire, record_decode = _EXCHANGE_TO_RECV.record, _DECODE.record
+        while True:
+            try:
+                async with websockets.connect(url) as ws:
+                    recv = ws.recv
+                    while True:
+                        msg = await recv()
+                        recv_ns = time.time_ns()
+                        kind = stream_kind(stream_name(msg))
+
+                        if kind == TICKER:
+                            symbol, event_ms, price = decode_ticker(msg)
+                            slot = slots.get(symbol)
+                            if slot is None:
+                                continue
+                            market.update_spot(slot, price, event_ms)
+                        elif kind == MARK_PRICE:
+                            symbol, event_ms, price, funding_rate, next_funding_ms = decode_mark_price(msg)
+                            slot = slots.get(symbol)
+                            if slot is None:
+                                continue
+                            market.update_perp(slot, price, funding_rate, event_ms)
+                            on_funding(slot, funding_rate, next_funding_ms)
+                        else:
+                            continue
+                        record_decode(time.time_ns() - recv_ns)
+                        record_wire(recv_ns - event_ms * 1_000_000)
+
+                        if tick_bus is not None:
+                            spot, perp = market.spot[slot], market.perp[slot]
+                            if spot == spot and perp == perp:  # both non-NaN
+                                tick_bus.publish(PriceTick(
+                                    symbol,
+                                    float(spot),
+                                    float(perp),
+                                    float(market.funding[slot]),
+                                    event_ms * 1_000_000,
+                                    recv_ns,
+                                ))
+
+            except Exception as e:
+                print(f"WebSocket shard error ({url[:80]}...): {e}. Reconnecting in 1s...")
+                await asyncio.sleep(1)
@@ -0,0 +1,477 @@
+# db/archive.py
+#
+# Columnar tick archive for research and backtests, so they stop pulling raw rows
+# out of the production database. Ticks are stored as Arrow IPC files partitioned
+# by UTC day and symbol:
+#
+#   <root>/date=2026-10-17/symbol=BTCUSDT/part-000000.arrow
+#
+# Columns follow the spool record (db.spool.RECORD_DTYPE): int64 event/receive
+# times (epoch ns), float64 spot / perp / funding, dictionary-encoded symbol and
+# venue. Each part holds one record batch sorted by event time, uncompressed, so a
+# reader can memory-map it and hand out NumPy views of the columns without copying
+# or decoding anything.
+#
+#   cd Binance && python -m db.archive export --dsn postgres://... --root archive --start 2026-01-01 --end 2026-02-01
+#   cd Binance && python -m db.archive scan --root archive --symbol BTCUSDT
+
+import argparse
+import asyncio
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import asyncpg
+import numpy as np
+import pyarrow as pa
+
+from data.tick_bus import TickSubscriber
+from db.spool import RECORD_DTYPE
+
+NS_PER_DAY = 86_400 * 1_000_000_000
+PART_SUFFIX = '.arrow'
+# Numeric columns, readable as zero-copy NumPy views
+NUMERIC_COLUMNS = ('event_ns', 'recv_ns', 'spot', 'perp', 'funding')
+SCHEMA = pa.schema([
+    ('event_ns', pa.int64()),
+    ('recv_ns', pa.int64()),
+    ('symbol', pa.dictionary(pa.int32(), pa.string())),
+    ('venue', pa.dictionary(pa.int8(), pa.string())),
+    ('spot', pa.float64()),
+    ('perp', pa.float64()),
+    ('funding', pa.float64()),
+])
+# Rows buffered per partition before a part is written (~56 MiB)
+DEFAULT_FLUSH_ROWS = 1 << 20
+# Live capture: longest a tick waits in memory before its part is written
+DEFAULT_FLUSH_INTERVAL_S = 60.0
+
+
+def day_string(day: int) -> str:
+    return (datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(days=day)).strftime('%Y-%m-%d')
+
+
+def day_number(value: str) -> int:
+    return (datetime.strptime(value, '%Y-%m-%d').replace(tzinfo=timezone.utc)
+            - datetime(1970, 1, 1, tzinfo=timezone.utc)).days
+
+
+def partition_dir(root: str, day: int, symbol: str) -> str:
+    return os.path.join(root, f"date={day_string(day)}", f"symbol={symbol}")
+
+
+def list_parts(directory: str) -> List[str]:
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(PART_SUFFIX)
+    )
+
+
+def _batch(records: np.ndarray, symbol: str) -> pa.RecordBatch:
+    """
+    One record batch of a single symbol's spool records (already sorted).
+    """
+    n = len(records)
+    venues, venue_idx = np.unique(records['venue'], return_inverse=True)
+    columns = [
+        pa.array(records['event_ns']),
+        pa.array(records['recv_ns']),
+        pa.DictionaryArray.from_arrays(pa.array(np.zeros(n, dtype=np.int32)), pa.array([symbol])),
+        pa.DictionaryArray.from_arrays(
+            pa.array(venue_idx.astype(np.int8)), pa.array([v.decode() for v in venues], pa.string())
+        ),
+        pa.array(records['spot']),
+        pa.array(records['perp']),
+        pa.array(records['funding']),
+    ]
+    return pa.RecordBatch.from_arrays(columns, schema=SCHEMA)
+
+
+def write_part(path: str, batch: pa.RecordBatch):
+    """
+    Write one part atomically (temp file + rename), so readers never map a torn file.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + '.tmp'
+    with pa.OSFile(tmp, 'wb') as sink:
+        with pa.ipc.new_file(sink, SCHEMA) as writer:
+            writer.write_batch(batch)
+    os.replace(tmp, path)
+
+
+class ArchiveWriter:
+    """
+    Buffers spool records per (day, symbol) partition and writes each partition's
+    buffer as a new sorted part once it reaches `flush_rows`, or on `flush`.
+    `compact` merges a day's parts into one file per symbol.
+    """
+
+    def __init__(self, root: str, flush_rows: int = DEFAULT_FLUSH_ROWS):
+        self.root = root
+        self.flush_rows = flush_rows
+        self._buffers: Dict[Tuple[int, str], List[np.ndarray]] = {}
+        self._rows: Dict[Tuple[int, str], int] = {}
+        self._next_part: Dict[Tuple[int, str], int] = {}
+        self.rows_written = 0
+        self.parts_written = 0
+
+    def write(self, records: np.ndarray):
+        """
+        Add RECORD_DTYPE records (any mix of days and symbols, any order).
+        """
+        if not len(records):
+            return
+        days = records['event_ns'] // NS_PER_DAY
+        order = np.lexsort((records['event_ns'], records['symbol'], days))
+        records, days = records[order], days[order]
+        keys = np.empty(len(records), dtype=[('day', 'i8'), ('symbol', records.dtype['symbol'])])
+        keys['day'], keys['symbol'] = days, records['symbol']
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        for start, end in zip(starts, np.r_[starts[1:], len(records)]):
+            key = (int(days[start]), records['symbol'][start].decode())
+            self._buffers.setdefault(key, []).append(records[start:end])
+            self._rows[key] = self._rows.get(key, 0) + int(end - start)
+            if self._rows[key] >= self.flush_rows:
+                self._flush_partition(key)
+
+    def _part_path(self, key: Tuple[int, str]) -> str:
+        directory = partition_dir(self.root, *key)
+        index = self._next_part.get(key)
+        if index is None:
+            existing = list_parts(directory)
+            index = int(os.path.basename(existing[-1])[5:-len(PART_SUFFIX)]) + 1 if existing else 0
+        self._next_part[key] = index + 1
+        return os.path.join(directory, f"part-{index:06d}{PART_SUFFIX}")
+
+    def _flush_partition(self, key: Tuple[int, str]):
+        chunks = self._buffers.pop(key, None)
+        self._rows.pop(key, None)
+        if not chunks:
+            return
+        records = np.concatenate(chunks) if len(chunks) > 1 else chunks[0]
+        records = records[np.argsort(records['event_ns'], kind='stable')]
+        write_part(self._part_path(key), _batch(records, key[1]))
+        self.rows_written += len(records)
+        self.parts_written += 1
+
+    def flush(self, before_day: Optional[int] = None):
+        """
+        Write every buffered partition (or only those of days before `before_day`).
+        """
+        for key in [k for k in self._buffers if before_day is None or k[0] < before_day]:
+            self._flush_partition(key)
+
+    def compact(self, day: int, symbols: Optional[Sequence[str]] = None):
+        """
+        Merge each partition of `day` into a single sorted part.
+        """
+        day_dir = os.path.join(self.root, f"date={day_string(day)}")
+        if not os.path.isdir(day_dir):
+            return
+        for name in sorted(os.listdir(day_dir)):
+            symbol = name.split('=', 1)[1]
+            if symbols is not None and symbol not in symbols:
+                continue
+            parts = list_parts(os.path.join(day_dir, name))
+            if len(parts) < 2:
+                continue
+            records = np.concatenate([read_part_records(p) for p in parts])
+            records = records[np.argsort(records['event_ns'], kind='stable')]
+            merged = os.path.join(day_dir, name, f"part-{0:06d}{PART_SUFFIX}")
+            write_part(merged + '.merged', _batch(records, symbol))
+            for part in parts:
+                os.remove(part)
+            os.replace(merged + '.merged', merged)
+            self._next_part.pop((day, symbol), None)
+
+    def close(self):
+        self.flush()
+
+    async def run(self, ticks: TickSubscriber, flush_interval_s: float = DEFAULT_FLUSH_INTERVAL_S):
+        """
+        Live capture from the tick bus. Parts are written every `flush_interval_s`
+        (or at `flush_rows`); when the UTC day rolls over the finished day is
+        flushed and compacted in a worker thread.
+        """
+        last_flush = time.monotonic()
+        day = time.time_ns() // NS_PER_DAY
+        while True:
+            batch = await ticks.get_batch(max_items=10_000, timeout=1.0)
+            if batch:
+                records = np.zeros(len(batch), dtype=RECORD_DTYPE)
+                records['event_ns'] = [t.event_time_ns for t in batch]
+                records['recv_ns'] = [t.recv_time_ns for t in batch]
+                records['symbol'] = [t.symbol.encode() for t in batch]
+                records['venue'] = b'binance'
+                records['spot'] = [t.spot_price for t in batch]
+                records['perp'] = [t.perp_price for t in batch]
+                records['funding'] = [t.funding_rate for t in batch]
+                self.write(records)
+            today = time.time_ns() // NS_PER_DAY
+            if today != day:
+                self.flush(before_day=today)
+                await asyncio.to_thread(self.compact, day)
+                day = today
+            now = time.monotonic()
+            if now - last_flush >= flush_interval_s:
+                await asyncio.to_thread(self.flush)
+                last_flush = now
+
+
+def map_part(path: str) -> pa.RecordBatch:
+    """
+    The part's record batch over a read-only memory map (no read, no copy).
+    """
+    with pa.memory_map(path, 'r') as source:
+        return pa.ipc.open_file(source).get_batch(0)
+
+
+def part_columns(batch: pa.RecordBatch, columns: Sequence[str] = NUMERIC_COLUMNS) -> Dict[str, np.ndarray]:
+    """
+    Zero-copy NumPy views of numeric columns; they keep the mapping alive.
+    """
+    return {name: batch.column(name).to_numpy(zero_copy_only=True) for name in columns}
+
+
+def read_part_records(path: str) -> np.ndarray:
+    """
+    A part as RECORD_DTYPE records (a copy; for compaction and backtests).
+    """
+    batch = map_part(path)
+    records = np.zeros(batch.num_rows, dtype=RECORD_DTYPE)
+    for name, values in part_columns(batch).items():
+        records[name] = values
+    for name in ('symbol', 'venue'):
+        column = batch.column(name)
+        records[name] = np.array([s.encode() for s in column.dictionary.to_pylist()],
+                                 dtype=RECORD_DTYPE[name])[column.indices.to_numpy()]
+    return records
+
+
+class ArchiveSlice(NamedTuple):
+    day: int
+    symbol: str
+    columns: Dict[str, np.ndarray]  # zero-copy views, sorted by event_ns
+
+    def __len__(self) -> int:
+        return len(self.columns['event_ns'])
+
+
+class ArchiveReader:
+    """
+    Memory-mapped access to an archive. Partitions are pruned by directory name
+    (day, symbol); inside a part the time range is found by binary search on the
+    sorted event times, so a slice costs a mapping and two searches.
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def days(self) -> List[int]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(day_number(name[5:]) for name in os.listdir(self.root) if name.startswith('date='))
+
+    def symbols(self, day: int) -> List[str]:
+        day_dir = os.path.join(self.root, f"date={day_string(day)}")
+        if not os.path.isdir(day_dir):
+            return []
+        return sorted(name.split('=', 1)[1] for name in os.listdir(day_dir) if name.startswith('symbol='))
+
+    def scan(
+        self,
+        symbols: Optional[Sequence[str]] = None,
+        start_ns: int = 0,
+        end_ns: Optional[int] = None,
+        columns: Sequence[str] = NUMERIC_COLUMNS,
+    ) -> Iterator[ArchiveSlice]:
+        """
+        Yield one slice per part in [start_ns, end_ns), day by day, then by symbol.
+        `columns` must include 'event_ns' only if the caller wants it back; it is
+        always used for the range search.
+        """
+        wanted = set(symbols) if symbols is not None else None
+        first_day = start_ns // NS_PER_DAY
+        last_day = (end_ns - 1) // NS_PER_DAY if end_ns is not None else None
+        for day in self.days():
+            if day < first_day or (last_day is not None and day > last_day):
+                continue
+            for symbol in self.symbols(day):
+                if wanted is not None and symbol not in wanted:
+                    continue
+                for path in list_parts(partition_dir(self.root, day, symbol)):
+                    batch = map_part(path)
+                    times = batch.column('event_ns').to_numpy(zero_copy_only=True)
+                    lo = int(np.searchsorted(times, start_ns, 'left')) if start_ns > day * NS_PER_DAY else 0
+                    hi = int(np.searchsorted(times, end_ns, 'left')) if end_ns is not None else len(times)
+                    if lo >= hi:
+                        continue
+                    views = part_columns(batch, [c for c in columns if c != 'event_ns'])
+                    views = {name: values[lo:hi] for name, values in views.items()}
+                    if 'event_ns' in columns:
+                        views['event_ns'] = times[lo:hi]
+                    yield ArchiveSlice(day, symbol, views)
+
+    def records(self, symbols: Optional[Sequence[str]] = None, start_ns: int = 0,
+                end_ns: Optional[int] = None) -> Iterator[np.ndarray]:
+        """
+        RECORD_DTYPE chunks, one per day, merged across symbols in event-time order
+        (what the backtest replay consumes).
+        """
+        day, pending = None, []
+        for part in self.scan(symbols, start_ns, end_ns):
+            if part.day != day and pending:
+                yield _merge(pending)
+                pending = []
+            day = part.day
+            pending.append(part)
+        if pending:
+            yield _merge(pending)
+
+
+def _merge(parts: List[ArchiveSlice]) -> np.ndarray:
+    records = np.zeros(sum(len(p) for p in parts), dtype=RECORD_DTYPE)
+    at = 0
+    for part in parts:
+        n = len(part)
+        chunk = records[at:at + n]
+        for name, values in part.columns.items():
+            chunk[name] = values
+        chunk['symbol'] = part.symbol.encode()
+        chunk['venue'] = b'binance'
+        at += n
+    return records[np.argsort(records['event_ns'], kind='stable')]
+
+
+# ---------------------------------------------------------------------- export
+
+async def export_prices(
+    dsn: str,
+    root: str,
+    start: datetime,
+    end: datetime,
+    symbols: Optional[Sequence[str]] = None,
+    exchange: str = 'binance',
+    chunk_rows: int = 200_000,
+) -> int:
+    """
+    Export the `prices` hypertable into the archive, one UTC day at a time with
+    a server-side cursor. Each day is written to a staging directory and then
+    replaces the archive's partitions for that day, so re-exporting is safe.
+    Returns the number of rows exported.
+    """
+    conn = await asyncpg.connect(dsn=dsn)
+    staging = os.path.join(root, '.staging')
+    total = 0
+    try:
+        day = (start.astimezone(timezone.utc) - datetime(1970, 1, 1, tzinfo=timezone.utc)).days
+        end_day = -(-int(end.timestamp()) // 86_400)
+        while day < end_day:
+            day_start = datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(days=day)
+            lo, hi = max(day_start, start.astimezone(timezone.utc)), min(day_start + timedelta(days=1), end)
+            shutil.rmtree(staging, ignore_errors=True)
+            writer = ArchiveWriter(staging, flush_rows=1 << 24)
+            t0 = time.perf_counter()
+            async with conn.transaction():
+                cursor = await conn.cursor(
+                    """
+                    SELECT (extract(epoch FROM timestamp) * 1e9)::bigint, symbol, spot, perp, funding_rate
+                    FROM prices
+                    WHERE exchange = $1 AND timestamp >= $2 AND timestamp < $3
+                      AND ($4::text[] IS NULL OR symbol = ANY($4::text[]))
+                    ORDER BY symbol, timestamp
+                    """,
+                    exchange, lo, hi, list(symbols) if symbols is not None else None,
+                )
+                while True:
+                    rows = await cursor.fetch(chunk_rows)
+                    if not rows:
+                        break
+                    chunk = np.zeros(len(rows), dtype=RECORD_DTYPE)
+                    chunk['event_ns'] = [r[0] for r in rows]
+                    chunk['recv_ns'] = chunk['event_ns']
+                    chunk['symbol'] = [r[1].encode() for r in rows]
+                    chunk['venue'] = exchange.encode()
+                    chunk['spot'] = [r[2] for r in rows]
+                    chunk['perp'] = [r[3] for r in rows]
+                    chunk['funding'] = [r[4] for r in rows]
+                    writer.write(chunk)
+            writer.close()
+            writer.compact(day)
+            _publish(staging, root, day)
+            total += writer.rows_written
+            logging.info(
+                f"Exported {writer.rows_written} rows for {day_string(day)} in {time.perf_counter() - t0:.1f}s."
+            )
+            day += 1
+    finally:
+        await conn.close()
+        shutil.rmtree(staging, ignore_errors=True)
+    return total
+
+
+def _publish(staging: str, root: str, day: int):
+    """
+    Move a staged day's partitions into the archive, replacing existing ones.
+    """
+    name = f"date={day_string(day)}"
+    source = os.path.join(staging, name)
+    if not os.path.isdir(source):
+        return
+    target = os.path.join(root, name)
+    os.makedirs(target, exist_ok=True)
+    for partition in os.listdir(source):
+        destination = os.path.join(target, partition)
+        if os.path.isdir(destination):
+            shutil.rmtree(destination)
+        os.replace(os.path.join(source, partition), destination)
+
+
+def _parse_time(value: str) -> datetime:
+    t = datetime.fromisoformat(value)
+    return t if t.tzinfo else t.replace(tzinfo=timezone.utc)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export and scan the columnar tick archive.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    export = commands.add_parser('export', help="copy the prices table into the archive")
+    export.add_argument('--dsn', default=os.getenv('DATABASE_URL'))
+    export.add_argument('--root', required=True)
+    export.add_argument('--start', required=True, help="ISO start time (UTC if no offset)")
+    export.add_argument('--end', required=True, help="ISO end time (UTC if no offset)")
+    export.add_argument('--symbols', help="comma-separated symbols (default: all)")
+    scan = commands.add_parser('scan', help="time a full scan (basis mean over every tick)")
+    scan.add_argument('--root', required=True)
+    scan.add_argument('--symbol', action='append', help="symbol filter (repeatable)")
+    scan.add_argument('--start', help="ISO start time")
+    scan.add_argument('--end', help="ISO end time")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if args.command == 'export':
+        symbols = [s.strip().upper() for s in args.symbols.split(',')] if args.symbols else None
+        rows = asyncio.run(export_prices(args.dsn, args.root, _parse_time(args.start), _parse_time(args.end), symbols))
+        print(f"{rows} rows exported to {args.root}")
+        return
+
+    start_ns = int(_parse_time(args.start).timestamp() * 1e9) if args.start else 0
+    end_ns = int(_parse_time(args.end).timestamp() * 1e9) if args.end else None
+    t0 = time.perf_counter()
+    rows, basis_sum = 0, 0.0
+    for part in ArchiveReader(args.root).scan(args.symbol, start_ns, end_ns, ('event_ns', 'spot', 'perp')):
+        rows += len(part)
+        basis_sum += float(np.sum(part.columns['perp'] / part.columns['spot'] - 1.0))
+    elapsed = time.perf_counter() - t0
+    print(
+        f"{rows:,} ticks in {elapsed:.2f}s ({rows / elapsed if elapsed else 0:,.0f} ticks/s), "
+        f"mean basis {basis_sum / rows if rows else float('nan'):.6f}"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,390 @@
+# db/history.py
+#
+# Read side of the `prices` hypertable. Raw ticks roll up into hierarchical
+# continuous aggregates (1s <- prices, 1m <- 1s, 1h <- 1m) holding basis and
+# funding OHLC per symbol plus the basis sum, sum of squares and tick count, so
+# the mean and volatility of any window are a few bucket rows away instead of a
+# scan over raw ticks. Raw chunks and aggregates are compressed once they are
+# old enough that nothing writes to them any more.
+#
+# Queries return NumPy (structured arrays or slot-aligned columns) and go through
+# an LRU cache keyed by bucket-aligned ranges: a range that ends before the
+# newest settled bucket can no longer change and stays cached until evicted.
+#
+# The schema is created by an explicit migration step, not at bot start-up:
+#
+#   cd Binance && python -m db.history setup --dsn postgres://...
+
+import argparse
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from db.db_async import TimescaleDB
+
+# resolution -> (aggregate view, bucket width, source, refresh policy
+# (start offset, end offset, schedule), compress after)
+RESOLUTIONS = {
+    '1s': ('prices_basis_1s', 1, 'prices', ('15 minutes', '2 seconds', '5 seconds'), '1 day'),
+    '1m': ('prices_basis_1m', 60, 'prices_basis_1s', ('2 hours', '1 minute', '1 minute'), '7 days'),
+    '1h': ('prices_basis_1h', 3600, 'prices_basis_1m', ('3 days', '1 hour', '30 minutes'), '30 days'),
+}
+# Raw ticks are compressed after this (segmented by exchange/symbol)
+RAW_COMPRESS_AFTER = '1 day'
+# Lateness allowed for ticks to reach the table (ingest batching + COPY); a bucket
+# that closed less than this long ago may still change
+SETTLE_S = 5.0
+DEFAULT_CACHE_ENTRIES = 256
+
+BAR_DTYPE = np.dtype([
+    ('bucket_ns', 'i8'),
+    ('basis_open', 'f8'), ('basis_high', 'f8'), ('basis_low', 'f8'), ('basis_close', 'f8'),
+    ('basis_sum', 'f8'), ('basis_sumsq', 'f8'), ('n', 'i8'),
+    ('funding_open', 'f8'), ('funding_high', 'f8'), ('funding_low', 'f8'), ('funding_close', 'f8'),
+])
+
+_BASIS = '((perp - spot) / spot)'
+
+_PRICES_DDL = """
+CREATE TABLE IF NOT EXISTS prices (
+    timestamp    TIMESTAMPTZ      NOT NULL,
+    exchange     TEXT             NOT NULL,
+    symbol       TEXT             NOT NULL,
+    spot         DOUBLE PRECISION NOT NULL,
+    perp         DOUBLE PRECISION NOT NULL,
+    funding_rate DOUBLE PRECISION NOT NULL
+)"""
+
+
+def _aggregate_ddl(view: str, width_s: int, source: str) -> str:
+    """
+    CREATE statement of one continuous aggregate: from raw ticks for the finest
+    resolution, otherwise from the next finer aggregate (OHLC via first/last,
+    sums added up).
+    """
+    if source == 'prices':
+        columns = f"""
+            time_bucket(INTERVAL '{width_s} seconds', timestamp) AS bucket, exchange, symbol,
+            first({_BASIS}, timestamp) AS basis_open,
+            max({_BASIS}) AS basis_high,
+            min({_BASIS}) AS basis_low,
+            last({_BASIS}, timestamp) AS basis_close,
+            sum({_BASIS}) AS basis_sum,
+            sum({_BASIS} * {_BASIS}) AS basis_sumsq,
+            count(*) AS n,
+            first(funding_rate, timestamp) AS funding_open,
+            max(funding_rate) AS funding_high,
+            min(funding_rate) AS funding_low,
+            last(funding_rate, timestamp) AS funding_close"""
+        bucket = f"time_bucket(INTERVAL '{width_s} seconds', timestamp)"
+    else:
+        columns = f"""
+            time_bucket(INTERVAL '{width_s} seconds', bucket) AS bucket, exchange, symbol,
+            first(basis_open, bucket) AS basis_open,
+            max(basis_high) AS basis_high,
+            min(basis_low) AS basis_low,
+            last(basis_close, bucket) AS basis_close,
+            sum(basis_sum) AS basis_sum,
+            sum(basis_sumsq) AS basis_sumsq,
+            sum(n)::bigint AS n,
+            first(funding_open, bucket) AS funding_open,
+            max(funding_high) AS funding_high,
+            min(funding_low) AS funding_low,
+            last(funding_close, bucket) AS funding_close"""
+        bucket = f"time_bucket(INTERVAL '{width_s} seconds', bucket)"
+    return f"""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+        WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+        SELECT {columns}
+        FROM {source}
+        GROUP BY {bucket}, exchange, symbol
+        WITH NO DATA"""
+
+
+def _to_datetime(ns: int) -> datetime:
+    return datetime.fromtimestamp(ns / 1e9, tz=timezone.utc)
+
+
+class BucketCache:
+    """
+    LRU of query results keyed by bucket-aligned time ranges.
+
+    A result whose range ends at or before the newest settled bucket boundary
+    never changes and is kept until evicted. One that reaches past it (an
+    explicit `end` close to now) expires when the next bucket settles.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_CACHE_ENTRIES, settle_s: float = SETTLE_S):
+        self.max_entries = max_entries
+        self.settle_ns = int(settle_s * 1e9)
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()  # key -> (expires_ns or 0, value)
+        self.hits = 0
+        self.misses = 0
+
+    def settled_edge(self, width_ns: int, now_ns: int) -> int:
+        """
+        End of the newest bucket that can no longer receive ticks.
+        """
+        return (now_ns - self.settle_ns) // width_ns * width_ns
+
+    def get(self, key: Hashable, now_ns: int):
+        entry = self._entries.get(key)
+        if entry is None or (entry[0] and entry[0] <= now_ns):
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value, end_ns: int, width_ns: int, now_ns: int):
+        edge = self.settled_edge(width_ns, now_ns)
+        expires_ns = 0 if end_ns <= edge else edge + width_ns + self.settle_ns
+        self._entries[key] = (expires_ns, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, symbol: Optional[str] = None):
+        """
+        Drop every entry, or only those of `symbol` (e.g. after backfilling it).
+        """
+        if symbol is None:
+            self._entries.clear()
+            return
+        for key in [k for k in self._entries if symbol in k[2]]:
+            del self._entries[key]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class BasisHistory:
+    """
+    Async queries over the basis/funding aggregates, cached per bucket-aligned range.
+    """
+
+    def __init__(self, db: TimescaleDB, exchange: str = 'binance', cache: Optional[BucketCache] = None):
+        self.db = db
+        self.exchange = exchange
+        self.cache = cache or BucketCache()
+
+    async def setup(self):
+        """
+        Create (if missing) the prices hypertable, the continuous aggregates with
+        their refresh policies, and compression on all of them. Idempotent; needs
+        TimescaleDB >= 2.9 (continuous aggregates on continuous aggregates). Run
+        through `python -m db.history setup`, not on every start-up.
+        """
+        if self.db.pool is None:
+            await self.db.connect()
+        async with self.db.pool.acquire() as conn:
+            await conn.execute(_PRICES_DDL)
+            await conn.execute("SELECT create_hypertable('prices', 'timestamp', if_not_exists => TRUE)")
+            enabled = await conn.fetchval(
+                "SELECT compression_enabled FROM timescaledb_information.hypertables "
+                "WHERE hypertable_name = 'prices'"
+            )
+            if not enabled:
+                await conn.execute(
+                    "ALTER TABLE prices SET (timescaledb.compress, "
+                    "timescaledb.compress_segmentby = 'exchange, symbol', "
+                    "timescaledb.compress_orderby = 'timestamp DESC')"
+                )
+            await conn.execute(
+                f"SELECT add_compression_policy('prices', INTERVAL '{RAW_COMPRESS_AFTER}', if_not_exists => TRUE)"
+            )
+
+            for view, width_s, source, (start, end, schedule), compress_after in RESOLUTIONS.values():
+                await conn.execute(_aggregate_ddl(view, width_s, source))
+                await conn.execute(
+                    f"SELECT add_continuous_aggregate_policy('{view}', "
+                    f"start_offset => INTERVAL '{start}', end_offset => INTERVAL '{end}', "
+                    f"schedule_interval => INTERVAL '{schedule}', if_not_exists => TRUE)"
+                )
+                enabled = await conn.fetchval(
+                    "SELECT compression_enabled FROM timescaledb_information.continuous_aggregates "
+                    "WHERE view_name = $1", view,
+                )
+                if not enabled:
+                    await conn.execute(f"ALTER MATERIALIZED VIEW {view} SET (timescaledb.compress = true)")
+                await conn.execute(
+                    f"SELECT add_compression_policy('{view}', compress_after => INTERVAL '{compress_after}', "
+                    f"if_not_exists => TRUE)"
+                )
+        logging.info(f"Continuous aggregates ready: {', '.join(v[0] for v in RESOLUTIONS.values())}.")
+
+    def _range(self, resolution: str, start_ns: Optional[int], end_ns: Optional[int], now_ns: int):
+        """
+        Bucket-aligned [start, end): start rounded down, end rounded up, `end`
+        defaulting to the newest settled bucket boundary.
+        """
+        width_ns = RESOLUTIONS[resolution][1] * 1_000_000_000
+        if end_ns is None:
+            end_ns = self.cache.settled_edge(width_ns, now_ns)
+        else:
+            end_ns = -(-end_ns // width_ns) * width_ns
+        start_ns = (start_ns or 0) // width_ns * width_ns
+        return width_ns, start_ns, end_ns
+
+    async def bars(
+        self,
+        symbol: str,
+        resolution: str = '1m',
+        start_ns: Optional[int] = None,
+        end_ns: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Basis/funding OHLC bars of one symbol as a BAR_DTYPE array, oldest first.
+        Times are epoch nanoseconds; `end_ns` defaults to the newest settled bucket.
+        """
+        now_ns = time.time_ns()
+        width_ns, start_ns, end_ns = self._range(resolution, start_ns, end_ns, now_ns)
+        key = ('bars', resolution, (symbol,), start_ns, end_ns)
+        cached = self.cache.get(key, now_ns)
+        if cached is not None:
+            return cached
+
+        view = RESOLUTIONS[resolution][0]
+        rows = await self.db.fetch(
+            f"""
+            SELECT (extract(epoch FROM bucket) * 1e9)::bigint,
+                   basis_open, basis_high, basis_low, basis_close, basis_sum, basis_sumsq, n,
+                   funding_open, funding_high, funding_low, funding_close
+            FROM {view}
+            WHERE exchange = $1 AND symbol = $2 AND bucket >= $3 AND bucket < $4
+            ORDER BY bucket
+            """,
+            self.exchange, symbol, _to_datetime(start_ns), _to_datetime(end_ns),
+        )
+        result = np.array([tuple(r) for r in rows], dtype=BAR_DTYPE)
+        result.flags.writeable = False  # shared with every later cache hit
+        self.cache.put(key, result, end_ns, width_ns, now_ns)
+        return result
+
+    async def basis_stats(
+        self,
+        symbols: Sequence[str],
+        window_s: float,
+        resolution: str = '1m',
+    ) -> Dict[str, np.ndarray]:
+        """
+        Basis mean, standard deviation and tick count over the last `window_s`
+        settled seconds for every symbol, as {'mean', 'std', 'n'} arrays aligned
+        with `symbols` (NaN / 0 where a symbol has no ticks). One aggregate
+        query for the whole universe.
+        """
+        now_ns = time.time_ns()
+        width_ns, _, end_ns = self._range(resolution, None, None, now_ns)
+        start_ns = (end_ns - int(window_s * 1e9)) // width_ns * width_ns
+        key = ('stats', resolution, tuple(symbols), start_ns, end_ns)
+        cached = self.cache.get(key, now_ns)
+        if cached is not None:
+            return cached
+
+        view = RESOLUTIONS[resolution][0]
+        rows = await self.db.fetch(
+            f"""
+            SELECT symbol, sum(basis_sum), sum(basis_sumsq), sum(n)::bigint
+            FROM {view}
+            WHERE exchange = $1 AND symbol = ANY($2::text[]) AND bucket >= $3 AND bucket < $4
+            GROUP BY symbol
+            """,
+            self.exchange, list(symbols), _to_datetime(start_ns), _to_datetime(end_ns),
+        )
+        slot = {s: i for i, s in enumerate(symbols)}
+        total = np.zeros(len(symbols))
+        total_sq = np.zeros(len(symbols))
+        n = np.zeros(len(symbols), dtype=np.int64)
+        for symbol, s, sq, count in rows:
+            i = slot[symbol]
+            total[i], total_sq[i], n[i] = s, sq, count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = total / n
+            std = np.sqrt(np.maximum(total_sq / n - mean * mean, 0.0))
+        result = {'mean': mean, 'std': std, 'n': n}
+        for column in result.values():
+            column.flags.writeable = False
+        self.cache.put(key, result, end_ns, width_ns, now_ns)
+        return result
+
+
+class RollingBasis:
+    """
+    Rolling basis mean and volatility per symbol for the risk / strategy code,
+    refreshed in the background each time a bucket settles and read without
+    awaiting anything. Arrays are aligned with `symbols` (the price-matrix slots).
+    """
+
+    def __init__(self, history: BasisHistory, symbols: List[str], window_s: float = 3600.0,
+                 resolution: str = '1m'):
+        self.history = history
+        self.symbols = list(symbols)
+        self.window_s = window_s
+        self.resolution = resolution
+        self.slot: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        self.mean = np.full(len(self.symbols), np.nan)
+        self.std = np.full(len(self.symbols), np.nan)
+        self.n = np.zeros(len(self.symbols), dtype=np.int64)
+        self.updated_ns: int = 0
+
+    def zscore(self, symbol: str, basis: float) -> Optional[float]:
+        """
+        How many rolling standard deviations `basis` is from the rolling mean;
+        None until the symbol has history.
+        """
+        i = self.slot.get(symbol)
+        if i is None or not self.n[i] or not self.std[i] > 0:
+            return None
+        return (basis - self.mean[i]) / self.std[i]
+
+    async def refresh(self):
+        stats = await self.history.basis_stats(self.symbols, self.window_s, self.resolution)
+        self.mean, self.std, self.n = stats['mean'], stats['std'], stats['n']
+        self.updated_ns = time.time_ns()
+
+    async def run(self):
+        width_ns = RESOLUTIONS[self.resolution][1] * 1_000_000_000
+        cache = self.history.cache
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logging.warning(f"Rolling basis refresh failed: {e}")
+            # Next refresh when the next bucket has settled
+            now_ns = time.time_ns()
+            next_ns = cache.settled_edge(width_ns, now_ns) + width_ns + cache.settle_ns
+            await asyncio.sleep(max(0.0, (next_ns - now_ns) / 1e9))
+
+
+async def setup_history(dsn: str):
+    db = TimescaleDB(dsn=dsn)
+    await db.connect()
+    try:
+        await BasisHistory(db).setup()
+    finally:
+        await db.pool.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage the basis history schema.")
+    commands = parser.add_subparsers(dest='command', required=True)
+    setup = commands.add_parser('setup', help="create the prices hypertable and continuous aggregates")
+    setup.add_argument('--dsn', default=os.getenv('DATABASE_URL'))
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+
+    if not args.dsn:
+        parser.error("--dsn or DATABASE_URL is required")
+    asyncio.run(setup_history(args.dsn))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+# db/ingest.py
+
+import asyncio
+import logging
+import time
+from typing import List
+
+from data.tick_bus import TickSubscriber
+from data.websocket_client import PriceTick
+from db.db_async import TimescaleDB, tick_record
+
+
+# What to do when the fill buffer reaches max_pending rows while a flush is in progress
+DROP_OLDEST = 'drop_oldest'   # discard the oldest buffered rows to make room
+DROP_NEWEST = 'drop_newest'   # reject incoming rows
+BLOCK = 'block'               # stop reading the tick bus until the flush completes
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class IngestMetrics:
+    """
+    Counters for the ingestion stage. Rates are computed over the interval
+    since the previous `report()` call.
+    """
+
+    def __init__(self):
+        self.rows_written: int = 0
+        self.rows_dropped: int = 0
+        self.flushes: int = 0
+        self.flush_errors: int = 0
+        self.last_flush_s: float = 0.0
+        self.max_flush_s: float = 0.0
+        self.total_flush_s: float = 0.0
+        self._interval_start: float = time.monotonic()
+        self._interval_rows: int = 0
+
+    def record_flush(self, rows: int, seconds: float):
+        self.rows_written += rows
+        self._interval_rows += rows
+        self.flushes += 1
+        self.last_flush_s = seconds
+        self.total_flush_s += seconds
+        if seconds > self.max_flush_s:
+            self.max_flush_s = seconds
+
+    def report(self) -> dict:
+        now = time.monotonic()
+        elapsed = max(now - self._interval_start, 1e-9)
+        stats = {
+            'rows_per_s': self._interval_rows / elapsed,
+            'rows_written': self.rows_written,
+            'rows_dropped': self.rows_dropped,
+            'flushes': self.flushes,
+            'flush_errors': self.flush_errors,
+            'avg_flush_ms': 1000 * self.total_flush_s / self.flushes if self.flushes else 0.0,
+            'last_flush_ms': 1000 * self.last_flush_s,
+            'max_flush_ms': 1000 * self.max_flush_s,
+        }
+        self._interval_start = now
+        self._interval_rows = 0
+        return stats
+
+
+class TickIngestor:
+    """
+    Double-buffered COPY ingestion into the `prices` hypertable.
+
+    Rows are appended to a fill buffer while the previous buffer is being
+    written by a background flusher. A flush starts when the fill buffer holds
+    `max_batch` rows or its oldest row is `max_age_s` old (monotonic clock), so
+    quiet periods still reach the database promptly.
+    """
+
+    def __init__(
+        self,
+        db: TimescaleDB,
+        max_batch: int = 5000,
+        max_age_s: float = 1.0,
+        max_pending: int = 100_000,
+        drop_policy: str = DROP_OLDEST,
+        metrics_interval_s: float = 60.0,
+    ):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy {drop_policy!r}; expected one of {DROP_POLICIES}")
+        self.db = db
+        self.max_batch = max_batch
+        self.max_age_s = max_age_s
+        self.max_pending = max(max_pending, max_batch)
+        self.drop_policy = drop_policy
+        self.metrics_interval_s = metrics_interval_s
+        self.metrics = IngestMetrics()
+
+        self._fill: List[tuple] = []
+        self._spare: List[tuple] = []
+        self._fill_started: float = 0.0
+        self._has_rows = asyncio.Event()
+        self._batch_ready = asyncio.Event()
+        self._room = asyncio.Event()
+        self._room.set()
+
+    def pending(self) -> int:
+        return len(self._fill)
+
+    async def put(self, ticks: List[PriceTick]):
+        """
+        Append ticks to the fill buffer, applying the drop policy if it is full.
+        Only waits under the BLOCK policy.
+        """
+        if not ticks:
+            return
+        fill = self._fill
+        overflow = len(fill) + len(ticks) - self.max_pending
+        if overflow > 0:
+            if self.drop_policy == BLOCK:
+                while len(self._fill) + len(ticks) > self.max_pending:
+                    self._room.clear()
+                    await self._room.wait()
+                fill = self._fill
+            elif self.drop_policy == DROP_NEWEST:
+                ticks = ticks[:max(0, len(ticks) - overflow)]
+                self.metrics.rows_dropped += overflow
+            else:
+                del fill[:min(overflow, len(fill))]
+                self.metrics.rows_dropped += overflow
+
+        if not fill:
+            self._fill_started = time.monotonic()
+        fill.extend([tick_record(t) for t in ticks])
+
+        self._has_rows.set()
+        if len(fill) >= self.max_batch:
+            self._batch_ready.set()
+
+    async def run(self, ticks: TickSubscriber):
+        """
+        Pump every tick from the bus into the fill buffer and run the flusher.
+        """
+        flusher = asyncio.create_task(self._flush_loop())
+        reporter = asyncio.create_task(self._report_loop(ticks))
+        try:
+            while True:
+                await self.put(await ticks.get_batch(max_items=self.max_batch))
+        finally:
+            flusher.cancel()
+            reporter.cancel()
+
+    async def flush(self):
+        """
+        Swap buffers and COPY the filled one. The next fill starts immediately.
+        """
+        if not self._fill:
+            return
+        batch, self._fill = self._fill, self._spare
+        self._batch_ready.clear()
+        self._has_rows.clear()
+        self._room.set()
+
+        t0 = time.monotonic()
+        try:
+            await self.db.copy_records(batch)
+            self.metrics.record_flush(len(batch), time.monotonic() - t0)
+        except Exception as e:
+            self.metrics.flush_errors += 1
+            self.metrics.rows_dropped += len(batch)
+            logging.error(f"Tick flush of {len(batch)} rows failed: {e}")
+        finally:
+            batch.clear()
+            self._spare = batch
+
+    async def _flush_loop(self):
+        while True:
+            if not self._fill:
+                self._has_rows.clear()
+                await self._has_rows.wait()
+
+            remaining = self.max_age_s - (time.monotonic() - self._fill_started)
+            if len(self._fill) < self.max_batch and remaining > 0:
+                try:
+                    await asyncio.wait_for(self._batch_ready.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+
+            await self.flush()
+
+    async def _report_loop(self, ticks: TickSubscriber):
+        while True:
+            await asyncio.sleep(self.metrics_interval_s)
+            stats = self.metrics.report()
+            logging.info(
+                f"Ingest: {stats['rows_per_s']:.0f} rows/s, flush avg={stats['avg_flush_ms']:.1f}ms "
+                f"max={stats['max_flush_ms']:.1f}ms, pending={self.pending()}, "
+                f"dropped={stats['rows_dropped']}, bus overruns={ticks.overruns}"
+            )
@@ -0,0 +1,319 @@
+# db/spool.py
+
+import asyncio
+import logging
+import mmap
+import os
+import struct
+import time
+from datetime import datetime
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pytz
+
+from data.tick_bus import TickSubscriber
+from data.websocket_client import PriceTick
+from db.db_async import TimescaleDB
+from db.ingest import IngestMetrics
+
+
+# Fixed 64-byte little-endian record:
+#   event_ns int64 | recv_ns int64 | symbol 16s | venue 8s | spot f64 | perp f64 | funding f64
+# event_ns is never 0 for a written record, so an all-zero slot marks the end of data.
+RECORD = struct.Struct('<qq16s8sddd')
+RECORD_SIZE = RECORD.size
+RECORD_DTYPE = np.dtype([
+    ('event_ns', '<i8'),
+    ('recv_ns', '<i8'),
+    ('symbol', 'S16'),
+    ('venue', 'S8'),
+    ('spot', '<f8'),
+    ('perp', '<f8'),
+    ('funding', '<f8'),
+])
+assert RECORD_DTYPE.itemsize == RECORD_SIZE
+
+SEGMENT_SUFFIX = '.spool'
+CHECKPOINT_FILE = 'checkpoint'
+DEFAULT_SEGMENT_RECORDS = 1 << 20  # 64 MiB per segment
+
+# (segment index, record offset within segment)
+SpoolPosition = Tuple[int, int]
+
+
+def segment_path(directory: str, index: int) -> str:
+    return os.path.join(directory, f"{index:012d}{SEGMENT_SUFFIX}")
+
+
+def list_segments(directory: str) -> List[int]:
+    return sorted(
+        int(name[:-len(SEGMENT_SUFFIX)])
+        for name in os.listdir(directory)
+        if name.endswith(SEGMENT_SUFFIX)
+    )
+
+
+def map_segment(path: str, segment_records: int, writable: bool) -> mmap.mmap:
+    size = segment_records * RECORD_SIZE
+    flags = os.O_RDWR | os.O_CREAT if writable else os.O_RDONLY
+    fd = os.open(path, flags, 0o644)
+    try:
+        if writable and os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)  # sparse, zero-filled
+        access = mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ
+        return mmap.mmap(fd, os.fstat(fd).st_size, access=access)
+    finally:
+        os.close(fd)
+
+
+def load_segment(path: str) -> np.ndarray:
+    """
+    Read-only record view over a whole segment file, trimmed at the end of data.
+    Used by offline readers (backtests, exports); does not touch the checkpoint.
+    """
+    records = np.memmap(path, dtype=RECORD_DTYPE, mode='r')
+    empty = np.flatnonzero(records['event_ns'] == 0)
+    return records[:empty[0]] if len(empty) else records
+
+
+def records_to_rows(records: np.ndarray) -> List[tuple]:
+    """
+    Convert spool records into `prices` rows (see db.db_async.PRICES_COLUMNS).
+    """
+    utc = pytz.utc
+    return [
+        (
+            datetime.fromtimestamp(int(ns) / 1e9, tz=utc),
+            venue.decode(),
+            symbol.decode(),
+            float(spot),
+            float(perp),
+            float(funding),
+        )
+        for ns, venue, symbol, spot, perp, funding in zip(
+            records['event_ns'], records['venue'], records['symbol'],
+            records['spot'], records['perp'], records['funding'],
+        )
+    ]
+
+
+class SpoolWriter:
+    """
+    Append-only, segmented, memory-mapped tick spool.
+
+    `append` is a single struct.pack_into into the current segment's mapping,
+    so it runs at memory speed regardless of database health. Data survives a
+    process crash via the page cache; `flush()` forces it to disk.
+    """
+
+    def __init__(self, directory: str, segment_records: int = DEFAULT_SEGMENT_RECORDS, venue: str = 'binance'):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_records = segment_records
+        self.venue = venue.encode()
+        self.appended: int = 0
+
+        segments = list_segments(directory)
+        self.segment: int = segments[-1] if segments else 0
+        self._mm = map_segment(segment_path(directory, self.segment), segment_records, writable=True)
+        self.offset: int = self._find_end()
+
+    def _find_end(self) -> int:
+        # Resume after the last written record of the newest segment
+        times = np.frombuffer(self._mm, dtype=RECORD_DTYPE)['event_ns']
+        empty = np.flatnonzero(times == 0)
+        return int(empty[0]) if len(empty) else self.segment_records
+
+    def _roll(self):
+        self._mm.flush()
+        self._mm.close()
+        self.segment += 1
+        self._mm = map_segment(segment_path(self.directory, self.segment), self.segment_records, writable=True)
+        self.offset = 0
+
+    def append(self, tick: PriceTick):
+        if self.offset >= self.segment_records:
+            self._roll()
+        RECORD.pack_into(
+            self._mm,
+            self.offset * RECORD_SIZE,
+            tick.event_time_ns or tick.recv_time_ns or time.time_ns(),
+            tick.recv_time_ns,
+            tick.symbol.encode(),
+            self.venue,
+            tick.spot_price,
+            tick.perp_price,
+            tick.funding_rate,
+        )
+        self.offset += 1
+        self.appended += 1
+
+    def position(self) -> SpoolPosition:
+        return self.segment, self.offset
+
+    def flush(self):
+        self._mm.flush()
+
+    def close(self):
+        self._mm.flush()
+        self._mm.close()
+
+    async def run(self, ticks: TickSubscriber, flush_interval_s: float = 1.0):
+        """
+        Append every tick from the bus; msync the active segment periodically.
+        """
+        last_flush = time.monotonic()
+        while True:
+            for tick in await ticks.get_batch(max_items=10_000, timeout=flush_interval_s):
+                self.append(tick)
+            now = time.monotonic()
+            if now - last_flush >= flush_interval_s:
+                self.flush()
+                last_flush = now
+
+
+class SpoolReader:
+    """
+    Reads spool records from a checkpointed position. `read` returns NumPy
+    record views straight over the segment mapping (no copy); `commit` persists
+    the new position and deletes segments that are fully consumed.
+    """
+
+    def __init__(self, directory: str, segment_records: int = DEFAULT_SEGMENT_RECORDS):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.segment_records = segment_records
+        self.checkpoint_path = os.path.join(directory, CHECKPOINT_FILE)
+        self.segment, self.offset = self._load_checkpoint()
+        self._mm: Optional[mmap.mmap] = None
+        self._mm_segment: int = -1
+
+    def _load_checkpoint(self) -> SpoolPosition:
+        try:
+            with open(self.checkpoint_path) as f:
+                segment, offset = f.read().split()
+                return int(segment), int(offset)
+        except (FileNotFoundError, ValueError):
+            segments = list_segments(self.directory)
+            return (segments[0] if segments else 0), 0
+
+    def _release(self):
+        if self._mm is not None:
+            try:
+                self._mm.close()
+            except BufferError:
+                pass  # a caller still holds a view; the mapping is freed with it
+            self._mm = None
+            self._mm_segment = -1
+
+    def _mapping(self) -> Optional[mmap.mmap]:
+        if self._mm_segment != self.segment:
+            self._release()
+            path = segment_path(self.directory, self.segment)
+            if not os.path.exists(path):
+                return None
+            self._mm = map_segment(path, self.segment_records, writable=False)
+            self._mm_segment = self.segment
+        return self._mm
+
+    def read(self, max_records: int) -> Tuple[np.ndarray, SpoolPosition]:
+        """
+        Return up to `max_records` unread records and the position after them.
+        Never crosses a segment boundary in one call. The records are a view over
+        the mapping and are only valid until the next read() or commit().
+        """
+        while True:
+            mm = self._mapping()
+            if mm is None:
+                return np.empty(0, dtype=RECORD_DTYPE), (self.segment, self.offset)
+
+            available = len(mm) // RECORD_SIZE - self.offset
+            if available <= 0:
+                # Segment exhausted: move on only once the writer has started the next one
+                if not os.path.exists(segment_path(self.directory, self.segment + 1)):
+                    return np.empty(0, dtype=RECORD_DTYPE), (self.segment, self.offset)
+                self.commit((self.segment + 1, 0))
+                continue
+
+            view = np.frombuffer(mm, dtype=RECORD_DTYPE, count=min(max_records, available),
+                                 offset=self.offset * RECORD_SIZE)
+            empty = np.flatnonzero(view['event_ns'] == 0)
+            if len(empty):
+                view = view[:empty[0]]
+            return view, (self.segment, self.offset + len(view))
+
+    def commit(self, position: SpoolPosition):
+        segment, offset = position
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w') as f:
+            f.write(f"{segment} {offset}\n")
+        os.replace(tmp, self.checkpoint_path)
+
+        for old in list_segments(self.directory):
+            if old >= segment:
+                break
+            if old == self._mm_segment:
+                self._release()
+            os.remove(segment_path(self.directory, old))
+
+        self.segment, self.offset = segment, offset
+
+    def close(self):
+        self._release()
+
+
+class SpoolReplayer:
+    """
+    Drains the spool into TimescaleDB with COPY, resuming from the reader's
+    checkpoint. While the database is unreachable it backs off and retries the
+    same records, so nothing is lost; the spool simply grows on disk.
+    """
+
+    def __init__(
+        self,
+        reader: SpoolReader,
+        db: TimescaleDB,
+        max_batch: int = 5000,
+        poll_interval_s: float = 0.2,
+        max_backoff_s: float = 30.0,
+        metrics_interval_s: float = 60.0,
+    ):
+        self.reader = reader
+        self.db = db
+        self.max_batch = max_batch
+        self.poll_interval_s = poll_interval_s
+        self.max_backoff_s = max_backoff_s
+        self.metrics_interval_s = metrics_interval_s
+        self.metrics = IngestMetrics()
+
+    async def run(self):
+        backoff = self.poll_interval_s
+        last_report = time.monotonic()
+        while True:
+            records, position = self.reader.read(self.max_batch)
+            if not len(records):
+                await asyncio.sleep(self.poll_interval_s)
+            else:
+                rows = records_to_rows(records)
+                del records  # release the mapping view before commit() may unmap it
+                t0 = time.monotonic()
+                try:
+                    await self.db.copy_records(rows)
+                except Exception as e:
+                    self.metrics.flush_errors += 1
+                    logging.warning(f"Spool replay paused, database unavailable: {e}. Retrying in {backoff:.1f}s")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, self.max_backoff_s)
+                    continue
+                self.metrics.record_flush(len(rows), time.monotonic() - t0)
+                self.reader.commit(position)
+                backoff = self.poll_interval_s
+
+            if time.monotonic() - last_report >= self.metrics_interval_s:
+                last_report = time.monotonic()
+                stats = self.metrics.report()
+                logging.info(
+                    f"Spool replay: {stats['rows_per_s']:.0f} rows/s, flush avg={stats['avg_flush_ms']:.1f}ms, "
+                    f"errors={stats['flush_errors']}, position={self.reader.segment}:{self.reader.offset}"
+                )
@@ -0,0 +1,429 @@
+# exec/fill_ledger.py
+
+import json
+import logging
+import os
+import re
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+
+# Positions smaller than this (asset units) count as flat
+FLAT_QTY = 1e-9
+# Closed-hedge outcomes (realized PnL) kept across compactions, for the win-rate window
+OUTCOME_HISTORY = 500
+
+# newClientOrderId of every order we send: arb<hedge id><s|p><order number>
+_CLIENT_ORDER_ID = re.compile(r'^arb(\d+)[sp]\d+$')
+
+
+def client_order_id(hedge_id: int, leg: str, n: int) -> str:
+    return f"arb{hedge_id}{leg[0]}{n}"
+
+
+def hedge_id_of(client_order_id: Optional[str]) -> Optional[int]:
+    """
+    Hedge id encoded in one of our client order ids; None for anything else.
+    """
+    m = _CLIENT_ORDER_ID.match(client_order_id or '')
+    return int(m.group(1)) if m else None
+
+
+@dataclass
+class LegPosition:
+    """
+    Average-cost position of one leg. `apply` returns the PnL realized by a fill.
+    """
+    qty: float = 0.0         # signed, asset units
+    avg_price: float = 0.0
+    realized: float = 0.0
+
+    def apply(self, signed_qty: float, price: float) -> float:
+        if self.qty == 0 or (self.qty > 0) == (signed_qty > 0):
+            new_qty = self.qty + signed_qty
+            self.avg_price = (self.qty * self.avg_price + signed_qty * price) / new_qty
+            self.qty = new_qty
+            return 0.0
+        closed = min(abs(signed_qty), abs(self.qty))
+        pnl = closed * (price - self.avg_price) * (1 if self.qty > 0 else -1)
+        remaining = self.qty + signed_qty
+        if abs(remaining) <= FLAT_QTY:
+            self.qty, self.avg_price = 0.0, 0.0
+        else:
+            if (remaining > 0) != (self.qty > 0):
+                self.avg_price = price  # flipped through zero
+            self.qty = remaining
+        self.realized += pnl
+        return pnl
+
+
+@dataclass
+class HedgeRecord:
+    hedge_id: int
+    symbol: str
+    direction: int            # +1: long spot / short perp, -1: short spot / long perp
+    opened_ns: int = 0
+    spot: LegPosition = field(default_factory=LegPosition)
+    perp: LegPosition = field(default_factory=LegPosition)
+    fees: float = 0.0
+    funding: float = 0.0
+    filled: bool = False      # any fill seen on either leg
+    closed: bool = False
+    fee_keys: set = field(default_factory=set)  # fees already booked (trade ids); go with the hedge
+    # Runtime only (not in the ledger): RiskManager lot, orders sent, in-flight order
+    # batches and orders acked but not yet final (e.g. perp orders filling on the stream)
+    lot_id: Optional[int] = None
+    orders_sent: int = 0
+    busy: int = 0
+    working: set = field(default_factory=set)
+
+    @property
+    def qty(self) -> float:
+        """Hedged size: the smaller of the two legs."""
+        return min(abs(self.spot.qty), abs(self.perp.qty))
+
+    @property
+    def pnl(self) -> float:
+        return self.spot.realized + self.perp.realized + self.funding - self.fees
+
+    @property
+    def flat(self) -> bool:
+        return abs(self.spot.qty) <= FLAT_QTY and abs(self.perp.qty) <= FLAT_QTY
+
+
+class FillLedger:
+    """
+    Append-only event log of hedges and their fills, one JSON object per line.
+
+    Events: `open` (hedge, symbol, direction), `fill` (per-order cumulative
+    quantity and quote, so REST acks and user-stream updates of the same order
+    can both be fed in any order without double counting), `fee`, `funding`,
+    `close` and `void`. Realized PnL is kept incrementally per leg on an
+    average-cost basis, net of fees and funding. A hedge closes once both legs
+    are flat again and no order batch is in flight; `on_close(hedge)` is then
+    called. Replaying the file rebuilds every open hedge and the running totals;
+    `compact` rewrites it down to those.
+    """
+
+    def __init__(self, path: Optional[str] = None, on_close: Optional[Callable[[HedgeRecord], None]] = None):
+        self.path = path
+        self.on_close = on_close
+        self.hedges: Dict[int, HedgeRecord] = {}        # open hedges only
+        self.by_symbol: Dict[str, List[int]] = {}
+        # (leg, order id) -> [hedge id, cumulative qty, cumulative quote] for open hedges
+        self.orders: Dict[Tuple[str, str], list] = {}
+        self.next_id: int = 1
+        self.realized_pnl: float = 0.0
+        self.fees_paid: float = 0.0
+        self.funding_received: float = 0.0
+        self.closed_count: int = 0
+        self.outcomes: Deque[float] = deque(maxlen=OUTCOME_HISTORY)
+        self._file = None
+        self._replaying = False
+
+    # ------------------------------------------------------------------ persistence
+
+    def _write(self, event: dict):
+        if self._replaying or self.path is None:
+            return
+        if self._file is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._file = open(self.path, 'a', buffering=1)
+        self._file.write(json.dumps(event, separators=(',', ':')) + '\n')
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def replay(self) -> List[HedgeRecord]:
+        """
+        Rebuild state from the ledger file; returns the hedges still open.
+        A torn last line (crash mid-write) is ignored.
+        """
+        if self.path is None or not os.path.exists(self.path):
+            return []
+        t0 = time.perf_counter()
+        self._replaying = True
+        n = 0
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        logging.warning(f"Skipping unreadable ledger line {n + 1} in {self.path}")
+                        continue
+                    self._apply(event)
+                    n += 1
+        finally:
+            self._replaying = False
+        logging.info(
+            f"Replayed {n} ledger events in {(time.perf_counter() - t0) * 1000:.1f}ms: "
+            f"{len(self.hedges)} open hedges, realized PnL {self.realized_pnl:.2f}"
+        )
+        return self.open_hedges()
+
+    def compact(self):
+        """
+        Rewrite the ledger as one `totals` event plus the events of open hedges.
+        """
+        if self.path is None:
+            return
+        self.close()
+        tmp = self.path + '.tmp'
+        with open(tmp, 'w') as f:
+            for event in self._state_events():
+                f.write(json.dumps(event, separators=(',', ':')) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+    def export_state(self) -> List[dict]:
+        """
+        The ledger's state as events (what `compact` writes), e.g. to carry a
+        memory-only ledger across restarts in a warm-restart snapshot.
+        """
+        return list(self._state_events())
+
+    def load_state(self, events: List[dict]):
+        """
+        Apply events from `export_state` as if they had been replayed.
+        """
+        self._replaying = True
+        try:
+            for event in events:
+                self._apply(event)
+        finally:
+            self._replaying = False
+
+    @property
+    def closed_pnl(self) -> float:
+        """
+        Realized PnL of closed hedges only.
+        """
+        return self.realized_pnl - sum(h.pnl for h in self.hedges.values())
+
+    def _state_events(self):
+        # Totals of closed hedges only; open hedges add theirs back when their events replay
+        open_hedges = self.hedges.values()
+        yield {
+            'ev': 'totals', 'next_id': self.next_id,
+            'pnl': self.realized_pnl - sum(h.pnl for h in open_hedges),
+            'fees': self.fees_paid - sum(h.fees for h in open_hedges),
+            'funding': self.funding_received - sum(h.funding for h in open_hedges),
+            'closed': self.closed_count, 'outcomes': list(self.outcomes),
+        }
+        for h in self.hedges.values():
+            yield {'ev': 'open', 'h': h.hedge_id, 's': h.symbol, 'd': h.direction, 'ts': h.opened_ns}
+            for leg_name in ('spot', 'perp'):
+                leg = getattr(h, leg_name)
+                if leg.qty or leg.realized:
+                    # Net position as one synthetic order; realized PnL carried separately
+                    yield {
+                        'ev': 'fill', 'h': h.hedge_id, 'leg': leg_name, 'o': f"compacted-{h.hedge_id}",
+                        'cq': abs(leg.qty), 'cv': abs(leg.qty) * leg.avg_price,
+                        'side': 'BUY' if leg.qty > 0 else 'SELL', 'rp': leg.realized, 'ts': h.opened_ns,
+                    }
+            if h.fees:
+                yield {'ev': 'fee', 'h': h.hedge_id, 'k': f"compacted-{h.hedge_id}", 'amt': h.fees, 'ts': h.opened_ns}
+            if h.funding:
+                yield {'ev': 'funding', 'h': h.hedge_id, 'amt': h.funding, 'ts': h.opened_ns}
+
+    # ------------------------------------------------------------------ events
+
+    def _apply(self, event: dict):
+        kind = event['ev']
+        if kind == 'fill':
+            self._fill(event)
+        elif kind == 'fee':
+            self._fee(event['h'], event['k'], event['amt'])
+        elif kind == 'funding':
+            self._funding(event['h'], event['amt'])
+        elif kind == 'open':
+            self._open(event['h'], event['s'], event['d'], event.get('ts', 0))
+        elif kind in ('close', 'void'):
+            h = self.hedges.get(event['h'])
+            if h is not None:
+                self._finish(h, closed=kind == 'close')
+        elif kind == 'totals':
+            self.next_id = max(self.next_id, event['next_id'])
+            self.realized_pnl = event['pnl']
+            self.fees_paid = event['fees']
+            self.funding_received = event['funding']
+            self.closed_count = event['closed']
+            self.outcomes.extend(event.get('outcomes', ()))
+
+    def _open(self, hedge_id: int, symbol: str, direction: int, ts: int) -> HedgeRecord:
+        h = HedgeRecord(hedge_id, symbol, direction, ts)
+        self.hedges[hedge_id] = h
+        self.by_symbol.setdefault(symbol, []).append(hedge_id)
+        self.next_id = max(self.next_id, hedge_id + 1)
+        return h
+
+    def _fill(self, event: dict) -> float:
+        h = self.hedges.get(event['h'])
+        if h is None:
+            return 0.0
+        leg = h.spot if event['leg'] == 'spot' else h.perp
+        carried = event.get('rp', 0.0)  # realized PnL folded into a compacted fill
+        if carried:
+            leg.realized += carried
+            self.realized_pnl += carried
+            h.filled = True
+
+        key = (event['leg'], event['o'])
+        order = self.orders.get(key)
+        if order is None:
+            order = self.orders[key] = [h.hedge_id, 0.0, 0.0]
+        qty = event['cq'] - order[1]
+        if qty <= FLAT_QTY:
+            return 0.0  # already accounted for (stale or duplicate update)
+        price = (event['cv'] - order[2]) / qty
+        order[1], order[2] = event['cq'], event['cv']
+
+        realized = leg.apply(qty if event['side'] == 'BUY' else -qty, price)
+        self.realized_pnl += realized
+        h.filled = True
+        return qty
+
+    def _fee(self, hedge_id: int, key: str, amount: float):
+        h = self.hedges.get(hedge_id)
+        if h is None or key in h.fee_keys:
+            return
+        h.fee_keys.add(key)
+        h.fees += amount
+        self.fees_paid += amount
+        self.realized_pnl -= amount
+
+    def _funding(self, hedge_id: int, amount: float):
+        h = self.hedges.get(hedge_id)
+        if h is None:
+            return
+        h.funding += amount
+        self.funding_received += amount
+        self.realized_pnl += amount
+
+    def _finish(self, h: HedgeRecord, closed: bool):
+        h.closed = closed
+        del self.hedges[h.hedge_id]
+        ids = self.by_symbol[h.symbol]
+        ids.remove(h.hedge_id)
+        if not ids:
+            del self.by_symbol[h.symbol]
+        for key in [k for k, order in self.orders.items() if order[0] == h.hedge_id]:
+            del self.orders[key]
+        if closed:
+            self.closed_count += 1
+            self.outcomes.append(h.pnl)
+
+    def _maybe_close(self, h: HedgeRecord):
+        if h.busy or h.working or not h.filled or not h.flat or h.hedge_id not in self.hedges:
+            return
+        self._write({'ev': 'close', 'h': h.hedge_id, 'pnl': h.pnl, 'ts': time.time_ns()})
+        self._finish(h, closed=True)
+        if self.on_close is not None:
+            self.on_close(h)
+
+    # ------------------------------------------------------------------ API
+
+    def open_hedge(self, symbol: str, direction: int, ts_ns: int = 0) -> HedgeRecord:
+        hedge_id = self.next_id
+        ts_ns = ts_ns or time.time_ns()
+        self._write({'ev': 'open', 'h': hedge_id, 's': symbol, 'd': direction, 'ts': ts_ns})
+        return self._open(hedge_id, symbol, direction, ts_ns)
+
+    def hold(self, h: HedgeRecord):
+        """
+        Mark an order batch in flight: the hedge cannot close until `release`.
+        """
+        h.busy += 1
+
+    def release(self, h: HedgeRecord):
+        h.busy -= 1
+        self._settle(h)
+
+    def _settle(self, h: HedgeRecord):
+        if h.hedge_id not in self.hedges:
+            return
+        if not h.filled and not h.busy and not h.working:
+            # Nothing ever filled: drop the hedge
+            self._write({'ev': 'void', 'h': h.hedge_id, 'ts': time.time_ns()})
+            self._finish(h, closed=False)
+            return
+        self._maybe_close(h)
+
+    def order_working(self, h: HedgeRecord, order_id: str):
+        """
+        An order of `h` was acked but is not final yet; `h` stays open until `order_done`.
+        """
+        h.working.add(order_id)
+
+    def order_done(self, hedge_id: int, order_id: str):
+        h = self.hedges.get(hedge_id)
+        if h is None or order_id not in h.working:
+            return
+        h.working.discard(order_id)
+        self._settle(h)
+
+    def on_order_update(self, hedge_id: int, leg: str, order_id: str, side: str,
+                        cum_qty: float, cum_quote: float, ts_ns: int = 0) -> float:
+        """
+        Feed the cumulative filled quantity and quote amount of one order (from a
+        REST ack or a user-stream update). Returns the newly filled quantity.
+        """
+        h = self.hedges.get(hedge_id)
+        if h is None:
+            return 0.0
+        order = self.orders.get((leg, order_id))
+        if order is not None and cum_qty - order[1] <= FLAT_QTY:
+            return 0.0
+        event = {
+            'ev': 'fill', 'h': hedge_id, 'leg': leg, 'o': order_id, 'side': side,
+            'cq': cum_qty, 'cv': cum_quote, 'ts': ts_ns or time.time_ns(),
+        }
+        self._write(event)
+        qty = self._fill(event)
+        self._maybe_close(h)
+        return qty
+
+    def on_fee(self, hedge_id: int, key: str, amount_usd: float, ts_ns: int = 0):
+        """
+        Commission in USD, once per `key` (e.g. trade id).
+        """
+        h = self.hedges.get(hedge_id)
+        if h is None or key in h.fee_keys:
+            return
+        self._write({'ev': 'fee', 'h': hedge_id, 'k': key, 'amt': amount_usd, 'ts': ts_ns or time.time_ns()})
+        self._fee(hedge_id, key, amount_usd)
+
+    def on_funding_fee(self, amount_usd: float, symbols: Optional[List[str]] = None, ts_ns: int = 0):
+        """
+        Spread one funding balance change over the open hedges of `symbols` (all
+        open hedges if None, as in cross margin where Binance does not say which
+        position it is for), weighted by perp notional.
+        """
+        hedges = [
+            h for h in self.hedges.values()
+            if abs(h.perp.qty) > FLAT_QTY and (symbols is None or h.symbol in symbols)
+        ]
+        total = sum(abs(h.perp.qty) * h.perp.avg_price for h in hedges)
+        if not total:
+            return
+        ts_ns = ts_ns or time.time_ns()
+        for h in hedges:
+            amount = amount_usd * abs(h.perp.qty) * h.perp.avg_price / total
+            self._write({'ev': 'funding', 'h': h.hedge_id, 'amt': amount, 'ts': ts_ns})
+            self._funding(h.hedge_id, amount)
+
+    def active(self, symbol: str) -> Optional[HedgeRecord]:
+        """
+        Most recently opened hedge on `symbol` that is still open.
+        """
+        ids = self.by_symbol.get(symbol)
+        return self.hedges[ids[-1]] if ids else None
+
+    def open_hedges(self) -> List[HedgeRecord]:
+        return list(self.hedges.values())
@@ -3,111 +3,550 @@
 import asyncio
 import json
 import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Deque, Dict, List, Optional, Tuple
 import ccxt.async_support as ccxt
 import websockets
 
+from config import USER_DATA_WS_BASE
 from arb.risk_manager import RiskManager
 from data.websocket_client import PriceTick
+from exec.fill_ledger import FillLedger, HedgeRecord, client_order_id, hedge_id_of
+from exec.order_gateway import MarketFilters, OrderGateway
+from exec.rate_limiter import ACCOUNT, PassthroughScheduler
+from metrics.latency import histogram
+from venues.base import VenueOrders
+from venues.binance import BinanceOrders
+
+
+# Quantity mismatch between legs below which a hedge counts as balanced
+LEG_QTY_TOLERANCE = 1e-9
+# Collateral locked per hedge, as a fraction of its spot notional (perp margin estimate)
+PERP_MARGIN_FRACTION = 0.01
+# Binance expires a listenKey after 60 minutes without a keepalive
+LISTEN_KEY_KEEPALIVE_S = 30 * 60
+# User-data stream reconnect backoff: 1s, doubling up to this
+USER_STREAM_MAX_BACKOFF_S = 30.0
+
+_TICK_TO_SEND = histogram('tick_to_send')
+_ORDER_ACK = histogram('order_ack')
+_EVENT_TO_ACK = histogram('event_to_ack')
+
+
+@dataclass
+class LegResult:
+    """
+    Outcome and timing of one hedge leg. Times are epoch nanoseconds:
+    send = request handed to the client, ack = REST response received,
+    fill = order reported fully filled (the ack for immediately filled market orders,
+    otherwise the user-data stream update).
+    """
+    market_type: str
+    side: str
+    requested_qty: float
+    filled_qty: float = 0.0
+    order_id: Optional[str] = None
+    order: Optional[dict] = None
+    error: Optional[str] = None
+    send_ns: int = 0
+    ack_ns: int = 0
+    fill_ns: int = 0
+
+
+@dataclass
+class HedgeReport:
+    symbol: str
+    spot: LegResult
+    perp: LegResult
+    outcome: str = 'hedged'   # 'hedged', 'topped_up', 'unwound' or 'failed'
+    hedged_qty: float = 0.0
+    repairs: List[LegResult] = field(default_factory=list)
+
+    @property
+    def send_skew_ns(self) -> int:
+        return abs(self.spot.send_ns - self.perp.send_ns)
+
+    @property
+    def ack_skew_ns(self) -> int:
+        return abs(self.spot.ack_ns - self.perp.ack_ns)
+
+    @property
+    def completion_ns(self) -> int:
+        legs = [self.spot, self.perp] + self.repairs
+        return max(l.ack_ns for l in legs) - min(l.send_ns for l in legs if l.send_ns)
 
 
 class OrderExecutor:
-    def __init__(self, exchange: ccxt.binance):
+    def __init__(self, exchange: ccxt.binance, concurrent_legs: bool = True, scheduler=None,
+                 ledger: Optional[FillLedger] = None, gateway: Optional[OrderGateway] = None,
+                 filters: Optional[MarketFilters] = None, orders: Optional[VenueOrders] = None):
         self.exchange = exchange
+        # Every REST call goes through the rate-limit scheduler at order priority
+        self.scheduler = scheduler or PassthroughScheduler()
+        # Orders go through the low-latency gateway when given, otherwise through ccxt
+        self.gateway = gateway
+        # Lot-size / notional filters: quantities are rounded before they are sent
+        if filters is None:
+            filters = gateway.filters if gateway is not None else MarketFilters(getattr(exchange, 'markets', None))
+        self.filters = filters
+        # Venue order adapter the legs are sent through
+        self.orders = orders or BinanceOrders(exchange, self.scheduler, filters, gateway)
         self.user_ws_url: str = None
+        # Send both legs at once (default) or spot first, then perp
+        self.concurrent_legs = concurrent_legs
+        self.hedge_reports: Deque[HedgeReport] = deque(maxlen=1000)
+        self._legs_by_order_id: Dict[str, LegResult] = {}
+        # Perp orders the user stream reported final, in case that beats the REST ack
+        self._final_order_ids: Deque[str] = deque(maxlen=1000)
+        # Every fill, fee and funding payment, paired per hedge; closes report realized PnL
+        self.ledger = ledger or FillLedger()
+        self.ledger.on_close = self._on_hedge_closed
 
-    async def place_hedge(self, tick: PriceTick, size_asset: float):
+    async def place_hedge(self, tick: PriceTick, size_asset: float) -> HedgeReport:
         """
         Given a PriceTick and an asset size, place two market orders:
           1. Spot side
           2. Perp side
-        We assume: 
+        We assume:
           - If perp > spot → Long spot, Short perp
           - Else → Short spot, Long perp
-        After placing both legs, lock collateral in RiskManager.
+        Both legs are sent concurrently; if one fails or partly fills, the lagging
+        leg is topped up or, failing that, the excess on the leading leg is unwound.
+        After placing both legs, lock collateral in RiskManager for the hedged size.
+        `size_asset` is rounded down to both venues' lot steps first; a size below
+        either venue's minimum is not sent.
         """
-        symbol = tick.symbol
-        perp_symbol = f"{symbol}"
+        if tick.perp_price > tick.spot_price:
+            spot_side, perp_side = 'BUY', 'SELL'    # Long spot, Short perp
+        else:
+            spot_side, perp_side = 'SELL', 'BUY'    # Short spot, Long perp
+        direction = 1 if spot_side == 'BUY' else -1
 
+        qty = self.filters.hedge_qty(tick.symbol, size_asset, tick.spot_price)
+        if qty <= 0:
+            error = 'below exchange minimum'
+            logging.info(f"Hedge on {tick.symbol} not sent: size {size_asset} is {error}.")
+            return HedgeReport(
+                tick.symbol,
+                LegResult(market_type='spot', side=spot_side, requested_qty=size_asset, error=error),
+                LegResult(market_type='perp', side=perp_side, requested_qty=size_asset, error=error),
+                outcome='failed',
+            )
+        size_asset = qty
+
+        hedge = self.ledger.open_hedge(tick.symbol, direction)
+        self.ledger.hold(hedge)
         try:
-            if tick.perp_price > tick.spot_price:
-                # 1) Long spot
-                spot_order = await self._place_market_order(symbol, 'BUY', size_asset, market_type='spot')
-                # 2) Short perp
-                perp_order = await self._place_market_order(perp_symbol, 'SELL', size_asset, market_type='perp')
+            report = await self._execute_legs(tick.symbol, spot_side, perp_side, size_asset, hedge=hedge)
+            self._record_entry(tick, report, hedge, direction)
+        finally:
+            self.ledger.release(hedge)
+        return report
 
-            else:
-                # 1) Short spot (convert to USDT‐margin syntax via createOrder)
-                spot_order = await self._place_market_order(symbol, 'SELL', size_asset, market_type='spot')
-                # 2) Long perp
-                perp_order = await self._place_market_order(perp_symbol, 'BUY', size_asset, market_type='perp')
+    def _record_entry(self, tick: PriceTick, report: HedgeReport, hedge: HedgeRecord, direction: int):
 
+        sent = [l.send_ns for l in (report.spot, report.perp) if l.send_ns]
+        if sent and tick.recv_time_ns:
+            _TICK_TO_SEND.record(min(sent) - tick.recv_time_ns)
+        if sent and tick.event_time_ns:
+            _EVENT_TO_ACK.record(max(report.spot.ack_ns, report.perp.ack_ns) - tick.event_time_ns)
+
+        if report.hedged_qty > 0:
             # Estimate locked collateral (simple: assume 1% margin for perp)
-            locked_usd = size_asset * tick.spot_price * 0.01
-            self.exchange.risk_manager.lock_collateral(symbol, locked_usd)
+            locked_usd = report.hedged_qty * tick.spot_price * PERP_MARGIN_FRACTION
+            hedge.lot_id = self.exchange.risk_manager.lock_collateral(
+                tick.symbol, locked_usd, report.hedged_qty, direction, report.spot.send_ns
+            )
 
-            logging.info(f"Hedge placed: spot={spot_order}, perp={perp_order}")
+    async def close_hedge(self, tick: PriceTick, direction: int, qty: float) -> HedgeReport:
+        """
+        Flatten a hedge opened by place_hedge: `direction` +1 was long spot / short perp.
+        The perp leg is reduce-only. `hedged_qty` of the report is the size closed.
+        """
+        if direction > 0:
+            spot_side, perp_side = 'SELL', 'BUY'
+        else:
+            spot_side, perp_side = 'BUY', 'SELL'
+        hedge = self.ledger.active(tick.symbol)
+        if hedge is None:
+            return await self._execute_legs(tick.symbol, spot_side, perp_side, qty, closing=True)
+        self.ledger.hold(hedge)
+        try:
+            return await self._execute_legs(tick.symbol, spot_side, perp_side, qty, closing=True, hedge=hedge)
+        finally:
+            # Closes the hedge in the ledger (and reports its PnL) once both legs are flat
+            self.ledger.release(hedge)
 
+    async def _execute_legs(
+        self,
+        symbol: str,
+        spot_side: str,
+        perp_side: str,
+        qty: float,
+        closing: bool = False,
+        hedge: Optional[HedgeRecord] = None,
+    ) -> HedgeReport:
+        perp_symbol = f"{symbol}"
+        if self.concurrent_legs:
+            spot_leg, perp_leg = await asyncio.gather(
+                self._send_leg(symbol, spot_side, qty, 'spot', hedge=hedge),
+                self._send_leg(perp_symbol, perp_side, qty, 'perp', reduce_only=closing, hedge=hedge),
+            )
+            report = HedgeReport(symbol, spot_leg, perp_leg)
+            await self._reconcile_legs(report, closing, hedge)
+        else:
+            spot_leg = await self._send_leg(symbol, spot_side, qty, 'spot', hedge=hedge)
+            if spot_leg.error:
+                perp_leg = LegResult(market_type='perp', side=perp_side, requested_qty=qty, error='not sent')
+                report = HedgeReport(symbol, spot_leg, perp_leg, outcome='failed')
+            else:
+                perp_leg = await self._send_leg(perp_symbol, perp_side, qty, 'perp', reduce_only=closing, hedge=hedge)
+                report = HedgeReport(symbol, spot_leg, perp_leg)
+                await self._reconcile_legs(report, closing, hedge)
+        self.hedge_reports.append(report)
+        if hedge is not None and report.hedged_qty > 0:
+            # Orders on a hedge that already holds a lot: the reconciled (leg-balanced) size changed it
+            self._resize_lot(hedge, -report.hedged_qty if closing else report.hedged_qty)
+
+        action = 'Hedge closed' if closing else 'Hedge placed'
+        if report.outcome == 'hedged':
+            logging.info(
+                f"{action}: {symbol} qty={report.hedged_qty} "
+                f"ack_skew={report.ack_skew_ns / 1e6:.2f}ms completion={report.completion_ns / 1e6:.2f}ms"
+            )
+        else:
+            logging.warning(
+                f"{action} with outcome {report.outcome}: {symbol} hedged_qty={report.hedged_qty} "
+                f"spot={spot_leg.filled_qty}/{spot_leg.requested_qty} ({spot_leg.error}) "
+                f"perp={perp_leg.filled_qty}/{perp_leg.requested_qty} ({perp_leg.error})"
+            )
+        return report
+
+    def _resize_lot(self, hedge: HedgeRecord, qty_delta: float):
+        """
+        Move the hedge's RiskManager lot by `qty_delta`, with collateral at the
+        lot's own rate per unit (PERP_MARGIN_FRACTION of the entry notional), so
+        locked collateral and exposure follow partial closes. No-op until the
+        entry has opened the lot.
+        """
+        risk = getattr(self.exchange, 'risk_manager', None)
+        lot = risk.positions.lots.get(hedge.lot_id) if risk is not None and hedge.lot_id is not None else None
+        if lot is None or lot.qty <= 0:
+            return
+        qty_delta = max(qty_delta, -lot.qty)
+        risk.record_fill(hedge.lot_id, qty_delta, lot.collateral / lot.qty * qty_delta)
+
+    async def _reconcile_legs(self, report: HedgeReport, closing: bool = False, hedge: Optional[HedgeRecord] = None):
+        """
+        Bring both legs to the same filled quantity: top up the lagging leg by the
+        difference, and if that does not fill, unwind the excess on the leading leg.
+        Perp repairs that shrink the position are sent reduce-only.
+        """
+        spot, perp = report.spot, report.perp
+        diff = spot.filled_qty - perp.filled_qty
+        if abs(diff) <= LEG_QTY_TOLERANCE:
+            report.hedged_qty = spot.filled_qty
+            report.outcome = 'hedged' if spot.filled_qty > 0 else 'failed'
+            return
+
+        lead, lag = (spot, perp) if diff > 0 else (perp, spot)
+        excess = abs(diff)
+        symbol = report.symbol
+
+        top_up = await self._send_leg(symbol, lag.side, excess, lag.market_type, reduce_only=closing, hedge=hedge)
+        report.repairs.append(top_up)
+        excess -= top_up.filled_qty
+        if excess <= LEG_QTY_TOLERANCE:
+            report.hedged_qty = lead.filled_qty
+            report.outcome = 'topped_up'
+            return
+
+        unwind_side = 'SELL' if lead.side == 'BUY' else 'BUY'
+        unwind = await self._send_leg(
+            symbol, unwind_side, excess, lead.market_type, reduce_only=not closing, hedge=hedge
+        )
+        report.repairs.append(unwind)
+        report.hedged_qty = lead.filled_qty - unwind.filled_qty
+        report.outcome = 'unwound'
+        if excess - unwind.filled_qty > LEG_QTY_TOLERANCE:
+            logging.error(
+                f"Leg risk on {symbol}: {excess - unwind.filled_qty} {lead.market_type} left unhedged "
+                f"after top-up and unwind ({top_up.error}; {unwind.error})"
+            )
+
+    async def _send_leg(
+        self,
+        symbol: str,
+        side: str,
+        quantity: float,
+        market_type: str,
+        reduce_only: bool = False,
+        hedge: Optional[HedgeRecord] = None,
+    ) -> LegResult:
+        """
+        Place one market order and capture its fill and timing; never raises.
+        The quantity is rounded down to the venue's lot step; below its minimum
+        nothing is sent. With a ledger hedge, the order carries the hedge id in its
+        client order id and the fill in the ack is recorded in the ledger.
+        """
+        leg = LegResult(market_type=market_type, side=side, requested_qty=quantity)
+        quantity = self.filters.qty(symbol, quantity, market_type)
+        if quantity <= 0:
+            leg.error = 'below exchange minimum'
+            return leg
+        client_id = None
+        if hedge is not None:
+            client_id = client_order_id(hedge.hedge_id, market_type, hedge.orders_sent)
+            hedge.orders_sent += 1
+        leg.send_ns = time.time_ns()
+        try:
+            order = await self._place_market_order(symbol, side, quantity, market_type, reduce_only, client_id)
         except Exception as e:
-            logging.error(f"Error placing hedge for {symbol}: {e}")
+            leg.ack_ns = time.time_ns()
+            leg.error = str(e)
+            return leg
+        leg.ack_ns = time.time_ns()
+        _ORDER_ACK.record(leg.ack_ns - leg.send_ns)
+        leg.order = order
+
+        leg.order_id, leg.filled_qty, done, cum_quote, fees = self._parse_ack(order)
+        if done:
+            leg.fill_ns = leg.ack_ns
+        elif market_type == 'perp':
+            # Fill time arrives on the futures user-data stream
+            self._legs_by_order_id[leg.order_id] = leg
+        if hedge is not None:
+            self._record_ack(hedge, symbol, leg, order, cum_quote, fees)
+        return leg
+
+    @staticmethod
+    def _parse_ack(order: dict) -> Tuple[str, float, bool, float, List[Tuple[float, Optional[str]]]]:
+        """
+        (order id, executed qty, fully filled, cumulative quote, [(commission, asset)])
+        from a ccxt spot order or a raw Binance order response (futures, and
+        spot orders sent through the gateway).
+        """
+        if 'orderId' in order:
+            filled = float(order.get('executedQty') or 0.0)
+            cum_quote = float(order.get('cummulativeQuoteQty') or order.get('cumQuote') or 0.0) \
+                or filled * float(order.get('avgPrice') or 0.0)
+            fees = [(float(f.get('commission') or 0.0), f.get('commissionAsset')) for f in order.get('fills') or ()]
+            return str(order['orderId']), filled, order.get('status') == 'FILLED', cum_quote, fees
+        filled = float(order.get('filled') or 0.0)
+        cum_quote = float(order.get('cost') or 0.0) or filled * float(order.get('average') or 0.0)
+        fees = order.get('fees') or ([order['fee']] if order.get('fee') else [])
+        fees = [(float(f.get('cost') or 0.0), f.get('currency')) for f in fees if f]
+        return str(order.get('id')), filled, order.get('status') == 'closed', cum_quote, fees
+
+    def _record_ack(self, hedge: HedgeRecord, symbol: str, leg: LegResult, order: dict, cum_quote: float,
+                    fees: List[Tuple[float, Optional[str]]]):
+        """
+        Ledger the fill reported in an order ack. Perp commissions arrive on the
+        user-data stream; spot commissions are in the ack.
+        """
+        hedge_id = hedge.hedge_id
+        if leg.market_type == 'perp':
+            if leg.fill_ns == 0 and order.get('status') in ('NEW', 'PARTIALLY_FILLED') \
+                    and leg.order_id not in self._final_order_ids:
+                # Still filling: the hedge cannot close before the stream says the order is final
+                self.ledger.order_working(hedge, leg.order_id)
+            self.ledger.on_order_update(hedge_id, 'perp', leg.order_id, leg.side, leg.filled_qty, cum_quote, leg.ack_ns)
+            return
+        if leg.filled_qty <= 0:
+            return
+        price = cum_quote / leg.filled_qty
+        self.ledger.on_order_update(hedge_id, 'spot', leg.order_id, leg.side, leg.filled_qty, cum_quote, leg.ack_ns)
+        fee_usd = sum(self._fee_usd(symbol, cost, asset, price, cum_quote) for cost, asset in fees)
+        if fee_usd:
+            self.ledger.on_fee(hedge_id, f"spot:{leg.order_id}", fee_usd, leg.ack_ns)
+
+    def _fee_usd(self, symbol: str, cost: float, asset: Optional[str], price: float, notional: float) -> float:
+        """
+        Commission in quote currency: as is if charged in the quote asset, at the
+        fill price if charged in the base asset, otherwise (e.g. BNB) estimated
+        from the taker fee rate.
+        """
+        if not cost:
+            return 0.0
+        asset = (asset or '').upper()
+        if asset and symbol.endswith(asset):
+            return cost
+        if asset and symbol.startswith(asset):
+            return cost * price
+        risk = getattr(self.exchange, 'risk_manager', None)
+        return notional * (risk.taker_fee if risk is not None else 0.001)
 
     async def _place_market_order(
         self,
         symbol: str,
         side: str,
         quantity: float,
-        market_type: str = 'spot'
+        market_type: str = 'spot',
+        reduce_only: bool = False,
+        client_id: Optional[str] = None,
     ) -> dict:
         """
-        market_type: 'spot' or 'perp'.
-        For 'spot', use standard create_order.
-        For 'perp', use the futures REST endpoint via ccxt.
+        market_type: 'spot' or 'perp'. Sent through the venue order adapter
+        (venues.binance.BinanceOrders unless another one was given).
         """
-        if market_type == 'spot':
-            order = await self.exchange.create_order(symbol, 'MARKET', side, quantity)
+        return await self.orders.place_market_order(symbol, side, quantity, market_type, reduce_only, client_id)
 
-        else:  # 'perp'
-            # Binance USDT‐margined perpetual uses fapiPrivate_post_order
-            order = await self.exchange.fapiPrivate_post_order({
-                'symbol': symbol,
-                'side': side,
-                'type': 'MARKET',
-                'quantity': quantity,
-            })
-
-        return order
+    def set_filters(self, filters: MarketFilters):
+        """
+        Swap in new lot filters (e.g. after a markets reload) everywhere they are used.
+        """
+        self.filters = filters
+        for holder in (self.orders, self.gateway):
+            if holder is not None and hasattr(holder, 'filters'):
+                holder.filters = filters
 
     async def listen_order_updates(self, risk_manager: RiskManager):
         """
-        Listen to Binance User Data Stream for order/trade updates.
-        Whenever an ORDER_TRADE_UPDATE event arrives, parse it and call
-        `risk_manager.record_trade_outcome(...)` with realized PnL.
+        Listen to the futures User Data Stream and feed order fills, commissions
+        and funding payments into the fill ledger; the ledger reports each hedge's
+        realized PnL to RiskManager once both legs are flat.
+        Reconnects in a loop with backoff (new listenKey each time) and keeps the
+        listenKey alive while connected.
         """
-        try:
-            # 1) Get listenKey for futures user data
-            resp = await self.exchange.fapiPrivate_post_listenKey()
-            listen_key = resp.get('listenKey')
-            self.user_ws_url = f"wss://fstream.binance.com/ws/{listen_key}"
-
-            async with websockets.connect(self.user_ws_url) as ws:
-                while True:
-                    msg = await ws.recv()
-                    data = json.loads(msg)
-
-                    if data.get('e') == 'ORDER_TRADE_UPDATE':
-                        o = data['o']
-                        symbol = o['s']  # e.g. "BTCUSDT"
-                        executed_qty = float(o.get('z', 0.0))
-                        avg_price = float(o.get('L', 0.0))
-                        # PnL calculation for a basis arbitrage is not trivial here.
-                        # For demonstration, assume we only care about whether the trade filled
-                        # and we compute a pseudo‐PnL: executed_qty * (avg_price - last_spot).
-                        # In practice, you'd need to reconcile both legs' fills.
-                        # We'll fetch last_spot from data layer (omitted) or pass it in.
-                        # Here, just record a 0 PnL placeholder and release collateral.
-                        pnl = 0.0
-                        risk_manager.record_trade_outcome(symbol, pnl)
+        if getattr(self.exchange, 'risk_manager', None) is None:
+            self.exchange.risk_manager = risk_manager
+        backoff = 1.0
+        while True:
+            keepalive = None
+            try:
+                # 1) Get listenKey for futures user data
+                resp = await self.scheduler.call(
+                    self.exchange.fapiPrivatePostListenKey, venue='perp', weight=1, priority=ACCOUNT
+                )
+                listen_key = resp.get('listenKey')
+                self.user_ws_url = f"{USER_DATA_WS_BASE}/{listen_key}"
 
-        except Exception as e:
-            logging.error(f"Order WS disconnected: {e}. Reconnecting in 1s...")
-            await asyncio.sleep(1)
-            await self.listen_order_updates(risk_manager)
+                async with websockets.connect(self.user_ws_url) as ws:
+                    keepalive = asyncio.create_task(self._keep_listen_key_alive())
+                    backoff = 1.0
+                    while True:
+                        data = json.loads(await ws.recv())
+                        event = data.get('e')
+                        if event == 'ORDER_TRADE_UPDATE':
+                            self._on_order_update(data)
+                        elif event == 'ACCOUNT_UPDATE':
+                            self._on_account_update(data)
+                        elif event == 'listenKeyExpired':
+                            raise ConnectionError("listenKey expired")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Order WS disconnected: {e}. Reconnecting in {backoff:.0f}s...")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, USER_STREAM_MAX_BACKOFF_S)
+            finally:
+                if keepalive is not None:
+                    keepalive.cancel()
+
+    async def _keep_listen_key_alive(self):
+        while True:
+            await asyncio.sleep(LISTEN_KEY_KEEPALIVE_S)
+            try:
+                await self.scheduler.call(
+                    self.exchange.fapiPrivatePutListenKey, venue='perp', weight=1, priority=ACCOUNT
+                )
+            except Exception as e:
+                logging.warning(f"listenKey keepalive failed: {e}")
+
+    def _on_order_update(self, data: dict):
+        o = data['o']
+        if o.get('X') == 'FILLED':
+            leg = self._legs_by_order_id.pop(str(o.get('i')), None)
+            if leg is not None:
+                leg.fill_ns = int(o.get('T', 0)) * 1_000_000 or time.time_ns()
+        hedge_id = hedge_id_of(o.get('c'))
+        if hedge_id is None:
+            return  # not one of ours
+        order_id = str(o.get('i'))
+        ts_ns = int(o.get('T', 0)) * 1_000_000
+        if o.get('x') == 'TRADE':
+            cum_qty = float(o.get('z') or 0.0)
+            self.ledger.on_order_update(
+                hedge_id, 'perp', order_id, o.get('S'), cum_qty, cum_qty * float(o.get('ap') or 0.0), ts_ns
+            )
+            commission = float(o.get('n') or 0.0)
+            if commission:
+                price = float(o.get('L') or 0.0)
+                fee_usd = self._fee_usd(o['s'], commission, o.get('N'), price, float(o.get('l') or 0.0) * price)
+                self.ledger.on_fee(hedge_id, f"perp:{o.get('t')}", fee_usd, ts_ns)
+        if o.get('X') in ('FILLED', 'CANCELED', 'EXPIRED', 'REJECTED'):
+            self._final_order_ids.append(order_id)
+            self.ledger.order_done(hedge_id, order_id)
+
+    def _on_account_update(self, data: dict):
+        a = data.get('a', {})
+        if a.get('m') != 'FUNDING_FEE':
+            return
+        # Cross margin: only the balance change, no position, so it is spread over all hedges
+        amount = sum(float(b.get('bc') or 0.0) for b in a.get('B', ()) if b.get('a') in ('USDT', 'BUSD', 'USDC'))
+        symbols = [p['s'] for p in a.get('P', ())] or None
+        if amount:
+            self.ledger.on_funding_fee(amount, symbols, int(data.get('T', 0)) * 1_000_000)
+
+    def _on_hedge_closed(self, hedge: HedgeRecord):
+        """
+        Ledger callback: both legs of `hedge` are flat; report its realized PnL.
+        """
+        risk = getattr(self.exchange, 'risk_manager', None)
+        if risk is None:
+            return
+        if hedge.lot_id is not None:
+            risk.record_trade_outcome(hedge.symbol, hedge.pnl, hedge.lot_id)
+        else:
+            # Entry never became a hedge (legs unwound): a cost, not a trade outcome
+            risk.record_pnl(hedge.pnl)
+        logging.info(
+            f"Hedge {hedge.hedge_id} on {hedge.symbol} closed: pnl={hedge.pnl:.4f} "
+            f"(fees={hedge.fees:.4f}, funding={hedge.funding:.4f})"
+        )
+
+    def restore(self, risk_manager: RiskManager, since: Optional[Tuple[int, float]] = None) -> List[HedgeRecord]:
+        """
+        After `ledger.replay()`: re-lock collateral for every open hedge, apply the
+        ledger's realized PnL to equity and seed the win-rate window. Returns the
+        hedges with a balanced position, for the engine to resume.
+
+        `since` is the ledger's (closed count, closed PnL) already contained in
+        risk_manager's equity and outcomes (restored from a warm-restart snapshot);
+        only hedges closed after it are applied.
+        """
+        closed_pnl = self.ledger.closed_pnl
+        outcomes = list(self.ledger.outcomes)
+        if since is not None:
+            closed, pnl = since
+            new = self.ledger.closed_count - closed
+            if new < 0:
+                logging.warning(
+                    f"Fill ledger has fewer closed hedges ({self.ledger.closed_count}) than the snapshot "
+                    f"({closed}); keeping the snapshot's equity and outcomes."
+                )
+                new, closed_pnl = 0, pnl
+            closed_pnl -= pnl
+            outcomes = outcomes[max(0, len(outcomes) - new):] if new else []
+        risk_manager.record_pnl(closed_pnl)
+        for pnl in outcomes:
+            risk_manager.historical_outcomes.append(1 if pnl > 0 else 0)
+        resumed = []
+        for hedge in self.ledger.open_hedges():
+            if abs(hedge.spot.qty - hedge.direction * hedge.qty) > LEG_QTY_TOLERANCE or \
+                    abs(hedge.perp.qty + hedge.direction * hedge.qty) > LEG_QTY_TOLERANCE:
+                logging.error(
+                    f"Hedge {hedge.hedge_id} on {hedge.symbol} restored unbalanced: "
+                    f"spot={hedge.spot.qty} perp={hedge.perp.qty}"
+                )
+            if hedge.qty <= 0:
+                continue
+            locked_usd = hedge.qty * hedge.spot.avg_price * PERP_MARGIN_FRACTION
+            hedge.lot_id = risk_manager.lock_collateral(
+                hedge.symbol, locked_usd, hedge.qty, hedge.direction, hedge.opened_ns
+            )
+            resumed.append(hedge)
+        return resumed
@@ -0,0 +1,537 @@
+# exec/order_gateway.py
+#
+# Direct order entry for the hedge legs. ccxt's create_order / fapiPrivatePostOrder
+# rebuild every request from scratch (market lookup, parameter merging, query
+# encoding, HMAC key setup); here the per-symbol parts are prepared once and an
+# order only formats its quantity, stamps the time and finishes a signature.
+
+import asyncio
+import hashlib
+import hmac
+import itertools
+import json
+import logging
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+import websockets
+
+from exec.rate_limiter import ACCOUNT, ORDER, PassthroughScheduler
+
+# Binance rejects signed requests older than this (ms) on arrival
+RECV_WINDOW_MS = 5000
+# Keep-alive connections per venue host (both legs of a few hedges at once)
+POOL_SIZE = 8
+# Idle pooled connections are kept this long ...
+KEEPALIVE_S = 120.0
+# ... and kept warm (and the clock offset refreshed) this often
+KEEP_WARM_S = 15.0
+# An order with no response after this long is looked up by its client order id ...
+ORDER_TIMEOUT_S = 10.0
+# ... up to this many times; if it cannot be found it is reported as failed
+ORDER_LOOKUP_ATTEMPTS = 3
+# WebSocket API reconnect backoff: 1s, doubling up to this
+WS_MAX_BACKOFF_S = 30.0
+
+_PATHS = {'spot': '/api/v3/order', 'perp': '/fapi/v1/order'}
+_TIME_PATHS = {'spot': '/api/v3/time', 'perp': '/fapi/v1/time'}
+# Request weight of an order; futures orders only count against the order limits
+_ORDER_WEIGHT = {'spot': 1, 'perp': 0}
+# Request weight of an order lookup (GET on the order path)
+_QUERY_WEIGHT = {'spot': 4, 'perp': 1}
+# Error code of a lookup for an order Binance never accepted
+_UNKNOWN_ORDER = -2013
+# Spot FULL acks carry the fills and commissions; futures RESULT acks the executed qty
+_RESP_TYPE = {'spot': 'FULL', 'perp': 'RESULT'}
+# rateLimits entries of WebSocket API responses, as the equivalent REST "used" headers
+_WS_LIMIT_HEADERS = {
+    ('REQUEST_WEIGHT', 'MINUTE', 1): 'x-mbx-used-weight-1m',
+    ('ORDERS', 'SECOND', 10): 'x-mbx-order-count-10s',
+    ('ORDERS', 'MINUTE', 1): 'x-mbx-order-count-1m',
+    ('ORDERS', 'DAY', 1): 'x-mbx-order-count-1d',
+}
+
+
+class OrderRejected(Exception):
+    """
+    Binance answered an order with an error (`code` and `msg` as sent).
+    """
+
+    def __init__(self, status: int, code: int, msg: str):
+        super().__init__(f"binance {status} {code}: {msg}")
+        self.status = status
+        self.code = code
+        self.msg = msg
+
+
+class SymbolFilters:
+    """
+    Quantity filters of one symbol on one venue (or of both, for a hedge).
+    """
+
+    __slots__ = ('step', 'min_qty', 'max_qty', 'min_notional', 'decimals', 'scale')
+
+    def __init__(self, step: float, min_qty: float, max_qty: float, min_notional: float, decimals: int):
+        self.step = step
+        self.min_qty = min_qty
+        self.max_qty = max_qty
+        self.min_notional = min_notional
+        self.decimals = decimals
+        # Steps per unit: a whole number of steps divided by this is the nearest float to the decimal
+        self.scale = 1.0 / step if step >= 1 else float(round(1.0 / step))
+
+
+def _decimals(step: str) -> int:
+    exponent = Decimal(step).normalize().as_tuple().exponent
+    return max(0, -exponent)
+
+
+def _parse_filters(raw: Iterable[dict]) -> Optional[SymbolFilters]:
+    by_type = {f.get('filterType'): f for f in raw}
+    lot = by_type.get('LOT_SIZE')
+    market_lot = by_type.get('MARKET_LOT_SIZE')
+    # MARKET_LOT_SIZE governs market orders when set; spot often leaves its step at 0
+    if market_lot and float(market_lot.get('stepSize') or 0) > 0:
+        lot_step, min_qty, max_qty = market_lot['stepSize'], market_lot['minQty'], market_lot['maxQty']
+    elif lot:
+        lot_step, min_qty, max_qty = lot['stepSize'], lot['minQty'], lot['maxQty']
+    else:
+        return None
+    notional = by_type.get('NOTIONAL') or by_type.get('MIN_NOTIONAL') or {}
+    min_notional = float(notional.get('minNotional') or notional.get('notional') or 0.0)
+    if notional.get('applyMinToMarket') is False:
+        min_notional = 0.0
+    return SymbolFilters(float(lot_step), float(min_qty), float(max_qty), min_notional, _decimals(lot_step))
+
+
+class MarketFilters:
+    """
+    LOT_SIZE / MARKET_LOT_SIZE / notional filters of every spot and USDT-M
+    perpetual symbol, indexed by exchange symbol id from ccxt `load_markets`, so
+    rounding an order quantity is a dict lookup and a multiply.
+
+    `hedge_qty` rounds a hedge size onto both venues' steps at once, so both legs
+    are sent with the same quantity and neither is rejected for its filters.
+    Symbols without known filters pass through unchanged.
+    """
+
+    def __init__(self, markets: Optional[dict] = None):
+        self.spot: Dict[str, SymbolFilters] = {}
+        self.perp: Dict[str, SymbolFilters] = {}
+        self.hedge: Dict[str, SymbolFilters] = {}
+        for market in (markets or {}).values():
+            info = market.get('info') or {}
+            filters = _parse_filters(info.get('filters') or ())
+            if filters is None:
+                continue
+            if market.get('spot'):
+                self.spot[market['id']] = filters
+            elif market.get('swap') and market.get('linear') and info.get('contractType') == 'PERPETUAL':
+                self.perp[market['id']] = filters
+        for symbol, spot in self.spot.items():
+            perp = self.perp.get(symbol)
+            if perp is None:
+                continue
+            # Binance steps are powers of ten, so the coarser step is a multiple of the finer one
+            coarse = spot if spot.step >= perp.step else perp
+            self.hedge[symbol] = SymbolFilters(
+                coarse.step,
+                max(spot.min_qty, perp.min_qty),
+                min(spot.max_qty, perp.max_qty),
+                max(spot.min_notional, perp.min_notional),
+                coarse.decimals,
+            )
+
+    @staticmethod
+    def _floor(f: SymbolFilters, qty: float) -> float:
+        if qty > f.max_qty:
+            qty = f.max_qty
+        # The epsilon keeps e.g. 0.3 * 10 = 2.9999999999999996 from losing a step
+        return int(qty * f.scale + 1e-9) / f.scale
+
+    def qty(self, symbol: str, qty: float, market_type: str) -> float:
+        """
+        `qty` rounded down to the venue's step; 0.0 if that is below its minimum.
+        """
+        f = (self.spot if market_type == 'spot' else self.perp).get(symbol)
+        if f is None:
+            return qty
+        qty = self._floor(f, qty)
+        return qty if qty >= f.min_qty and qty > 0 else 0.0
+
+    def hedge_qty(self, symbol: str, qty: float, price: float) -> float:
+        """
+        Hedge size both legs can trade: rounded down to the coarser step, and 0.0
+        if below either venue's minimum quantity or notional at `price`.
+        """
+        f = self.hedge.get(symbol)
+        if f is None:
+            return qty
+        qty = self._floor(f, qty)
+        if qty <= 0 or qty < f.min_qty or qty * price < f.min_notional:
+            return 0.0
+        return qty
+
+    def format_qty(self, symbol: str, qty: float, market_type: str) -> str:
+        """
+        Quantity as Binance expects it: fixed-point with the step's decimals.
+        """
+        f = (self.spot if market_type == 'spot' else self.perp).get(symbol)
+        return f"{qty:.{f.decimals if f is not None else 8}f}"
+
+
+class _Template:
+    """
+    Static part of one (venue, symbol, side, reduce-only) order: its query
+    prefix and an HMAC already keyed and fed with that prefix.
+    """
+
+    __slots__ = ('prefix', 'mac')
+
+    def __init__(self, prefix: str, mac):
+        self.prefix = prefix
+        self.mac = mac
+
+
+class _WsOrderChannel:
+    """
+    One Binance WebSocket API connection (order.place requests); responses are
+    matched to requests by id. Reconnects with backoff; while down, `ready` is
+    False and the gateway sends orders over REST.
+    """
+
+    def __init__(self, url: str, venue: str):
+        self.url = url
+        self.venue = venue
+        self.ws = None
+        self.pending: Dict[str, asyncio.Future] = {}
+
+    @property
+    def ready(self) -> bool:
+        return self.ws is not None
+
+    async def run(self):
+        backoff = 1.0
+        while True:
+            try:
+                async with websockets.connect(self.url) as ws:
+                    self.ws = ws
+                    backoff = 1.0
+                    logging.info(f"Order WebSocket API connected ({self.venue}).")
+                    async for raw in ws:
+                        msg = json.loads(raw)
+                        fut = self.pending.pop(str(msg.get('id')), None)
+                        if fut is not None and not fut.done():
+                            fut.set_result(msg)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Order WebSocket API ({self.venue}) disconnected: {e}. Reconnecting in {backoff:.0f}s...")
+            finally:
+                self.ws = None
+                for fut in self.pending.values():
+                    if not fut.done():
+                        fut.set_exception(ConnectionError(f"order WebSocket ({self.venue}) closed"))
+                self.pending.clear()
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, WS_MAX_BACKOFF_S)
+
+    async def request(self, request_id: str, payload: str) -> dict:
+        fut = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = fut
+        try:
+            await self.ws.send(payload)
+            return await asyncio.wait_for(fut, ORDER_TIMEOUT_S)
+        finally:
+            self.pending.pop(request_id, None)
+
+
+class OrderGateway:
+    """
+    Market orders for the hedge legs over pooled keep-alive connections.
+
+    - One aiohttp session per gateway; connections to both venue hosts are kept
+      open and warm (a time request every KEEP_WARM_S also keeps the clock
+      offset to the exchange current), so an order never pays for TCP/TLS setup.
+    - Quantities are rounded and formatted from MarketFilters.
+    - Per (venue, symbol, side, reduce-only) the static query and a keyed HMAC
+      fed with it are built once (`prepare`); an order copies that state, adds
+      quantity, client id and timestamp, and finishes the digest.
+    - With WebSocket API URLs, orders go out as `order.place` requests on a
+      persistent connection, falling back to REST while it is down.
+    - An order that times out may still have filled: once its recvWindow has
+      passed it is looked up by client order id, and the order found is
+      returned as if it were the ack.
+
+    Every order still goes through the scheduler's order buckets, and the used
+    counts in each response re-sync them. Responses are Binance's raw order JSON.
+    """
+
+    def __init__(
+        self,
+        api_key: Optional[str],
+        api_secret: Optional[str],
+        spot_url: str,
+        perp_url: str,
+        filters: Optional[MarketFilters] = None,
+        scheduler=None,
+        spot_ws_url: Optional[str] = None,
+        perp_ws_url: Optional[str] = None,
+        recv_window_ms: int = RECV_WINDOW_MS,
+    ):
+        self.api_key = api_key or ''
+        self.filters = filters or MarketFilters()
+        self.scheduler = scheduler or PassthroughScheduler()
+        self.urls = {'spot': spot_url.rstrip('/'), 'perp': perp_url.rstrip('/')}
+        self.recv_window_ms = recv_window_ms
+        self._key = hmac.new((api_secret or '').encode(), digestmod=hashlib.sha256)
+        self._templates: Dict[Tuple[str, str, str, bool], _Template] = {}
+        self._headers = {'X-MBX-APIKEY': self.api_key, 'Content-Type': 'application/x-www-form-urlencoded'}
+        self._order_urls = {venue: url + _PATHS[venue] for venue, url in self.urls.items()}
+        self._offset_ms = {'spot': 0, 'perp': 0}
+        self._ws = {
+            venue: _WsOrderChannel(url, venue)
+            for venue, url in (('spot', spot_ws_url), ('perp', perp_ws_url)) if url
+        }
+        self._ws_ids = itertools.count(1)
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self, symbols: Iterable[str] = ()):
+        """
+        Open the connection pool, sync the clock, prepare templates for `symbols`
+        and connect the WebSocket API channels.
+        """
+        connector = aiohttp.TCPConnector(
+            limit_per_host=POOL_SIZE, keepalive_timeout=KEEPALIVE_S, ttl_dns_cache=None
+        )
+        self._session = aiohttp.ClientSession(connector=connector)
+        for venue in self.urls:
+            await self._sync_time(venue)
+        self.prepare(symbols)
+        self._tasks.append(asyncio.create_task(self._keep_warm()))
+        self._tasks.extend(asyncio.create_task(channel.run()) for channel in self._ws.values())
+
+    async def close(self):
+        for task in self._tasks:
+            task.cancel()
+        self._tasks.clear()
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def prepare(self, symbols: Iterable[str]):
+        for symbol in symbols:
+            for venue in ('spot', 'perp'):
+                for side in ('BUY', 'SELL'):
+                    for reduce_only in ((False, True) if venue == 'perp' else (False,)):
+                        self._template(venue, symbol, side, reduce_only)
+
+    def _template(self, venue: str, symbol: str, side: str, reduce_only: bool) -> _Template:
+        key = (venue, symbol, side, reduce_only)
+        tmpl = self._templates.get(key)
+        if tmpl is None:
+            prefix = (
+                f"symbol={symbol}&side={side}&type=MARKET&newOrderRespType={_RESP_TYPE[venue]}"
+                f"{'&reduceOnly=true' if reduce_only else ''}&recvWindow={self.recv_window_ms}&"
+            )
+            mac = self._key.copy()
+            mac.update(prefix.encode())
+            tmpl = self._templates[key] = _Template(prefix, mac)
+        return tmpl
+
+    def signed_body(self, venue: str, symbol: str, side: str, quantity: str,
+                    reduce_only: bool = False, client_id: Optional[str] = None) -> str:
+        """
+        Complete signed form body of one market order.
+        """
+        tmpl = self._template(venue, symbol, side, reduce_only)
+        timestamp = self._now_ms(venue)
+        if client_id:
+            suffix = f"quantity={quantity}&newClientOrderId={client_id}&timestamp={timestamp}"
+        else:
+            suffix = f"quantity={quantity}&timestamp={timestamp}"
+        mac = tmpl.mac.copy()
+        mac.update(suffix.encode())
+        return f"{tmpl.prefix}{suffix}&signature={mac.hexdigest()}"
+
+    def _ws_payload(self, request_id: str, venue: str, symbol: str, side: str, quantity: str,
+                    reduce_only: bool, client_id: Optional[str]) -> str:
+        # The WebSocket API signs the parameters sorted by name, so only the key setup is shared
+        params = {
+            'apiKey': self.api_key,
+            'newOrderRespType': _RESP_TYPE[venue],
+            'quantity': quantity,
+            'recvWindow': self.recv_window_ms,
+            'side': side,
+            'symbol': symbol,
+            'timestamp': self._now_ms(venue),
+            'type': 'MARKET',
+        }
+        if client_id:
+            params['newClientOrderId'] = client_id
+        if reduce_only:
+            params['reduceOnly'] = 'true'
+        query = '&'.join(f"{k}={params[k]}" for k in sorted(params))
+        mac = self._key.copy()
+        mac.update(query.encode())
+        params['signature'] = mac.hexdigest()
+        return json.dumps({'id': request_id, 'method': 'order.place', 'params': params})
+
+    async def place_market_order(
+        self,
+        symbol: str,
+        side: str,
+        quantity: float,
+        market_type: str = 'spot',
+        reduce_only: bool = False,
+        client_id: Optional[str] = None,
+    ) -> dict:
+        """
+        Send one market order and return Binance's order response; raises
+        OrderRejected on an error response. Without a response within
+        ORDER_TIMEOUT_S, an order with a `client_id` is looked up and the order
+        found is returned instead; the timeout is raised if it does not exist.
+        """
+        venue = market_type
+        qty = self.filters.format_qty(symbol, quantity, venue)
+        await self.scheduler.acquire(venue, _ORDER_WEIGHT[venue], 1, ORDER)
+        sent_ms = self._now_ms(venue)
+        try:
+            channel = self._ws.get(venue)
+            if channel is not None and channel.ready:
+                return await self._place_ws(channel, venue, symbol, side, qty, reduce_only, client_id)
+            body = self.signed_body(venue, symbol, side, qty, reduce_only, client_id)
+            status, data = await self._request('POST', venue, self._order_urls[venue], body)
+        except asyncio.TimeoutError:
+            if not client_id:
+                raise
+            order = await self._recover(venue, symbol, client_id, sent_ms)
+            if order is None:
+                raise
+            return order
+        if status >= 400:
+            raise OrderRejected(status, int(data.get('code', 0)), str(data.get('msg', '')))
+        return data
+
+    async def query_order(self, venue: str, symbol: str, client_id: str) -> Optional[dict]:
+        """
+        Binance's current state of one order by client order id (the raw order
+        JSON, without fills); None if Binance has no such order.
+        """
+        await self.scheduler.acquire(venue, _QUERY_WEIGHT[venue], 0, ORDER)
+        query = (
+            f"symbol={symbol}&origClientOrderId={client_id}"
+            f"&recvWindow={self.recv_window_ms}&timestamp={self._now_ms(venue)}"
+        )
+        mac = self._key.copy()
+        mac.update(query.encode())
+        status, data = await self._request(
+            'GET', venue, f"{self._order_urls[venue]}?{query}&signature={mac.hexdigest()}"
+        )
+        if status >= 400:
+            if int(data.get('code', 0)) == _UNKNOWN_ORDER:
+                return None
+            raise OrderRejected(status, int(data.get('code', 0)), str(data.get('msg', '')))
+        return data
+
+    async def _recover(self, venue: str, symbol: str, client_id: str, sent_ms: int) -> Optional[dict]:
+        """
+        Look up an order that got no response. Binance drops an order arriving
+        after its recvWindow, so once that has passed "does not exist" is final.
+        """
+        wait_ms = sent_ms + self.recv_window_ms - self._now_ms(venue)
+        if wait_ms > 0:
+            await asyncio.sleep(wait_ms / 1000)
+        for attempt in range(1, ORDER_LOOKUP_ATTEMPTS + 1):
+            try:
+                order = await self.query_order(venue, symbol, client_id)
+            except (asyncio.TimeoutError, aiohttp.ClientError, OrderRejected) as e:
+                logging.warning(f"Lookup {attempt} of timed-out {venue} order {client_id} failed: {e}")
+                await asyncio.sleep(attempt)
+                continue
+            if order is None:
+                logging.warning(f"Timed-out {venue} order {client_id} was never placed.")
+            else:
+                logging.warning(
+                    f"Timed-out {venue} order {client_id} was placed: {order.get('status')}, "
+                    f"executed {order.get('executedQty')}."
+                )
+            return order
+        logging.error(f"Could not look up timed-out {venue} order {client_id}; its state is unknown.")
+        return None
+
+    async def _request(self, method: str, venue: str, url: str, body: Optional[str] = None) -> Tuple[int, dict]:
+        """
+        One signed REST call on the pooled session: (HTTP status, decoded JSON);
+        its headers re-sync (or, on 418/429, pause) the venue's scheduler buckets.
+        """
+        async with self._session.request(
+            method, url, data=body, headers=self._headers,
+            timeout=aiohttp.ClientTimeout(total=ORDER_TIMEOUT_S),
+        ) as resp:
+            payload = await resp.read()
+            headers = resp.headers
+            status = resp.status
+        if status in (418, 429):
+            self.scheduler.reject(venue, headers)
+        else:
+            self.scheduler.observe(venue, headers)
+        return status, json.loads(payload)
+
+    def _now_ms(self, venue: str) -> int:
+        # Exchange time, from our clock and the last measured offset
+        return time.time_ns() // 1_000_000 + self._offset_ms[venue]
+
+    async def _place_ws(self, channel: _WsOrderChannel, venue: str, symbol: str, side: str, qty: str,
+                        reduce_only: bool, client_id: Optional[str]) -> dict:
+        request_id = client_id or f"gw{next(self._ws_ids)}"
+        msg = await channel.request(
+            request_id, self._ws_payload(request_id, venue, symbol, side, qty, reduce_only, client_id)
+        )
+        headers = {
+            header: str(limit.get('count', 0))
+            for limit in msg.get('rateLimits') or ()
+            for header in [_WS_LIMIT_HEADERS.get(
+                (limit.get('rateLimitType'), limit.get('interval'), limit.get('intervalNum')))]
+            if header
+        }
+        status = int(msg.get('status', 200))
+        error = msg.get('error') or {}
+        if status in (418, 429):
+            # The ban end comes as epoch ms in the error instead of a Retry-After header
+            retry_ms = (error.get('data') or {}).get('retryAfter')
+            if retry_ms:
+                headers['Retry-After'] = str(max(1, (int(retry_ms) - time.time_ns() // 1_000_000) // 1000))
+            self.scheduler.reject(venue, headers)
+        else:
+            self.scheduler.observe(venue, headers)
+        if status >= 400:
+            raise OrderRejected(status, int(error.get('code', 0)), str(error.get('msg', '')))
+        return msg.get('result') or {}
+
+    async def _sync_time(self, venue: str):
+        """
+        Offset of the exchange clock from ours, so timestamps land inside recvWindow.
+        """
+        sent_ms = time.time_ns() // 1_000_000
+        try:
+            async with self._session.get(self.urls[venue] + _TIME_PATHS[venue]) as resp:
+                server_ms = int((await resp.json()).get('serverTime', 0))
+                headers = resp.headers
+        except Exception as e:
+            logging.warning(f"Clock sync with Binance {venue} failed: {e}")
+            return
+        self.scheduler.observe(venue, headers)
+        if server_ms:
+            self._offset_ms[venue] = server_ms - (sent_ms + time.time_ns() // 1_000_000) // 2
+
+    async def _keep_warm(self):
+        # A cheap request per venue keeps a pooled connection open between orders
+        while True:
+            await asyncio.sleep(KEEP_WARM_S)
+            for venue in self.urls:
+                await self.scheduler.acquire(venue, 1, 0, ACCOUNT)
+                await self._sync_time(venue)
@@ -0,0 +1,259 @@
+# exec/rate_limiter.py
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+import ccxt.async_support as ccxt
+
+
+# Request priorities (lower runs first)
+ORDER = 0       # order placement / cancellation
+ACCOUNT = 1     # listen keys, balances
+METADATA = 2    # fees, funding history, exchange info
+
+# Binance limits per venue: request weight and order counts as (limit, window seconds).
+# Each bucket is kept in sync with the matching X-MBX-* "used" response header.
+BINANCE_LIMITS: Dict[str, Dict[str, Tuple[int, int]]] = {
+    'spot': {
+        'weight_1m': (6000, 60),
+        'orders_10s': (100, 10),
+        'orders_1d': (200_000, 86_400),
+    },
+    'perp': {
+        'weight_1m': (2400, 60),
+        'orders_10s': (300, 10),
+        'orders_1m': (1200, 60),
+    },
+}
+USED_HEADERS = {
+    'x-mbx-used-weight-1m': 'weight_1m',
+    'x-mbx-order-count-10s': 'orders_10s',
+    'x-mbx-order-count-1m': 'orders_1m',
+    'x-mbx-order-count-1d': 'orders_1d',
+}
+# Fraction of each published limit we allow ourselves to use
+DEFAULT_HEADROOM = 0.9
+# Pause after a 429/418 when the exchange does not send Retry-After
+DEFAULT_BACKOFF_S = 10.0
+
+# Headers of the responses received by the current RequestScheduler.call (per task)
+_response_headers: ContextVar[Optional[list]] = ContextVar('response_headers', default=None)
+
+
+def _capture_response_headers(exchange):
+    """
+    Hook the exchange's `on_rest_response` (ccxt calls it once per HTTP response,
+    inside the requesting task) so each call sees its own response headers
+    instead of the shared `last_response_headers`, which concurrent calls to the
+    other venue overwrite.
+    """
+    original = getattr(exchange, 'on_rest_response', None)
+    if original is None or getattr(original, 'captures_headers', False):
+        return
+
+    def on_rest_response(code, reason, url, method, response_headers, *args):
+        holder = _response_headers.get()
+        if holder is not None:
+            holder.append(response_headers)
+        return original(code, reason, url, method, response_headers, *args)
+
+    on_rest_response.captures_headers = True
+    exchange.on_rest_response = on_rest_response
+
+
+class TokenBucket:
+    """
+    Continuous-refill approximation of a fixed exchange window. `observe_used`
+    pulls it down to what the exchange reports, so drift never lets us exceed
+    the real limit.
+    """
+
+    def __init__(self, limit: int, window_s: float, headroom: float = DEFAULT_HEADROOM):
+        self.limit = limit
+        self.capacity = limit * headroom
+        self.rate = self.capacity / window_s
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, n: float, now: float) -> float:
+        if now < self.paused_until:
+            return self.paused_until - now
+        self._refill(now)
+        if self.tokens >= n:
+            return 0.0
+        return (n - self.tokens) / self.rate
+
+    def consume(self, n: float):
+        self.tokens -= n
+
+    def observe_used(self, used: float):
+        self.tokens = min(self.tokens, self.capacity - used)
+
+    def pause(self, seconds: float):
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+class PassthroughScheduler:
+    """
+    Same interface as RequestScheduler, without any limiting (tests, backtests).
+    """
+
+    async def call(self, fn, *args, venue: str = 'spot', weight: float = 1, orders: int = 0,
+                   priority: int = METADATA, **kwargs):
+        return await fn(*args, **kwargs)
+
+    async def acquire(self, venue: str, weight: float = 1, orders: int = 0, priority: int = METADATA):
+        pass
+
+    def observe(self, venue: str, headers):
+        pass
+
+    def reject(self, venue: str, headers):
+        pass
+
+
+class RequestScheduler:
+    """
+    Gatekeeper for every Binance REST call.
+
+    Each call declares its venue ('spot' or 'perp'), request weight and order
+    count. Calls wait until the venue's weight and order buckets have room,
+    and waiting calls are released strictly by priority (orders first, then
+    account calls, then metadata), FIFO within a priority. Each venue has its
+    own queue and dispatcher, so a venue that is paused or out of budget never
+    holds up the other. After each response the used-weight / order-count
+    headers of that response re-sync the buckets, and a 429/418 pauses the
+    venue for Retry-After seconds.
+    """
+
+    def __init__(self, exchange, limits: Dict[str, Dict[str, Tuple[int, int]]] = None,
+                 headroom: float = DEFAULT_HEADROOM):
+        self.exchange = exchange
+        limits = limits or BINANCE_LIMITS
+        self.buckets: Dict[str, Dict[str, TokenBucket]] = {
+            venue: {name: TokenBucket(limit, window, headroom) for name, (limit, window) in rules.items()}
+            for venue, rules in limits.items()
+        }
+        # Per venue: heap of waiting requests, wake-up event and dispatcher task
+        self._waiting: Dict[str, List[tuple]] = {venue: [] for venue in self.buckets}
+        self._kick: Dict[str, asyncio.Event] = {venue: asyncio.Event() for venue in self.buckets}
+        self._dispatchers: Dict[str, asyncio.Task] = {}
+        self._seq = itertools.count()
+        self.rejections: int = 0
+        if exchange is not None:
+            _capture_response_headers(exchange)
+
+    def pending(self) -> int:
+        """
+        Requests currently waiting for rate-limit budget.
+        """
+        return sum(len(waiting) for waiting in self._waiting.values())
+
+    def _wait_time(self, venue: str, weight: float, orders: int) -> float:
+        now = time.monotonic()
+        wait = 0.0
+        for name, bucket in self.buckets[venue].items():
+            need = weight if name.startswith('weight') else orders
+            if need or now < bucket.paused_until:
+                wait = max(wait, bucket.wait_time(need, now))
+        return wait
+
+    def _consume(self, venue: str, weight: float, orders: int):
+        for name, bucket in self.buckets[venue].items():
+            bucket.consume(weight if name.startswith('weight') else orders)
+
+    async def acquire(self, venue: str, weight: float = 1, orders: int = 0, priority: int = METADATA):
+        waiting = self._waiting[venue]
+        if not waiting and self._wait_time(venue, weight, orders) <= 0:
+            self._consume(venue, weight, orders)
+            return
+
+        fut = asyncio.get_running_loop().create_future()
+        heapq.heappush(waiting, (priority, next(self._seq), weight, orders, fut))
+        self._kick[venue].set()
+        dispatcher = self._dispatchers.get(venue)
+        if dispatcher is None or dispatcher.done():
+            self._dispatchers[venue] = asyncio.create_task(self._dispatch(venue))
+        await fut
+
+    async def _dispatch(self, venue: str):
+        waiting, kick = self._waiting[venue], self._kick[venue]
+        while waiting:
+            priority, _, weight, orders, fut = waiting[0]
+            if fut.done():  # caller was cancelled
+                heapq.heappop(waiting)
+                continue
+
+            wait = self._wait_time(venue, weight, orders)
+            if wait <= 0:
+                heapq.heappop(waiting)
+                self._consume(venue, weight, orders)
+                fut.set_result(None)
+                continue
+
+            # Sleep until the head request fits, or until a new (possibly higher-priority) one arrives
+            kick.clear()
+            try:
+                await asyncio.wait_for(kick.wait(), wait)
+            except asyncio.TimeoutError:
+                pass
+
+    def observe(self, venue: str, headers):
+        """
+        Re-sync the venue's buckets from the used-weight / order-count headers of a
+        response (also called by exec.order_gateway, which bypasses ccxt).
+        """
+        if not headers:
+            return
+        buckets = self.buckets[venue]
+        for key, value in headers.items():
+            name = USED_HEADERS.get(key.lower())
+            if name in buckets:
+                try:
+                    buckets[name].observe_used(float(value))
+                except (TypeError, ValueError):
+                    pass
+
+    def reject(self, venue: str, headers):
+        """
+        A 429/418 came back: pause the venue for Retry-After (or the default backoff).
+        """
+        headers = headers or {}
+        retry_after = next((v for k, v in headers.items() if k.lower() == 'retry-after'), None)
+        try:
+            seconds = float(retry_after) if retry_after is not None else DEFAULT_BACKOFF_S
+        except ValueError:
+            seconds = DEFAULT_BACKOFF_S
+        for bucket in self.buckets[venue].values():
+            bucket.pause(seconds)
+        self.rejections += 1
+        logging.warning(f"Binance {venue} rate limit hit; pausing {venue} requests for {seconds:.0f}s")
+
+    async def call(self, fn, *args, venue: str = 'spot', weight: float = 1, orders: int = 0,
+                   priority: int = METADATA, **kwargs):
+        """
+        Wait for budget, then `await fn(*args, **kwargs)`. The buckets are synced
+        from the headers of this call's own (last) response.
+        """
+        await self.acquire(venue, weight, orders, priority)
+        received: list = []
+        token = _response_headers.set(received)
+        try:
+            return await fn(*args, **kwargs)
+        except (ccxt.RateLimitExceeded, ccxt.DDoSProtection):
+            self.reject(venue, received[-1] if received else None)
+            raise
+        finally:
+            _response_headers.reset(token)
+            if received:
+                self.observe(venue, received[-1])
@@ -6,12 +6,37 @@ import os
 
 import ccxt.async_support as ccxt
 
-from config import API_KEY, API_SECRET, DATABASE_URL, SYMBOL
-from data.websocket_client import BinanceWebSocketClient, PriceTick
+from config import (
+    API_KEY, API_SECRET, DATABASE_URL, SYMBOL, SYMBOLS, EXIT_BASIS, COOLDOWN_S, MAX_INFLIGHT_ORDERS,
+    INGEST_MAX_BATCH, INGEST_MAX_AGE_S, INGEST_MAX_PENDING, INGEST_DROP_POLICY, SPOOL_DIR, METRICS_PORT,
+    EXCHANGE_SIM_URL, DEPTH_BOOKS, FILL_LEDGER_PATH, FEED_WORKERS, ORDER_GATEWAY, SPOT_REST_BASE,
+    FUTURES_REST_BASE, SPOT_WS_API_URL, FUTURES_WS_API_URL, SNAPSHOT_PATH, SNAPSHOT_INTERVAL_S,
+    SNAPSHOT_MAX_AGE_S, HISTORY_WINDOW_S, HISTORY_RESOLUTION, ARCHIVE_DIR, VENUES, VENUE_STANDIN_URL,
+    SCAN_INTERVAL_S, SCAN_MAX_AGE_MS, SCAN_MIN_EDGE,
+)
+from data.websocket_client import BinanceWebSocketClient
+from data.tick_bus import TickBus
+from data.order_book import DepthBooks
+from data.feed_workers import FeedSupervisor
+from data.funding import FundingSchedule
+from data.shared_market import SharedPriceMatrix
 from db.db_async import TimescaleDB
+from db.history import BasisHistory, RollingBasis
+from db.ingest import TickIngestor
+from db.spool import SpoolReader, SpoolReplayer, SpoolWriter
 from arb.risk_manager import RiskManager
 from arb.arbitrage_engine import ArbitrageEngine
+from exec.fill_ledger import FillLedger
 from exec.order_executor import OrderExecutor
+from exec.order_gateway import MarketFilters, OrderGateway
+from exec.rate_limiter import METADATA, RequestScheduler
+from metrics.latency import gauge, monitor_loop_lag
+from metrics.server import MetricsServer
+from state.snapshot import SnapshotWriter, load_snapshot, verify_snapshot
+from venues.feed import MultiVenueFeed
+from venues.registry import make_feeds
+from venues.scanner import CrossVenueScanner
+from venues.table import VenuePriceTable
 
 
 async def main():
@@ -28,65 +53,276 @@ async def main():
         logger.error("DATABASE_URL is not set in environment.")
         return
     db = TimescaleDB(dsn=DATABASE_URL)
-    await db.connect()
-    logger.info("Connected to TimescaleDB.")
+    try:
+        await db.connect()
+        logger.info("Connected to TimescaleDB.")
+    except Exception as e:
+        if not SPOOL_DIR:
+            raise
+        # With a spool, ticks are kept locally and replayed once the DB is reachable
+        logger.warning(f"TimescaleDB unavailable ({e}); spooling ticks to {SPOOL_DIR} until it is.")
 
     # 3) Create a single ccxt.binance instance (for both rest & user data WS)
     exchange = ccxt.binance({
         'apiKey': API_KEY,
         'secret': API_SECRET,
-        'enableRateLimit': False,  # we manage our own rate logic
+        'enableRateLimit': False,  # we manage our own rate logic (RequestScheduler)
     })
-    await exchange.load_markets()
-    logger.info("Connected to Binance via CCXT.")
+    if EXCHANGE_SIM_URL:
+        from sim.exchange_sim import configure_ccxt
+        configure_ccxt(exchange, EXCHANGE_SIM_URL)
+        logger.info(f"Using the local exchange simulator at {EXCHANGE_SIM_URL}.")
+    scheduler = RequestScheduler(exchange)
+    # Warm restart: markets, fees and funding from the snapshot instead of REST (checked
+    # against the exchange in the background once trading has started)
+    symbols = SYMBOLS or [SYMBOL]
+    snapshot = load_snapshot(SNAPSHOT_PATH)
+    warm = snapshot is not None and snapshot.restore_markets(exchange, symbols, SNAPSHOT_MAX_AGE_S)
+    if not warm:
+        await scheduler.call(exchange.load_markets, venue='spot', weight=20, priority=METADATA)
+    logger.info("Connected to Binance via CCXT." + (" (markets from snapshot)" if warm else ""))
 
-    # 4) Initialize RiskManager and fetch fees
+    # 4) Initialize RiskManager and fetch fees; equity and the win-rate window carry over
     risk_manager = RiskManager(initial_equity=100_000.0, max_alloc=float(os.getenv('MAX_ALLOC', 0.1)))
-    await risk_manager.fetch_fees(exchange)
-    logger.info(f"Fetched maker={risk_manager.maker_fee}, taker={risk_manager.taker_fee} fees.")
+    if snapshot is not None:
+        snapshot.restore_risk(risk_manager)
+    if warm:
+        snapshot.restore_fees(risk_manager)
+    else:
+        await risk_manager.fetch_fees(exchange, scheduler)
+    logger.info(
+        f"{'Restored' if warm else 'Fetched'} maker={risk_manager.maker_fee}, taker={risk_manager.taker_fee} fees."
+    )
+    # Local L2 books for depth-aware sizing (falls back to the flat cushion until synced)
+    depth_task = None
+    if DEPTH_BOOKS:
+        depth_books = DepthBooks(symbols, exchange, scheduler)
+        risk_manager.books = depth_books
+        depth_task = asyncio.create_task(depth_books.run())
+        logger.info(f"Depth books started for {len(depth_books.symbols)} symbols.")
+
+    # Rolling basis statistics from the continuous aggregates (created beforehand with
+    # `python -m db.history setup`)
+    history_task = None
+    if HISTORY_WINDOW_S > 0 and db.pool is not None:
+        history = BasisHistory(db)
+        risk_manager.history = RollingBasis(history, symbols, HISTORY_WINDOW_S, HISTORY_RESOLUTION)
+        history_task = asyncio.create_task(risk_manager.history.run())
+        logger.info(f"Rolling basis over {HISTORY_WINDOW_S:.0f}s of {HISTORY_RESOLUTION} buckets.")
 
     # 5) Initialize OrderExecutor (attach risk_manager to exchange for collateral locking)
-    order_executor = OrderExecutor(exchange)
+    # Replay the fill ledger first: open hedges, realized PnL and outcomes survive restarts
+    ledger = FillLedger(FILL_LEDGER_PATH or None)
+    ledger.replay()
+    if snapshot is not None:
+        snapshot.restore_ledger(ledger)
+    ledger.compact()
+    # Lot-size filters from the loaded markets; the gateway keeps its connections warm
+    filters = MarketFilters(exchange.markets)
+    gateway = None
+    if ORDER_GATEWAY in ('rest', 'ws'):
+        ws_api = ORDER_GATEWAY == 'ws'
+        gateway = OrderGateway(
+            API_KEY, API_SECRET, SPOT_REST_BASE, FUTURES_REST_BASE, filters, scheduler,
+            spot_ws_url=SPOT_WS_API_URL if ws_api else None,
+            perp_ws_url=FUTURES_WS_API_URL if ws_api else None,
+        )
+        await gateway.start(symbols)
+        logger.info(f"Order gateway started ({ORDER_GATEWAY}).")
+    order_executor = OrderExecutor(exchange, scheduler=scheduler, ledger=ledger, gateway=gateway, filters=filters)
     exchange.risk_manager = risk_manager  # so OrderExecutor can lock collateral
+    # With a snapshot, only ledger outcomes closed after it was written are applied
+    resumed = order_executor.restore(risk_manager, since=snapshot.ledger_mark if snapshot else None)
     # Spawn a task to listen for order updates
     asyncio.create_task(order_executor.listen_order_updates(risk_manager))
     logger.info("Order update listener started.")
 
     # 6) Initialize ArbitrageEngine
-    arb_engine = ArbitrageEngine(risk_manager, order_executor)
-
-    # 7) Initialize BinanceWebSocketClient
-    ws_client = BinanceWebSocketClient()
-
-    # 8) Create asyncio queues
-    price_queue = asyncio.Queue(maxsize=1000)
-
-    # 9) Start WebSocket listener (feeds price_queue)
-    data_task = asyncio.create_task(ws_client.listen_price_ticks(price_queue, exchange))
-    logger.info("WebSocket price listener started.")
-
-    # 10) Start DB writer task (consumes price_queue in batches)
-    async def db_writer():
-        buffer = []
-        while True:
-            tick: PriceTick = await price_queue.get()
-            buffer.append(tick)
-            # If we have ≥100 ticks or ≥1 second since first tick, flush
-            first_ts = buffer[0].timestamp.timestamp()
-            now_ts = asyncio.get_event_loop().time()
-            if len(buffer) >= 100 or (now_ts - first_ts) >= 1.0:
-                await db.write_batch(buffer)
-                buffer.clear()
-
-    writer_task = asyncio.create_task(db_writer())
-    logger.info("DB writer task started.")
-
-    # 11) Start arbitrage engine (also consumes price_queue)
-    arb_task = asyncio.create_task(arb_engine.run(price_queue))
+    arb_engine = ArbitrageEngine(
+        risk_manager,
+        order_executor,
+        exit_basis=EXIT_BASIS,
+        cooldown_s=COOLDOWN_S,
+        max_inflight=MAX_INFLIGHT_ORDERS,
+    )
+    for hedge in resumed:
+        entry_basis = (hedge.perp.avg_price - hedge.spot.avg_price) / hedge.spot.avg_price
+        arb_engine.restore_position(hedge.symbol, hedge.direction, hedge.qty, entry_basis)
+    if resumed:
+        logger.info(f"Resumed {len(resumed)} open hedges from the fill ledger.")
+
+    # 7) Market data: an in-process BinanceWebSocketClient (multi-symbol mode if SYMBOLS
+    #    is set), or FEED_WORKERS feed processes writing a shared-memory price matrix
+    sharded = FEED_WORKERS > 0 and bool(SYMBOLS)
+    if FEED_WORKERS > 0 and not SYMBOLS:
+        logger.warning("FEED_WORKERS needs SYMBOLS; running single-process.")
+    supervisor = None
+    if sharded:
+        market = SharedPriceMatrix(SYMBOLS, FEED_WORKERS)
+        funding = FundingSchedule(SYMBOLS, arrays=market.funding_arrays())
+    else:
+        ws_client = BinanceWebSocketClient(symbols=SYMBOLS or None, scheduler=scheduler)
+        market, funding = ws_client.market, ws_client.funding
+
+    # Funding: one REST cold start here (or the snapshot's schedule), then the markPrice
+    # stream keeps it current; sizing adds the expected carry per funding interval to the edge
+    if warm:
+        logger.info(f"Funding schedule restored for {snapshot.restore_funding(funding)} symbols.")
+    elif sharded:
+        await funding.bootstrap(exchange, scheduler)
+    else:
+        await ws_client.fetch_initial_funding_rate(exchange)
+    risk_manager.funding = funding
+    verify_task = None
+    if warm:
+        verify_task = asyncio.create_task(
+            verify_snapshot(exchange, scheduler, risk_manager, funding, order_executor, symbols)
+        )
+    snapshot_writer = None
+    snapshot_task = None
+    if SNAPSHOT_PATH:
+        snapshot_writer = SnapshotWriter(
+            SNAPSHOT_PATH, exchange, risk_manager, funding, ledger, symbols, SNAPSHOT_INTERVAL_S
+        )
+        snapshot_task = asyncio.create_task(snapshot_writer.run())
+
+    # 8) Create the tick bus: every subscriber sees every tick on its own cursor
+    tick_bus = TickBus(capacity=8192)
+    writer_ticks = None if sharded else tick_bus.subscribe("db_ingest")
+    archive_ticks = None
+    if ARCHIVE_DIR:
+        if sharded:
+            logger.warning("ARCHIVE_DIR needs the single-process feed; not archiving ticks.")
+        else:
+            archive_ticks = tick_bus.subscribe("archive")
+    engine_ticks = tick_bus.subscribe("arbitrage_engine")
+
+    # 9) Start WebSocket listener (publishes on tick_bus)
+    if sharded:
+        # Workers write the matrix; the bus only carries wake-ups for the engine
+        supervisor = FeedSupervisor(market)
+        supervisor.start()
+        data_task = asyncio.gather(supervisor.run(), market.notify(tick_bus))
+        logger.info(
+            f"{len(supervisor.shards)} feed workers started for {len(SYMBOLS)} symbols "
+            f"(shared matrix {market.name})."
+        )
+    elif ws_client.market is not None:
+        data_task = asyncio.create_task(ws_client.listen_universe(tick_bus))
+        logger.info(
+            f"WebSocket universe listener started: {len(SYMBOLS)} symbols over "
+            f"{len(ws_client.spot_urls)} spot + {len(ws_client.perp_urls)} perp connections."
+        )
+    else:
+        data_task = asyncio.create_task(ws_client.listen_price_ticks(tick_bus, exchange))
+        logger.info("WebSocket price listener started.")
+
+    # 10) Start the ingestion stage
+    ingestor = None
+    if sharded:
+        writer_task = None
+        logger.info("Tick ingestion runs in the feed workers.")
+    elif SPOOL_DIR:
+        # Spool every tick to local memory-mapped segments; replay them into the DB
+        spool_writer = SpoolWriter(SPOOL_DIR)
+        spool_replayer = SpoolReplayer(SpoolReader(SPOOL_DIR), db, max_batch=INGEST_MAX_BATCH)
+        writer_task = asyncio.gather(spool_writer.run(writer_ticks), spool_replayer.run())
+        logger.info(f"Tick spool started in {SPOOL_DIR} at position {spool_writer.position()}.")
+    else:
+        # Double-buffered COPY of every tick straight into the DB
+        ingestor = TickIngestor(
+            db,
+            max_batch=INGEST_MAX_BATCH,
+            max_age_s=INGEST_MAX_AGE_S,
+            max_pending=INGEST_MAX_PENDING,
+            drop_policy=INGEST_DROP_POLICY,
+        )
+        writer_task = asyncio.create_task(ingestor.run(writer_ticks))
+        logger.info("DB ingestion task started.")
+
+    archive_writer = None
+    archive_task = None
+    if archive_ticks is not None:
+        from db.archive import ArchiveWriter
+        archive_writer = ArchiveWriter(ARCHIVE_DIR)
+        archive_task = asyncio.create_task(archive_writer.run(archive_ticks))
+        logger.info(f"Archiving ticks to {ARCHIVE_DIR}.")
+
+    # 11) Start arbitrage engine (conflates to the latest tick per symbol)
+    if market is not None:
+        arb_task = asyncio.create_task(arb_engine.run_universe(engine_ticks, market))
+    else:
+        arb_task = asyncio.create_task(arb_engine.run(engine_ticks))
     logger.info("Arbitrage engine started.")
 
-    # 12) Run until cancelled
-    await asyncio.gather(data_task, writer_task, arb_task)
+    # Cross-venue scanner: every venue's feed in this process, one price table, read-only
+    venue_feed = None
+    venue_tasks = []
+    if VENUES:
+        venue_feeds = make_feeds(VENUES, symbols, VENUE_STANDIN_URL)
+        venue_feed = MultiVenueFeed(venue_feeds, VenuePriceTable(VENUES, symbols))
+        scanner = CrossVenueScanner(
+            venue_feed.table, {f.name: f.taker_fees for f in venue_feeds},
+            max_age_ms=SCAN_MAX_AGE_MS, min_edge=SCAN_MIN_EDGE,
+        )
+        venue_tasks = [
+            asyncio.create_task(venue_feed.run()),
+            asyncio.create_task(scanner.run(venue_feed.updated, SCAN_INTERVAL_S)),
+        ]
+        logger.info(
+            f"Cross-venue scanner started for {', '.join(VENUES)}"
+            + (f" (stand-in at {VENUE_STANDIN_URL})." if VENUE_STANDIN_URL else ".")
+        )
+
+    # 12) Metrics: queue-depth gauges, event-loop lag and the local endpoint
+    for sub in (writer_ticks, engine_ticks, archive_ticks):
+        if sub is not None:
+            gauge(f'bus_pending.{sub.name}', sub.pending)
+            gauge(f'bus_overruns.{sub.name}', lambda sub=sub: sub.overruns)
+    gauge('engine_inflight_orders', lambda: len(arb_engine.tasks))
+    gauge('scheduler_waiting', scheduler.pending)
+    if ingestor is not None:
+        gauge('ingest_pending', ingestor.pending)
+    if supervisor is not None:
+        gauge('feed_workers_alive', supervisor.alive)
+    if venue_feed is not None:
+        gauge('venue_connections', lambda: venue_feed.connected)
+        for i, venue in enumerate(VENUES):
+            gauge(f'venue_quotes.{venue}', lambda i=i: int(venue_feed.table.updates[i]))
+    lag_task = asyncio.create_task(monitor_loop_lag())
+    metrics_server = None
+    if METRICS_PORT:
+        metrics_server = MetricsServer(port=METRICS_PORT)
+        await metrics_server.start()
+
+    # 13) Run until cancelled; on the way out, cancel in-flight order tasks
+    try:
+        await asyncio.gather(*[t for t in (data_task, writer_task, arb_task) if t is not None])
+    finally:
+        lag_task.cancel()
+        if supervisor is not None:
+            supervisor.stop()
+            market.close()
+        if depth_task is not None:
+            depth_task.cancel()
+        if verify_task is not None:
+            verify_task.cancel()
+        if history_task is not None:
+            history_task.cancel()
+        if archive_task is not None:
+            archive_task.cancel()
+            archive_writer.close()
+        for task in venue_tasks:
+            task.cancel()
+        if metrics_server is not None:
+            await metrics_server.close()
+        await arb_engine.shutdown()
+        if gateway is not None:
+            await gateway.close()
+        if snapshot_writer is not None:
+            snapshot_task.cancel()
+            snapshot_writer.close()
+        ledger.close()
 
 
 if __name__ == "__main__":
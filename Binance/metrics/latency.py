@@ -0,0 +1,148 @@
+# metrics/latency.py
+#
+# Always-on latency histograms and gauges for the tick → order path.
+#
+# Stages (all in nanoseconds, wall clock so they line up with the exchange `E` field):
+#   exchange_to_recv   Binance event time `E` → WebSocket message received
+#   decode             message received → decoded (and matrix updated)
+#   bus_wait.<name>    tick published on the TickBus → read by subscriber <name>
+#   sizing             RiskManager.calculate_position_size / size_universe
+#   tick_to_send       tick received → first order leg sent
+#   order_ack          order sent → REST acknowledgement
+#   event_to_ack       Binance event time → last leg acknowledged
+#   venue_recv.<venue> venue event time → message received (venues.feed)
+#   venue_scan         one cross-venue basis scan (venues.scanner)
+
+import asyncio
+import time
+from typing import Callable, Dict, List
+
+# Log-linear buckets: values below 2**(SUB_BITS + 1) get one bucket each, every
+# power of two above that is split into 2**SUB_BITS buckets (≤ 6.25% error).
+SUB_BITS = 4
+SUB_COUNT = 1 << SUB_BITS
+LINEAR_LIMIT = SUB_COUNT << 1
+MAX_BITS = 44                      # ~4.9 hours in ns; larger values land in the last bucket
+N_BUCKETS = (MAX_BITS - SUB_BITS + 1) << SUB_BITS
+
+QUANTILES = (0.5, 0.99, 0.999)
+
+
+def bucket_low(idx: int) -> int:
+    """
+    Smallest value that falls into bucket `idx`.
+    """
+    if idx < LINEAR_LIMIT:
+        return idx
+    shift = (idx >> SUB_BITS) - 1
+    return (idx - (shift << SUB_BITS)) << shift
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram of non-negative integer samples. `record` is a few
+    integer operations on a preallocated list, well under a microsecond, so
+    it can stay on in production.
+    """
+
+    __slots__ = ('name', 'counts')
+
+    def __init__(self, name: str):
+        self.name = name
+        self.counts: List[int] = [0] * N_BUCKETS
+
+    def record(self, value: int):
+        if value < LINEAR_LIMIT:
+            self.counts[value if value > 0 else 0] += 1
+            return
+        shift = value.bit_length() - SUB_BITS - 1
+        idx = (shift << SUB_BITS) + (value >> shift)
+        self.counts[idx if idx < N_BUCKETS else N_BUCKETS - 1] += 1
+
+    def reset(self):
+        self.counts = [0] * N_BUCKETS
+
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def quantiles(self, qs=QUANTILES) -> Dict[float, int]:
+        """
+        Lower bound of the bucket holding each quantile; 0 when empty.
+        """
+        counts = self.counts
+        total = sum(counts)
+        result = {q: 0 for q in qs}
+        if not total:
+            return result
+        targets = sorted((max(1, int(q * total + 0.5)), q) for q in qs)
+        seen = 0
+        t = 0
+        for idx, c in enumerate(counts):
+            if not c:
+                continue
+            seen += c
+            while t < len(targets) and seen >= targets[t][0]:
+                result[targets[t][1]] = bucket_low(idx)
+                t += 1
+            if t == len(targets):
+                break
+        return result
+
+
+class MetricsRegistry:
+    """
+    Named histograms plus gauges; gauges are callables evaluated at scrape time,
+    so registering one adds no cost to the hot path.
+    """
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+
+    def histogram(self, name: str) -> Histogram:
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram(name)
+        return hist
+
+    def gauge(self, name: str, fn: Callable[[], float]):
+        self.gauges[name] = fn
+
+    def report(self) -> dict:
+        """
+        {'latency_ns': {stage: {'count', 'p50', 'p99', 'p999'}}, 'gauges': {name: value}}
+        """
+        latency = {}
+        for name, hist in self.histograms.items():
+            q = hist.quantiles()
+            latency[name] = {'count': hist.count(), 'p50': q[0.5], 'p99': q[0.99], 'p999': q[0.999]}
+        gauges = {}
+        for name, fn in self.gauges.items():
+            try:
+                gauges[name] = float(fn())
+            except Exception:
+                gauges[name] = float('nan')
+        return {'latency_ns': latency, 'gauges': gauges}
+
+
+# Process-wide registry; modules grab their histograms once at import time
+REGISTRY = MetricsRegistry()
+histogram = REGISTRY.histogram
+gauge = REGISTRY.gauge
+
+
+async def monitor_loop_lag(interval_s: float = 0.1, registry: MetricsRegistry = REGISTRY):
+    """
+    Measure how late the event loop wakes a sleeping task; a busy or blocked
+    loop shows up here before it shows up anywhere else.
+    """
+    hist = registry.histogram('loop_lag')
+    last = [0]
+    registry.gauge('loop_lag_ns', lambda: last[0])
+    interval_ns = int(interval_s * 1e9)
+    while True:
+        start = time.perf_counter_ns()
+        await asyncio.sleep(interval_s)
+        lag = time.perf_counter_ns() - start - interval_ns
+        last[0] = lag if lag > 0 else 0
+        hist.record(last[0])
@@ -0,0 +1,74 @@
+# metrics/server.py
+
+import asyncio
+import json
+import logging
+import math
+
+from metrics.latency import REGISTRY, MetricsRegistry
+
+
+def render_text(report: dict) -> str:
+    """
+    Prometheus text exposition: one summary per latency stage, one gauge per gauge.
+    """
+    lines = []
+    for stage, stats in report['latency_ns'].items():
+        name = 'arb_latency_ns'
+        for q, key in ((0.5, 'p50'), (0.99, 'p99'), (0.999, 'p999')):
+            lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {stats[key]}')
+        lines.append(f'{name}_count{{stage="{stage}"}} {stats["count"]}')
+    for gauge, value in report['gauges'].items():
+        lines.append(f'arb_gauge{{name="{gauge}"}} {"NaN" if math.isnan(value) else value}')
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsServer:
+    """
+    Minimal local HTTP endpoint for the metrics registry:
+      GET /metrics       Prometheus text format
+      GET /metrics.json  the same report as JSON
+    Bound to localhost by default; the report is only built when scraped.
+    """
+
+    def __init__(self, registry: MetricsRegistry = REGISTRY, host: str = '127.0.0.1', port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server = None
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        logging.info(f"Metrics endpoint on http://{self.host}:{self.port}/metrics")
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await reader.readline()
+            # Drain the headers; the request has no body we care about
+            while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                pass
+            parts = request_line.decode('latin-1').split()
+            path = parts[1] if len(parts) > 1 else '/'
+
+            if path == '/metrics':
+                status, ctype, body = '200 OK', 'text/plain; version=0.0.4', render_text(self.registry.report())
+            elif path == '/metrics.json':
+                status, ctype, body = '200 OK', 'application/json', json.dumps(self.registry.report())
+            else:
+                status, ctype, body = '404 Not Found', 'text/plain', 'not found\n'
+
+            payload = body.encode()
+            writer.write(
+                f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+                f"Content-Length: {len(payload)}\r\nConnection: close\r\n\r\n".encode() + payload
+            )
+            await writer.drain()
+        except Exception as e:
+            logging.warning(f"Metrics request failed: {e}")
+        finally:
+            writer.close()
@@ -0,0 +1,899 @@
+# sim/exchange_sim.py
+#
+# Local stand-in for Binance, so the whole bot can be load-tested on one box
+# with no network:
+#
+#   cd Binance && python -m sim.exchange_sim --symbols BTCUSDT,ETHUSDT --msg-rate 20000
+#   cd Binance && EXCHANGE_SIM_URL=http://127.0.0.1:8765 SYMBOLS=BTCUSDT,ETHUSDT python main.py
+#
+# Serves:
+#   WS   /stream?streams=...     combined <symbol>@ticker / <symbol>@markPrice / spot <symbol>@depth@100ms
+#   WS   /fstream?streams=...    same, with futures <symbol>@depth@100ms
+#   WS   /ws/<listenKey>         futures user-data stream (ORDER_TRADE_UPDATE)
+#   WS   /ws-api/v3, /ws-fapi/v1 WebSocket API order.place (spot, futures)
+#   REST /api/v3/exchangeInfo, /fapi/v1/exchangeInfo   (ccxt load_markets)
+#   REST /sapi/v1/asset/tradeFee                       (fetch_trading_fees)
+#   REST /fapi/v1/fundingRate, /fapi/v1/premiumIndex
+#   REST /api/v3/depth, /fapi/v1/depth                 (order book snapshots)
+#   REST POST /api/v3/order                            (spot create_order)
+#   REST POST /fapi/v1/order                           (fapiPrivatePostOrder)
+#   REST POST/PUT/DELETE /fapi/v1/listenKey
+#   REST /fapi/v2/positionRisk                         (futures positions)
+#   GET  /stats                                        simulator counters
+#
+# Signatures are not checked; order quantities must sit on the LOT_SIZE step. Message rate, delivery latency, fill behaviour
+# and error injection are set through SimConfig (one CLI flag per field).
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import time
+import uuid
+from dataclasses import dataclass, field, fields
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit
+
+from aiohttp import WSMsgType, web
+
+from exec.rate_limiter import BINANCE_LIMITS, USED_HEADERS
+from sim.market import SimDepth, SimMarket, SimSymbol
+
+# Request weight per REST path (anything else costs 1)
+PATH_WEIGHTS = {
+    '/api/v3/exchangeInfo': 20,
+    '/fapi/v1/exchangeInfo': 1,
+    '/sapi/v1/asset/tradeFee': 1,
+    '/api/v3/depth': 50,
+    '/fapi/v1/depth': 20,
+    '/api/v3/order': 1,
+    '/fapi/v1/order': 0,
+    '/fapi/v2/positionRisk': 5,
+}
+ORDER_PATHS = {'/api/v3/order', '/fapi/v1/order'}
+WS_API_PATHS = {'/ws-api/v3': 'spot', '/ws-fapi/v1': 'perp'}
+# LOT_SIZE steps in exchangeInfo (and enforced on orders unless lax_filters)
+SPOT_STEP = '0.00001000'
+PERP_STEP = '0.001'
+# rateLimits entries of WebSocket API responses, per order bucket
+WS_RATE_LIMITS = {
+    'weight_1m': ('REQUEST_WEIGHT', 'MINUTE', 1),
+    'orders_10s': ('ORDERS', 'SECOND', 10),
+    'orders_1m': ('ORDERS', 'MINUTE', 1),
+    'orders_1d': ('ORDERS', 'DAY', 1),
+}
+HEADER_NAMES = {bucket: header.upper() for header, bucket in USED_HEADERS.items()}
+
+
+@dataclass
+class SimConfig:
+    host: str = '127.0.0.1'
+    port: int = 8765
+    symbols: List[str] = field(default_factory=lambda: ['BTCUSDT'])
+    msg_rate: float = 1000.0            # market-data messages per second, all symbols together
+    ws_latency_ms: float = 0.0          # delivery delay after the event time `E`
+    rest_latency_ms: float = 1.0        # added to every REST response
+    rest_jitter_ms: float = 0.0         # uniform extra REST delay in [0, jitter]
+    fill_ratio: float = 1.0             # executed fraction of every market order
+    slippage_bps: float = 0.0           # fills move against the taker by this much
+    perp_fill_delay_ms: float = 0.0     # > 0: futures orders ack as NEW and fill later on the user stream
+    spot_fee: float = 0.001
+    perp_fee: float = 0.0004
+    reject_rate: float = 0.0            # orders rejected with -2010 (insufficient balance)
+    lax_filters: bool = False           # accept quantities off the LOT_SIZE step (Binance rejects them)
+    error_rate: float = 0.0             # REST calls answered 503 / -1001
+    rate_limit_rate: float = 0.0        # REST calls answered 429 / -1003 with Retry-After
+    retry_after_s: int = 1
+    enforce_limits: bool = False        # answer 429 once the real Binance weight / order limits are exceeded
+    ws_drop_rate: float = 0.0           # per market message: probability of dropping that connection
+    queue_size: int = 100_000           # per-connection send queue; overflow is dropped and counted
+    basis_mean: float = 0.0
+    basis_vol: float = 0.0005
+    volatility: float = 0.0002
+    depth_levels: int = 20              # price levels per side in the depth streams / snapshots
+    depth_notional: float = 50_000.0    # mean USD quoted per level
+    seed: Optional[int] = None
+
+
+class _Conn:
+    """
+    One WebSocket client with its own bounded send queue and sender task.
+    """
+
+    __slots__ = ('ws', 'queue', 'task')
+
+    def __init__(self, ws: web.WebSocketResponse, queue_size: int):
+        self.ws = ws
+        self.queue: asyncio.Queue = asyncio.Queue(queue_size)
+        self.task: Optional[asyncio.Task] = None
+
+
+class _Window:
+    """
+    Fixed-window counter, aligned to the wall clock like Binance's.
+    """
+
+    __slots__ = ('limit', 'window', 'start', 'used')
+
+    def __init__(self, limit: int, window: int):
+        self.limit = limit
+        self.window = window
+        self.start = 0
+        self.used = 0
+
+    def add(self, n: float, now: float) -> float:
+        start = int(now // self.window)
+        if start != self.start:
+            self.start, self.used = start, 0
+        self.used += n
+        return self.used
+
+
+class ExchangeSimulator:
+    def __init__(self, config: SimConfig):
+        self.config = config
+        self.rng = random.Random(config.seed)
+        self.market = SimMarket(
+            config.symbols,
+            volatility=config.volatility,
+            basis_mean=config.basis_mean,
+            basis_vol=config.basis_vol,
+            seed=config.seed,
+        )
+        self.streams: Dict[str, Set[_Conn]] = {}
+        # Depth ladders per venue; their streams are keyed "<venue>:<symbol>@depth@100ms"
+        self.depth: Dict[str, Dict[str, SimDepth]] = {
+            venue: {s: SimDepth(config.depth_levels, config.depth_notional) for s in self.market.symbols}
+            for venue in ('spot', 'perp')
+        }
+        self.user_conns: Set[_Conn] = set()
+        self.listen_keys: Set[str] = set()
+        # Futures position per symbol: (signed qty, average entry price)
+        self.positions: Dict[str, List[float]] = {}
+        self.windows = {
+            venue: {name: _Window(limit, window) for name, (limit, window) in rules.items()}
+            for venue, rules in BINANCE_LIMITS.items()
+        }
+        self._order_ids = itertools.count(1_000_000)
+        self.stats = {
+            'ws_connections': 0,
+            'ws_api_connections': 0,
+            'messages_sent': 0,
+            'messages_dropped': 0,
+            'ws_drops': 0,
+            'rest_requests': 0,
+            'orders': 0,
+            'orders_rejected': 0,
+            'errors_injected': 0,
+            'rate_limited': 0,
+        }
+
+        self.app = web.Application(middlewares=[self._rest_middleware])
+        self.app.add_routes([
+            web.get('/stream', self._market_stream),
+            web.get('/fstream', self._market_stream),
+            web.get('/ws/{listen_key}', self._user_stream),
+            web.get('/ws-api/v3', self._ws_api),
+            web.get('/ws-fapi/v1', self._ws_api),
+            web.get('/stats', self._stats),
+            web.get('/api/v3/ping', self._ping),
+            web.get('/fapi/v1/ping', self._ping),
+            web.get('/api/v3/time', self._time),
+            web.get('/fapi/v1/time', self._time),
+            web.get('/api/v3/exchangeInfo', self._spot_exchange_info),
+            web.get('/fapi/v1/exchangeInfo', self._perp_exchange_info),
+            web.get('/sapi/v1/asset/tradeFee', self._trade_fee),
+            web.get('/fapi/v1/fundingRate', self._funding_rate),
+            web.get('/fapi/v1/premiumIndex', self._premium_index),
+            web.get('/api/v3/depth', self._depth_snapshot),
+            web.get('/fapi/v1/depth', self._depth_snapshot),
+            web.post('/api/v3/order', self._spot_order),
+            web.post('/fapi/v1/order', self._perp_order),
+            web.post('/fapi/v1/listenKey', self._new_listen_key),
+            web.put('/fapi/v1/listenKey', self._keepalive_listen_key),
+            web.delete('/fapi/v1/listenKey', self._delete_listen_key),
+            web.get('/fapi/v2/positionRisk', self._position_risk),
+        ])
+        self._runner: Optional[web.AppRunner] = None
+        self._generator: Optional[asyncio.Task] = None
+        self._depth_generator: Optional[asyncio.Task] = None
+        self._tasks: Set[asyncio.Task] = set()
+
+    # ------------------------------------------------------------------ lifecycle
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.config.host, self.config.port).start()
+        self._generator = asyncio.create_task(self._generate())
+        self._depth_generator = asyncio.create_task(self._generate_depth())
+        logging.info(
+            f"Exchange simulator on http://{self.config.host}:{self.config.port} "
+            f"({len(self.market.symbols)} symbols, {self.config.msg_rate:.0f} msg/s)"
+        )
+
+    async def close(self):
+        for generator in (self._generator, self._depth_generator):
+            if generator is not None:
+                generator.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    def _spawn(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    # ------------------------------------------------------------------ market data
+
+    async def _generate(self):
+        """
+        Emit `msg_rate` messages per second, round-robin over symbols, alternating
+        @ticker and @markPrice per symbol. Payloads are only built for streams
+        somebody is subscribed to.
+        """
+        market = self.market
+        order = market.order
+        streams = self.streams
+        latency_s = self.config.ws_latency_ms / 1000
+        budget = 0.0
+        last = time.monotonic()
+        rr = 0
+        while True:
+            await asyncio.sleep(0.001)
+            now = time.monotonic()
+            budget += (now - last) * self.config.msg_rate
+            last = now
+            n = int(budget)
+            budget -= n
+            now_ms = int(time.time() * 1000)
+            due = now + latency_s
+            for _ in range(n):
+                s: SimSymbol = order[rr % len(order)]
+                rr += 1
+                s.trade_id += 1
+                if s.trade_id & 1:
+                    market.step(s)
+                    conns = streams.get(f"{s.lower}@ticker")
+                    if conns:
+                        self._fan_out(conns, due, market.ticker_msg(s, now_ms))
+                else:
+                    conns = streams.get(f"{s.lower}@markPrice")
+                    conns_1s = streams.get(f"{s.lower}@markPrice@1s")
+                    if conns or conns_1s:
+                        msg = market.mark_price_msg(s, now_ms)
+                        for group in (conns, conns_1s):
+                            if group:
+                                self._fan_out(group, due, msg)
+
+    async def _generate_depth(self):
+        """
+        Every 100ms, publish one depth diff per subscribed (venue, symbol).
+        """
+        market = self.market
+        latency_s = self.config.ws_latency_ms / 1000
+        while True:
+            await asyncio.sleep(0.1)
+            now_ms = int(time.time() * 1000)
+            due = time.monotonic() + latency_s
+            for venue, ladders in self.depth.items():
+                for s in market.order:
+                    conns = self.streams.get(f"{venue}:{s.lower}@depth@100ms")
+                    if conns:
+                        self._fan_out(conns, due, market.depth_msg(s, venue == 'perp', ladders[s.symbol], now_ms))
+
+    def _fan_out(self, conns: Set[_Conn], due: float, msg: str):
+        for conn in conns:
+            try:
+                conn.queue.put_nowait((due, msg))
+            except asyncio.QueueFull:
+                self.stats['messages_dropped'] += 1
+
+    async def _sender(self, conn: _Conn, market_data: bool):
+        drop_rate = self.config.ws_drop_rate if market_data else 0.0
+        while True:
+            due, msg = await conn.queue.get()
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            await conn.ws.send_str(msg)
+            self.stats['messages_sent'] += 1
+            if drop_rate and self.rng.random() < drop_rate:
+                self.stats['ws_drops'] += 1
+                await conn.ws.close()
+                return
+
+    async def _serve_ws(self, request: web.Request, conn_groups: List[Set[_Conn]], market_data: bool):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        conn = _Conn(ws, self.config.queue_size)
+        for group in conn_groups:
+            group.add(conn)
+        conn.task = asyncio.create_task(self._sender(conn, market_data))
+        self.stats['ws_connections'] += 1
+        try:
+            async for _ in ws:  # client frames (pings, subscriptions) are ignored
+                pass
+        finally:
+            for group in conn_groups:
+                group.discard(conn)
+            conn.task.cancel()
+            self.stats['ws_connections'] -= 1
+        return ws
+
+    async def _market_stream(self, request: web.Request):
+        venue = 'perp' if request.path == '/fstream' else 'spot'
+        names = [
+            f"{venue}:{name}" if '@depth' in name else name
+            for name in request.query.get('streams', '').split('/') if name
+        ]
+        groups = [self.streams.setdefault(name, set()) for name in names]
+        return await self._serve_ws(request, groups, market_data=True)
+
+    async def _user_stream(self, request: web.Request):
+        if request.match_info['listen_key'] not in self.listen_keys:
+            return _error(400, -1125, "This listenKey does not exist.")
+        return await self._serve_ws(request, [self.user_conns], market_data=False)
+
+    def _push_user_event(self, event: dict):
+        msg = json.dumps(event)
+        self._fan_out(self.user_conns, 0.0, msg)
+
+    # ------------------------------------------------------------------ REST plumbing
+
+    @web.middleware
+    async def _rest_middleware(self, request: web.Request, handler):
+        path = request.path
+        if path in ('/stream', '/fstream', '/stats') or path.startswith('/ws/') or path in WS_API_PATHS:
+            return await handler(request)
+
+        cfg = self.config
+        self.stats['rest_requests'] += 1
+        await self._latency()
+
+        venue = 'perp' if path.startswith('/fapi/') else 'spot'
+        weight = PATH_WEIGHTS.get(path, 1)
+        orders = 1 if path in ORDER_PATHS and request.method == 'POST' else 0
+        used, over = self._count(venue, weight, orders)
+        headers = {HEADER_NAMES[name]: str(int(n)) for name, n in used.items() if name in HEADER_NAMES}
+
+        if (cfg.enforce_limits and over) or (cfg.rate_limit_rate and self.rng.random() < cfg.rate_limit_rate):
+            self.stats['rate_limited'] += 1
+            headers['Retry-After'] = str(cfg.retry_after_s)
+            resp = _error(429, -1003, "Too many requests; current limit is exceeded.")
+        elif cfg.error_rate and self.rng.random() < cfg.error_rate:
+            self.stats['errors_injected'] += 1
+            resp = _error(503, -1001, "Internal error; unable to process your request. Please try again.")
+        else:
+            resp = await handler(request)
+        resp.headers.update(headers)
+        return resp
+
+    async def _latency(self):
+        cfg = self.config
+        delay = cfg.rest_latency_ms + (self.rng.uniform(0, cfg.rest_jitter_ms) if cfg.rest_jitter_ms else 0.0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def _count(self, venue: str, weight: float, orders: int):
+        """
+        Add a request to the venue's limit windows; returns (used per window, over any limit).
+        """
+        now = time.time()
+        used = {}
+        over = False
+        for name, window in self.windows[venue].items():
+            used[name] = window.add(weight if name.startswith('weight') else orders, now)
+            over = over or used[name] > window.limit
+        return used, over
+
+    async def _params(self, request: web.Request) -> dict:
+        params = dict(request.query)
+        if request.can_read_body:
+            params.update(await request.post())
+        return params
+
+    def _symbol(self, params: dict) -> Optional[SimSymbol]:
+        return self.market.symbols.get(str(params.get('symbol', '')).upper())
+
+    # ------------------------------------------------------------------ public endpoints
+
+    async def _stats(self, request):
+        return web.json_response(self.stats)
+
+    async def _ping(self, request):
+        return web.json_response({})
+
+    async def _time(self, request):
+        return web.json_response({'serverTime': int(time.time() * 1000)})
+
+    async def _spot_exchange_info(self, request):
+        return web.json_response({
+            'timezone': 'UTC',
+            'serverTime': int(time.time() * 1000),
+            'rateLimits': [],
+            'exchangeFilters': [],
+            'symbols': [_spot_symbol_info(s) for s in self.market.symbols],
+        })
+
+    async def _perp_exchange_info(self, request):
+        return web.json_response({
+            'timezone': 'UTC',
+            'serverTime': int(time.time() * 1000),
+            'rateLimits': [],
+            'exchangeFilters': [],
+            'assets': [{'asset': 'USDT', 'marginAvailable': True, 'autoAssetExchange': '0'}],
+            'symbols': [_perp_symbol_info(s) for s in self.market.symbols],
+        })
+
+    async def _trade_fee(self, request):
+        fee = f"{self.config.spot_fee:.8f}"
+        return web.json_response([
+            {'symbol': s, 'makerCommission': fee, 'takerCommission': fee} for s in self.market.symbols
+        ])
+
+    async def _funding_rate(self, request):
+        params = await self._params(request)
+        s = self._symbol(params)
+        if s is None:
+            return _error(400, -1121, "Invalid symbol.")
+        return web.json_response(self.market.funding_history(s.symbol, int(params.get('limit', 100))))
+
+    async def _premium_index(self, request):
+        params = await self._params(request)
+        now_ms = int(time.time() * 1000)
+
+        def row(s: SimSymbol) -> dict:
+            return {
+                'symbol': s.symbol,
+                'markPrice': f"{s.perp:.8f}",
+                'indexPrice': f"{s.spot:.8f}",
+                'estimatedSettlePrice': f"{s.perp:.8f}",
+                'lastFundingRate': f"{s.funding_rate:.8f}",
+                'interestRate': '0.00010000',
+                'nextFundingTime': self.market.next_funding_ms(now_ms),
+                'time': now_ms,
+            }
+
+        if 'symbol' in params:
+            s = self._symbol(params)
+            if s is None:
+                return _error(400, -1121, "Invalid symbol.")
+            return web.json_response(row(s))
+        return web.json_response([row(s) for s in self.market.order])
+
+    async def _depth_snapshot(self, request):
+        params = await self._params(request)
+        s = self._symbol(params)
+        if s is None:
+            return _error(400, -1121, "Invalid symbol.")
+        perp = request.path.startswith('/fapi/')
+        snapshot = self.depth['perp' if perp else 'spot'][s.symbol].snapshot()
+        if perp:
+            now_ms = int(time.time() * 1000)
+            snapshot = {'lastUpdateId': snapshot['lastUpdateId'], 'E': now_ms, 'T': now_ms, **snapshot}
+        return web.json_response(snapshot)
+
+    # ------------------------------------------------------------------ orders
+
+    def _fill(self, s: SimSymbol, side: str, qty: float, perp: bool):
+        executed = round(qty * self.config.fill_ratio, 8)
+        sign = 1 if side == 'BUY' else -1
+        price = (s.perp if perp else s.spot) * (1 + sign * self.config.slippage_bps / 10_000)
+        return executed, price
+
+    def _check_order(self, params: dict, perp: bool):
+        """
+        Common validation; returns (symbol, side, qty) or raises _OrderError.
+        """
+        s = self._symbol(params)
+        if s is None:
+            raise _OrderError(400, -1121, "Invalid symbol.")
+        side = str(params.get('side', '')).upper()
+        if side not in ('BUY', 'SELL'):
+            raise _OrderError(400, -1117, "Invalid side.")
+        if str(params.get('type', '')).upper() != 'MARKET':
+            raise _OrderError(400, -1116, "Invalid orderType.")
+        try:
+            qty = float(params.get('quantity'))
+        except (TypeError, ValueError):
+            raise _OrderError(400, -1102, "Mandatory parameter 'quantity' was not sent, was empty/null, or malformed.")
+        if qty <= 0:
+            raise _OrderError(400, -1013, "Invalid quantity.")
+        self.stats['orders'] += 1
+        steps = qty / float(PERP_STEP if perp else SPOT_STEP)
+        if not self.config.lax_filters and abs(steps - round(steps)) > 1e-6:
+            self.stats['orders_rejected'] += 1
+            raise _OrderError(400, -1013, "Filter failure: LOT_SIZE")
+        if self.config.reject_rate and self.rng.random() < self.config.reject_rate:
+            self.stats['orders_rejected'] += 1
+            raise _OrderError(400, -2010, "Account has insufficient balance for requested action.")
+        return s, side, qty
+
+    async def _spot_order(self, request):
+        try:
+            return web.json_response(self._place_spot(await self._params(request)))
+        except _OrderError as e:
+            return _error(e.status, e.code, e.msg)
+
+    async def _perp_order(self, request):
+        try:
+            return web.json_response(self._place_perp(await self._params(request)))
+        except _OrderError as e:
+            return _error(e.status, e.code, e.msg)
+
+    def _place_spot(self, params: dict) -> dict:
+        s, side, qty = self._check_order(params, perp=False)
+        executed, price = self._fill(s, side, qty, perp=False)
+        now_ms = int(time.time() * 1000)
+        order_id = next(self._order_ids)
+        fills = []
+        if executed > 0:
+            s.trade_id += 1
+            fills.append({
+                'price': f"{price:.8f}",
+                'qty': f"{executed:.8f}",
+                'commission': f"{executed * price * self.config.spot_fee:.8f}",
+                'commissionAsset': 'USDT',
+                'tradeId': s.trade_id,
+            })
+        return {
+            'symbol': s.symbol,
+            'orderId': order_id,
+            'orderListId': -1,
+            'clientOrderId': str(params.get('newClientOrderId') or uuid.uuid4().hex[:22]),
+            'transactTime': now_ms,
+            'price': '0.00000000',
+            'origQty': f"{qty:.8f}",
+            'executedQty': f"{executed:.8f}",
+            'cummulativeQuoteQty': f"{executed * price:.8f}",
+            'status': 'FILLED' if executed >= qty else ('EXPIRED' if executed == 0 else 'PARTIALLY_FILLED'),
+            'timeInForce': 'GTC',
+            'type': 'MARKET',
+            'side': side,
+            'workingTime': now_ms,
+            'fills': fills,
+            'selfTradePreventionMode': 'NONE',
+        }
+
+    def _place_perp(self, params: dict) -> dict:
+        s, side, qty = self._check_order(params, perp=True)
+        reduce_only = str(params.get('reduceOnly', 'false')).lower() == 'true'
+        sign = 1 if side == 'BUY' else -1
+
+        pos_qty = self.positions.get(s.symbol, [0.0, 0.0])[0]
+        if reduce_only:
+            if pos_qty == 0 or (pos_qty > 0) == (sign > 0):
+                self.stats['orders_rejected'] += 1
+                raise _OrderError(400, -2022, "ReduceOnly Order is rejected.")
+            qty = min(qty, abs(pos_qty))
+
+        executed, price = self._fill(s, side, qty, perp=True)
+        order = {
+            'orderId': next(self._order_ids),
+            'symbol': s.symbol,
+            'clientOrderId': str(params.get('newClientOrderId') or uuid.uuid4().hex[:22]),
+            'price': '0',
+            'origQty': f"{qty:.8f}",
+            'timeInForce': 'GTC',
+            'type': 'MARKET',
+            'reduceOnly': reduce_only,
+            'closePosition': False,
+            'side': side,
+            'positionSide': 'BOTH',
+            'stopPrice': '0',
+            'workingType': 'CONTRACT_PRICE',
+            'priceProtect': False,
+            'origType': 'MARKET',
+            'updateTime': int(time.time() * 1000),
+        }
+
+        if self.config.perp_fill_delay_ms > 0:
+            self._spawn(self._delayed_perp_fill(order, s, sign, executed, price))
+            order.update(status='NEW', executedQty='0', cumQty='0', cumQuote='0', avgPrice='0.00000')
+        else:
+            self._settle_perp(order, s, sign, executed, price)
+        return order
+
+    async def _ws_api(self, request: web.Request):
+        """
+        WebSocket API: `order.place` requests, answered with the REST order body
+        as `result` plus the order-count `rateLimits`.
+        """
+        venue = WS_API_PATHS[request.path]
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.stats['ws_api_connections'] += 1
+        try:
+            async for frame in ws:
+                if frame.type != WSMsgType.TEXT:
+                    continue
+                req = json.loads(frame.data)
+                self._spawn(self._ws_api_call(ws, venue, req))
+        finally:
+            self.stats['ws_api_connections'] -= 1
+        return ws
+
+    async def _ws_api_call(self, ws: web.WebSocketResponse, venue: str, req: dict):
+        cfg = self.config
+        await self._latency()
+        resp = {'id': req.get('id')}
+        if req.get('method') != 'order.place':
+            resp.update(status=400, error={'code': -1100, 'msg': "Unsupported method."})
+            await ws.send_str(json.dumps(resp))
+            return
+        used, over = self._count(venue, PATH_WEIGHTS['/fapi/v1/order' if venue == 'perp' else '/api/v3/order'], 1)
+        resp['rateLimits'] = [
+            {'rateLimitType': kind, 'interval': interval, 'intervalNum': num,
+             'limit': self.windows[venue][name].limit, 'count': int(used[name])}
+            for name, (kind, interval, num) in WS_RATE_LIMITS.items() if name in used
+        ]
+        if (cfg.enforce_limits and over) or (cfg.rate_limit_rate and self.rng.random() < cfg.rate_limit_rate):
+            self.stats['rate_limited'] += 1
+            resp.update(status=429, error={
+                'code': -1003, 'msg': "Too many requests; current limit is exceeded.",
+                'data': {'retryAfter': int(time.time() * 1000) + cfg.retry_after_s * 1000},
+            })
+        else:
+            try:
+                params = req.get('params') or {}
+                result = self._place_perp(params) if venue == 'perp' else self._place_spot(params)
+                resp.update(status=200, result=result)
+            except _OrderError as e:
+                resp.update(status=e.status, error={'code': e.code, 'msg': e.msg})
+        await ws.send_str(json.dumps(resp))
+
+    async def _delayed_perp_fill(self, order: dict, s: SimSymbol, sign: int, executed: float, price: float):
+        await asyncio.sleep(self.config.perp_fill_delay_ms / 1000)
+        self._settle_perp(order, s, sign, executed, price)
+
+    def _settle_perp(self, order: dict, s: SimSymbol, sign: int, executed: float, price: float):
+        """
+        Book the fill into the futures position and publish ORDER_TRADE_UPDATE.
+        """
+        qty = float(order['origQty'])
+        realized = 0.0
+        if executed > 0:
+            pos = self.positions.setdefault(s.symbol, [0.0, 0.0])
+            pos_qty, entry = pos
+            delta = sign * executed
+            if pos_qty and (pos_qty > 0) != (delta > 0):
+                closed = min(abs(delta), abs(pos_qty))
+                realized = closed * (price - entry) * (1 if pos_qty > 0 else -1)
+            new_qty = pos_qty + delta
+            if new_qty == 0:
+                pos[:] = [0.0, 0.0]
+            elif pos_qty == 0 or (pos_qty > 0) != (new_qty > 0):
+                pos[:] = [new_qty, price]
+            elif (pos_qty > 0) == (delta > 0):
+                pos[:] = [new_qty, (pos_qty * entry + delta * price) / new_qty]
+            else:
+                pos[0] = new_qty
+
+        status = 'FILLED' if executed >= qty else ('EXPIRED' if executed == 0 else 'PARTIALLY_FILLED')
+        order.update(
+            status=status,
+            executedQty=f"{executed:.8f}",
+            cumQty=f"{executed:.8f}",
+            cumQuote=f"{executed * price:.8f}",
+            avgPrice=f"{price:.8f}" if executed else '0.00000',
+            updateTime=int(time.time() * 1000),
+        )
+
+        now_ms = int(time.time() * 1000)
+        if executed > 0:
+            s.trade_id += 1
+            self._push_user_event(self._order_event(order, 'TRADE', status, executed, price, realized, s.trade_id, now_ms))
+        if executed < qty:
+            # Unfilled remainder of a market order expires
+            self._push_user_event(self._order_event(order, 'EXPIRED', 'EXPIRED', 0.0, price, 0.0, 0, now_ms))
+
+    def _order_event(self, order: dict, exec_type: str, status: str, last_qty: float, price: float,
+                     realized: float, trade_id: int, now_ms: int) -> dict:
+        executed = float(order['executedQty'])
+        return {
+            'e': 'ORDER_TRADE_UPDATE',
+            'E': now_ms,
+            'T': now_ms,
+            'o': {
+                's': order['symbol'],
+                'c': order['clientOrderId'],
+                'S': order['side'],
+                'o': 'MARKET',
+                'f': 'GTC',
+                'q': order['origQty'],
+                'p': '0',
+                'ap': f"{price:.8f}" if executed else '0',
+                'sp': '0',
+                'x': exec_type,
+                'X': status,
+                'i': order['orderId'],
+                'l': f"{last_qty:.8f}",
+                'z': f"{executed:.8f}",
+                'L': f"{price:.8f}" if last_qty else '0',
+                'N': 'USDT',
+                'n': f"{last_qty * price * self.config.perp_fee:.8f}",
+                'T': now_ms,
+                't': trade_id,
+                'b': '0',
+                'a': '0',
+                'm': False,
+                'R': order['reduceOnly'],
+                'wt': 'CONTRACT_PRICE',
+                'ot': 'MARKET',
+                'ps': 'BOTH',
+                'cp': False,
+                'rp': f"{realized:.8f}",
+            },
+        }
+
+    async def _position_risk(self, request):
+        now_ms = int(time.time() * 1000)
+        rows = []
+        for s in self.market.order:
+            qty, entry = self.positions.get(s.symbol, [0.0, 0.0])
+            rows.append({
+                'symbol': s.symbol,
+                'positionAmt': f"{qty:.8f}",
+                'entryPrice': f"{entry:.8f}",
+                'markPrice': f"{s.perp:.8f}",
+                'unRealizedProfit': f"{qty * (s.perp - entry):.8f}",
+                'leverage': '20',
+                'marginType': 'cross',
+                'positionSide': 'BOTH',
+                'updateTime': now_ms,
+            })
+        return web.json_response(rows)
+
+    # ------------------------------------------------------------------ listen keys
+
+    async def _new_listen_key(self, request):
+        key = uuid.uuid4().hex + uuid.uuid4().hex
+        self.listen_keys.add(key)
+        return web.json_response({'listenKey': key})
+
+    async def _keepalive_listen_key(self, request):
+        return web.json_response({})
+
+    async def _delete_listen_key(self, request):
+        params = await self._params(request)
+        self.listen_keys.discard(params.get('listenKey', ''))
+        return web.json_response({})
+
+
+class _OrderError(Exception):
+    def __init__(self, status: int, code: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+        self.code = code
+        self.msg = msg
+
+
+def _error(status: int, code: int, msg: str) -> web.Response:
+    return web.json_response({'code': code, 'msg': msg}, status=status)
+
+
+def _base_quote(symbol: str):
+    for quote in ('USDT', 'USDC', 'BUSD', 'FDUSD', 'BTC'):
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return symbol[:-len(quote)], quote
+    return symbol[:-4], symbol[-4:]
+
+
+def _spot_symbol_info(symbol: str) -> dict:
+    base, quote = _base_quote(symbol)
+    return {
+        'symbol': symbol,
+        'status': 'TRADING',
+        'baseAsset': base,
+        'baseAssetPrecision': 8,
+        'quoteAsset': quote,
+        'quotePrecision': 8,
+        'quoteAssetPrecision': 8,
+        'orderTypes': ['LIMIT', 'MARKET'],
+        'icebergAllowed': True,
+        'ocoAllowed': True,
+        'isSpotTradingAllowed': True,
+        'isMarginTradingAllowed': False,
+        'filters': [
+            {'filterType': 'PRICE_FILTER', 'minPrice': '0.00000001', 'maxPrice': '1000000.00000000', 'tickSize': '0.00000001'},
+            {'filterType': 'LOT_SIZE', 'minQty': SPOT_STEP, 'maxQty': '9000000.00000000', 'stepSize': SPOT_STEP},
+            {'filterType': 'MARKET_LOT_SIZE', 'minQty': '0.00000000', 'maxQty': '9000000.00000000', 'stepSize': '0.00000000'},
+            {'filterType': 'NOTIONAL', 'minNotional': '5.00000000', 'applyMinToMarket': True,
+             'maxNotional': '9000000.00000000', 'applyMaxToMarket': False, 'avgPriceMins': 5},
+        ],
+        'permissions': ['SPOT'],
+        'permissionSets': [['SPOT']],
+    }
+
+
+def _perp_symbol_info(symbol: str) -> dict:
+    base, quote = _base_quote(symbol)
+    return {
+        'symbol': symbol,
+        'pair': symbol,
+        'contractType': 'PERPETUAL',
+        'deliveryDate': 4133404800000,
+        'onboardDate': 1569398400000,
+        'status': 'TRADING',
+        'baseAsset': base,
+        'quoteAsset': quote,
+        'marginAsset': quote,
+        'pricePrecision': 2,
+        'quantityPrecision': 3,
+        'baseAssetPrecision': 8,
+        'quotePrecision': 8,
+        'underlyingType': 'COIN',
+        'settlePlan': 0,
+        'triggerProtect': '0.0500',
+        'filters': [
+            {'filterType': 'PRICE_FILTER', 'minPrice': '0.01', 'maxPrice': '1000000', 'tickSize': '0.01'},
+            {'filterType': 'LOT_SIZE', 'minQty': PERP_STEP, 'maxQty': '1000', 'stepSize': PERP_STEP},
+            {'filterType': 'MARKET_LOT_SIZE', 'minQty': PERP_STEP, 'maxQty': '120', 'stepSize': PERP_STEP},
+            {'filterType': 'MIN_NOTIONAL', 'notional': '5'},
+        ],
+        'orderTypes': ['LIMIT', 'MARKET'],
+        'timeInForce': ['GTC', 'IOC', 'FOK', 'GTX'],
+    }
+
+
+def configure_ccxt(exchange, base_url: str):
+    """
+    Point a ccxt.binance instance at the simulator: every REST host is swapped
+    for `base_url` (paths are kept) and only spot + USDT-M markets are loaded.
+    """
+    base = base_url.rstrip('/')
+    for key, url in exchange.urls['api'].items():
+        if isinstance(url, str) and url.startswith('http'):
+            parts = urlsplit(url)
+            exchange.urls['api'][key] = base + parts.path
+    exchange.options['fetchMarkets'] = {'types': ['spot', 'linear']}
+    exchange.options['fetchMargins'] = False
+    exchange.options['fetchCurrencies'] = False
+    return exchange
+
+
+def _parse_args() -> SimConfig:
+    parser = argparse.ArgumentParser(description="Local Binance spot/perp simulator.")
+    defaults = SimConfig()
+    for f in fields(SimConfig):
+        flag = '--' + f.name.replace('_', '-')
+        default = getattr(defaults, f.name)
+        if f.name == 'symbols':
+            parser.add_argument(flag, default=','.join(default), help="comma-separated symbols")
+        elif isinstance(default, bool):
+            parser.add_argument(flag, action='store_true', default=default)
+        elif f.name == 'seed':
+            parser.add_argument(flag, type=int, default=None)
+        else:
+            parser.add_argument(flag, type=type(default), default=default)
+    args = vars(parser.parse_args())
+    args['symbols'] = [s.strip().upper() for s in args['symbols'].split(',') if s.strip()]
+    return SimConfig(**args)
+
+
+async def _serve(config: SimConfig):
+    sim = ExchangeSimulator(config)
+    await sim.start()
+    try:
+        while True:
+            await asyncio.sleep(10)
+            logging.info(f"Simulator stats: {sim.stats}")
+    finally:
+        await sim.close()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    try:
+        asyncio.run(_serve(_parse_args()))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+# sim/market.py
+
+import json
+import math
+import random
+import time
+from typing import Dict, List
+
+FUNDING_INTERVAL_MS = 8 * 3600 * 1000
+
+
+class SimSymbol:
+    """
+    Synthetic spot/perp pair: spot follows a random walk, the perp basis mean-reverts
+    (Ornstein-Uhlenbeck) around `basis_mean`, so entry and exit signals both occur.
+    """
+
+    __slots__ = ('symbol', 'lower', 'spot', 'basis', 'funding_rate', 'trade_id')
+
+    def __init__(self, symbol: str, spot: float, basis: float, funding_rate: float):
+        self.symbol = symbol
+        self.lower = symbol.lower()
+        self.spot = spot
+        self.basis = basis
+        self.funding_rate = funding_rate
+        self.trade_id = 0
+
+    @property
+    def perp(self) -> float:
+        return self.spot * (1 + self.basis)
+
+
+class SimDepth:
+    """
+    Top-of-book ladder for one symbol on one venue. Every `diff` re-quotes
+    `levels` price levels per side around the current price and zeroes the
+    levels that fell out, so a client applying diffs in sequence ends up with
+    exactly the published ladder (which is also what `snapshot` returns).
+    """
+
+    __slots__ = ('levels', 'notional', 'update_id', 'bids', 'asks')
+
+    def __init__(self, levels: int = 20, notional: float = 50_000.0):
+        self.levels = levels
+        self.notional = notional     # mean USD quoted per level
+        self.update_id = 1
+        self.bids: Dict[str, str] = {}
+        self.asks: Dict[str, str] = {}
+
+    @staticmethod
+    def _tick(price: float) -> float:
+        return 10 ** (math.floor(math.log10(price)) - 4)
+
+    def diff(self, price: float, rng: random.Random):
+        """
+        Re-quote around `price`. Returns (U, u, pu, bid changes, ask changes).
+        """
+        tick = self._tick(price)
+        top = math.floor(price / tick)
+        mean_qty = self.notional / price
+        bids = {
+            f"{(top - i) * tick:.8f}": f"{mean_qty * rng.uniform(0.2, 1.8):.8f}" for i in range(self.levels)
+        }
+        asks = {
+            f"{(top + 1 + i) * tick:.8f}": f"{mean_qty * rng.uniform(0.2, 1.8):.8f}" for i in range(self.levels)
+        }
+        bid_changes = [[p, q] for p, q in bids.items()] + [[p, '0.00000000'] for p in self.bids if p not in bids]
+        ask_changes = [[p, q] for p, q in asks.items()] + [[p, '0.00000000'] for p in self.asks if p not in asks]
+        self.bids, self.asks = bids, asks
+        prev = self.update_id
+        first = prev + 1
+        self.update_id = prev + len(bid_changes) + len(ask_changes)
+        return first, self.update_id, prev, bid_changes, ask_changes
+
+    def snapshot(self) -> dict:
+        return {
+            'lastUpdateId': self.update_id,
+            'bids': [[p, q] for p, q in self.bids.items()],
+            'asks': [[p, q] for p, q in self.asks.items()],
+        }
+
+
+class SimMarket:
+    """
+    Price state for every simulated symbol plus Binance-shaped stream payloads.
+    Payload key order matches Binance, so data.decoders' fast path is exercised.
+    """
+
+    def __init__(
+        self,
+        symbols: List[str],
+        volatility: float = 0.0002,    # per-step log-return stdev of spot
+        basis_mean: float = 0.0,
+        basis_vol: float = 0.0005,     # per-step stdev of the basis
+        basis_reversion: float = 0.05, # fraction of the gap to basis_mean closed per step
+        seed: int = None,
+    ):
+        self.rng = random.Random(seed)
+        self.volatility = volatility
+        self.basis_mean = basis_mean
+        self.basis_vol = basis_vol
+        self.basis_reversion = basis_reversion
+        self.symbols: Dict[str, SimSymbol] = {}
+        for i, symbol in enumerate(symbols):
+            spot = 30_000.0 / (i + 1)
+            self.symbols[symbol] = SimSymbol(symbol, spot, basis_mean, 0.0001)
+        self.order: List[SimSymbol] = list(self.symbols.values())
+
+    def step(self, s: SimSymbol):
+        rng = self.rng
+        s.spot *= math.exp(self.volatility * rng.gauss(0.0, 1.0))
+        s.basis += self.basis_reversion * (self.basis_mean - s.basis) + self.basis_vol * rng.gauss(0.0, 1.0)
+        s.funding_rate = max(-0.0075, min(0.0075, s.funding_rate + 0.000001 * rng.gauss(0.0, 1.0)))
+
+    @staticmethod
+    def next_funding_ms(now_ms: int) -> int:
+        return (now_ms // FUNDING_INTERVAL_MS + 1) * FUNDING_INTERVAL_MS
+
+    def ticker_msg(self, s: SimSymbol, now_ms: int) -> str:
+        c = f"{s.spot:.8f}"
+        return (
+            f'{{"stream":"{s.lower}@ticker","data":{{"e":"24hrTicker","E":{now_ms},"s":"{s.symbol}",'
+            f'"p":"0.00000000","P":"0.000","w":"{c}","x":"{c}","c":"{c}","Q":"0.00100000",'
+            f'"b":"{c}","B":"1.00000000","a":"{c}","A":"1.00000000","o":"{c}","h":"{c}","l":"{c}",'
+            f'"v":"0.00000000","q":"0.00000000","O":{now_ms - 86_400_000},"C":{now_ms},'
+            f'"F":0,"L":{s.trade_id},"n":{s.trade_id}}}}}'
+        )
+
+    def mark_price_msg(self, s: SimSymbol, now_ms: int) -> str:
+        return (
+            f'{{"stream":"{s.lower}@markPrice","data":{{"e":"markPriceUpdate","E":{now_ms},"s":"{s.symbol}",'
+            f'"p":"{s.perp:.8f}","i":"{s.spot:.8f}","P":"{s.perp:.8f}","r":"{s.funding_rate:.8f}",'
+            f'"T":{self.next_funding_ms(now_ms)}}}}}'
+        )
+
+    def depth_msg(self, s: SimSymbol, perp: bool, depth: SimDepth, now_ms: int) -> str:
+        """
+        `<symbol>@depth@100ms` diff; perp diffs carry `T` and `pu` like Binance futures.
+        """
+        first, last, prev, bids, asks = depth.diff(s.perp if perp else s.spot, self.rng)
+        head = f'"E":{now_ms},"T":{now_ms},' if perp else f'"E":{now_ms},'
+        tail = f',"pu":{prev}' if perp else ''
+        return (
+            f'{{"stream":"{s.lower}@depth@100ms","data":{{"e":"depthUpdate",{head}"s":"{s.symbol}",'
+            f'"U":{first},"u":{last}{tail},"b":{json.dumps(bids)},"a":{json.dumps(asks)}}}}}'
+        )
+
+    def funding_history(self, symbol: str, limit: int = 100) -> List[dict]:
+        """
+        /fapi/v1/fundingRate rows for past settlements at the current rate.
+        """
+        s = self.symbols[symbol]
+        last = self.next_funding_ms(int(time.time() * 1000)) - FUNDING_INTERVAL_MS
+        return [
+            {
+                'symbol': symbol,
+                'fundingTime': last - k * FUNDING_INTERVAL_MS,
+                'fundingRate': f"{s.funding_rate:.8f}",
+                'markPrice': f"{s.perp:.8f}",
+            }
+            for k in reversed(range(min(limit, 1000)))
+        ]
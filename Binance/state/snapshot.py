@@ -0,0 +1,259 @@
+# state/snapshot.py
+#
+# Warm restart. Cold start-up waits on load_markets, fetch_fees and the funding
+# REST fetch before the first tick is handled, and the risk state (equity,
+# win-rate window) starts over. A snapshot of all of it is written every few
+# seconds and on shutdown; at boot it is restored without any REST call, and
+# the exchange is asked the same questions in the background to confirm it.
+#
+# Open positions belong to the fill ledger (exec.fill_ledger): the snapshot only
+# marks how much of the ledger its equity and outcomes already contain, and
+# carries the ledger itself when that has no file.
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional, Tuple
+
+from exec.order_gateway import MarketFilters
+from exec.rate_limiter import ACCOUNT, METADATA, PassthroughScheduler
+
+# Bumped when the layout changes; other versions are ignored
+SNAPSHOT_VERSION = 1
+# /fapi/v2/positionRisk without a symbol
+POSITION_RISK_WEIGHT = 5
+# Perp quantity mismatch (exchange vs ledger) below which positions agree
+POSITION_TOLERANCE = 1e-9
+
+
+@dataclass
+class Snapshot:
+    """
+    Everything a restart needs before it can trade. `markets` holds only the
+    ccxt markets (spot and perp) of the traded symbols; `ledger_mark` is the fill
+    ledger's (closed count, closed PnL) included in `equity` / `outcomes`.
+    """
+    written_ms: int
+    symbols: List[str]
+    markets: Dict[str, dict]
+    maker_fee: float
+    taker_fee: float
+    funding: Dict[str, List[float]]
+    equity: float
+    outcomes: List[int]
+    ledger_mark: Tuple[int, float]
+    ledger_state: Optional[List[dict]] = None
+    version: int = SNAPSHOT_VERSION
+
+    @property
+    def age_s(self) -> float:
+        return time.time() - self.written_ms / 1000
+
+    # ------------------------------------------------------------------ restore
+
+    def restore_markets(self, exchange, symbols: List[str], max_age_s: float) -> bool:
+        """
+        Install the snapshot's markets into ccxt (no load_markets request) if the
+        snapshot is recent enough and covers both venues of every symbol.
+        """
+        if self.age_s > max_age_s:
+            logging.info(f"Snapshot is {self.age_s:.0f}s old; loading markets from the exchange.")
+            return False
+        spot = {m['id'] for m in self.markets.values() if m.get('spot')}
+        perp = {m['id'] for m in self.markets.values() if m.get('swap')}
+        missing = [s for s in symbols if s not in spot or s not in perp]
+        if missing:
+            logging.info(f"Snapshot has no markets for {missing}; loading markets from the exchange.")
+            return False
+        exchange.set_markets(self.markets)
+        return True
+
+    def restore_fees(self, risk_manager):
+        risk_manager.maker_fee = self.maker_fee
+        risk_manager.taker_fee = self.taker_fee
+
+    def restore_funding(self, funding) -> int:
+        return funding.load_state(self.funding)
+
+    def restore_risk(self, risk_manager):
+        """
+        Equity and the win-rate window. Positions come back through the fill
+        ledger (OrderExecutor.restore with `since=self.ledger_mark`).
+        """
+        risk_manager.equity = self.equity
+        for outcome in self.outcomes:
+            risk_manager.historical_outcomes.append(outcome)
+
+    def restore_ledger(self, ledger):
+        """
+        Memory-only ledgers have no file to replay; their state travels here.
+        """
+        if self.ledger_state and ledger.path is None:
+            ledger.load_state(self.ledger_state)
+
+
+def capture(exchange, risk_manager, funding, ledger, symbols: List[str]) -> Snapshot:
+    """
+    Snapshot of the live state; cheap enough to take on the event loop.
+    """
+    ids = set(symbols)
+    markets = {
+        key: market for key, market in (exchange.markets or {}).items()
+        if market.get('id') in ids and (market.get('spot') or market.get('swap'))
+    }
+    return Snapshot(
+        written_ms=int(time.time() * 1000),
+        symbols=list(symbols),
+        markets=markets,
+        maker_fee=risk_manager.maker_fee,
+        taker_fee=risk_manager.taker_fee,
+        funding=funding.state() if funding is not None else {},
+        equity=risk_manager.equity,
+        outcomes=list(risk_manager.historical_outcomes),
+        ledger_mark=(ledger.closed_count, ledger.closed_pnl),
+        ledger_state=ledger.export_state() if ledger.path is None else None,
+    )
+
+
+def write_snapshot(path: str, snapshot: Snapshot):
+    """
+    Atomic replace: a crash mid-write leaves the previous snapshot in place.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as f:
+        json.dump(asdict(snapshot), f, separators=(',', ':'))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def load_snapshot(path: str) -> Optional[Snapshot]:
+    if not path or not os.path.exists(path):
+        return None
+    t0 = time.perf_counter()
+    try:
+        with open(path) as f:
+            raw = json.load(f)
+        if raw.get('version') != SNAPSHOT_VERSION:
+            logging.warning(f"Ignoring snapshot {path}: version {raw.get('version')} != {SNAPSHOT_VERSION}")
+            return None
+        raw['ledger_mark'] = tuple(raw['ledger_mark'])
+        snapshot = Snapshot(**raw)
+    except (OSError, ValueError, TypeError, KeyError) as e:
+        logging.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+    logging.info(
+        f"Loaded snapshot {path} in {(time.perf_counter() - t0) * 1000:.1f}ms "
+        f"({snapshot.age_s:.0f}s old, equity {snapshot.equity:.2f}, {len(snapshot.outcomes)} outcomes)."
+    )
+    return snapshot
+
+
+class SnapshotWriter:
+    """
+    Takes a snapshot every `interval_s` and on `close`; the file write runs in a
+    worker thread so the event loop only pays for the capture.
+    """
+
+    def __init__(self, path: str, exchange, risk_manager, funding, ledger, symbols: List[str],
+                 interval_s: float):
+        self.path = path
+        self.exchange = exchange
+        self.risk_manager = risk_manager
+        self.funding = funding
+        self.ledger = ledger
+        self.symbols = symbols
+        self.interval_s = interval_s
+        self.written: int = 0
+
+    def _capture(self) -> Snapshot:
+        return capture(self.exchange, self.risk_manager, self.funding, self.ledger, self.symbols)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            try:
+                await asyncio.to_thread(write_snapshot, self.path, self._capture())
+                self.written += 1
+            except Exception as e:
+                logging.error(f"Snapshot write to {self.path} failed: {e}")
+
+    def close(self):
+        """
+        Final synchronous snapshot on shutdown.
+        """
+        try:
+            write_snapshot(self.path, self._capture())
+        except Exception as e:
+            logging.error(f"Snapshot write to {self.path} failed: {e}")
+
+
+def _filter_key(filters: MarketFilters, symbol: str) -> tuple:
+    return tuple(
+        (f.step, f.min_qty, f.max_qty, f.min_notional) if f is not None else None
+        for f in (filters.spot.get(symbol), filters.perp.get(symbol))
+    )
+
+
+async def verify_snapshot(exchange, scheduler, risk_manager, funding, executor, symbols: List[str]):
+    """
+    Background check of a warm start against the exchange: reload markets (and
+    swap in new lot filters if they changed), re-fetch fees, fetch funding for
+    symbols the snapshot had no schedule for, and compare perp positions with
+    the fill ledger. Differences are logged and the live values win.
+    """
+    scheduler = scheduler or PassthroughScheduler()
+    t0 = time.perf_counter()
+    try:
+        await scheduler.call(exchange.load_markets, True, venue='spot', weight=20, priority=METADATA)
+        filters = MarketFilters(exchange.markets)
+        changed = [s for s in symbols if _filter_key(filters, s) != _filter_key(executor.filters, s)]
+        if changed:
+            logging.warning(f"Lot filters changed since the snapshot for {changed}; using the exchange's.")
+        executor.set_filters(filters)
+    except Exception as e:
+        logging.warning(f"Snapshot check: load_markets failed ({e}); keeping the snapshot's markets.")
+
+    maker, taker = risk_manager.maker_fee, risk_manager.taker_fee
+    await risk_manager.fetch_fees(exchange, scheduler, symbols[0])
+    if (maker, taker) != (risk_manager.maker_fee, risk_manager.taker_fee):
+        logging.warning(
+            f"Fees changed since the snapshot: maker {maker} -> {risk_manager.maker_fee}, "
+            f"taker {taker} -> {risk_manager.taker_fee}."
+        )
+
+    if funding is not None and not all(funding.next_ms):
+        await funding.bootstrap(exchange, scheduler, missing_only=True)
+
+    await check_positions(exchange, scheduler, executor.ledger, symbols)
+    logging.info(f"Snapshot checked against the exchange in {time.perf_counter() - t0:.2f}s.")
+
+
+async def check_positions(exchange, scheduler, ledger, symbols: List[str]) -> Dict[str, Tuple[float, float]]:
+    """
+    Perp position per symbol on the exchange vs the ledger's open hedges; returns
+    the mismatches as {symbol: (exchange qty, ledger qty)}.
+    """
+    try:
+        rows = await scheduler.call(
+            exchange.fapiPrivateV2GetPositionRisk, venue='perp', weight=POSITION_RISK_WEIGHT, priority=ACCOUNT
+        )
+    except Exception as e:
+        logging.warning(f"Snapshot check: position request failed ({e}).")
+        return {}
+    held = {row['symbol']: float(row.get('positionAmt') or 0.0) for row in rows}
+    booked: Dict[str, float] = {}
+    for hedge in ledger.open_hedges():
+        booked[hedge.symbol] = booked.get(hedge.symbol, 0.0) + hedge.perp.qty
+    mismatches = {}
+    for symbol in symbols:
+        on_exchange, in_ledger = held.get(symbol, 0.0), booked.get(symbol, 0.0)
+        if abs(on_exchange - in_ledger) > POSITION_TOLERANCE:
+            mismatches[symbol] = (on_exchange, in_ledger)
+    if mismatches:
+        logging.warning(f"Perp positions differ from the fill ledger (exchange, ledger): {mismatches}")
+    return mismatches
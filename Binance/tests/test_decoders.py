@@ -0,0 +1,68 @@
+# tests/test_decoders.py
+
+import json
+
+import pytest
+
+from data.decoders import MARK_PRICE, OTHER, TICKER, decode, decode_mark_price, decode_ticker, stream_name
+from sim.market import SimMarket
+
+# Payloads as Binance sends them (key order of the live streams)
+TICKER_MSG = (
+    '{"stream":"btcusdt@ticker","data":{"e":"24hrTicker","E":1672515782136,"s":"BTCUSDT","p":"0.0015",'
+    '"P":"250.00","w":"0.0018","x":"0.0009","c":"16548.12000000","Q":"10","b":"0.0024","B":"10","a":"0.0026",'
+    '"A":"100","o":"0.0010","h":"0.0025","l":"0.0010","v":"10000","q":"18","O":0,"C":86400000,"F":0,'
+    '"L":18150,"n":18151}}'
+)
+MARK_PRICE_MSG = (
+    '{"stream":"btcusdt@markPrice","data":{"e":"markPriceUpdate","E":1562305380000,"s":"BTCUSDT",'
+    '"p":"11794.15000000","i":"11784.62659091","P":"11784.25641265","r":"0.00038167","T":1562306400000}}'
+)
+DELIVERY_MARK_PRICE_MSG = MARK_PRICE_MSG.replace('"r":"0.00038167"', '"r":""')
+
+
+def _reference_ticker(msg: str):
+    data = json.loads(msg)['data']
+    return data['s'], int(data['E']), float(data['c'])
+
+
+def _reference_mark_price(msg: str):
+    data = json.loads(msg)['data']
+    return data['s'], int(data['E']), float(data['p']), float(data['r'] or 0.0), int(data['T'])
+
+
+def _reshaped(msg: str) -> str:
+    # Same content, different key order and whitespace: forces the json.loads fallback
+    envelope = json.loads(msg)
+    envelope['data'] = dict(reversed(list(envelope['data'].items())))
+    return json.dumps({'data': envelope['data'], 'stream': envelope['stream']}, indent=1)
+
+
+def test_ticker_matches_json_loads():
+    assert decode_ticker(TICKER_MSG) == _reference_ticker(TICKER_MSG)
+    assert decode_ticker(_reshaped(TICKER_MSG)) == _reference_ticker(TICKER_MSG)
+
+
+@pytest.mark.parametrize('msg', [MARK_PRICE_MSG, DELIVERY_MARK_PRICE_MSG])
+def test_mark_price_matches_json_loads(msg):
+    assert decode_mark_price(msg) == _reference_mark_price(msg)
+    assert decode_mark_price(_reshaped(msg)) == _reference_mark_price(msg)
+
+
+def test_simulator_payloads_match_json_loads():
+    market = SimMarket(['BTCUSDT', 'ETHUSDT', 'SOLUSDT'], seed=3)
+    for step in range(200):
+        s = market.order[step % 3]
+        market.step(s)
+        s.trade_id += 1
+        now_ms = 1_700_000_000_000 + step
+        ticker, mark = market.ticker_msg(s, now_ms), market.mark_price_msg(s, now_ms)
+        assert decode_ticker(ticker) == _reference_ticker(ticker)
+        assert decode_mark_price(mark) == _reference_mark_price(mark)
+
+
+def test_dispatch_on_stream_name():
+    assert stream_name(_reshaped(TICKER_MSG)) == 'btcusdt@ticker'
+    assert decode(TICKER_MSG) == (TICKER, _reference_ticker(TICKER_MSG))
+    assert decode(MARK_PRICE_MSG.replace('@markPrice', '@markPrice@1s'))[0] == MARK_PRICE
+    assert decode('{"stream":"btcusdt@depth@100ms","data":{}}') == (OTHER, None)
@@ -0,0 +1,90 @@
+# tests/test_fill_ledger.py
+
+import pytest
+
+from exec.fill_ledger import FillLedger
+
+
+def _enter(ledger: FillLedger, symbol: str = 'BTCUSDT'):
+    h = ledger.open_hedge(symbol, 1, ts_ns=1)
+    ledger.on_order_update(h.hedge_id, 'spot', 's1', 'BUY', 2.0, 200.0)
+    ledger.on_order_update(h.hedge_id, 'perp', 'p1', 'SELL', 1.0, 101.0)
+    # Same perp order again from the user stream: partial, then cumulative
+    ledger.on_order_update(h.hedge_id, 'perp', 'p1', 'SELL', 1.0, 101.0)
+    ledger.on_order_update(h.hedge_id, 'perp', 'p1', 'SELL', 2.0, 204.0)
+    ledger.on_fee(h.hedge_id, 't1', 0.5)
+    ledger.on_fee(h.hedge_id, 't1', 0.5)
+    ledger.on_funding_fee(0.25)
+    return h
+
+
+def test_round_trip_pnl_and_close():
+    closed = []
+    ledger = FillLedger(on_close=closed.append)
+    h = _enter(ledger)
+    assert h.spot.qty == 2.0 and h.spot.avg_price == 100.0
+    assert h.perp.qty == -2.0 and h.perp.avg_price == 102.0
+    assert h.fees == 0.5 and h.funding == 0.25
+
+    ledger.on_order_update(h.hedge_id, 'spot', 's2', 'SELL', 2.0, 206.0)
+    assert not closed
+    ledger.on_order_update(h.hedge_id, 'perp', 'p2', 'BUY', 2.0, 205.0)
+
+    assert closed == [h]
+    assert h.closed and not ledger.hedges and not ledger.by_symbol and not ledger.orders
+    # spot +6, perp -1, fees -0.5, funding +0.25
+    assert h.pnl == pytest.approx(4.75)
+    assert ledger.realized_pnl == pytest.approx(4.75)
+    assert ledger.closed_pnl == pytest.approx(4.75)
+    assert ledger.closed_count == 1 and list(ledger.outcomes) == [pytest.approx(4.75)]
+
+    # Late fee of a closed hedge is not booked
+    ledger.on_fee(h.hedge_id, 't2', 1.0)
+    assert ledger.fees_paid == pytest.approx(0.5)
+
+
+def test_replay_and_compact_rebuild_the_same_state(tmp_path):
+    path = str(tmp_path / 'ledger.jsonl')
+    ledger = FillLedger(path)
+    done = _enter(ledger, 'ETHUSDT')
+    ledger.on_order_update(done.hedge_id, 'spot', 's2', 'SELL', 2.0, 206.0)
+    ledger.on_order_update(done.hedge_id, 'perp', 'p2', 'BUY', 2.0, 205.0)
+    h = _enter(ledger)
+    ledger.on_order_update(h.hedge_id, 'spot', 's3', 'SELL', 1.0, 101.0)
+    ledger.close()
+    with open(path, 'a') as f:
+        f.write('{"ev":"fill","h":')  # torn last line
+
+    def state(ledger):
+        (h,) = ledger.open_hedges()
+        return (
+            h.hedge_id, h.symbol, h.spot.qty, h.spot.avg_price, h.perp.qty, h.perp.avg_price,
+            round(h.pnl, 9), round(ledger.realized_pnl, 9), round(ledger.fees_paid, 9),
+            round(ledger.funding_received, 9), ledger.closed_count, ledger.next_id,
+        )
+
+    expected = state(ledger)
+    replayed = FillLedger(path)
+    assert [r.hedge_id for r in replayed.replay()] == [h.hedge_id]
+    assert state(replayed) == expected
+
+    replayed.compact()
+    compacted = FillLedger(path)
+    compacted.replay()
+    assert state(compacted) == expected
+    assert compacted.closed_pnl == pytest.approx(4.75)
+
+    # Continues where the original left off
+    (restored,) = compacted.open_hedges()
+    compacted.on_order_update(restored.hedge_id, 'spot', 's4', 'SELL', 1.0, 102.0)
+    compacted.on_order_update(restored.hedge_id, 'perp', 'p4', 'BUY', 2.0, 200.0)
+    assert not compacted.hedges
+    assert compacted.open_hedge('BTCUSDT', 1).hedge_id == expected[-1]
+
+
+def test_unfilled_hedge_is_voided():
+    ledger = FillLedger()
+    h = ledger.open_hedge('BTCUSDT', 1)
+    ledger.hold(h)
+    ledger.release(h)
+    assert not ledger.hedges and ledger.closed_count == 0
@@ -0,0 +1,131 @@
+# tests/test_order_executor.py
+
+import asyncio
+from collections import deque
+from typing import Deque, Dict, List
+
+import pytest
+
+from arb.risk_manager import RiskManager
+from data.websocket_client import PriceTick
+from exec.order_executor import PERP_MARGIN_FRACTION, OrderExecutor
+from venues.base import VenueOrders
+
+
+class _Exchange:
+    markets = None
+
+
+class _ScriptedOrders(VenueOrders):
+    """
+    Fills each market order with the next scripted fraction for its venue
+    (an Exception instance is raised instead); unscripted orders fill fully.
+    """
+
+    def __init__(self, spot=(), perp=()):
+        self.script: Dict[str, Deque] = {'spot': deque(spot), 'perp': deque(perp)}
+        self.sent: List[tuple] = []
+        self.next_id = 1
+
+    async def place_market_order(self, symbol, side, quantity, market_type='spot', reduce_only=False,
+                                 client_id=None):
+        # reduce_only only means something on the perp
+        self.sent.append((market_type, side, round(quantity, 9), reduce_only and market_type == 'perp'))
+        outcome = self.script[market_type].popleft() if self.script[market_type] else 1.0
+        if isinstance(outcome, Exception):
+            raise outcome
+        filled = quantity * outcome
+        self.next_id += 1
+        return {
+            'orderId': self.next_id,
+            'executedQty': f"{filled:.8f}",
+            'cummulativeQuoteQty': f"{filled * 100.0:.8f}",
+            'status': 'FILLED' if outcome == 1.0 else 'EXPIRED',
+        }
+
+
+def _execute(orders: _ScriptedOrders, closing: bool = False, concurrent: bool = True):
+    executor = OrderExecutor(_Exchange(), concurrent_legs=concurrent, orders=orders)
+    spot_side, perp_side = ('SELL', 'BUY') if closing else ('BUY', 'SELL')
+    return asyncio.run(executor._execute_legs('BTCUSDT', spot_side, perp_side, 1.0, closing=closing))
+
+
+def test_both_legs_filled():
+    orders = _ScriptedOrders()
+    report = _execute(orders)
+    assert (report.outcome, report.hedged_qty, report.repairs) == ('hedged', 1.0, [])
+    assert orders.sent == [('spot', 'BUY', 1.0, False), ('perp', 'SELL', 1.0, False)]
+
+
+def test_partial_perp_is_topped_up():
+    orders = _ScriptedOrders(perp=[0.6])
+    report = _execute(orders)
+    assert report.outcome == 'topped_up'
+    assert report.hedged_qty == pytest.approx(1.0)
+    assert orders.sent[2] == ('perp', 'SELL', 0.4, False)
+
+
+def test_failed_top_up_unwinds_the_leading_leg():
+    orders = _ScriptedOrders(perp=[ConnectionError('down'), ConnectionError('still down')])
+    report = _execute(orders)
+    assert report.outcome == 'unwound'
+    assert report.hedged_qty == pytest.approx(0.0)
+    # Top-up on perp, then the spot excess sold back
+    assert orders.sent[2:] == [('perp', 'SELL', 1.0, False), ('spot', 'SELL', 1.0, False)]
+    assert [leg.error for leg in report.repairs] == ['still down', None]
+
+
+def test_partial_top_up_unwinds_only_the_rest():
+    orders = _ScriptedOrders(spot=[0.5, 0.0])
+    report = _execute(orders)
+    # Spot lags by 0.5: top-up fills nothing, so 0.5 perp is bought back reduce-only
+    assert report.outcome == 'unwound'
+    assert report.hedged_qty == pytest.approx(0.5)
+    assert orders.sent[2:] == [('spot', 'BUY', 0.5, False), ('perp', 'BUY', 0.5, True)]
+
+
+def test_closing_repairs_flip_reduce_only():
+    orders = _ScriptedOrders(spot=[0.0], perp=[1.0, 1.0])
+    report = _execute(orders, closing=True)
+    # Perp closed but spot did not sell: the spot is topped up
+    assert report.outcome == 'topped_up'
+    assert orders.sent[:2] == [('spot', 'SELL', 1.0, False), ('perp', 'BUY', 1.0, True)]
+    assert orders.sent[2] == ('spot', 'SELL', 1.0, False)
+
+    orders = _ScriptedOrders(spot=[1.0], perp=[0.0, 0.0])
+    report = _execute(orders, closing=True)
+    assert report.outcome == 'unwound'
+    assert orders.sent[2:] == [('perp', 'BUY', 1.0, True), ('spot', 'BUY', 1.0, False)]
+
+
+def test_sequential_legs_skip_perp_when_spot_fails():
+    orders = _ScriptedOrders(spot=[ConnectionError('rejected')])
+    report = _execute(orders, concurrent=False)
+    assert report.outcome == 'failed'
+    assert report.perp.error == 'not sent'
+    assert orders.sent == [('spot', 'BUY', 1.0, False)]
+
+
+def test_partial_close_shrinks_the_lot():
+    async def scenario():
+        exchange = _Exchange()
+        exchange.risk_manager = risk = RiskManager(initial_equity=10_000.0)
+        # Entry fills fully; the close only gets half of each leg and no repair
+        orders = _ScriptedOrders(spot=[1.0, 0.5], perp=[1.0, 0.5])
+        executor = OrderExecutor(exchange, orders=orders)
+        tick = PriceTick('BTCUSDT', 100.0, 101.0, 0.0, 1, 1)
+        await executor.place_hedge(tick, 2.0)
+        locked = [(risk.positions.locked_collateral, risk.positions.exposure['BTCUSDT'].qty)]
+        await executor.close_hedge(tick, 1, 2.0)
+        locked.append((risk.positions.locked_collateral, risk.positions.exposure['BTCUSDT'].qty))
+        available = risk.available_equity()
+        await executor.close_hedge(tick, 1, 1.0)
+        return risk, locked, available
+
+    risk, locked, available = asyncio.run(scenario())
+    full = 2.0 * 100.0 * PERP_MARGIN_FRACTION
+    assert locked[0] == (pytest.approx(full), pytest.approx(2.0))
+    assert locked[1] == (pytest.approx(full / 2), pytest.approx(1.0))
+    assert available == pytest.approx(10_000.0 - full / 2)
+    # Closing the rest flattens the hedge, which releases the lot
+    assert not risk.positions.lots and risk.positions.locked_collateral == 0.0
@@ -0,0 +1,64 @@
+# tests/test_order_gateway.py
+
+import asyncio
+
+import pytest
+from aiohttp import web
+
+import exec.order_gateway as order_gateway
+from exec.order_gateway import OrderGateway
+
+
+def _server(known: dict):
+    """
+    Futures order endpoint that never answers an order in time, but remembers
+    it (by client order id) when `known` says Binance accepted it.
+    """
+    async def place(request):
+        await asyncio.sleep(1.0)
+        return web.json_response({})
+
+    async def query(request):
+        order = known.get(request.query['origClientOrderId'])
+        if order is None:
+            return web.json_response({'code': -2013, 'msg': 'Order does not exist.'}, status=400)
+        return web.json_response(order)
+
+    app = web.Application()
+    app.router.add_post('/fapi/v1/order', place)
+    app.router.add_get('/fapi/v1/order', query)
+    return app
+
+
+async def _place(known: dict):
+    runner = web.AppRunner(_server(known))
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = runner.addresses[0][1]
+    url = f'http://127.0.0.1:{port}'
+    gateway = OrderGateway('key', 'secret', url, url, recv_window_ms=50)
+    await gateway.start()
+    try:
+        return await gateway.place_market_order('BTCUSDT', 'SELL', 0.5, 'perp', client_id='arb7p1')
+    finally:
+        await gateway.close()
+        await runner.cleanup()
+
+
+@pytest.fixture(autouse=True)
+def short_timeout(monkeypatch):
+    monkeypatch.setattr(order_gateway, 'ORDER_TIMEOUT_S', 0.2)
+
+
+def test_timed_out_order_that_filled_is_returned():
+    filled = {
+        'orderId': 42, 'clientOrderId': 'arb7p1', 'status': 'FILLED',
+        'executedQty': '0.5', 'cumQuote': '50000', 'avgPrice': '100000',
+    }
+    assert asyncio.run(_place({'arb7p1': filled})) == filled
+
+
+def test_timed_out_order_that_never_arrived_still_fails():
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(_place({}))
@@ -0,0 +1,99 @@
+# tests/test_rate_limiter.py
+
+import asyncio
+
+import ccxt.async_support as ccxt
+import pytest
+
+from exec.rate_limiter import ORDER, RequestScheduler
+
+
+class _Exchange:
+    """
+    Just the ccxt hook the scheduler uses: `on_rest_response` is called once per
+    HTTP response, and `last_response_headers` is shared by every request.
+    """
+
+    def __init__(self):
+        self.last_response_headers = None
+
+    def on_rest_response(self, code, reason, url, method, headers, body, request_headers, request_body):
+        self.last_response_headers = headers
+        return body
+
+    async def request(self, headers, delay, error=None):
+        await asyncio.sleep(delay)
+        self.on_rest_response(200, 'OK', 'url', 'GET', headers, '{}', {}, None)
+        if error is not None:
+            raise error
+        return headers
+
+
+def test_concurrent_calls_sync_their_own_venue():
+    async def run():
+        exchange = _Exchange()
+        scheduler = RequestScheduler(exchange, headroom=1.0)
+        # The perp response arrives last, so it is what last_response_headers holds
+        await asyncio.gather(
+            scheduler.call(exchange.request, {'X-MBX-USED-WEIGHT-1M': '1000'}, 0.01, venue='spot'),
+            scheduler.call(exchange.request, {'X-MBX-USED-WEIGHT-1M': '2000'}, 0.02, venue='perp'),
+        )
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.buckets['spot']['weight_1m'].tokens == pytest.approx(6000 - 1000, abs=1)
+    assert scheduler.buckets['perp']['weight_1m'].tokens == pytest.approx(2400 - 2000, abs=1)
+
+
+def test_rate_limit_pauses_only_the_rejected_venue():
+    async def run():
+        exchange = _Exchange()
+        scheduler = RequestScheduler(exchange)
+        with pytest.raises(ccxt.RateLimitExceeded):
+            await asyncio.gather(
+                scheduler.call(exchange.request, {'Retry-After': '30'}, 0.01,
+                               ccxt.RateLimitExceeded('429'), venue='perp'),
+                scheduler.call(exchange.request, {'X-MBX-USED-WEIGHT-1M': '5'}, 0.02, venue='spot'),
+            )
+        return scheduler
+
+    scheduler = asyncio.run(run())
+    assert scheduler.rejections == 1
+    assert all(b.paused_until > 0 for b in scheduler.buckets['perp'].values())
+    assert all(b.paused_until == 0 for b in scheduler.buckets['spot'].values())
+
+
+def test_paused_venue_does_not_block_the_other():
+    async def run():
+        scheduler = RequestScheduler(None)
+        scheduler.reject('spot', {'Retry-After': '30'})
+        blocked = asyncio.create_task(scheduler.acquire('spot', 1, 1, ORDER))
+        await asyncio.sleep(0)
+        assert scheduler.pending() == 1
+        # Lower priority, other venue: must not queue behind the paused spot order
+        await scheduler.acquire('perp', 1, 0)
+        scheduler.reject('perp', {'Retry-After': '30'})
+        queued = asyncio.create_task(scheduler.acquire('perp', 1, 0))
+        await asyncio.sleep(0)
+        assert scheduler.pending() == 2
+        blocked.cancel()
+        queued.cancel()
+        await asyncio.gather(blocked, queued, return_exceptions=True)
+
+    asyncio.run(asyncio.wait_for(run(), 1.0))
+
+
+def test_waiting_requests_release_by_priority():
+    async def run():
+        scheduler = RequestScheduler(None, limits={'spot': {'weight_1m': (10, 1)}}, headroom=1.0)
+        await scheduler.acquire('spot', 10)
+        released = []
+
+        async def request(name, priority):
+            await scheduler.acquire('spot', 5, priority=priority)
+            released.append(name)
+
+        await asyncio.gather(request('metadata', 2), request('order', ORDER))
+        return released
+
+    assert asyncio.run(asyncio.wait_for(run(), 5.0)) == ['order', 'metadata']
@@ -0,0 +1,111 @@
+# tests/test_risk_manager.py
+
+import asyncio
+
+import numpy as np
+
+from arb.arbitrage_engine import ENTERING, OPEN, ArbitrageEngine, SymbolState
+from arb.risk_manager import RiskManager
+from data.market_state import PriceMatrix
+from data.tick_bus import TickBus
+from data.websocket_client import PriceTick
+
+
+def _risk() -> RiskManager:
+    risk = RiskManager(initial_equity=100_000.0, max_alloc=0.1, prior_win_prob=0.99)
+    risk.taker_fee = 0.0004
+    return risk
+
+
+def _universe(n: int, seed: int = 7):
+    rng = np.random.default_rng(seed)
+    spot = rng.uniform(1.0, 50_000.0, n)
+    perp = spot * (1 + rng.normal(0.0, 0.03, n))
+    spot[3] = np.nan
+    return spot, perp
+
+
+def test_size_universe_matches_scalar_sizing():
+    risk = _risk()
+    spot, perp = _universe(200)
+    sized = risk.size_universe_arrays(spot, perp, max_candidates=None)
+    assert len(sized.slots) > 0
+    assert 3 not in sized.slots
+    for slot, size in zip(sized.slots, sized.size):
+        tick = PriceTick(f"S{slot}", float(spot[slot]), float(perp[slot]), 0.0)
+        assert np.isclose(size, risk.calculate_position_size(tick))
+    # Every slot left out sizes to zero on the scalar path
+    left_out = set(range(200)) - set(sized.slots.tolist()) - {3}
+    for slot in left_out:
+        assert risk.calculate_position_size(PriceTick('X', float(spot[slot]), float(perp[slot]), 0.0)) == 0.0
+
+
+def test_size_universe_top_k_is_the_head_of_the_full_ranking():
+    risk = _risk()
+    spot, perp = _universe(1000)
+    full = risk.size_universe_arrays(spot, perp, max_candidates=None)
+    top = risk.size_universe_arrays(spot, perp, max_candidates=10)
+    assert np.array_equal(top.slots, full.slots[:10])
+    assert np.all(np.diff(top.edge) <= 0)
+    opps = risk.size_universe(spot, perp, np.zeros(1000), [f"S{i}" for i in range(1000)], max_candidates=5)
+    assert [o.slot for o in opps] == full.slots[:5].tolist()
+    assert all(type(o.size_asset) is float for o in opps)
+
+
+class _Executor:
+    def __init__(self):
+        self.entries = []
+
+    async def place_hedge(self, tick, size_asset):
+        self.entries.append((tick.symbol, size_asset))
+        await asyncio.sleep(3600)
+
+
+def test_run_universe_enters_with_the_vectorized_size():
+    async def scenario():
+        risk = _risk()
+        risk.calculate_position_size = lambda tick: (_ for _ in ()).throw(AssertionError("scalar sizing"))
+        executor = _Executor()
+        engine = ArbitrageEngine(risk, executor, cooldown_s=0.0, max_inflight=2)
+        market = PriceMatrix(['AAAUSDT', 'BBBUSDT', 'CCCUSDT'])
+        for slot, (spot, perp) in enumerate([(100.0, 105.0), (100.0, 100.01), (50.0, 48.0)]):
+            market.update_spot(slot, spot, 1)
+            market.update_perp(slot, perp, 0.0, 1)
+        bus = TickBus()
+        ticks = bus.subscribe('engine')
+        task = asyncio.create_task(engine.run_universe(ticks, market))
+        bus.publish(PriceTick('AAAUSDT', 100.0, 105.0, 0.0, 1, 1))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        states = {symbol: st.state for symbol, st in engine.states.items()}
+        await engine.shutdown()
+        return risk, states, executor, market
+
+    risk, states, executor, market = asyncio.run(scenario())
+    expected = risk.size_universe_arrays(market.spot, market.perp)
+    assert sorted(executor.entries) == sorted(
+        (market.symbols[slot], size) for slot, size in zip(expected.slots.tolist(), expected.size.tolist())
+    )
+    assert states['AAAUSDT'] == ENTERING
+    assert 'BBBUSDT' not in states
+
+
+def test_run_universe_skips_open_hedges_outside_the_universe():
+    async def scenario():
+        engine = ArbitrageEngine(_risk(), _Executor(), cooldown_s=0.0)
+        engine.states['OLDUSDT'] = SymbolState(state=OPEN, direction=1, qty=1.0, entry_basis=0.01)
+        market = PriceMatrix(['AAAUSDT'])
+        market.update_spot(0, 100.0, 1)
+        market.update_perp(0, 100.0, 0.0, 1)
+        bus = TickBus()
+        ticks = bus.subscribe('engine')
+        task = asyncio.create_task(engine.run_universe(ticks, market))
+        bus.publish(PriceTick('AAAUSDT', 100.0, 100.0, 0.0, 1, 1))
+        await asyncio.sleep(0.05)
+        bus.publish(PriceTick('AAAUSDT', 100.0, 100.0, 0.0, 2, 2))
+        await asyncio.sleep(0.05)
+        assert not task.done()
+        task.cancel()
+        return engine.states['OLDUSDT'].state
+
+    assert asyncio.run(scenario()) == OPEN
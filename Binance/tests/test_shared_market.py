@@ -0,0 +1,79 @@
+# tests/test_shared_market.py
+
+import math
+import multiprocessing
+import time
+
+import pytest
+
+from data.feed_workers import FeedSupervisor
+from data.shared_market import SharedPriceMatrix
+
+SYMBOLS = ['BTCUSDT', 'ETHUSDT']
+
+
+def _die_mid_write(name, ready):
+    """
+    Feed-worker stand-in: starts an update of BTCUSDT and hangs before finishing it.
+    """
+    market = SharedPriceMatrix(SYMBOLS, n_workers=1, name=name)
+    market.slot_seq[0] += 1
+    market.spot[0] = 101.0
+    ready.set()
+    time.sleep(60)
+
+
+class _Process:
+    def __init__(self, *args, **kwargs):
+        self.pid = None
+
+    def start(self):
+        pass
+
+    def is_alive(self):
+        return True
+
+
+class _Context:
+    Process = _Process
+
+
+@pytest.fixture
+def market():
+    market = SharedPriceMatrix(SYMBOLS, n_workers=1)
+    yield market
+    market.close()
+
+
+def test_snapshot_masks_a_slot_being_written(market):
+    market.update_spot(0, 100.0, 1)
+    market.update_spot(1, 10.0, 1)
+    market.slot_seq[1] += 1
+    snap = market.snapshot()
+    assert snap.spot[0] == 100.0
+    assert math.isnan(snap.spot[1])
+    market.slot_seq[1] += 1
+    assert market.snapshot().spot[1] == 10.0
+
+
+def test_restart_releases_a_slot_torn_by_a_killed_worker(market):
+    market.update_spot(0, 100.0, 1)
+    ctx = multiprocessing.get_context('fork')
+    ready = ctx.Event()
+    proc = ctx.Process(target=_die_mid_write, args=(market.name, ready), daemon=True)
+    proc.start()
+    assert ready.wait(10)
+    proc.kill()
+    proc.join(5)
+
+    assert market.slot_seq[0] & 1
+    assert math.isnan(market.snapshot().spot[0])
+
+    supervisor = FeedSupervisor(market)
+    supervisor.ctx = _Context()
+    supervisor._spawn(0)
+
+    assert not market.slot_seq[0] & 1
+    assert market.snapshot().spot[0] == 101.0
+    market.update_spot(0, 102.0, 2)
+    assert market.snapshot().spot[0] == 102.0
@@ -0,0 +1,90 @@
+# venues/base.py
+#
+# Venue adapters. Each exchange is two small classes:
+#
+#   VenueFeed    connections (URL + subscribe frames + heartbeat) and a decoder
+#                from the venue's raw messages to normalized quotes
+#   VenueOrders  market orders on the venue's spot and perp markets
+#
+# Everything venue-specific (hosts, topic names, field letters, symbol spelling,
+# order endpoints) stays inside the adapter; the rest of the bot only sees
+# canonical symbols ('BTCUSDT') and the Quote tuple below.
+
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+# Normalized tick, identical for every venue:
+#   (kind, symbol, event_ms, price, funding_rate, next_funding_ms)
+# kind is SPOT (last trade price; funding fields 0) or PERP (mark price, current
+# funding rate and next funding time), as in data.market_state. A plain tuple
+# keeps decode allocation-light.
+Quote = Tuple[int, str, int, float, float, int]
+
+
+class Connection(NamedTuple):
+    """
+    One WebSocket a feed needs: `key` ('spot' / 'perp' / 'public') is handed back
+    to VenueFeed.decode with every message read from it.
+    """
+    key: str
+    url: str
+    subscribe: List[str]
+
+
+def chunks(items: List[str], size: int) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class VenueFeed:
+    """
+    Market-data adapter for one venue and a fixed list of canonical symbols.
+    `urls` overrides the venue's endpoints per connection key, e.g. to point the
+    adapter at a local stand-in (venues.recorded).
+    """
+
+    name: str = ''
+    # Taker fee rates (spot, perp) used by the cross-venue scanner
+    taker_fees: Tuple[float, float] = (0.001, 0.0005)
+    # Application-level ping frame and its interval; None if the venue pings us
+    ping_message: Optional[str] = None
+    ping_interval_s: float = 20.0
+
+    def __init__(self, symbols: List[str], urls: Optional[Dict[str, str]] = None):
+        self.symbols: List[str] = [s.upper() for s in symbols]
+        self.urls: Dict[str, str] = dict(urls or {})
+
+    def url(self, key: str, default: str) -> str:
+        return self.urls.get(key, default)
+
+    def connections(self) -> List[Connection]:
+        raise NotImplementedError
+
+    def decode(self, key: str, msg: str) -> List[Quote]:
+        """
+        Quotes in one raw message from connection `key`; [] for acks, pongs and
+        anything else that carries no price. Unknown symbols may be returned.
+        """
+        raise NotImplementedError
+
+
+class VenueOrders:
+    """
+    Order-entry adapter. Acks are returned as the venue sent them (raw Binance
+    JSON or a ccxt order); OrderExecutor._parse_ack reads both.
+    """
+
+    name: str = ''
+
+    async def place_market_order(
+        self,
+        symbol: str,
+        side: str,
+        quantity: float,
+        market_type: str = 'spot',
+        reduce_only: bool = False,
+        client_id: Optional[str] = None,
+    ) -> dict:
+        raise NotImplementedError
+
+    async def close(self):
+        pass
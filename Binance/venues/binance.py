@@ -0,0 +1,96 @@
+# venues/binance.py
+#
+# Binance: spot <symbol>@ticker and USDT-M <symbol>@markPrice combined streams
+# (stream names go in the URL, so nothing is subscribed after connecting), decoded
+# with the slicing decoders in data.decoders; orders through the gateway or ccxt.
+
+from typing import Dict, List, Optional
+
+from config import FUTURES_WS_BASE, SPOT_WS_BASE
+from data.decoders import MARK_PRICE, TICKER, decode_mark_price, decode_ticker, stream_kind, stream_name
+from data.market_state import PERP, SPOT
+from data.websocket_client import FUTURES_MAX_STREAMS_PER_CONN, SPOT_MAX_STREAMS_PER_CONN, build_stream_urls
+from exec.order_gateway import MarketFilters, OrderGateway
+from exec.rate_limiter import ORDER, PassthroughScheduler
+from venues.base import Connection, Quote, VenueFeed, VenueOrders
+
+
+class BinanceFeed(VenueFeed):
+    name = 'binance'
+    taker_fees = (0.001, 0.0005)
+
+    def connections(self) -> List[Connection]:
+        lower = [s.lower() for s in self.symbols]
+        spot = build_stream_urls(
+            self.url('spot', SPOT_WS_BASE), [f"{s}@ticker" for s in lower], SPOT_MAX_STREAMS_PER_CONN
+        )
+        perp = build_stream_urls(
+            self.url('perp', FUTURES_WS_BASE), [f"{s}@markPrice" for s in lower], FUTURES_MAX_STREAMS_PER_CONN
+        )
+        return [Connection('spot', url, []) for url in spot] + [Connection('perp', url, []) for url in perp]
+
+    def decode(self, key: str, msg: str) -> List[Quote]:
+        kind = stream_kind(stream_name(msg))
+        if kind == TICKER:
+            symbol, event_ms, price = decode_ticker(msg)
+            return [(SPOT, symbol, event_ms, price, 0.0, 0)]
+        if kind == MARK_PRICE:
+            symbol, event_ms, price, funding_rate, next_funding_ms = decode_mark_price(msg)
+            return [(PERP, symbol, event_ms, price, funding_rate, next_funding_ms)]
+        return []
+
+
+class BinanceOrders(VenueOrders):
+    """
+    Market orders on Binance spot and USDT-M futures. With a gateway (see
+    exec.order_gateway), both legs go through it; otherwise spot uses ccxt's
+    create_order and perp the futures REST endpoint through ccxt, whose RESULT
+    responses carry the executed quantity so partial fills are visible in the ack.
+    Every REST call goes through the rate-limit scheduler at order priority.
+    """
+
+    name = 'binance'
+
+    def __init__(self, exchange, scheduler=None, filters: Optional[MarketFilters] = None,
+                 gateway: Optional[OrderGateway] = None):
+        self.exchange = exchange
+        self.scheduler = scheduler or PassthroughScheduler()
+        self.gateway = gateway
+        self.filters = filters or MarketFilters(getattr(exchange, 'markets', None))
+
+    async def place_market_order(
+        self,
+        symbol: str,
+        side: str,
+        quantity: float,
+        market_type: str = 'spot',
+        reduce_only: bool = False,
+        client_id: Optional[str] = None,
+    ) -> dict:
+        if self.gateway is not None:
+            return await self.gateway.place_market_order(symbol, side, quantity, market_type, reduce_only, client_id)
+
+        if market_type == 'spot':
+            params = {'newClientOrderId': client_id} if client_id else {}
+            return await self.scheduler.call(
+                self.exchange.create_order, symbol, 'MARKET', side, quantity, None, params,
+                venue='spot', weight=1, orders=1, priority=ORDER,
+            )
+
+        # Binance USDT‐margined perpetual uses fapiPrivatePostOrder
+        params: Dict[str, str] = {
+            'symbol': symbol,
+            'side': side,
+            'type': 'MARKET',
+            'quantity': self.filters.format_qty(symbol, quantity, 'perp'),
+            'newOrderRespType': 'RESULT',
+        }
+        if reduce_only:
+            params['reduceOnly'] = 'true'
+        if client_id:
+            params['newClientOrderId'] = client_id
+        # Futures orders count against the order limits only, not IP weight
+        return await self.scheduler.call(
+            self.exchange.fapiPrivatePostOrder, params,
+            venue='perp', weight=0, orders=1, priority=ORDER,
+        )
@@ -0,0 +1,73 @@
+# venues/bybit.py
+#
+# Bybit v5 public streams: `tickers.<SYMBOL>` on the spot and linear clusters.
+# Symbols are spelled like Binance's. Linear tickers are a snapshot followed by
+# deltas that only carry the fields that changed, so the last mark price and
+# funding per symbol are kept here and every delta is re-emitted as a full quote.
+
+import json
+from typing import Dict, List, Optional
+
+from data.market_state import PERP, SPOT
+from venues.base import Connection, Quote, VenueFeed, chunks
+from venues.ccxt_orders import CcxtOrders
+
+BYBIT_SPOT_WS = 'wss://stream.bybit.com/v5/public/spot'
+BYBIT_LINEAR_WS = 'wss://stream.bybit.com/v5/public/linear'
+# Spot accepts at most 10 args per subscribe request
+SUBSCRIBE_BATCH = 10
+# Topics per connection before another one is opened
+MAX_TOPICS_PER_CONN = 200
+
+
+class BybitFeed(VenueFeed):
+    name = 'bybit'
+    taker_fees = (0.001, 0.00055)
+    # Bybit drops connections without a ping for 30 seconds
+    ping_message = '{"op":"ping"}'
+    ping_interval_s = 20.0
+
+    def __init__(self, symbols: List[str], urls: Optional[Dict[str, str]] = None):
+        super().__init__(symbols, urls)
+        # symbol -> [mark price, funding rate, next funding ms], from the last snapshot/delta
+        self._perp: Dict[str, List[float]] = {}
+
+    def connections(self) -> List[Connection]:
+        topics = [f"tickers.{s}" for s in self.symbols]
+        conns = []
+        for key, default in (('spot', BYBIT_SPOT_WS), ('perp', BYBIT_LINEAR_WS)):
+            for shard in chunks(topics, MAX_TOPICS_PER_CONN):
+                subscribe = [
+                    json.dumps({'op': 'subscribe', 'args': batch}, separators=(',', ':'))
+                    for batch in chunks(shard, SUBSCRIBE_BATCH)
+                ]
+                conns.append(Connection(key, self.url(key, default), subscribe))
+        return conns
+
+    def decode(self, key: str, msg: str) -> List[Quote]:
+        payload = json.loads(msg)
+        data = payload.get('data')
+        if data is None or not payload.get('topic', '').startswith('tickers.'):
+            return []  # subscribe acks, pongs
+        symbol = data['symbol']
+        event_ms = int(payload['ts'])
+        if key == 'spot':
+            return [(SPOT, symbol, event_ms, float(data['lastPrice']), 0.0, 0)]
+
+        state = self._perp.get(symbol)
+        if state is None:
+            state = self._perp[symbol] = [float('nan'), 0.0, 0]
+        if 'markPrice' in data:
+            state[0] = float(data['markPrice'])
+        if data.get('fundingRate'):
+            state[1] = float(data['fundingRate'])
+        if data.get('nextFundingTime'):
+            state[2] = int(data['nextFundingTime'])
+        if state[0] != state[0]:
+            return []  # no mark price seen yet
+        return [(PERP, symbol, event_ms, state[0], state[1], state[2])]
+
+
+class BybitOrders(CcxtOrders):
+    # Spot market buys are sized in USDT unless marketUnit says otherwise
+    spot_base_qty_params = {'marketUnit': 'baseCoin'}
@@ -0,0 +1,71 @@
+# venues/ccxt_orders.py
+
+from typing import Dict, Optional, Tuple
+
+from exec.rate_limiter import ORDER, PassthroughScheduler
+from venues.base import VenueOrders
+
+
+class CcxtOrders(VenueOrders):
+    """
+    Market orders through ccxt's unified create_order, for venues without a
+    hand-written order path. Canonical symbols ('BTCUSDT') map to the venue's
+    spot and linear-swap markets by base + quote. Perp quantities are sent in
+    contracts and the ack's amounts converted back, so the ledger always sees
+    base-asset quantities. Rate limiting is left to ccxt (enableRateLimit)
+    unless a scheduler is given.
+    """
+
+    # Extra params that make a spot market buy's amount a base quantity (several
+    # venues size market buys in the quote asset by default)
+    spot_base_qty_params: Dict[str, str] = {}
+
+    def __init__(self, exchange, scheduler=None):
+        self.exchange = exchange
+        self.name = exchange.id
+        self.scheduler = scheduler or PassthroughScheduler()
+        self._index: Dict[Tuple[str, str], dict] = {}
+
+    def market(self, symbol: str, market_type: str) -> dict:
+        """
+        ccxt market of a canonical symbol; needs load_markets to have run.
+        """
+        if not self._index:
+            for market in (self.exchange.markets or {}).values():
+                if market.get('spot'):
+                    kind = 'spot'
+                elif market.get('swap') and market.get('linear') and market.get('settle') == market.get('quote'):
+                    kind = 'perp'
+                else:
+                    continue
+                self._index[(kind, f"{market['base']}{market['quote']}")] = market
+        market = self._index.get((market_type, symbol))
+        if market is None:
+            raise ValueError(f"{self.name} has no {market_type} market for {symbol}")
+        return market
+
+    async def place_market_order(
+        self,
+        symbol: str,
+        side: str,
+        quantity: float,
+        market_type: str = 'spot',
+        reduce_only: bool = False,
+        client_id: Optional[str] = None,
+    ) -> dict:
+        market = self.market(symbol, market_type)
+        contract_size = float(market.get('contractSize') or 1.0) if market_type == 'perp' else 1.0
+        params = dict(self.spot_base_qty_params) if market_type == 'spot' else {}
+        if reduce_only:
+            params['reduceOnly'] = True
+        if client_id:
+            params['clientOrderId'] = client_id
+        order = await self.scheduler.call(
+            self.exchange.create_order, market['symbol'], 'market', side.lower(), quantity / contract_size, None,
+            params, venue=market_type, weight=1, orders=1, priority=ORDER,
+        )
+        if contract_size != 1.0:
+            for field in ('amount', 'filled', 'remaining'):
+                if order.get(field) is not None:
+                    order[field] = float(order[field]) * contract_size
+        return order
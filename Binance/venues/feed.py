@@ -0,0 +1,98 @@
+# venues/feed.py
+
+import asyncio
+import logging
+import time
+from typing import List
+
+import websockets
+
+from metrics.latency import histogram
+from venues.base import Connection, VenueFeed
+from venues.table import VenuePriceTable
+
+# Reconnect backoff per connection: 1s, doubling up to this
+FEED_MAX_BACKOFF_S = 30.0
+# Stagger connection start-up (venues limit new connections per IP)
+CONNECT_STAGGER_S = 0.25
+
+
+class MultiVenueFeed:
+    """
+    Runs every connection of every venue adapter concurrently on one event loop
+    and writes the decoded quotes into one VenuePriceTable. Each connection
+    sends its subscribe frames after connecting, pings at the venue's interval
+    and reconnects with backoff on its own, so one venue going down leaves the
+    others streaming.
+    """
+
+    def __init__(self, feeds: List[VenueFeed], table: VenuePriceTable):
+        self.feeds = feeds
+        self.table = table
+        # Set on every applied quote; a scanner can wait on it instead of polling
+        self.updated = asyncio.Event()
+        self.connected = 0
+        self.reconnects = 0
+        # Messages a venue adapter could not parse (skipped, the connection stays up)
+        self.decode_errors = 0
+
+    async def run(self):
+        listeners = []
+        for feed in self.feeds:
+            for i, conn in enumerate(feed.connections()):
+                listeners.append(self._listen(feed, conn, delay=i * CONNECT_STAGGER_S))
+        logging.info(
+            f"Multi-venue feed: {len(listeners)} connections to {', '.join(f.name for f in self.feeds)} "
+            f"for {len(self.table.symbols)} symbols."
+        )
+        await asyncio.gather(*listeners)
+
+    async def _ping(self, ws, feed: VenueFeed):
+        while True:
+            await asyncio.sleep(feed.ping_interval_s)
+            await ws.send(feed.ping_message)
+
+    async def _listen(self, feed: VenueFeed, conn: Connection, delay: float = 0.0):
+        await asyncio.sleep(delay)
+        venue = self.table.venue_slots[feed.name]
+        apply, decode, updated = self.table.apply, feed.decode, self.updated
+        record_wire = histogram(f'venue_recv.{feed.name}').record
+        backoff = 1.0
+        while True:
+            pinger = None
+            try:
+                async with websockets.connect(conn.url, ping_interval=None if feed.ping_message else 20) as ws:
+                    for frame in conn.subscribe:
+                        await ws.send(frame)
+                    if feed.ping_message:
+                        pinger = asyncio.create_task(self._ping(ws, feed))
+                    self.connected += 1
+                    backoff = 1.0
+                    try:
+                        async for msg in ws:
+                            recv_ns = time.time_ns()
+                            try:
+                                quotes = decode(conn.key, msg)
+                            except (ValueError, KeyError, TypeError):
+                                self.decode_errors += 1
+                                continue
+                            for quote in quotes:
+                                if apply(venue, quote):
+                                    record_wire(recv_ns - quote[2] * 1_000_000)
+                                    updated.set()
+                    finally:
+                        self.connected -= 1
+                raise ConnectionError("closed by the venue")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.reconnects += 1
+                logging.warning(
+                    f"{feed.name} {conn.key} feed disconnected ({e}). Reconnecting in {backoff:.0f}s..."
+                )
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, FEED_MAX_BACKOFF_S)
+            finally:
+                if pinger is not None:
+                    pinger.cancel()
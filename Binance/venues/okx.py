@@ -0,0 +1,103 @@
+# venues/okx.py
+#
+# OKX v5 public channels, all on one connection: `tickers` for spot (instId
+# BTC-USDT), `mark-price` and `funding-rate` for the USDT swap (BTC-USDT-SWAP).
+# Mark price and funding arrive on separate channels, so the last of each per
+# symbol is kept and either update is emitted as a full perp quote.
+
+import json
+from typing import Dict, List, Optional
+
+from data.market_state import PERP, SPOT
+from venues.base import Connection, Quote, VenueFeed, chunks
+from venues.ccxt_orders import CcxtOrders
+
+OKX_PUBLIC_WS = 'wss://ws.okx.com:8443/ws/v5/public'
+# Quote assets recognised when splitting canonical symbols into instIds
+QUOTE_ASSETS = ('USDT', 'USDC')
+# Channel args per subscribe request (requests are capped at 64 KB)
+SUBSCRIBE_BATCH = 100
+# Symbols (three channels each) per connection before another one is opened
+MAX_SYMBOLS_PER_CONN = 100
+
+
+def inst_id(symbol: str) -> str:
+    """
+    'BTCUSDT' -> 'BTC-USDT'.
+    """
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return f"{symbol[:-len(quote)]}-{quote}"
+    raise ValueError(f"Cannot map {symbol} to an OKX instrument (quote not in {QUOTE_ASSETS})")
+
+
+def canonical(inst: str) -> str:
+    """
+    'BTC-USDT' / 'BTC-USDT-SWAP' -> 'BTCUSDT'.
+    """
+    if inst.endswith('-SWAP'):
+        inst = inst[:-5]
+    return inst.replace('-', '')
+
+
+class OkxFeed(VenueFeed):
+    name = 'okx'
+    taker_fees = (0.001, 0.0005)
+    # OKX closes connections idle for 30 seconds; it answers 'ping' with 'pong'
+    ping_message = 'ping'
+    ping_interval_s = 20.0
+
+    def __init__(self, symbols: List[str], urls: Optional[Dict[str, str]] = None):
+        super().__init__(symbols, urls)
+        # symbol -> [mark price, funding rate, next funding ms]
+        self._perp: Dict[str, List[float]] = {}
+
+    def connections(self) -> List[Connection]:
+        conns = []
+        for shard in chunks(self.symbols, MAX_SYMBOLS_PER_CONN):
+            args = []
+            for symbol in shard:
+                spot = inst_id(symbol)
+                args.append({'channel': 'tickers', 'instId': spot})
+                args.append({'channel': 'mark-price', 'instId': f"{spot}-SWAP"})
+                args.append({'channel': 'funding-rate', 'instId': f"{spot}-SWAP"})
+            subscribe = [
+                json.dumps({'op': 'subscribe', 'args': batch}, separators=(',', ':'))
+                for batch in chunks(args, SUBSCRIBE_BATCH)
+            ]
+            conns.append(Connection('public', self.url('public', OKX_PUBLIC_WS), subscribe))
+        return conns
+
+    def decode(self, key: str, msg: str) -> List[Quote]:
+        if msg == 'pong':
+            return []
+        payload = json.loads(msg)
+        data = payload.get('data')
+        if not data:
+            return []  # subscribe acks, errors
+        channel = payload['arg']['channel']
+        quotes = []
+        for row in data:
+            symbol = canonical(row['instId'])
+            event_ms = int(row['ts'])
+            if channel == 'tickers':
+                quotes.append((SPOT, symbol, event_ms, float(row['last']), 0.0, 0))
+                continue
+            state = self._perp.get(symbol)
+            if state is None:
+                state = self._perp[symbol] = [float('nan'), 0.0, 0]
+            if channel == 'mark-price':
+                state[0] = float(row['markPx'])
+            elif channel == 'funding-rate':
+                state[1] = float(row['fundingRate'])
+                state[2] = int(row['fundingTime'])
+            else:
+                continue
+            if state[0] == state[0]:
+                quotes.append((PERP, symbol, event_ms, state[0], state[1], state[2]))
+        return quotes
+
+
+class OkxOrders(CcxtOrders):
+    # Spot market buys are sized in the quote currency unless tgtCcy says otherwise
+    spot_base_qty_params = {'tgtCcy': 'base_ccy'}
@@ -0,0 +1,363 @@
+# venues/recorded.py
+#
+# Recorded-message stand-ins for the venue feeds, so every adapter (and the
+# multi-venue scanner) runs against local sockets with no network:
+#
+#   cd Binance && python -m venues.recorded record --venue bybit --symbols BTCUSDT,ETHUSDT --seconds 60 --out bybit.jsonl
+#   cd Binance && python -m venues.recorded serve --symbols BTCUSDT,ETHUSDT --synthetic binance,bybit,okx
+#   cd Binance && python -m venues.recorded serve --recording bybit=bybit.jsonl --recording okx=okx.jsonl
+#   cd Binance && VENUES=binance,bybit,okx VENUE_STANDIN_URL=http://127.0.0.1:8790 SYMBOLS=BTCUSDT,ETHUSDT python main.py
+#
+# A recording is JSONL, one raw message per line: {"t": receive ms, "key": connection key, "msg": text}.
+# `synthetic` recordings are built from one sim.market price path per symbol with
+# a small mean-reverting dislocation per venue, in each venue's own wire format.
+# The server replays a recording on every connection to /<venue>/<key>, with the
+# venue's event times shifted to now (the recorded exchange-to-receive delay is
+# kept), answers pings and acks subscriptions.
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import re
+import time
+from typing import Dict, List, Optional, Tuple
+
+from aiohttp import WSMsgType, web
+import websockets
+
+from sim.market import FUNDING_INTERVAL_MS, SimMarket, SimSymbol
+from venues.base import VenueFeed
+from venues.okx import inst_id
+
+# (receive ms, connection key, raw message)
+Row = Tuple[int, str, str]
+
+# Event-time fields rewritten on replay
+RETIME = {
+    'binance': re.compile(r'"E":(\d+)'),
+    'bybit': re.compile(r'"ts":(\d+)'),
+    'okx': re.compile(r'"ts":"(\d+)"'),
+}
+# Replies to client frames; subscribe acks carry no data, so decoders drop them
+PONGS = {'ping': 'pong', '{"op":"ping"}': '{"success":true,"ret_msg":"pong","op":"ping"}'}
+SUBSCRIBE_ACKS = {
+    'bybit': lambda req: json.dumps({'success': True, 'ret_msg': '', 'op': 'subscribe'}),
+    'okx': lambda req: json.dumps({'event': 'subscribe', 'arg': (req.get('args') or [{}])[0]}),
+}
+DEFAULT_PORT = 8790
+
+
+def standin_urls(base: str, venue: str) -> Dict[str, str]:
+    """
+    Adapter `urls` pointing every connection key of `venue` at a stand-in server
+    at `base` (http://host:port).
+    """
+    ws = 'ws' + base.rstrip('/')[len('http'):]
+    return {key: f"{ws}/{venue}/{key}" for key in ('spot', 'perp', 'public')}
+
+
+def save_recording(path: str, rows: List[Row]):
+    with open(path, 'w') as f:
+        for t, key, msg in rows:
+            f.write(json.dumps({'t': t, 'key': key, 'msg': msg}, separators=(',', ':')) + '\n')
+
+
+def load_recording(path: str) -> List[Row]:
+    rows = []
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                rows.append((int(row['t']), row['key'], row['msg']))
+    return rows
+
+
+async def record(feed: VenueFeed, seconds: float) -> List[Row]:
+    """
+    Raw messages of every connection of `feed` for `seconds`.
+    """
+    rows: List[Row] = []
+
+    async def capture(conn):
+        async with websockets.connect(conn.url) as ws:
+            for frame in conn.subscribe:
+                await ws.send(frame)
+            last_ping = time.monotonic()
+            async for msg in ws:
+                rows.append((int(time.time() * 1000), conn.key, msg))
+                if feed.ping_message and time.monotonic() - last_ping > feed.ping_interval_s:
+                    await ws.send(feed.ping_message)
+                    last_ping = time.monotonic()
+
+    try:
+        await asyncio.wait_for(asyncio.gather(*(capture(c) for c in feed.connections())), seconds)
+    except asyncio.TimeoutError:
+        pass
+    rows.sort(key=lambda row: row[0])
+    return rows
+
+
+# ---------------------------------------------------------------------- synthetic
+
+class _BybitFormat:
+    def __init__(self):
+        self.seq = 0
+        self.linear_sent = set()
+
+    def __call__(self, s: SimSymbol, now_ms: int, funding_due: bool) -> List[Tuple[str, str]]:
+        self.seq += 1
+        spot = (
+            f'{{"topic":"tickers.{s.symbol}","ts":{now_ms},"type":"snapshot","cs":{self.seq},'
+            f'"data":{{"symbol":"{s.symbol}","lastPrice":"{s.spot:.8f}","highPrice24h":"{s.spot:.8f}",'
+            f'"lowPrice24h":"{s.spot:.8f}","prevPrice24h":"{s.spot:.8f}","volume24h":"0","turnover24h":"0",'
+            f'"price24hPcnt":"0","usdIndexPrice":"{s.spot:.8f}"}}}}'
+        )
+        next_ms = SimMarket.next_funding_ms(now_ms)
+        if s.symbol not in self.linear_sent:
+            self.linear_sent.add(s.symbol)
+            data = (
+                f'"symbol":"{s.symbol}","tickDirection":"PlusTick","price24hPcnt":"0","lastPrice":"{s.perp:.8f}",'
+                f'"markPrice":"{s.perp:.8f}","indexPrice":"{s.spot:.8f}","openInterest":"0",'
+                f'"nextFundingTime":"{next_ms}","fundingRate":"{s.funding_rate:.8f}","bid1Price":"{s.perp:.8f}",'
+                f'"ask1Price":"{s.perp:.8f}"'
+            )
+            kind = 'snapshot'
+        else:
+            data = f'"symbol":"{s.symbol}","markPrice":"{s.perp:.8f}","indexPrice":"{s.spot:.8f}"'
+            if funding_due:
+                data += f',"fundingRate":"{s.funding_rate:.8f}","nextFundingTime":"{next_ms}"'
+            kind = 'delta'
+        perp = f'{{"topic":"tickers.{s.symbol}","type":"{kind}","data":{{{data}}},"cs":{self.seq},"ts":{now_ms}}}'
+        return [('spot', spot), ('perp', perp)]
+
+
+def _okx_format(s: SimSymbol, now_ms: int, funding_due: bool) -> List[Tuple[str, str]]:
+    spot_id = inst_id(s.symbol)
+    swap_id = f"{spot_id}-SWAP"
+    msgs = [
+        ('public',
+         f'{{"arg":{{"channel":"tickers","instId":"{spot_id}"}},"data":[{{"instType":"SPOT","instId":"{spot_id}",'
+         f'"last":"{s.spot:.8f}","lastSz":"0.1","askPx":"{s.spot:.8f}","askSz":"1","bidPx":"{s.spot:.8f}",'
+         f'"bidSz":"1","open24h":"{s.spot:.8f}","high24h":"{s.spot:.8f}","low24h":"{s.spot:.8f}",'
+         f'"volCcy24h":"0","vol24h":"0","ts":"{now_ms}"}}]}}'),
+        ('public',
+         f'{{"arg":{{"channel":"mark-price","instId":"{swap_id}"}},"data":[{{"instType":"SWAP",'
+         f'"instId":"{swap_id}","markPx":"{s.perp:.8f}","ts":"{now_ms}"}}]}}'),
+    ]
+    if funding_due:
+        next_ms = SimMarket.next_funding_ms(now_ms)
+        msgs.append((
+            'public',
+            f'{{"arg":{{"channel":"funding-rate","instId":"{swap_id}"}},"data":[{{"fundingRate":'
+            f'"{s.funding_rate:.8f}","fundingTime":"{next_ms}","instId":"{swap_id}","instType":"SWAP",'
+            f'"method":"current_period","nextFundingRate":"","nextFundingTime":"{next_ms + FUNDING_INTERVAL_MS}",'
+            f'"ts":"{now_ms}"}}]}}'
+        ))
+    return msgs
+
+
+def synthetic_recordings(venues: List[str], symbols: List[str], seconds: float = 60.0,
+                         updates_per_s: float = 10.0, dislocation_bp: float = 3.0,
+                         seed: Optional[int] = None) -> Dict[str, List[Row]]:
+    """
+    One recording per venue over a shared sim.market price path. Each venue's
+    spot and perp sit a mean-reverting few basis points off the shared prices,
+    so cross-venue spreads open and close. Funding updates every 10th step.
+    """
+    market = SimMarket(symbols, seed=seed)
+    rng = random.Random(seed)
+    formats = {'bybit': _BybitFormat(), 'okx': _okx_format}
+    # (venue, symbol) -> [spot offset, perp offset], in fractions
+    offsets = {(v, s): [0.0, 0.0] for v in venues for s in symbols}
+    views = {(v, s): SimSymbol(s, 0.0, 0.0, 0.0) for v in venues for s in symbols}
+    sigma = dislocation_bp * 1e-4
+    recordings: Dict[str, List[Row]] = {v: [] for v in venues}
+    start_ms = int(time.time() * 1000)
+    for step in range(int(seconds * updates_per_s)):
+        now_ms = start_ms + int(step * 1000 / updates_per_s)
+        funding_due = step % 10 == 0
+        for s in market.order:
+            market.step(s)
+            for venue in venues:
+                off = offsets[(venue, s.symbol)]
+                off[0] += -0.2 * off[0] + 0.45 * sigma * rng.gauss(0.0, 1.0)
+                off[1] += -0.2 * off[1] + 0.45 * sigma * rng.gauss(0.0, 1.0)
+                view = views[(venue, s.symbol)]
+                view.spot = s.spot * (1 + off[0])
+                view.basis = (1 + s.basis) * (1 + off[1]) / (1 + off[0]) - 1
+                view.funding_rate = s.funding_rate
+                view.trade_id = step
+                if venue == 'binance':
+                    msgs = [('spot', market.ticker_msg(view, now_ms)), ('perp', market.mark_price_msg(view, now_ms))]
+                else:
+                    msgs = formats[venue](view, now_ms, funding_due)
+                recordings[venue].extend((now_ms, key, msg) for key, msg in msgs)
+    return recordings
+
+
+# ---------------------------------------------------------------------- server
+
+class RecordedVenueServer:
+    """
+    Replays recordings over WebSocket: ws://host:port/<venue>/<key>. Every
+    connection gets the whole recording for its key from the start, looped, at
+    `speed` times the recorded pace (0 sends as fast as the socket takes it).
+    """
+
+    def __init__(self, recordings: Dict[str, List[Row]], host: str = '127.0.0.1', port: int = DEFAULT_PORT,
+                 speed: float = 1.0, loop: bool = True):
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.loop = loop
+        self.streams: Dict[Tuple[str, str], List[Tuple[int, str]]] = {}
+        for venue, rows in recordings.items():
+            for t, key, msg in rows:
+                self.streams.setdefault((venue, key), []).append((t, msg))
+        self.stats = {'connections': 0, 'messages_sent': 0, 'subscribes': 0, 'pings': 0}
+        self.app = web.Application()
+        self.app.router.add_get('/{venue}/{key}', self._serve)
+        self._runner: Optional[web.AppRunner] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        logging.info(
+            f"Recorded venue stand-in on {self.url}: "
+            + ", ".join(f"{v}/{k} ({len(rows)} msgs)" for (v, k), rows in sorted(self.streams.items()))
+        )
+
+    async def close(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    async def _serve(self, request: web.Request):
+        venue, key = request.match_info['venue'], request.match_info['key']
+        rows = self.streams.get((venue, key))
+        if rows is None:
+            return web.Response(status=404, text=f"no recording for {venue}/{key}")
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.stats['connections'] += 1
+        sender = asyncio.create_task(self._replay(ws, venue, rows))
+        try:
+            async for frame in ws:
+                if frame.type != WSMsgType.TEXT:
+                    continue
+                pong = PONGS.get(frame.data)
+                if pong is not None:
+                    self.stats['pings'] += 1
+                    await ws.send_str(pong)
+                    continue
+                try:
+                    req = json.loads(frame.data)
+                except ValueError:
+                    continue
+                if req.get('op') == 'subscribe':
+                    self.stats['subscribes'] += 1
+                    ack = SUBSCRIBE_ACKS.get(venue)
+                    if ack is not None:
+                        await ws.send_str(ack(req))
+        finally:
+            sender.cancel()
+            self.stats['connections'] -= 1
+        return ws
+
+    async def _replay(self, ws: web.WebSocketResponse, venue: str, rows: List[Tuple[int, str]]):
+        pattern = RETIME.get(venue)
+        first = rows[0][0]
+        try:
+            while True:
+                start = time.monotonic()
+                for i, (t, msg) in enumerate(rows):
+                    if self.speed > 0:
+                        delay = start + (t - first) / 1000 / self.speed - time.monotonic()
+                        if delay > 0:
+                            await asyncio.sleep(delay)
+                    elif i % 256 == 0:
+                        await asyncio.sleep(0)
+                    if pattern is not None:
+                        shift = int(time.time() * 1000) - t
+                        msg = pattern.sub(lambda m: m.group(0).replace(m.group(1), str(int(m.group(1)) + shift)), msg)
+                    await ws.send_str(msg)
+                    self.stats['messages_sent'] += 1
+                if not self.loop:
+                    break
+        except (ConnectionError, RuntimeError):
+            pass  # client went away
+
+
+# ---------------------------------------------------------------------- CLI
+
+def _feed(venue: str, symbols: List[str]) -> VenueFeed:
+    from venues.registry import FEEDS
+    return FEEDS[venue](symbols)
+
+
+async def _record(args):
+    rows = await record(_feed(args.venue, args.symbols), args.seconds)
+    save_recording(args.out, rows)
+    logging.info(f"Recorded {len(rows)} {args.venue} messages to {args.out}.")
+
+
+async def _serve_cli(args):
+    recordings: Dict[str, List[Row]] = {}
+    if args.synthetic:
+        recordings.update(synthetic_recordings(
+            args.synthetic, args.symbols, seconds=args.seconds, updates_per_s=args.rate, seed=args.seed
+        ))
+    for spec in args.recording:
+        venue, path = spec.split('=', 1)
+        recordings[venue] = load_recording(path)
+    server = RecordedVenueServer(recordings, args.host, args.port, speed=args.speed)
+    await server.start()
+    try:
+        while True:
+            await asyncio.sleep(10)
+            logging.info(f"Stand-in stats: {server.stats}")
+    finally:
+        await server.close()
+
+
+def _parse_args():
+    def csv(value: str) -> List[str]:
+        return [v.strip() for v in value.split(',') if v.strip()]
+
+    parser = argparse.ArgumentParser(description="Record venue feeds and replay them locally.")
+    sub = parser.add_subparsers(dest='command', required=True)
+    rec = sub.add_parser('record', help="capture a venue's raw messages to JSONL")
+    rec.add_argument('--venue', required=True)
+    rec.add_argument('--symbols', type=lambda v: [s.upper() for s in csv(v)], required=True)
+    rec.add_argument('--seconds', type=float, default=60.0)
+    rec.add_argument('--out', required=True)
+    serve = sub.add_parser('serve', help="replay recordings over WebSocket")
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=DEFAULT_PORT)
+    serve.add_argument('--recording', action='append', default=[], help="venue=path.jsonl (repeatable)")
+    serve.add_argument('--synthetic', type=csv, default=[], help="comma-separated venues to synthesize")
+    serve.add_argument('--symbols', type=lambda v: [s.upper() for s in csv(v)], default=['BTCUSDT'])
+    serve.add_argument('--seconds', type=float, default=60.0, help="length of synthetic recordings")
+    serve.add_argument('--rate', type=float, default=10.0, help="synthetic updates per symbol per second")
+    serve.add_argument('--speed', type=float, default=1.0, help="replay pace; 0 = as fast as possible")
+    serve.add_argument('--seed', type=int, default=None)
+    return parser.parse_args()
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    args = _parse_args()
+    try:
+        asyncio.run(_record(args) if args.command == 'record' else _serve_cli(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,34 @@
+# venues/registry.py
+
+from typing import Dict, List, Type
+
+from venues.base import VenueFeed, VenueOrders
+from venues.binance import BinanceFeed, BinanceOrders
+from venues.bybit import BybitFeed, BybitOrders
+from venues.okx import OkxFeed, OkxOrders
+
+FEEDS: Dict[str, Type[VenueFeed]] = {
+    'binance': BinanceFeed,
+    'bybit': BybitFeed,
+    'okx': OkxFeed,
+}
+
+ORDERS: Dict[str, Type[VenueOrders]] = {
+    'binance': BinanceOrders,
+    'bybit': BybitOrders,
+    'okx': OkxOrders,
+}
+
+
+def make_feeds(venues: List[str], symbols: List[str], standin_url: str = '') -> List[VenueFeed]:
+    """
+    One feed adapter per venue name; with `standin_url`, every connection points
+    at a local venues.recorded server instead of the exchange.
+    """
+    unknown = [v for v in venues if v not in FEEDS]
+    if unknown:
+        raise ValueError(f"Unknown venues {unknown}; known: {sorted(FEEDS)}")
+    if standin_url:
+        from venues.recorded import standin_urls
+        return [FEEDS[v](symbols, standin_urls(standin_url, v)) for v in venues]
+    return [FEEDS[v](symbols) for v in venues]
@@ -0,0 +1,113 @@
+# venues/scanner.py
+
+import asyncio
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from metrics.latency import histogram
+from venues.table import VenuePriceTable
+
+_SCAN = histogram('venue_scan')
+
+
+class CrossVenueSpread(NamedTuple):
+    """
+    Buy spot on `spot_venue`, short the perp on `perp_venue` (direction 1), or
+    the reverse (direction -1). `edge` is |basis| minus both taker fees plus one
+    funding interval of carry at the perp venue's current rate.
+    """
+    symbol: str
+    spot_venue: str
+    perp_venue: str
+    direction: int
+    spot_price: float
+    perp_price: float
+    basis: float
+    funding_rate: float
+    edge: float
+
+
+class CrossVenueScanner:
+    """
+    Basis of every (spot venue, perp venue, symbol) combination in one pass over
+    a VenuePriceTable: perp[None, :, :] / spot[:, None, :] - 1 broadcasts to a
+    (venues, venues, symbols) cube, which is masked for missing or stale quotes
+    and ranked by edge. Same-venue pairs are included (the classic basis).
+    """
+
+    def __init__(self, table: VenuePriceTable, taker_fees: Dict[str, Tuple[float, float]],
+                 max_age_ms: int = 5_000, min_edge: float = 0.0):
+        self.table = table
+        self.max_age_ms = max_age_ms
+        self.min_edge = min_edge
+        # (spot fee of the spot venue) + (perp fee of the perp venue), per pair
+        spot_fee = np.array([taker_fees.get(v, (0.001, 0.0005))[0] for v in table.venues])
+        perp_fee = np.array([taker_fees.get(v, (0.001, 0.0005))[1] for v in table.venues])
+        self.cost = (spot_fee[:, None] + perp_fee[None, :])[:, :, None]
+        self.last: List[CrossVenueSpread] = []
+
+    def scan(self, now_ms: Optional[int] = None, limit: int = 10) -> List[CrossVenueSpread]:
+        """
+        Up to `limit` opportunities with edge above `min_edge`, best first.
+        """
+        t0 = time.perf_counter_ns()
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        table = self.table
+        snap = table.snapshot()
+        spot, perp = snap.spot[:, None, :], snap.perp[None, :, :]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            basis = perp / spot - 1.0
+        direction = np.where(basis >= 0.0, 1, -1)
+        # Short perp receives positive funding; long perp pays it
+        carry = direction * snap.funding[None, :, :]
+        edge = np.abs(basis) - self.cost + carry
+        cutoff = now_ms - self.max_age_ms
+        fresh = (snap.spot_time[:, None, :] >= cutoff) & (snap.perp_time[None, :, :] >= cutoff)
+        edge = np.where(fresh & np.isfinite(edge), edge, -np.inf)
+
+        flat = edge.ravel()
+        k = min(limit, int(np.count_nonzero(flat > self.min_edge)))
+        spreads = []
+        if k:
+            top = np.argpartition(-flat, k - 1)[:k]
+            top = top[np.argsort(-flat[top])]
+            n_venues, n_symbols = len(table.venues), len(table.symbols)
+            for i in top:
+                s_venue, p_venue, slot = np.unravel_index(i, (n_venues, n_venues, n_symbols))
+                spreads.append(CrossVenueSpread(
+                    symbol=table.symbols[slot],
+                    spot_venue=table.venues[s_venue],
+                    perp_venue=table.venues[p_venue],
+                    direction=int(direction[s_venue, p_venue, slot]),
+                    spot_price=float(snap.spot[s_venue, slot]),
+                    perp_price=float(snap.perp[p_venue, slot]),
+                    basis=float(basis[s_venue, p_venue, slot]),
+                    funding_rate=float(snap.funding[p_venue, slot]),
+                    edge=float(flat[i]),
+                ))
+        self.last = spreads
+        _SCAN.record(time.perf_counter_ns() - t0)
+        return spreads
+
+    async def run(self, updated: asyncio.Event, interval_s: float = 1.0, log_top: int = 3):
+        """
+        Re-scan at most every `interval_s` while quotes are arriving and log the
+        best opportunities whenever the leader changes.
+        """
+        leader = None
+        while True:
+            await updated.wait()
+            updated.clear()
+            spreads = self.scan()
+            head = spreads[0][:3] if spreads else None
+            if spreads and head != leader:
+                logging.info("Cross-venue basis: " + "; ".join(
+                    f"{s.symbol} spot@{s.spot_venue}/perp@{s.perp_venue} "
+                    f"basis {s.basis * 1e4:+.1f}bp edge {s.edge * 1e4:+.1f}bp"
+                    for s in spreads[:log_top]
+                ))
+            leader = head
+            await asyncio.sleep(interval_s)
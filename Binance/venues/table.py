@@ -0,0 +1,93 @@
+# venues/table.py
+
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+
+from data.market_state import SPOT
+from venues.base import Quote
+
+
+class VenueSnapshot(NamedTuple):
+    """
+    Read-only (venue, symbol) views over a VenuePriceTable; `seq` as in
+    data.market_state.UniverseSnapshot.
+    """
+    seq: int
+    venues: List[str]
+    symbols: List[str]
+    spot: np.ndarray
+    perp: np.ndarray
+    funding: np.ndarray
+    next_funding_ms: np.ndarray
+    spot_time: np.ndarray
+    perp_time: np.ndarray
+
+
+class VenuePriceTable:
+    """
+    Latest normalized quotes of every venue in one place: 2-D (venue × symbol)
+    arrays for spot, perp, funding rate, next funding time and the event times of
+    both legs. Missing prices are NaN, missing times 0. Same seqlock convention
+    as data.market_state.PriceMatrix, so a scan can check it did not straddle
+    an update.
+    """
+
+    def __init__(self, venues: List[str], symbols: List[str]):
+        self.venues: List[str] = list(venues)
+        self.symbols: List[str] = [s.upper() for s in symbols]
+        self.venue_slots: Dict[str, int] = {v: i for i, v in enumerate(self.venues)}
+        self.slots: Dict[str, int] = {s: i for i, s in enumerate(self.symbols)}
+        shape = (len(self.venues), len(self.symbols))
+
+        self.spot = np.full(shape, np.nan, dtype=np.float64)
+        self.perp = np.full(shape, np.nan, dtype=np.float64)
+        self.funding = np.zeros(shape, dtype=np.float64)
+        self.next_funding_ms = np.zeros(shape, dtype=np.int64)
+        self.spot_time = np.zeros(shape, dtype=np.int64)
+        self.perp_time = np.zeros(shape, dtype=np.int64)
+        self.seq: int = 0
+        # Quotes applied per venue
+        self.updates = np.zeros(len(self.venues), dtype=np.int64)
+
+    def apply(self, venue: int, quote: Quote) -> bool:
+        """
+        Write one quote of venue slot `venue`; False if its symbol is not tracked.
+        """
+        kind, symbol, event_ms, price, funding_rate, next_funding_ms = quote
+        slot = self.slots.get(symbol)
+        if slot is None:
+            return False
+        self.seq += 1
+        if kind == SPOT:
+            self.spot[venue, slot] = price
+            self.spot_time[venue, slot] = event_ms
+        else:
+            self.perp[venue, slot] = price
+            self.funding[venue, slot] = funding_rate
+            self.next_funding_ms[venue, slot] = next_funding_ms
+            self.perp_time[venue, slot] = event_ms
+        self.seq += 1
+        self.updates[venue] += 1
+        return True
+
+    def snapshot(self) -> VenueSnapshot:
+        def ro(a: np.ndarray) -> np.ndarray:
+            view = a.view()
+            view.flags.writeable = False
+            return view
+
+        return VenueSnapshot(
+            seq=self.seq,
+            venues=self.venues,
+            symbols=self.symbols,
+            spot=ro(self.spot),
+            perp=ro(self.perp),
+            funding=ro(self.funding),
+            next_funding_ms=ro(self.next_funding_ms),
+            spot_time=ro(self.spot_time),
+            perp_time=ro(self.perp_time),
+        )
+
+    def is_consistent(self, snap: VenueSnapshot) -> bool:
+        return snap.seq == self.seq and not (snap.seq & 1)